@@ -0,0 +1,19 @@
+"""
+Historical backtesting on top of the production trading components.
+"""
+
+from .archive import KlineArchive, KlineDownloader
+from .data import HistoricalDataService, load_klines_directory
+from .engine import BacktestEngine, BacktestResult, BacktestTrade, FillModel
+from .features import SymbolFeatures, compute_features, features_from_klines
+from .sweep import ParameterSet, ParameterSweep, parameter_grid, signal_events, simulate
+from .walk_forward import Fold, FoldResult, WalkForwardOptimizer, walk_forward_folds
+
+__all__ = [
+    'BacktestEngine', 'BacktestResult', 'BacktestTrade', 'FillModel',
+    'HistoricalDataService', 'load_klines_directory',
+    'KlineArchive', 'KlineDownloader',
+    'SymbolFeatures', 'compute_features', 'features_from_klines',
+    'ParameterSet', 'ParameterSweep', 'parameter_grid', 'signal_events', 'simulate',
+    'Fold', 'FoldResult', 'WalkForwardOptimizer', 'walk_forward_folds'
+]
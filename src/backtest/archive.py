@@ -0,0 +1,532 @@
+"""
+Kline Archive - Deep kline history in a partitioned columnar store.
+
+Responsibilities:
+- Store klines per (interval, symbol, month) as one array file per column,
+  memory-mappable by the backtester and by ML feature pipelines
+- Page backward through Binance futures klines (endTime) for the whole
+  symbol universe and timeframe set, concurrently within a request-weight
+  budget
+- Resume after interruption from a per-(symbol, interval) manifest
+
+Layout:
+    {root}/{interval}/{SYMBOL}/manifest.json
+    {root}/{interval}/{SYMBOL}/{YYYY-MM}/{column}.npy    (memory-mappable)
+    {root}/{interval}/{SYMBOL}/{YYYY-MM}.npz             (compress=True)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.data import KLINE_COLUMNS, timeframe_to_offset
+from src.config import Config
+from src.core.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DTYPES = {
+    'timestamp': np.int64,   # 開盤時間（epoch ms）
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64
+}
+MAX_PAGE_LIMIT = 1500        # /fapi/v1/klines 單次上限
+_MS = 1_000_000              # ns → ms
+
+
+def kline_request_weight(limit: int) -> int:
+    """Request weight of GET /fapi/v1/klines for a page size."""
+    return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+
+
+def _to_ms(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return pd.Timestamp(value).value // _MS
+
+
+def _month_keys(ts_ms: np.ndarray) -> np.ndarray:
+    return ts_ms.astype('datetime64[ms]').astype('datetime64[M]')
+
+
+def _next_month_ms(ts_ms: int) -> int:
+    month = np.datetime64(int(ts_ms), 'ms').astype('datetime64[M]') + 1
+    return int(month.astype('datetime64[ms]').astype(np.int64))
+
+
+class KlineArchive:
+    """Per-symbol, per-month columnar kline store."""
+
+    def __init__(self, root: Optional[str] = None, compress: Optional[bool] = None):
+        """
+        Initialize kline archive.
+
+        Args:
+            root: Archive directory (default: Config.KLINE_ARCHIVE_DIR)
+            compress: Write compressed .npz partitions (smaller, but loaded
+                into memory instead of memory-mapped)
+        """
+        self.root = root or Config.KLINE_ARCHIVE_DIR
+        self.compress = Config.KLINE_ARCHIVE_COMPRESS if compress is None else compress
+        os.makedirs(self.root, exist_ok=True)
+
+        # Statistics
+        self.stats = {
+            'partitions_written': 0,
+            'rows_written': 0,
+            'partitions_read': 0
+        }
+
+    def _symbol_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, interval, symbol)
+
+    # ------------------------------------------------------------------
+    # Manifest (resume state)
+    # ------------------------------------------------------------------
+
+    def read_manifest(self, symbol: str, interval: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._symbol_dir(symbol, interval), 'manifest.json')
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Corrupt manifest {path}, restarting {symbol} {interval}: {e}")
+            return None
+
+    def write_manifest(self, symbol: str, interval: str, manifest: Dict[str, Any]):
+        directory = self._symbol_dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, 'manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(path + '.tmp', path)
+
+    # ------------------------------------------------------------------
+    # Partitions
+    # ------------------------------------------------------------------
+
+    def symbols(self, interval: str) -> List[str]:
+        directory = os.path.join(self.root, interval)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(os.listdir(directory))
+
+    def months(self, symbol: str, interval: str) -> List[str]:
+        directory = self._symbol_dir(symbol, interval)
+        if not os.path.isdir(directory):
+            return []
+        self._recover(directory)
+        months = set()
+        for name in os.listdir(directory):
+            stem = name[:-4] if name.endswith('.npz') else name
+            if len(stem) == 7 and stem[4] == '-' and not name.endswith('.tmp'):
+                months.add(stem)
+        return sorted(months)
+
+    def _recover(self, directory: str):
+        """
+        Finish or roll back partition swaps interrupted by a crash.
+
+        A partition is replaced by renaming the old copy to <month>.old, moving
+        the new one into place, then deleting <month>.old. A leftover .old is
+        restored if no current copy exists, otherwise removed; leftover .tmp
+        files / directories are incomplete writes and are removed.
+        """
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.old'):
+                base = path[:-len('.old')]
+                if os.path.isdir(base) or os.path.exists(base + '.npz'):
+                    self._remove(path)
+                else:
+                    logger.warning(f"Restoring interrupted partition swap: {path}")
+                    os.replace(path, base)
+            elif name.endswith('.tmp') and not name.startswith('manifest'):
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def read_partition(self, symbol: str, interval: str, month: str) -> Optional[Dict[str, np.ndarray]]:
+        """Columns of one month partition (memory-mapped unless stored compressed)."""
+        base = os.path.join(self._symbol_dir(symbol, interval), month)
+        if os.path.exists(base + '.old'):
+            self._recover(os.path.dirname(base))
+        if os.path.isdir(base):
+            columns = {col: np.load(os.path.join(base, f'{col}.npy'), mmap_mode='r') for col in ARCHIVE_DTYPES}
+        elif os.path.exists(base + '.npz'):
+            with np.load(base + '.npz') as npz:
+                columns = {col: npz[col] for col in ARCHIVE_DTYPES}
+        else:
+            return None
+        self.stats['partitions_read'] += 1
+        return columns
+
+    def write_klines(self, symbol: str, interval: str, df: pd.DataFrame) -> int:
+        """
+        Merge klines (get_klines format) into their month partitions.
+
+        Rows already archived are replaced by the new ones; each partition is
+        rewritten atomically.
+
+        Returns:
+            Number of partitions written
+        """
+        if df is None or len(df) == 0:
+            return 0
+
+        columns = {
+            'timestamp': df['timestamp'].values.astype('datetime64[ms]').astype(np.int64),
+            **{col: df[col].values.astype(np.float64) for col in KLINE_COLUMNS[1:]}
+        }
+        months = _month_keys(columns['timestamp'])
+        written = 0
+        for month in np.unique(months):
+            mask = months == month
+            new = {col: values[mask] for col, values in columns.items()}
+            self._write_partition(symbol, interval, str(month), new)
+            written += 1
+        return written
+
+    def _write_partition(self, symbol: str, interval: str, month: str, new: Dict[str, np.ndarray]):
+        existing = self.read_partition(symbol, interval, month)
+        if existing is not None:
+            # 新數據優先：按 timestamp 去重（保留最後出現者）
+            merged = {col: np.concatenate([np.asarray(existing[col]), new[col]]) for col in ARCHIVE_DTYPES}
+            ts = merged['timestamp']
+            _, last = np.unique(ts[::-1], return_index=True)
+            keep = np.sort(len(ts) - 1 - last)
+            new = {col: values[keep] for col, values in merged.items()}
+
+        order = np.argsort(new['timestamp'], kind='stable')
+        new = {col: np.ascontiguousarray(new[col][order], dtype=dtype) for col, dtype in ARCHIVE_DTYPES.items()}
+
+        directory = self._symbol_dir(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, month)
+        old = base + '.old'
+        self._recover(directory)
+        if self.compress:
+            with open(base + '.npz.tmp', 'wb') as f:
+                np.savez_compressed(f, **new)
+            os.replace(base + '.npz.tmp', base + '.npz')
+            if os.path.isdir(base):
+                # 目錄格式的舊分區優先於 .npz 被讀取：先移開再刪除
+                os.replace(base, old)
+                shutil.rmtree(old)
+        else:
+            tmp = base + '.tmp'
+            os.makedirs(tmp)
+            for col, values in new.items():
+                np.save(os.path.join(tmp, f'{col}.npy'), values)
+            # 舊分區先改名移開，新分區就位後才刪除：任何時刻崩潰都至少保留一份完整數據
+            if os.path.isdir(base):
+                os.replace(base, old)
+            os.replace(tmp, base)
+            if os.path.isdir(old):
+                shutil.rmtree(old)
+            if os.path.exists(base + '.npz'):
+                os.remove(base + '.npz')
+
+        self.stats['partitions_written'] += 1
+        self.stats['rows_written'] += len(new['timestamp'])
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def load_columns(self, symbol: str, interval: str, start=None, end=None) -> Dict[str, np.ndarray]:
+        """
+        Columns between start and end (inclusive, open time).
+
+        A range inside one uncompressed month is returned as memory-mapped
+        views; wider ranges are concatenated.
+
+        Args:
+            start / end: Timestamp-like or epoch ms (None = unbounded)
+        """
+        start_ms, end_ms = _to_ms(start), _to_ms(end)
+        first = str(np.datetime64(start_ms, 'ms').astype('datetime64[M]')) if start_ms is not None else None
+        last = str(np.datetime64(end_ms, 'ms').astype('datetime64[M]')) if end_ms is not None else None
+
+        parts = []
+        for month in self.months(symbol, interval):
+            if (first and month < first) or (last and month > last):
+                continue
+            part = self.read_partition(symbol, interval, month)
+            if part is not None:
+                parts.append(part)
+
+        if not parts:
+            return {col: np.empty(0, dtype=dtype) for col, dtype in ARCHIVE_DTYPES.items()}
+        if len(parts) == 1:
+            columns = parts[0]
+        else:
+            columns = {col: np.concatenate([part[col] for part in parts]) for col in ARCHIVE_DTYPES}
+
+        ts = columns['timestamp']
+        lo = np.searchsorted(ts, start_ms, 'left') if start_ms is not None else 0
+        hi = np.searchsorted(ts, end_ms, 'right') if end_ms is not None else len(ts)
+        return {col: values[lo:hi] for col, values in columns.items()}
+
+    def load(self, symbol: str, interval: str, start=None, end=None) -> pd.DataFrame:
+        """Klines between start and end in the BinanceDataClient.get_klines format."""
+        columns = self.load_columns(symbol, interval, start, end)
+        df = pd.DataFrame({col: np.asarray(columns[col]) for col in KLINE_COLUMNS[1:]})
+        df.insert(0, 'timestamp', pd.to_datetime(np.asarray(columns['timestamp']), unit='ms'))
+        return df
+
+    def load_klines(
+        self,
+        symbols: Optional[List[str]] = None,
+        interval: str = '1m',
+        start=None,
+        end=None
+    ) -> Dict[str, pd.DataFrame]:
+        """Dict of {symbol: klines} for BacktestEngine / ParameterSweep / WalkForwardOptimizer."""
+        klines = {}
+        for symbol in symbols or self.symbols(interval):
+            df = self.load(symbol, interval, start, end)
+            if len(df):
+                klines[symbol] = df
+        logger.info(f"Loaded {interval} klines for {len(klines)} symbols from archive {self.root}")
+        return klines
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get archive statistics."""
+        return dict(self.stats)
+
+
+class KlineDownloader:
+    """
+    Backfills a KlineArchive from Binance futures klines.
+
+    Each (symbol, interval) pages backward from the last closed candle to
+    start (or the listing date). Completed months are written as soon as
+    paging moves past them and the manifest records how far down the
+    archive is contiguous, so an interrupted run resumes where it stopped;
+    a later run also tops up the candles closed since.
+    """
+
+    def __init__(
+        self,
+        client,
+        archive: Optional[KlineArchive] = None,
+        intervals: Optional[List[str]] = None,
+        start=None,
+        weight_per_minute: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        page_limit: int = MAX_PAGE_LIMIT,
+        max_retries: int = 5
+    ):
+        """
+        Initialize downloader.
+
+        Args:
+            client: BinanceDataClient (get_klines_history_async)
+            archive: Target archive (default: KlineArchive())
+            intervals: Timeframes to download (default: Config.KLINE_ARCHIVE_INTERVALS)
+            start: Oldest candle wanted (default: Config.KLINE_ARCHIVE_START)
+            weight_per_minute: Request-weight budget (default: Config.KLINE_DOWNLOAD_WEIGHT_PER_MINUTE)
+            concurrency: Concurrent (symbol, interval) downloads
+            page_limit: Candles per request (max 1500)
+            max_retries: Retries of a failed page before the stream is left for the next run
+        """
+        self.client = client
+        self.archive = archive or KlineArchive()
+        self.intervals = intervals or [i.strip() for i in Config.KLINE_ARCHIVE_INTERVALS.split(',') if i.strip()]
+        self.start_ms = _to_ms(start or Config.KLINE_ARCHIVE_START)
+        self.page_limit = min(page_limit, MAX_PAGE_LIMIT)
+        self.max_retries = max_retries
+        self.weight = kline_request_weight(self.page_limit)
+        self.limiter = RateLimiter(requests_per_minute=weight_per_minute or Config.KLINE_DOWNLOAD_WEIGHT_PER_MINUTE)
+        self.concurrency = concurrency or Config.KLINE_DOWNLOAD_CONCURRENCY
+
+        # Statistics
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'candles': 0,
+            'streams_completed': 0,
+            'streams_failed': 0
+        }
+
+    async def run(self, symbols: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Download every (symbol, interval) stream.
+
+        Args:
+            symbols: Symbols to download (default: all USDT perpetuals)
+        """
+        if symbols is None:
+            symbols = self.client.get_all_usdt_perpetual_pairs()
+
+        started = time.time()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(symbol, interval):
+            async with semaphore:
+                try:
+                    ok = await self.download(symbol, interval)
+                except Exception as e:
+                    logger.error(f"Kline download failed for {symbol} {interval}: {e}", exc_info=True)
+                    ok = False
+                self.stats['streams_completed' if ok else 'streams_failed'] += 1
+
+        await asyncio.gather(*(bounded(s, i) for i in self.intervals for s in symbols))
+
+        logger.info(
+            f"Kline download finished in {time.time() - started:.0f}s: "
+            f"{self.stats['streams_completed']} streams complete, {self.stats['streams_failed']} failed, "
+            f"{self.stats['candles']:,} candles, {self.stats['requests']} requests"
+        )
+        return self.get_stats()
+
+    async def download(self, symbol: str, interval: str) -> bool:
+        """Backfill and top up one stream; True when it is complete."""
+        interval_ms = timeframe_to_offset(interval).value // _MS
+        # 只歸檔已收盤的 K 線
+        last_closed = (int(time.time() * 1000) // interval_ms) * interval_ms - 1
+
+        manifest = self.archive.read_manifest(symbol, interval)
+        if manifest is None:
+            manifest = {'first_ms': last_closed + 1, 'last_ms': last_closed, 'listing_reached': False}
+            self.archive.write_manifest(symbol, interval, manifest)
+
+        if not manifest['listing_reached'] and manifest['first_ms'] > self.start_ms:
+            if not await self._page_backward(symbol, interval, manifest['first_ms'] - 1, self.start_ms, manifest):
+                return False
+
+        if manifest['last_ms'] < last_closed:
+            if not await self._page_backward(symbol, interval, last_closed, manifest['last_ms'] + 1, None):
+                return False
+            manifest['last_ms'] = last_closed
+            self.archive.write_manifest(symbol, interval, manifest)
+        return True
+
+    async def _page_backward(
+        self,
+        symbol: str,
+        interval: str,
+        end_ms: int,
+        stop_ms: int,
+        manifest: Optional[Dict[str, Any]]
+    ) -> bool:
+        """
+        Fetch [stop_ms, end_ms] newest page first.
+
+        With a manifest (backfill), first_ms follows every written month, so
+        the archive is contiguous from first_ms up to last_ms at any moment.
+        """
+        pending: List[pd.DataFrame] = []
+        end = end_ms
+        while end >= stop_ms:
+            page = await self._fetch_page(symbol, interval, end)
+            if page is None:
+                self._flush(symbol, interval, pending, None, manifest)
+                return False
+
+            listing_reached = len(page) < self.page_limit
+            ts = page['timestamp'].values.astype('datetime64[ms]').astype(np.int64)
+            page = page[ts >= stop_ms]
+            if len(page):
+                pending.append(page)
+                oldest = int(ts[ts >= stop_ms][0])
+                # 比最舊一根所在月份更新的月份已完整，立即落盤
+                self._flush(symbol, interval, pending, _next_month_ms(oldest), manifest)
+                end = oldest - 1
+            if listing_reached or len(page) == 0:
+                if manifest is not None and listing_reached:
+                    manifest['listing_reached'] = True
+                break
+
+        self._flush(symbol, interval, pending, None, manifest)
+        if manifest is not None and end < stop_ms:
+            manifest['first_ms'] = stop_ms
+        if manifest is not None:
+            self.archive.write_manifest(symbol, interval, manifest)
+        return True
+
+    def _flush(
+        self,
+        symbol: str,
+        interval: str,
+        pending: List[pd.DataFrame],
+        complete_from: Optional[int],
+        manifest: Optional[Dict[str, Any]]
+    ):
+        """Write pending rows at or after complete_from (all rows if None)."""
+        if not pending:
+            return
+        df = pd.concat(pending[::-1], ignore_index=True)
+        if complete_from is not None:
+            ts = df['timestamp'].values.astype('datetime64[ms]').astype(np.int64)
+            ready = ts >= complete_from
+            if not ready.any():
+                return
+            self.archive.write_klines(symbol, interval, df[ready])
+            pending[:] = [df[~ready]]
+            first = complete_from
+        else:
+            self.archive.write_klines(symbol, interval, df)
+            pending.clear()
+            first = int(df['timestamp'].iloc[0].value // _MS)
+
+        if manifest is not None:
+            manifest['first_ms'] = min(manifest['first_ms'], first)
+            self.archive.write_manifest(symbol, interval, manifest)
+
+    async def _fetch_page(self, symbol: str, interval: str, end_ms: int) -> Optional[pd.DataFrame]:
+        for attempt in range(self.max_retries + 1):
+            while not await self.limiter.acquire(tokens=self.weight):
+                pass
+            self.stats['requests'] += 1
+            page = await self.client.get_klines_history_async(symbol, interval, end_time=end_ms, limit=self.page_limit)
+            if page is not None:
+                self.stats['candles'] += len(page)
+                return page
+            if attempt < self.max_retries:
+                self.stats['retries'] += 1
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+        logger.warning(f"Giving up on {symbol} {interval} page ending {end_ms} (resumes next run)")
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get downloader statistics."""
+        return {**self.stats, 'archive': self.archive.get_stats()}
+
+
+async def main():
+    """Download Config.KLINE_ARCHIVE_INTERVALS for all USDT perpetuals into Config.KLINE_ARCHIVE_DIR."""
+    from src.clients.binance_client import BinanceClient
+
+    client = BinanceClient()
+    await client.initialize_async()
+    try:
+        await KlineDownloader(client).run()
+    finally:
+        await client.close_async()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
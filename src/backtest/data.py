@@ -0,0 +1,215 @@
+"""
+Historical Data - Stored klines served as of a simulated clock.
+
+Responsibilities:
+- Load per-symbol kline files (CSV / Parquet)
+- Stand in for DataService.fetch_klines during a backtest
+- Aggregate the base timeframe into higher timeframes (15m trend), with the
+  current higher-timeframe candle still forming exactly as Binance returns it
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+KLINE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+_PANDAS_UNITS = {'m': 'min', 'h': 'h', 'd': 'D', 'w': 'W'}
+
+
+def timeframe_to_offset(timeframe: str) -> pd.Timedelta:
+    """Convert a Binance interval ('1m', '15m', '1h', '1d') to a Timedelta."""
+    unit = timeframe[-1]
+    if unit not in _PANDAS_UNITS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return pd.Timedelta(int(timeframe[:-1]), unit=_PANDAS_UNITS[unit])
+
+
+def normalize_klines(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bring a kline frame into the BinanceDataClient.get_klines format.
+
+    Numeric timestamps are treated as epoch milliseconds; rows are sorted and
+    de-duplicated by timestamp.
+    """
+    df = df[[col for col in KLINE_COLUMNS if col in df.columns]].copy()
+    if pd.api.types.is_numeric_dtype(df['timestamp']):
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    else:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = df[col].astype(float)
+
+    df = df.drop_duplicates('timestamp', keep='last').sort_values('timestamp')
+    return df.reset_index(drop=True)
+
+
+def load_klines_directory(
+    directory: str,
+    symbols: Optional[List[str]] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Load {SYMBOL}.csv / {SYMBOL}.parquet files from a directory.
+
+    Args:
+        directory: Directory containing one file per symbol
+        symbols: Optional subset of symbols to load
+
+    Returns:
+        Dict of {symbol: kline DataFrame}
+    """
+    klines = {}
+    for filename in sorted(os.listdir(directory)):
+        symbol, ext = os.path.splitext(filename)
+        if ext not in ('.csv', '.parquet') or (symbols and symbol not in symbols):
+            continue
+
+        path = os.path.join(directory, filename)
+        try:
+            df = pd.read_parquet(path) if ext == '.parquet' else pd.read_csv(path)
+            klines[symbol] = normalize_klines(df)
+        except Exception as e:
+            logger.error(f"Failed to load klines for {symbol} from {path}: {e}")
+
+    logger.info(f"Loaded klines for {len(klines)} symbols from {directory}")
+    return klines
+
+
+class HistoricalDataService:
+    """
+    DataService stand-in for backtests.
+
+    fetch_klines() returns the candles visible at the simulated time set via
+    set_time(): base-timeframe candles up to and including the current one,
+    and for higher timeframes the completed candles plus the forming one.
+    """
+
+    def __init__(self, klines: Dict[str, pd.DataFrame], base_timeframe: str = '1m'):
+        """
+        Initialize historical data service.
+
+        Args:
+            klines: Dict of {symbol: kline DataFrame in the base timeframe}
+            base_timeframe: Timeframe of the stored klines
+        """
+        self.base_timeframe = base_timeframe
+        self.frames = {symbol: normalize_klines(df) for symbol, df in klines.items()}
+        self._timestamps = {
+            symbol: df['timestamp'].values.astype('datetime64[ns]').astype(np.int64)
+            for symbol, df in self.frames.items()
+        }
+        self._aggregates: Dict[tuple, Dict[str, np.ndarray]] = {}
+        self._now_ns: Optional[int] = None
+
+        # Statistics
+        self.stats = {
+            'total_fetches': 0,
+            'failed_fetches': 0,
+            'aggregations': 0
+        }
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.frames.keys())
+
+    def set_time(self, timestamp):
+        """Advance the simulated clock (pd.Timestamp or epoch nanoseconds)."""
+        self._now_ns = int(timestamp) if isinstance(timestamp, (int, np.integer)) else pd.Timestamp(timestamp).value
+
+    def position(self, symbol: str) -> int:
+        """Index of the latest base candle visible at the simulated time (-1 = none)."""
+        ts = self._timestamps.get(symbol)
+        if ts is None or len(ts) == 0:
+            return -1
+        if self._now_ns is None:
+            return len(ts) - 1
+        return int(np.searchsorted(ts, self._now_ns, side='right')) - 1
+
+    async def fetch_klines(
+        self,
+        symbol: str,
+        timeframe: str = '1h',
+        limit: int = 200,
+        force_refresh: bool = False
+    ) -> Optional[pd.DataFrame]:
+        """
+        Fetch klines as of the simulated time (same signature as DataService.fetch_klines).
+
+        Returns:
+            DataFrame or None if the symbol has no data yet
+        """
+        i = self.position(symbol)
+        if i < 0:
+            self.stats['failed_fetches'] += 1
+            return None
+
+        self.stats['total_fetches'] += 1
+
+        if timeframe == self.base_timeframe:
+            return self.frames[symbol].iloc[max(0, i - limit + 1):i + 1].reset_index(drop=True)
+
+        agg = self._aggregate(symbol, timeframe)
+        bucket = int(agg['bucket'][i])
+        start = max(0, bucket - limit + 1)
+
+        # 已收盤的高週期 K 棒 + 當前形成中的 K 棒（與交易所返回一致）
+        data = {
+            'timestamp': np.append(agg['timestamp'][start:bucket], agg['timestamp'][bucket]),
+            'open': np.append(agg['open'][start:bucket], agg['open'][bucket]),
+            'high': np.append(agg['high'][start:bucket], agg['running_high'][i]),
+            'low': np.append(agg['low'][start:bucket], agg['running_low'][i]),
+            'close': np.append(agg['close'][start:bucket], agg['base_close'][i]),
+            'volume': np.append(agg['volume'][start:bucket], agg['running_volume'][i])
+        }
+        return pd.DataFrame(data)
+
+    async def get_ticker_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Last price at the simulated time (subset of the 24h ticker)."""
+        i = self.position(symbol)
+        if i < 0:
+            return None
+        return {'symbol': symbol, 'lastPrice': float(self.frames[symbol]['close'].iloc[i])}
+
+    def _aggregate(self, symbol: str, timeframe: str) -> Dict[str, np.ndarray]:
+        """Resample the base candles once per (symbol, timeframe)."""
+        key = (symbol, timeframe)
+        if key in self._aggregates:
+            return self._aggregates[key]
+
+        df = self.frames[symbol]
+        bucket_start = df['timestamp'].dt.floor(timeframe_to_offset(timeframe))
+        groups = df.groupby(bucket_start, sort=True)
+        bars = groups.agg(open=('open', 'first'), high=('high', 'max'), low=('low', 'min'),
+                          close=('close', 'last'), volume=('volume', 'sum'))
+
+        # 每根基礎 K 棒所屬高週期 K 棒的序號，以及該 K 棒到此為止的高 / 低 / 量
+        bucket = groups.ngroup().values
+        agg = {
+            'bucket': bucket,
+            'timestamp': bars.index.values,
+            'open': bars['open'].values,
+            'high': bars['high'].values,
+            'low': bars['low'].values,
+            'close': bars['close'].values,
+            'volume': bars['volume'].values,
+            'running_high': groups['high'].cummax().values,
+            'running_low': groups['low'].cummin().values,
+            'running_volume': groups['volume'].cumsum().values,
+            'base_close': df['close'].values
+        }
+        self._aggregates[key] = agg
+        self.stats['aggregations'] += 1
+        return agg
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get data service statistics."""
+        return {
+            **self.stats,
+            'symbols': len(self.frames),
+            'candles': sum(len(df) for df in self.frames.values())
+        }
@@ -0,0 +1,580 @@
+"""
+Backtest Engine - Event-driven replay of stored klines through the live pipeline.
+
+Responsibilities:
+- Compute indicators once per symbol over the whole history (TechnicalIndicators)
+- Step candle by candle, analyzing only candles the prescreen cannot rule out
+- Run the production StrategyEngine.analyze_batch / rank_signals and
+  RiskManager sizing and leverage on each analyzed candle
+- Simulate fills, exchange-side stop-loss / take-profit and fees
+
+Per step the engine slices a live-length window out of the precomputed
+indicator frame and the StrategyEngine's incremental structure tracker only
+processes the candles added since the symbol was last analyzed, so no
+200-candle window is ever recomputed.
+
+Modes:
+- 'replay' (default): the candle-by-candle walk through the production
+  analyze_batch / rank_signals / ICTSMCStrategy (~1 ms per symbol-candle),
+  so every change to the live strategy is what gets backtested.
+- 'vectorized' (opt-in): the strategy decision of every candle comes from
+  the precomputed features (features.py / batch_scoring) and the portfolio
+  from sweep.simulate with the engine's RiskManager and FillModel
+  (~0.005-0.02 ms per symbol-candle, three months of 1m data for 300
+  symbols in a few minutes). It is a reimplementation of the strategy:
+  re-check it against 'replay' on a sample after strategy changes. Custom
+  strategy engines, rank modes other than 'confidence' and same-candle
+  entries always replay.
+
+Usage:
+    engine = BacktestEngine(load_klines_directory(Config.BACKTEST_DATA_DIR))
+    result = asyncio.run(engine.run())
+    print(result.summary())
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.data import HistoricalDataService
+from src.backtest.features import SymbolFeatures, features_from_klines
+from src.config import Config
+from src.managers.risk_manager import RiskManager
+from src.services.strategy_engine import Signal, StrategyEngine
+from src.utils.indicators import TechnicalIndicators
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FillModel:
+    """Simulated order fills and fees."""
+    taker_fee_rate: float = Config.TAKER_FEE_RATE
+    maker_fee_rate: float = Config.MAKER_FEE_RATE
+    slippage_bps: float = Config.BACKTEST_SLIPPAGE_BPS
+    entry_on_next_open: bool = True      # 信號在收盤產生，下一根 K 棒開盤以市價進場
+    take_profit_as_maker: bool = False   # TAKE_PROFIT_MARKET 為吃單；限價止盈時改用掛單費率
+    stop_first: bool = True              # 同一根 K 棒同時觸及止損與止盈時先算止損（保守）
+
+    def market_price(self, action: str, reference: float) -> float:
+        """Market fill with adverse slippage."""
+        slip = self.slippage_bps / 10000
+        return reference * (1 + slip) if action == 'BUY' else reference * (1 - slip)
+
+    def fee(self, notional: float, maker: bool = False) -> float:
+        return abs(notional) * (self.maker_fee_rate if maker else self.taker_fee_rate)
+
+    def check_exit(self, trade: 'BacktestTrade', bar_open: float, bar_high: float, bar_low: float) -> Optional[Tuple[float, str]]:
+        """
+        Check a candle against the exchange-side stop-loss / take-profit.
+
+        Returns:
+            (exit_price, reason) or None; gaps through a level fill at the open
+        """
+        if trade.action == 'BUY':
+            stop_hit = bar_low <= trade.stop_loss
+            target_hit = bar_high >= trade.take_profit
+            stop_price = min(bar_open, trade.stop_loss)
+            target_price = max(bar_open, trade.take_profit)
+        else:
+            stop_hit = bar_high >= trade.stop_loss
+            target_hit = bar_low <= trade.take_profit
+            stop_price = max(bar_open, trade.stop_loss)
+            target_price = min(bar_open, trade.take_profit)
+
+        if stop_hit and (self.stop_first or not target_hit):
+            return self.market_price('SELL' if trade.action == 'BUY' else 'BUY', stop_price), 'stop_loss'
+        if target_hit:
+            return target_price, 'take_profit'
+        return None
+
+
+@dataclass
+class BacktestTrade:
+    """One simulated position from entry to exit."""
+    symbol: str
+    action: str  # 'BUY' or 'SELL'
+    signal_time: pd.Timestamp
+    quantity: float
+    leverage: float
+    margin: float
+    stop_loss: float
+    take_profit: float
+    confidence: float
+    strategy: str
+    signal_price: float
+    entry_time: Optional[pd.Timestamp] = None
+    entry_price: Optional[float] = None
+    exit_time: Optional[pd.Timestamp] = None
+    exit_price: Optional[float] = None
+    exit_reason: str = ''
+    gross_pnl: float = 0.0
+    fees: float = 0.0
+
+    @property
+    def net_pnl(self) -> float:
+        return self.gross_pnl - self.fees
+
+    @property
+    def return_on_margin(self) -> float:
+        return self.net_pnl / self.margin * 100 if self.margin else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'symbol': self.symbol,
+            'action': self.action,
+            'entry_time': self.entry_time,
+            'entry_price': self.entry_price,
+            'exit_time': self.exit_time,
+            'exit_price': self.exit_price,
+            'exit_reason': self.exit_reason,
+            'quantity': self.quantity,
+            'leverage': self.leverage,
+            'margin': self.margin,
+            'confidence': self.confidence,
+            'strategy': self.strategy,
+            'gross_pnl': self.gross_pnl,
+            'fees': self.fees,
+            'net_pnl': self.net_pnl,
+            'return_on_margin': self.return_on_margin
+        }
+
+
+@dataclass
+class BacktestResult:
+    """Trades, equity curve and run statistics of a backtest."""
+    initial_balance: float
+    final_balance: float
+    trades: List[BacktestTrade] = field(default_factory=list)
+    equity_curve: List[Tuple[pd.Timestamp, float]] = field(default_factory=list)
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def max_drawdown(self) -> float:
+        """Maximum peak-to-trough drawdown of realized equity (%)."""
+        if not self.equity_curve:
+            return 0.0
+        equity = np.array([self.initial_balance] + [balance for _, balance in self.equity_curve])
+        peaks = np.maximum.accumulate(equity)
+        return float(np.max((peaks - equity) / peaks) * 100)
+
+    def trades_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([trade.to_dict() for trade in self.trades])
+
+    def summary(self) -> Dict[str, Any]:
+        """Headline performance figures."""
+        net = [trade.net_pnl for trade in self.trades]
+        wins = [pnl for pnl in net if pnl > 0]
+        losses = [pnl for pnl in net if pnl <= 0]
+        gross_loss = abs(sum(losses))
+
+        return {
+            'total_trades': len(self.trades),
+            'winning_trades': len(wins),
+            'losing_trades': len(losses),
+            'win_rate': len(wins) / len(self.trades) * 100 if self.trades else 0.0,
+            'net_pnl': self.final_balance - self.initial_balance,
+            'return_percent': (self.final_balance / self.initial_balance - 1) * 100,
+            'fees': sum(trade.fees for trade in self.trades),
+            'profit_factor': sum(wins) / gross_loss if gross_loss > 0 else float('inf') if wins else 0.0,
+            'max_drawdown': self.max_drawdown,
+            'final_balance': self.final_balance,
+            **self.stats
+        }
+
+
+@contextmanager
+def quiet_logs(enabled: bool):
+    """Silence per-signal INFO / WARNING logs of the production components during a run."""
+    root = logging.getLogger('src')
+    previous = root.level
+    if enabled:
+        root.setLevel(logging.ERROR)
+    try:
+        yield
+    finally:
+        root.setLevel(previous)
+
+
+class BacktestEngine:
+    """Backtester built on the production components (vectorized or candle-by-candle)."""
+
+    def __init__(
+        self,
+        klines: Dict[str, pd.DataFrame],
+        initial_balance: Optional[float] = None,
+        window_size: Optional[int] = None,
+        max_positions: int = 3,
+        fill_model: Optional[FillModel] = None,
+        risk_manager: Optional[RiskManager] = None,
+        strategy_engine: Optional[StrategyEngine] = None,
+        rank_mode: str = 'confidence',
+        quiet: bool = True,
+        mode: Optional[str] = None
+    ):
+        """
+        Initialize backtest engine.
+
+        Args:
+            klines: Dict of {symbol: 1m kline DataFrame} (see load_klines_directory)
+            initial_balance: Starting balance (default: Config.BACKTEST_INITIAL_BALANCE)
+            window_size: Indicator rows per analysis (default: Config.BACKTEST_WINDOW_SIZE)
+            max_positions: Concurrent position slots (ExecutionService.max_positions)
+            fill_model: Fill / fee model
+            risk_manager: RiskManager to size positions with (default: fresh instance)
+            strategy_engine: StrategyEngine to analyze with (default: fresh instance)
+            rank_mode: rank_signals mode
+            quiet: Suppress INFO logs of the production components while running
+            mode: 'vectorized' or 'replay' (default: Config.BACKTEST_MODE)
+        """
+        self.initial_balance = initial_balance or Config.BACKTEST_INITIAL_BALANCE
+        self.window_size = window_size or Config.BACKTEST_WINDOW_SIZE
+        self.max_positions = max_positions
+        self.fill_model = fill_model or FillModel()
+        self.rank_mode = rank_mode
+        self.quiet = quiet
+        self.mode = mode or Config.BACKTEST_MODE
+
+        self.data_service = HistoricalDataService(klines)
+        self.risk_manager = risk_manager or RiskManager(account_balance=self.initial_balance)
+        self.strategy_engine = strategy_engine or StrategyEngine(
+            self.risk_manager,
+            data_service=self.data_service,
+            executor_mode='async'
+        )
+        self.strategy_engine.data_service = self.data_service
+        self._default_strategy = strategy_engine is None   # 向量化特徵只複現默認的 ICT/SMC 策略
+
+        # 每個交易對：全歷史指標、K 棒數組、候選行
+        self._indicators: Dict[str, pd.DataFrame] = {}
+        self._bars: Dict[str, Dict[str, np.ndarray]] = {}
+        self._candidates: Dict[int, List[Tuple[str, int]]] = {}
+        self._features: Optional[List[SymbolFeatures]] = None
+
+        # 模擬帳戶狀態
+        self._pending: Dict[str, BacktestTrade] = {}
+        self._open: Dict[str, BacktestTrade] = {}
+        self._result: Optional[BacktestResult] = None
+
+        # Statistics
+        self.stats = {
+            'candles': 0,
+            'steps': 0,
+            'analysis_steps': 0,
+            'symbols_analyzed': 0,
+            'signals': 0,
+            'signals_rejected': 0,
+            'prepare_time': 0.0,
+            'replay_time': 0.0
+        }
+
+    def prepare(self):
+        """Compute indicators and candidate candles for every symbol (once per run)."""
+        started = time.perf_counter()
+        self._indicators.clear()
+        self._bars.clear()
+        self._candidates.clear()
+
+        for symbol, raw in self.data_service.frames.items():
+            if len(raw) < self.window_size:
+                logger.warning(f"Skipping {symbol}: {len(raw)} candles < window {self.window_size}")
+                continue
+
+            # 指標全部為因果計算，一次算完整段歷史即可
+            df = TechnicalIndicators.calculate_all_indicators(raw)
+            if df is None or len(df) < self.window_size:
+                logger.warning(f"Skipping {symbol}: indicators unavailable")
+                continue
+
+            self._indicators[symbol] = df
+            ts = df['timestamp'].values.astype('datetime64[ns]').astype(np.int64)
+            self._bars[symbol] = {
+                'timestamp': ts,
+                'open': df['open'].values.astype(np.float64),
+                'high': df['high'].values.astype(np.float64),
+                'low': df['low'].values.astype(np.float64),
+                'close': df['close'].values.astype(np.float64)
+            }
+            self.stats['candles'] += len(df)
+
+            mask = self.strategy_engine.screen_history(df)
+            if mask is None:
+                mask = np.ones(len(df), dtype=bool)
+            mask[:self.window_size - 1] = False
+
+            for row in np.flatnonzero(mask):
+                self._candidates.setdefault(int(ts[row]), []).append((symbol, int(row)))
+
+        self.stats['prepare_time'] += time.perf_counter() - started
+        logger.info(
+            f"Backtest prepared: {len(self._indicators)} symbols, {self.stats['candles']} candles, "
+            f"{sum(len(v) for v in self._candidates.values())} candidate candles "
+            f"({time.perf_counter() - started:.2f}s)"
+        )
+
+    @property
+    def vectorized(self) -> bool:
+        """Whether run() uses the vectorized path (it reproduces the replay only for the default setup)."""
+        return (
+            self.mode == 'vectorized'
+            and self._default_strategy
+            and self.rank_mode == 'confidence'
+            and self.fill_model.entry_on_next_open
+        )
+
+    def prepare_features(self) -> List[SymbolFeatures]:
+        """Compute per-candle strategy features for every symbol (vectorized mode, once per run)."""
+        if self._features is None:
+            started = time.perf_counter()
+            features = []
+            for symbol, raw in self.data_service.frames.items():
+                f = features_from_klines(symbol, raw, self.window_size)
+                if f is None:
+                    logger.warning(f"Skipping {symbol}: not enough candles for the analysis window")
+                    continue
+                features.append(f)
+                self.stats['candles'] += len(f)
+            self._features = features
+            self.stats['prepare_time'] += time.perf_counter() - started
+            logger.info(
+                f"Backtest features prepared: {len(features)} symbols, {self.stats['candles']} candles "
+                f"({time.perf_counter() - started:.2f}s)"
+            )
+        return self._features
+
+    async def run(self) -> BacktestResult:
+        """
+        Backtest the whole history (vectorized or candle-by-candle, see mode).
+
+        Returns:
+            BacktestResult
+        """
+        if self.vectorized:
+            with quiet_logs(self.quiet):
+                self._run_vectorized()
+            return self._finish()
+
+        with quiet_logs(self.quiet):
+            if not self._indicators:
+                self.prepare()
+
+            started = time.perf_counter()
+            self._result = BacktestResult(
+                initial_balance=self.risk_manager.account_balance,
+                final_balance=self.risk_manager.account_balance
+            )
+
+            # 預篩選已在 prepare() 中對整段歷史執行，重放時不必逐步重複
+            prescreen_enabled = self.strategy_engine.prescreen_enabled
+            self.strategy_engine.prescreen_enabled = False
+            try:
+                await self._replay()
+            finally:
+                self.strategy_engine.prescreen_enabled = prescreen_enabled
+
+            self._close_remaining()
+            self.stats['replay_time'] += time.perf_counter() - started
+        return self._finish()
+
+    def _run_vectorized(self):
+        """Signals of every candle from the features, portfolio via sweep.simulate."""
+        # sweep 依賴本模塊的數據類，延遲導入以避免循環引用
+        from src.backtest.sweep import ParameterSet, signal_events, simulate
+
+        features = self.prepare_features()
+        started = time.perf_counter()
+        events = signal_events(features, [ParameterSet(
+            min_confidence=Config.MIN_CONFIDENCE_THRESHOLD,
+            stop_atr_multiplier=Config.BREAKEVEN_STOP_ATR_MULTIPLIER,
+            min_rr=Config.MIN_RISK_REWARD_RATIO,
+            medium_rr=Config.MEDIUM_RISK_REWARD_RATIO,
+            max_rr=Config.MAX_RISK_REWARD_RATIO
+        )])[0]
+        self.stats['signals'] += len(events['timestamp'])
+        self._result = simulate(
+            features, events, self.risk_manager.account_balance,
+            max_positions=self.max_positions,
+            fill_model=self.fill_model,
+            risk_manager=self.risk_manager
+        )
+        self.stats['replay_time'] += time.perf_counter() - started
+
+    def _finish(self) -> BacktestResult:
+        self._result.final_balance = self.risk_manager.account_balance
+        self._result.stats = self.get_stats()
+        summary = self._result.summary()
+        logger.info(
+            f"Backtest complete: {summary['total_trades']} trades, "
+            f"win rate {summary['win_rate']:.1f}%, PnL ${summary['net_pnl']:.2f}, "
+            f"max DD {summary['max_drawdown']:.2f}% "
+            f"({self.stats['replay_time']:.1f}s)"
+        )
+        return self._result
+
+    async def _replay(self):
+        """Walk the merged timeline: entries → exits → analysis on every candle."""
+        timeline = np.unique(np.concatenate([bars['timestamp'] for bars in self._bars.values()])) \
+            if self._bars else np.array([], dtype=np.int64)
+
+        for ts in timeline:
+            self.stats['steps'] += 1
+            current = {}
+            for symbol in set(self._pending) | set(self._open):
+                row = self._row_at(symbol, ts)
+                if row is not None:
+                    current[symbol] = row
+
+            for symbol in list(self._pending):
+                if symbol in current:
+                    self._fill_entry(symbol, current[symbol])
+
+            # 開盤進場的倉位在同一根 K 棒內就可能觸發止損 / 止盈
+            for symbol in list(self._open):
+                if symbol in current:
+                    self._check_exit(symbol, current[symbol])
+
+            candidates = self._candidates.get(int(ts))
+            if candidates and len(self._open) + len(self._pending) < self.max_positions:
+                await self._analyze_step(int(ts), candidates)
+
+    def _row_at(self, symbol: str, ts) -> Optional[int]:
+        """Row of symbol's candle at ts (None if the symbol has no candle there)."""
+        timestamps = self._bars[symbol]['timestamp']
+        row = int(np.searchsorted(timestamps, ts))
+        return row if row < len(timestamps) and timestamps[row] == ts else None
+
+    async def _analyze_step(self, ts: int, candidates: List[Tuple[str, int]]):
+        """Run the live signal pipeline on the candle closing at ts."""
+        self.stats['analysis_steps'] += 1
+        self.data_service.set_time(ts)
+
+        symbols_data = {}
+        for symbol, row in candidates:
+            window = self._indicators[symbol].iloc[row - self.window_size + 1:row + 1]
+            symbols_data[symbol] = (window, float(self._bars[symbol]['close'][row]))
+        self.stats['symbols_analyzed'] += len(symbols_data)
+
+        signals = await self.strategy_engine.analyze_batch(symbols_data, self.data_service)
+        self.stats['signals'] += len(signals)
+
+        ranked = self.strategy_engine.rank_signals(signals, mode=self.rank_mode, limit=self.max_positions)
+        for signal in ranked:
+            if len(self._open) + len(self._pending) >= self.max_positions:
+                break
+            if signal.symbol in self._open or signal.symbol in self._pending:
+                self.stats['signals_rejected'] += 1
+                continue
+
+            row = dict(candidates)[signal.symbol]
+            trade = self._size_trade(signal, pd.Timestamp(ts))
+            if trade is None:
+                self.stats['signals_rejected'] += 1
+                continue
+
+            self._pending[signal.symbol] = trade
+            if not self.fill_model.entry_on_next_open:
+                self._fill_entry(signal.symbol, row, price=signal.price)
+
+    def _size_trade(self, signal: Signal, ts: pd.Timestamp) -> Optional[BacktestTrade]:
+        """Leverage and size exactly as ExecutionService.execute_signal does."""
+        leverage = self.risk_manager.calculate_dynamic_leverage(
+            confidence=signal.confidence,
+            atr=signal.metadata.get('atr', 0),
+            current_price=signal.metadata.get('current_price', signal.price)
+        )
+        params = self.risk_manager.calculate_position_size(
+            symbol=signal.symbol,
+            entry_price=signal.price,
+            stop_loss_price=signal.stop_loss,
+            confidence=signal.confidence,
+            leverage=leverage
+        )
+        if not params:
+            return None
+
+        return BacktestTrade(
+            symbol=signal.symbol,
+            action=signal.action,
+            signal_time=ts,
+            quantity=params['quantity'],
+            leverage=params['leverage'],
+            margin=params['margin'],
+            stop_loss=signal.stop_loss,
+            take_profit=signal.take_profit,
+            confidence=signal.confidence,
+            strategy=signal.strategy,
+            signal_price=signal.price
+        )
+
+    def _fill_entry(self, symbol: str, row: int, price: Optional[float] = None):
+        """Fill a pending entry at the candle's open (or at the given price)."""
+        trade = self._pending.pop(symbol)
+        bars = self._bars[symbol]
+        reference = price if price is not None else bars['open'][row]
+
+        trade.entry_time = pd.Timestamp(bars['timestamp'][row])
+        trade.entry_price = self.fill_model.market_price(trade.action, reference)
+        entry_fee = self.fill_model.fee(trade.entry_price * trade.quantity)
+        trade.fees += entry_fee
+
+        self.risk_manager.open_position(
+            symbol, trade.action, trade.entry_price, trade.quantity, trade.stop_loss, trade.take_profit
+        )
+        self._apply_balance(-entry_fee, trade.entry_time)
+        self._open[symbol] = trade
+
+    def _check_exit(self, symbol: str, row: int):
+        """Apply the candle to an open position's stop-loss / take-profit."""
+        trade = self._open[symbol]
+        bars = self._bars[symbol]
+        outcome = self.fill_model.check_exit(
+            trade, bars['open'][row], bars['high'][row], bars['low'][row]
+        )
+        if outcome is not None:
+            exit_price, reason = outcome
+            self._close_trade(symbol, exit_price, reason, pd.Timestamp(bars['timestamp'][row]))
+
+    def _close_trade(self, symbol: str, exit_price: float, reason: str, ts: pd.Timestamp):
+        trade = self._open.pop(symbol)
+        closed = self.risk_manager.close_position(symbol, exit_price)
+        exit_fee = self.fill_model.fee(
+            exit_price * trade.quantity,
+            maker=reason == 'take_profit' and self.fill_model.take_profit_as_maker
+        )
+
+        trade.exit_time = ts
+        trade.exit_price = exit_price
+        trade.exit_reason = reason
+        trade.gross_pnl = closed['pnl'] if closed else 0.0
+        trade.fees += exit_fee
+
+        self._apply_balance(-exit_fee, ts)
+        self._result.trades.append(trade)
+
+    def _close_remaining(self):
+        """Close positions still open at the end of the data at the last close."""
+        self._pending.clear()
+        for symbol in list(self._open):
+            bars = self._bars[symbol]
+            self._close_trade(
+                symbol, float(bars['close'][-1]), 'end_of_data', pd.Timestamp(bars['timestamp'][-1])
+            )
+
+    def _apply_balance(self, delta: float, ts: pd.Timestamp):
+        self.risk_manager.update_balance(self.risk_manager.account_balance + delta)
+        self._result.equity_curve.append((ts, self.risk_manager.account_balance))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get backtest statistics."""
+        return {
+            **self.stats,
+            'mode': 'vectorized' if self._features is not None else 'replay',
+            'symbols': len(self._features) if self._features is not None else len(self._indicators),
+            'analysis_rate': self.stats['analysis_steps'] / max(self.stats['steps'], 1),
+            'candles_per_second': self.stats['candles'] / max(self.stats['replay_time'], 1e-9)
+        }
@@ -0,0 +1,281 @@
+"""
+Backtest Features - Per-candle strategy inputs precomputed over a whole history.
+
+Responsibilities:
+- Market structure code per candle (ICTSMCStrategy.check_market_structure)
+- Liquidity-zone proximity per candle (structure tracker + is_near_zone)
+- 15m trend per candle (ICTSMCStrategy.get_15m_trend on HistoricalDataService)
+- Parameter-independent BUY / SELL confidence (batch_scoring.confidence_batch)
+
+Every array is aligned with the rows of the indicator frame, and row t
+describes the analysis window of window_size rows ending at t, so one pass
+replaces a per-candle replay for anything that only varies thresholds,
+risk/reward tiers or stop distances (see sweep.py).
+"""
+
+from dataclasses import dataclass, fields
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.data import normalize_klines, timeframe_to_offset
+from src.config import Config
+from src.strategies.batch_scoring import (
+    DIRECTION_BUY,
+    DIRECTION_SELL,
+    STRUCTURE_BEARISH,
+    STRUCTURE_BULLISH,
+    STRUCTURE_NEUTRAL,
+    TREND_BEAR,
+    TREND_BULL,
+    TREND_NEUTRAL,
+    confidence_batch
+)
+from src.utils.indicators import TechnicalIndicators
+
+_MSB_BREAKOUT = 0.003       # is_msb_confirmed 突破幅度
+_ZONE_TOLERANCE = 0.015     # is_near_zone 誤差範圍
+_LZ_LOOKBACK = 50           # identify_liquidity_zones lookback
+_MAX_ZONES = 5              # 每個窗口保留的流動性區域數
+_TREND_EMA_PERIOD = 200
+_TREND_LIMIT = 250          # get_15m_trend 抓取的 15m K 棒數
+
+
+@dataclass
+class SymbolFeatures:
+    """Row-aligned strategy inputs for one symbol."""
+    symbol: str
+    timestamp: np.ndarray       # int64 ns
+    open: np.ndarray            # float64 (fills)
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    price: np.ndarray           # 指標 dtype（通常 float32），與策略計算一致
+    atr: np.ndarray
+    structure: np.ndarray       # STRUCTURE_* codes
+    trend: np.ndarray           # TREND_* codes
+    at_support: np.ndarray
+    at_resistance: np.ndarray
+    buy_confidence: np.ndarray
+    sell_confidence: np.ndarray
+    valid: np.ndarray           # 完整窗口且指標有效
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def between(self, start_ns: int, end_ns: int) -> 'SymbolFeatures':
+        """
+        Rows with start_ns <= timestamp < end_ns.
+
+        Every feature is causal, so a slice of the full-history arrays equals
+        what the live bot would have seen in that period (no re-warm-up).
+        """
+        lo, hi = np.searchsorted(self.timestamp, [start_ns, end_ns])
+        return SymbolFeatures(**{
+            field.name: getattr(self, field.name) if field.name == 'symbol' else getattr(self, field.name)[lo:hi]
+            for field in fields(self)
+        })
+
+
+def structure_codes(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """Vectorized ICTSMCStrategy.check_market_structure for windows ending at each row."""
+    n = len(high)
+    codes = np.full(n, STRUCTURE_NEUTRAL, dtype=np.int8)
+    if n < 3:
+        return codes
+
+    # is_msb_confirmed 讀取的是 iloc 行（object dtype → Python float），以 float64 計算
+    h = high.astype(np.float64)
+    l = low.astype(np.float64)
+    c = close.astype(np.float64)
+
+    d_high = np.diff(h)
+    d_low = np.diff(l)
+    rising = (d_high[:-1] >= 0) & (d_high[1:] >= 0) & (d_low[:-1] >= 0) & (d_low[1:] >= 0)
+    falling = (d_high[:-1] <= 0) & (d_high[1:] <= 0) & (d_low[:-1] <= 0) & (d_low[1:] <= 0)
+
+    prev_high, current_high = h[:-2], h[1:-1]
+    prev_low, current_low = l[:-2], l[1:-1]
+    current_close = c[1:-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        msb_bull = (prev_high > 0) & ((current_high - prev_high) / prev_high >= _MSB_BREAKOUT) & (current_close > prev_high)
+        msb_bear = (prev_low > 0) & ((prev_low - current_low) / prev_low >= _MSB_BREAKOUT) & (current_close < prev_low)
+
+    tail = np.where(
+        rising, np.where(msb_bull, STRUCTURE_BULLISH, STRUCTURE_NEUTRAL),
+        np.where(falling, np.where(msb_bear, STRUCTURE_BEARISH, STRUCTURE_NEUTRAL), STRUCTURE_NEUTRAL)
+    )
+    codes[2:] = tail
+    return codes
+
+
+def zone_proximity(price: np.ndarray, high: np.ndarray, low: np.ndarray, window_size: int):
+    """
+    Liquidity-zone proximity flags for windows ending at each row.
+
+    Zones are the last five resistance / support events of candles that are
+    at least lookback rows into the window (same as the structure tracker's
+    snapshot, forming candle included).
+
+    Returns:
+        (at_support, at_resistance) boolean arrays
+    """
+    n = len(price)
+    at_support = np.zeros(n, dtype=bool)
+    at_resistance = np.zeros(n, dtype=bool)
+    if n <= _LZ_LOOKBACK:
+        return at_support, at_resistance
+
+    prior_high = pd.Series(high).rolling(_LZ_LOOKBACK).max().shift(1).values
+    prior_low = pd.Series(low).rolling(_LZ_LOOKBACK).min().shift(1).values
+    is_resistance = np.zeros(n, dtype=bool)
+    is_support = np.zeros(n, dtype=bool)
+    is_resistance[_LZ_LOOKBACK:] = high[_LZ_LOOKBACK:] >= prior_high[_LZ_LOOKBACK:]
+    is_support[_LZ_LOOKBACK:] = low[_LZ_LOOKBACK:] <= prior_low[_LZ_LOOKBACK:]
+
+    # 事件順序：同一根 K 棒先阻力後支撐（與 identify_liquidity_zones 相同）
+    event_row = np.concatenate([np.flatnonzero(is_resistance), np.flatnonzero(is_support)])
+    event_type = np.concatenate([
+        np.ones(is_resistance.sum(), dtype=bool),    # True = resistance
+        np.zeros(is_support.sum(), dtype=bool)
+    ])
+    order = np.lexsort((~event_type, event_row))
+    event_row = event_row[order]
+    event_type = event_type[order]
+    event_price = np.where(event_type, high[event_row], low[event_row])
+
+    rows = np.arange(n)
+    end = np.searchsorted(event_row, rows, side='right')
+    earliest = rows - window_size + 1 + _LZ_LOOKBACK
+    price64 = price.astype(np.float64)
+
+    for k in range(1, _MAX_ZONES + 1):
+        idx = end - k
+        has = idx >= 0
+        idx = np.where(has, idx, 0)
+        has &= event_row[idx] >= earliest
+        near = (np.abs(price - event_price[idx]).astype(np.float64) < price64 * _ZONE_TOLERANCE) & has
+        at_resistance |= near & event_type[idx]
+        at_support |= near & ~event_type[idx]
+
+    return at_support, at_resistance
+
+
+def trend_codes(timestamp: np.ndarray, close: np.ndarray, timeframe: str = None) -> np.ndarray:
+    """
+    15m trend per row as get_15m_trend computes it on HistoricalDataService
+    (last 250 15m candles incl. the forming one, EMA200 restarted at the
+    window start, fewer than 200 candles → neutral).
+    """
+    n = len(close)
+    codes = np.full(n, TREND_NEUTRAL, dtype=np.int8)
+    if n == 0:
+        return codes
+
+    offset = timeframe_to_offset(timeframe or Config.TREND_TIMEFRAME)
+    buckets = pd.Series(pd.to_datetime(timestamp)).dt.floor(offset)
+    bucket = pd.factorize(buckets, sort=True)[0]
+    completed_close = pd.Series(close).groupby(bucket).last().values
+
+    alpha = 2.0 / (_TREND_EMA_PERIOD + 1)
+    ema_completed = TechnicalIndicators.calculate_ema(completed_close, _TREND_EMA_PERIOD)
+
+    n_bars = np.minimum(bucket + 1, _TREND_LIMIT)
+    ready = n_bars >= _TREND_EMA_PERIOD
+    if not ready.any():
+        return codes
+
+    # 形成中的 K 棒：EMA 由上一根已收盤 K 棒遞推；窗口起點修正 EMA 的初始化
+    rows = np.flatnonzero(ready)
+    b = bucket[rows]
+    start = b - n_bars[rows] + 1
+    ema_full = alpha * close[rows] + (1 - alpha) * ema_completed[b - 1]
+    ema_window = ema_full - (1 - alpha) ** (b - start) * (ema_completed[start] - completed_close[start])
+
+    codes[rows] = np.where(close[rows] > ema_window, TREND_BULL, TREND_BEAR)
+    return codes
+
+
+def compute_features(
+    symbol: str,
+    indicators: pd.DataFrame,
+    window_size: Optional[int] = None,
+    raw_close: Optional[np.ndarray] = None,
+    raw_timestamp: Optional[np.ndarray] = None
+) -> SymbolFeatures:
+    """
+    Precompute all per-row strategy inputs of a symbol.
+
+    Args:
+        symbol: Trading symbol
+        indicators: Full-history frame from TechnicalIndicators.calculate_all_indicators
+        window_size: Analysis window length (default: Config.BACKTEST_WINDOW_SIZE)
+        raw_close / raw_timestamp: Unrounded kline closes for the trend (the 15m
+            trend is computed from raw klines, including the indicator warm-up rows)
+
+    Returns:
+        SymbolFeatures
+    """
+    window_size = window_size or Config.BACKTEST_WINDOW_SIZE
+    ts = indicators['timestamp'].values.astype('datetime64[ns]').astype(np.int64)
+    high = indicators['high'].values
+    low = indicators['low'].values
+    price = indicators['close'].values
+    macd = indicators['macd'].values
+    macd_signal = indicators['macd_signal'].values
+    ema_9 = indicators['ema_9'].values
+    ema_21 = indicators['ema_21'].values
+    atr = indicators['atr'].values
+
+    structure = structure_codes(high, low, price)
+    at_support, at_resistance = zone_proximity(price, high, low, window_size)
+
+    if raw_close is not None and raw_timestamp is not None:
+        raw_trend = trend_codes(raw_timestamp, raw_close.astype(np.float64))
+        positions = np.searchsorted(raw_timestamp, ts)
+        trend = raw_trend[positions]
+    else:
+        trend = trend_codes(ts, price.astype(np.float64))
+
+    buy_confidence = confidence_batch(structure, macd, macd_signal, ema_9, ema_21, price, DIRECTION_BUY, at_support)
+    sell_confidence = confidence_batch(structure, macd, macd_signal, ema_9, ema_21, price, DIRECTION_SELL, at_resistance)
+
+    values = np.column_stack([price, macd, macd_signal, ema_9, ema_21, atr]).astype(np.float64)
+    valid = ~np.isnan(values).any(axis=1) & (atr > 0) & (price > 0)
+    valid[:window_size - 1] = False
+
+    return SymbolFeatures(
+        symbol=symbol,
+        timestamp=ts,
+        open=indicators['open'].values.astype(np.float64),
+        high=high.astype(np.float64),
+        low=low.astype(np.float64),
+        close=price.astype(np.float64),
+        price=price,
+        atr=atr,
+        structure=structure,
+        trend=trend,
+        at_support=at_support,
+        at_resistance=at_resistance,
+        buy_confidence=buy_confidence,
+        sell_confidence=sell_confidence,
+        valid=valid
+    )
+
+
+def features_from_klines(symbol: str, klines: pd.DataFrame, window_size: Optional[int] = None) -> Optional[SymbolFeatures]:
+    """Indicators + features for a raw kline frame (None if too short)."""
+    klines = normalize_klines(klines)
+    indicators = TechnicalIndicators.calculate_all_indicators(klines)
+    if indicators is None or len(indicators) < (window_size or Config.BACKTEST_WINDOW_SIZE):
+        return None
+
+    return compute_features(
+        symbol,
+        indicators,
+        window_size=window_size,
+        raw_close=klines['close'].values,
+        raw_timestamp=klines['timestamp'].values.astype('datetime64[ns]').astype(np.int64)
+    )
@@ -0,0 +1,431 @@
+"""
+Parameter Sweep - Vectorized backtest of a parameter grid.
+
+Responsibilities:
+- Precompute per-candle strategy features once per symbol (features.py)
+- Broadcast every parameter set over those arrays in one NumPy pass
+  (signal threshold, risk/reward tiers, stop distance)
+- Simulate each parameter set's portfolio with the same slot, sizing, fill
+  and fee rules as BacktestEngine
+- Shard the grid across worker processes
+
+With default parameters the sweep reproduces BacktestEngine trade for trade;
+it only skips the per-candle replay, which is what makes grids affordable.
+"""
+
+import heapq
+import itertools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.engine import BacktestResult, BacktestTrade, FillModel, quiet_logs
+from src.backtest.features import SymbolFeatures, features_from_klines
+from src.config import Config
+from src.managers.risk_manager import RiskManager
+from src.strategies.batch_scoring import (
+    DIRECTION_BUY,
+    DIRECTION_SELL,
+    STRUCTURE_BEARISH,
+    STRUCTURE_BULLISH,
+    STRUCTURE_NEUTRAL,
+    TREND_BEAR,
+    TREND_BULL,
+    rr_ratio_batch,
+    trade_levels_batch
+)
+
+logger = logging.getLogger(__name__)
+
+_BLOCK_CELLS = 2_000_000   # 每次廣播的 (參數組 × K 棒) 上限，控制內存
+_EXIT_SCAN_CHUNK = 256
+_END_OF_DATA = np.iinfo(np.int64).max
+
+# 進程池 worker 的全局狀態（由 initializer 設置）
+_worker_features: List[SymbolFeatures] = []
+_worker_settings: Dict[str, Any] = {}
+
+
+@dataclass(frozen=True)
+class ParameterSet:
+    """One point of the sweep grid (defaults = current live settings)."""
+    min_confidence: float = Config.MIN_CONFIDENCE_THRESHOLD
+    stop_atr_multiplier: float = Config.BREAKEVEN_STOP_ATR_MULTIPLIER   # 損益平衡止損的 ATR 倍數（USE_BREAKEVEN_STOPS）
+    min_rr: float = Config.MIN_RISK_REWARD_RATIO
+    medium_rr: float = Config.MEDIUM_RISK_REWARD_RATIO
+    max_rr: float = Config.MAX_RISK_REWARD_RATIO
+
+
+def parameter_grid(**axes) -> List[ParameterSet]:
+    """
+    Cartesian product of parameter values.
+
+    Example:
+        parameter_grid(min_confidence=[70, 75, 80], stop_atr_multiplier=[1.0, 1.5, 2.0])
+    """
+    names = list(axes.keys())
+    return [
+        ParameterSet(**dict(zip(names, values)))
+        for values in itertools.product(*[axes[name] for name in names])
+    ]
+
+
+def signal_events(features: List[SymbolFeatures], grid: List[ParameterSet]) -> List[Dict[str, np.ndarray]]:
+    """
+    Signals of every parameter set, broadcast over all candles of all symbols.
+
+    Returns:
+        Per parameter set: dict of event arrays sorted the way the live
+        pipeline ranks them (time, confidence desc, symbol order)
+    """
+    columns = ['timestamp', 'symbol', 'row', 'direction', 'confidence', 'stop_loss', 'take_profit']
+    collected = [{name: [] for name in columns} for _ in grid]
+
+    for symbol_index, f in enumerate(features):
+        n = len(f)
+        if n == 0:
+            continue
+
+        base_buy = f.valid & ((f.structure == STRUCTURE_BULLISH) | (f.structure == STRUCTURE_NEUTRAL)) & (f.trend != TREND_BEAR)
+        base_sell = f.valid & ((f.structure == STRUCTURE_BEARISH) | (f.structure == STRUCTURE_NEUTRAL)) & (f.trend != TREND_BULL)
+        block = max(1, _BLOCK_CELLS // n)
+
+        for start in range(0, len(grid), block):
+            params = grid[start:start + block]
+            column = lambda name: np.array([getattr(p, name) for p in params], dtype=np.float64)[:, None]
+            min_confidence = column('min_confidence')
+            stop_multiplier = column('stop_atr_multiplier')
+            tiers = (column('min_rr'), column('medium_rr'), column('max_rr'))
+            shape = (len(params), n)
+
+            buy_taken = base_buy & (f.buy_confidence >= min_confidence)
+            sell_taken = base_sell & ~buy_taken & (f.sell_confidence >= min_confidence)
+
+            buy_sl, buy_tp, _, buy_ok = trade_levels_batch(
+                f.price, f.atr, rr_ratio_batch(f.buy_confidence, tiers), DIRECTION_BUY, stop_multiplier
+            )
+            sell_sl, sell_tp, _, sell_ok = trade_levels_batch(
+                f.price, f.atr, rr_ratio_batch(f.sell_confidence, tiers), DIRECTION_SELL, stop_multiplier
+            )
+            is_buy = buy_taken & np.broadcast_to(buy_ok, shape)
+            is_sell = sell_taken & np.broadcast_to(sell_ok, shape)
+            stop_loss = np.where(is_buy, np.broadcast_to(buy_sl, shape), np.broadcast_to(sell_sl, shape))
+            take_profit = np.where(is_buy, np.broadcast_to(buy_tp, shape), np.broadcast_to(sell_tp, shape))
+
+            for offset in range(len(params)):
+                rows = np.flatnonzero(is_buy[offset] | is_sell[offset])
+                buy_rows = is_buy[offset][rows]
+                events = collected[start + offset]
+                events['timestamp'].append(f.timestamp[rows])
+                events['symbol'].append(np.full(len(rows), symbol_index))
+                events['row'].append(rows)
+                events['direction'].append(np.where(buy_rows, DIRECTION_BUY, DIRECTION_SELL))
+                events['confidence'].append(np.where(buy_rows, f.buy_confidence[rows], f.sell_confidence[rows]))
+                events['stop_loss'].append(stop_loss[offset][rows])
+                events['take_profit'].append(take_profit[offset][rows])
+
+    result = []
+    for events in collected:
+        arrays = {
+            name: np.concatenate(values) if values else np.array([])
+            for name, values in events.items()
+        }
+        order = np.lexsort((arrays['symbol'], -arrays['confidence'], arrays['timestamp'])) \
+            if len(arrays['timestamp']) else np.array([], dtype=np.int64)
+        result.append({name: values[order] for name, values in arrays.items()})
+    return result
+
+
+def _find_exit(f: SymbolFeatures, start: int, trade: BacktestTrade, fill_model: FillModel):
+    """First candle from start on that hits the trade's stop / target (same rules as BacktestEngine)."""
+    n = len(f)
+    k = start
+    while k < n:
+        end = min(n, k + _EXIT_SCAN_CHUNK)
+        if trade.action == 'BUY':
+            hit = (f.low[k:end] <= trade.stop_loss) | (f.high[k:end] >= trade.take_profit)
+        else:
+            hit = (f.high[k:end] >= trade.stop_loss) | (f.low[k:end] <= trade.take_profit)
+        if hit.any():
+            row = k + int(np.argmax(hit))
+            exit_price, reason = fill_model.check_exit(trade, f.open[row], f.high[row], f.low[row])
+            return row, exit_price, reason
+        k = end
+
+    return n - 1, float(f.close[-1]), 'end_of_data'
+
+
+def simulate(
+    features: List[SymbolFeatures],
+    events: Dict[str, np.ndarray],
+    initial_balance: float,
+    max_positions: int = 3,
+    fill_model: Optional[FillModel] = None,
+    risk_manager: Optional[RiskManager] = None
+) -> BacktestResult:
+    """
+    Portfolio simulation of one parameter set's signals.
+
+    Mirrors BacktestEngine: entries, then exits, then new signals on each
+    candle; top-ranked signals fill free slots; sizing and leverage come
+    from a RiskManager (default: fresh instance); entries fill at the next open.
+    """
+    fill_model = fill_model or FillModel()
+    risk_manager = risk_manager or RiskManager(account_balance=initial_balance)
+    result = BacktestResult(initial_balance=initial_balance, final_balance=initial_balance)
+
+    active = set()          # 已接受、尚未出場的交易對（含待進場）
+    queue = []              # (時間, 0=進場 / 1=出場, 序號, 交易對, 交易, 出場數據)
+    sequence = itertools.count()
+
+    def apply(delta, ts):
+        risk_manager.update_balance(risk_manager.account_balance + delta)
+        result.equity_curve.append((pd.Timestamp(ts), risk_manager.account_balance))
+
+    def process_until(ts):
+        while queue and queue[0][0] <= ts:
+            event_ts, kind, _, symbol_index, trade, payload = heapq.heappop(queue)
+            f = features[symbol_index]
+            if kind == 0:
+                risk_manager.open_position(
+                    f.symbol, trade.action, trade.entry_price, trade.quantity, trade.stop_loss, trade.take_profit
+                )
+                apply(-payload, event_ts)
+            else:
+                exit_ts, exit_price, reason = payload
+                closed = risk_manager.close_position(f.symbol, exit_price)
+                exit_fee = fill_model.fee(
+                    exit_price * trade.quantity,
+                    maker=reason == 'take_profit' and fill_model.take_profit_as_maker
+                )
+                trade.exit_time = pd.Timestamp(exit_ts)
+                trade.exit_price = exit_price
+                trade.exit_reason = reason
+                trade.gross_pnl = closed['pnl'] if closed else 0.0
+                trade.fees += exit_fee
+                apply(-exit_fee, exit_ts)
+                result.trades.append(trade)
+                active.discard(symbol_index)
+
+    timestamps = events['timestamp']
+    boundaries = np.flatnonzero(np.diff(timestamps)) + 1 if len(timestamps) else np.array([], dtype=np.int64)
+
+    for group in np.split(np.arange(len(timestamps)), boundaries) if len(timestamps) else []:
+        ts = timestamps[group[0]]
+        process_until(ts)
+        if len(active) >= max_positions:
+            continue
+
+        # rank_signals(limit=max_positions)：只考慮信心度最高的前 N 個
+        for i in group[:max_positions]:
+            if len(active) >= max_positions:
+                break
+            symbol_index = int(events['symbol'][i])
+            if symbol_index in active:
+                continue
+
+            f = features[symbol_index]
+            row = int(events['row'][i])
+            action = 'BUY' if events['direction'][i] == DIRECTION_BUY else 'SELL'
+            confidence = events['confidence'][i]
+            price = f.price[row]
+
+            leverage = risk_manager.calculate_dynamic_leverage(
+                confidence=confidence, atr=f.atr[row], current_price=price
+            )
+            params = risk_manager.calculate_position_size(
+                symbol=f.symbol,
+                entry_price=price,
+                stop_loss_price=events['stop_loss'][i],
+                confidence=confidence,
+                leverage=leverage
+            )
+            if not params:
+                continue
+
+            active.add(symbol_index)
+            if row + 1 >= len(f):
+                continue  # 數據結束前無法進場（與 BacktestEngine 相同，佔用倉位至結束）
+
+            trade = BacktestTrade(
+                symbol=f.symbol,
+                action=action,
+                signal_time=pd.Timestamp(ts),
+                quantity=params['quantity'],
+                leverage=params['leverage'],
+                margin=params['margin'],
+                stop_loss=events['stop_loss'][i],
+                take_profit=events['take_profit'][i],
+                confidence=confidence,
+                strategy='ict_smc',
+                signal_price=price
+            )
+            entry_row = row + 1
+            trade.entry_time = pd.Timestamp(f.timestamp[entry_row])
+            trade.entry_price = fill_model.market_price(action, f.open[entry_row])
+            entry_fee = fill_model.fee(trade.entry_price * trade.quantity)
+            trade.fees += entry_fee
+
+            exit_row, exit_price, reason = _find_exit(f, entry_row, trade, fill_model)
+            exit_ts = int(f.timestamp[exit_row])
+            # 數據結束時的平倉在整段重放之後才發生，倉位一直佔用到最後
+            release_ts = _END_OF_DATA if reason == 'end_of_data' else exit_ts
+            heapq.heappush(queue, (int(f.timestamp[entry_row]), 0, next(sequence), symbol_index, trade, entry_fee))
+            heapq.heappush(queue, (release_ts, 1, next(sequence), symbol_index, trade, (exit_ts, exit_price, reason)))
+
+    process_until(_END_OF_DATA)
+    result.final_balance = risk_manager.account_balance
+    return result
+
+
+def evaluate_grid(
+    features: List[SymbolFeatures],
+    grid: List[ParameterSet],
+    initial_balance: float,
+    max_positions: int = 3,
+    fill_model: Optional[FillModel] = None
+) -> List[Dict[str, Any]]:
+    """Signals + portfolio simulation for a list of parameter sets (one results row each)."""
+    rows = []
+    for params, events in zip(grid, signal_events(features, grid)):
+        result = simulate(features, events, initial_balance, max_positions, fill_model)
+        summary = result.summary()
+        rows.append({
+            **asdict(params),
+            'total_trades': summary['total_trades'],
+            'win_rate': summary['win_rate'],
+            'net_pnl': summary['net_pnl'],
+            'return_percent': summary['return_percent'],
+            'max_drawdown': summary['max_drawdown'],
+            'profit_factor': summary['profit_factor'],
+            'fees': summary['fees'],
+            'signals': len(events['timestamp'])
+        })
+    return rows
+
+
+def _init_worker(features: List[SymbolFeatures], settings: Dict[str, Any]):
+    """Process pool initializer: features are shipped once per worker."""
+    global _worker_features, _worker_settings
+    _worker_features = features
+    _worker_settings = settings
+    logging.getLogger('src').setLevel(logging.ERROR)
+
+
+def _evaluate_shard(grid: List[ParameterSet]) -> List[Dict[str, Any]]:
+    return evaluate_grid(_worker_features, grid, **_worker_settings)
+
+
+class ParameterSweep:
+    """Grid search over strategy / risk parameters on precomputed features."""
+
+    def __init__(
+        self,
+        klines: Optional[Dict[str, pd.DataFrame]] = None,
+        features: Optional[List[SymbolFeatures]] = None,
+        window_size: Optional[int] = None,
+        initial_balance: Optional[float] = None,
+        max_positions: int = 3,
+        fill_model: Optional[FillModel] = None,
+        max_workers: Optional[int] = None,
+        start_method: Optional[str] = None
+    ):
+        """
+        Initialize parameter sweep.
+
+        Args:
+            klines: Dict of {symbol: 1m kline DataFrame} (features computed lazily)
+            features: Precomputed features (e.g. cached per walk-forward fold)
+            window_size: Analysis window length (default: Config.BACKTEST_WINDOW_SIZE)
+            initial_balance: Starting balance (default: Config.BACKTEST_INITIAL_BALANCE)
+            max_positions: Concurrent position slots
+            fill_model: Fill / fee model
+            max_workers: Worker processes (default: Config.STRATEGY_WORKERS; 1 = inline)
+            start_method: multiprocessing start method (default: Config.STRATEGY_MP_START_METHOD)
+        """
+        self.klines = klines or {}
+        self.features = features
+        self.window_size = window_size or Config.BACKTEST_WINDOW_SIZE
+        self.initial_balance = initial_balance or Config.BACKTEST_INITIAL_BALANCE
+        self.max_positions = max_positions
+        self.fill_model = fill_model or FillModel()
+        self.max_workers = max_workers or Config.STRATEGY_WORKERS
+        self.start_method = start_method or Config.STRATEGY_MP_START_METHOD
+
+        # Statistics
+        self.stats = {
+            'parameter_sets': 0,
+            'shards': 0,
+            'feature_time': 0.0,
+            'sweep_time': 0.0
+        }
+
+    def prepare(self) -> List[SymbolFeatures]:
+        """Compute features for every symbol (once)."""
+        if self.features is None:
+            started = time.perf_counter()
+            features = []
+            for symbol, df in self.klines.items():
+                f = features_from_klines(symbol, df, self.window_size)
+                if f is None:
+                    logger.warning(f"Skipping {symbol}: not enough candles for the analysis window")
+                    continue
+                features.append(f)
+            self.features = features
+            self.stats['feature_time'] += time.perf_counter() - started
+        return self.features
+
+    def run(self, grid: List[ParameterSet]) -> pd.DataFrame:
+        """
+        Evaluate every parameter set.
+
+        Returns:
+            DataFrame with one row per parameter set (parameters + PnL,
+            win rate, drawdown, trade count), in grid order
+        """
+        with quiet_logs(True):
+            features = self.prepare()
+            started = time.perf_counter()
+            settings = {
+                'initial_balance': self.initial_balance,
+                'max_positions': self.max_positions,
+                'fill_model': self.fill_model
+            }
+
+            workers = min(self.max_workers, len(grid))
+            if workers <= 1:
+                rows = evaluate_grid(features, grid, **settings)
+                self.stats['shards'] += 1
+            else:
+                shards = [list(shard) for shard in np.array_split(np.array(grid, dtype=object), workers * 2) if len(shard)]
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(features, settings)
+                ) as pool:
+                    rows = [row for shard_rows in pool.map(_evaluate_shard, shards) for row in shard_rows]
+                self.stats['shards'] += len(shards)
+
+            self.stats['parameter_sets'] += len(grid)
+            self.stats['sweep_time'] += time.perf_counter() - started
+
+        logger.info(
+            f"Parameter sweep: {len(grid)} sets over {len(features)} symbols "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        return pd.DataFrame(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get sweep statistics."""
+        return {
+            **self.stats,
+            'symbols': len(self.features or []),
+            'sets_per_second': self.stats['parameter_sets'] / max(self.stats['sweep_time'], 1e-9)
+        }
@@ -0,0 +1,399 @@
+"""
+Walk-Forward Optimization - Rolling in-sample optimization, out-of-sample scoring.
+
+Responsibilities:
+- Split history into rolling (or anchored) in-sample / out-of-sample folds
+- Optimize the sweep parameters on each in-sample fold (sweep.py)
+- Score the chosen parameters on the following out-of-sample fold
+- Run folds in parallel with deterministic per-fold seeds
+- Build a parameter-stability report that maps back onto Config
+
+Features are computed once over the whole history and sliced per fold:
+every feature is causal, so overlapping windows share one computation and
+each fold sees exactly what the live bot would have seen.
+"""
+
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.engine import FillModel, quiet_logs
+from src.backtest.features import SymbolFeatures, features_from_klines
+from src.backtest.sweep import ParameterSet, evaluate_grid
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 參數 → 回寫位置（Config 屬性，均可由同名環境變量設置）
+CONFIG_KEYS = {
+    'min_confidence': 'MIN_CONFIDENCE_THRESHOLD',
+    'stop_atr_multiplier': 'BREAKEVEN_STOP_ATR_MULTIPLIER',
+    'min_rr': 'MIN_RISK_REWARD_RATIO',
+    'medium_rr': 'MEDIUM_RISK_REWARD_RATIO',
+    'max_rr': 'MAX_RISK_REWARD_RATIO'
+}
+
+# 進程池 worker 的全局狀態（由 initializer 設置）
+_worker_optimizer: Optional['WalkForwardOptimizer'] = None
+
+
+@dataclass(frozen=True)
+class Fold:
+    """One in-sample / out-of-sample split."""
+    index: int
+    train_start: pd.Timestamp
+    train_end: pd.Timestamp     # = test_start
+    test_start: pd.Timestamp
+    test_end: pd.Timestamp
+
+
+@dataclass
+class FoldResult:
+    """Optimization outcome of one fold."""
+    fold: Fold
+    candidates: int = 0
+    best: Optional[Dict[str, Any]] = None           # 選中的參數組
+    in_sample: Dict[str, Any] = field(default_factory=dict)
+    out_of_sample: Dict[str, Any] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'index': self.fold.index,
+            'train_start': self.fold.train_start.isoformat(),
+            'train_end': self.fold.train_end.isoformat(),
+            'test_start': self.fold.test_start.isoformat(),
+            'test_end': self.fold.test_end.isoformat(),
+            'candidates': self.candidates,
+            'best': self.best,
+            'in_sample': self.in_sample,
+            'out_of_sample': self.out_of_sample,
+            'elapsed': round(self.elapsed, 3)
+        }
+
+
+def walk_forward_folds(
+    start,
+    end,
+    in_sample: Optional[str] = None,
+    out_of_sample: Optional[str] = None,
+    step: Optional[str] = None,
+    anchored: bool = False
+) -> List[Fold]:
+    """
+    Build rolling folds covering [start, end).
+
+    Args:
+        start / end: History boundaries
+        in_sample / out_of_sample / step: Window lengths as pandas Timedelta
+            strings (default: Config.WALK_FORWARD_*; step defaults to the
+            out-of-sample length so test windows tile the history)
+        anchored: Keep every in-sample window starting at start (expanding)
+
+    Returns:
+        List of Fold
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    in_sample = pd.Timedelta(in_sample or Config.WALK_FORWARD_IN_SAMPLE)
+    out_of_sample = pd.Timedelta(out_of_sample or Config.WALK_FORWARD_OUT_OF_SAMPLE)
+    step = pd.Timedelta(step or Config.WALK_FORWARD_STEP or out_of_sample)
+
+    folds = []
+    train_start = start
+    while train_start + in_sample + out_of_sample <= end:
+        test_start = train_start + in_sample
+        folds.append(Fold(
+            index=len(folds),
+            train_start=start if anchored else train_start,
+            train_end=test_start,
+            test_start=test_start,
+            test_end=test_start + out_of_sample
+        ))
+        train_start += step
+    return folds
+
+
+def _metrics(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Result-table row without the parameter columns."""
+    names = {f.name for f in fields(ParameterSet)}
+    return {key: value for key, value in row.items() if key not in names}
+
+
+def _jsonable(value):
+    """numpy scalars / NaN → JSON-safe Python values."""
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return None if not np.isfinite(value) else value
+    return value
+
+
+def _init_worker(optimizer: 'WalkForwardOptimizer'):
+    """Process pool initializer: history features are shipped once per worker."""
+    global _worker_optimizer
+    _worker_optimizer = optimizer
+    logging.getLogger('src').setLevel(logging.ERROR)
+
+
+def _run_fold_in_worker(task: Tuple[Fold, List[ParameterSet]]) -> FoldResult:
+    return _worker_optimizer.run_fold(*task)
+
+
+class WalkForwardOptimizer:
+    """Walk-forward driver on top of the vectorized parameter sweep."""
+
+    def __init__(
+        self,
+        klines: Optional[Dict[str, pd.DataFrame]] = None,
+        features: Optional[List[SymbolFeatures]] = None,
+        window_size: Optional[int] = None,
+        initial_balance: Optional[float] = None,
+        max_positions: int = 3,
+        fill_model: Optional[FillModel] = None,
+        objective: Optional[str] = None,
+        min_trades: Optional[int] = None,
+        sample_size: Optional[int] = None,
+        seed: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        start_method: Optional[str] = None
+    ):
+        """
+        Initialize walk-forward optimizer.
+
+        Args:
+            klines: Dict of {symbol: 1m kline DataFrame}
+            features: Precomputed full-history features (skips klines)
+            window_size: Analysis window length (default: Config.BACKTEST_WINDOW_SIZE)
+            initial_balance: Starting balance of every fold
+            max_positions: Concurrent position slots
+            fill_model: Fill / fee model
+            objective: Result column maximized in-sample (default: Config.WALK_FORWARD_OBJECTIVE)
+            min_trades: In-sample trades required for a parameter set to qualify
+            sample_size: Random subset of the grid evaluated per fold (None = full grid)
+            seed: Base seed of the per-fold sampling (default: Config.WALK_FORWARD_SEED)
+            max_workers: Parallel folds (default: Config.STRATEGY_WORKERS; 1 = inline)
+            start_method: multiprocessing start method
+        """
+        self.klines = klines or {}
+        self.features = features
+        self.window_size = window_size or Config.BACKTEST_WINDOW_SIZE
+        self.initial_balance = initial_balance or Config.BACKTEST_INITIAL_BALANCE
+        self.max_positions = max_positions
+        self.fill_model = fill_model or FillModel()
+        self.objective = objective or Config.WALK_FORWARD_OBJECTIVE
+        self.min_trades = Config.WALK_FORWARD_MIN_TRADES if min_trades is None else min_trades
+        self.sample_size = sample_size
+        self.seed = Config.WALK_FORWARD_SEED if seed is None else seed
+        self.max_workers = max_workers or Config.STRATEGY_WORKERS
+        self.start_method = start_method or Config.STRATEGY_MP_START_METHOD
+
+        self.results: List[FoldResult] = []
+
+        # Statistics
+        self.stats = {
+            'folds': 0,
+            'folds_without_selection': 0,
+            'feature_time': 0.0,
+            'run_time': 0.0
+        }
+
+    def __getstate__(self):
+        # 傳給 worker 時只帶特徵，不帶原始 K 線
+        state = self.__dict__.copy()
+        state['klines'] = {}
+        state['results'] = []
+        return state
+
+    def prepare(self) -> List[SymbolFeatures]:
+        """Compute full-history features for every symbol (once)."""
+        if self.features is None:
+            started = time.perf_counter()
+            features = []
+            for symbol, df in self.klines.items():
+                f = features_from_klines(symbol, df, self.window_size)
+                if f is None:
+                    logger.warning(f"Skipping {symbol}: not enough candles for the analysis window")
+                    continue
+                features.append(f)
+            self.features = features
+            self.stats['feature_time'] += time.perf_counter() - started
+        return self.features
+
+    def folds(self, **kwargs) -> List[Fold]:
+        """Folds over the loaded history (kwargs: see walk_forward_folds)."""
+        features = [f for f in self.prepare() if len(f)]
+        if not features:
+            return []
+        start = min(int(f.timestamp[0]) for f in features)
+        end = max(int(f.timestamp[-1]) for f in features) + 1
+        return walk_forward_folds(start, end, **kwargs)
+
+    def window(self, start: pd.Timestamp, end: pd.Timestamp) -> List[SymbolFeatures]:
+        """Features of [start, end) as views into the full-history arrays."""
+        start_ns, end_ns = pd.Timestamp(start).value, pd.Timestamp(end).value
+        sliced = [f.between(start_ns, end_ns) for f in self.prepare()]
+        return [f for f in sliced if len(f)]
+
+    def _candidates(self, fold: Fold, grid: List[ParameterSet]) -> List[ParameterSet]:
+        """Per-fold grid sample (deterministic: seeded by base seed and fold index)."""
+        if not self.sample_size or self.sample_size >= len(grid):
+            return list(grid)
+        rng = np.random.default_rng([self.seed, fold.index])
+        picks = np.sort(rng.choice(len(grid), size=self.sample_size, replace=False))
+        return [grid[i] for i in picks]
+
+    def run_fold(self, fold: Fold, grid: List[ParameterSet]) -> FoldResult:
+        """Optimize on the in-sample window, score the winner out-of-sample."""
+        started = time.perf_counter()
+        settings = {
+            'initial_balance': self.initial_balance,
+            'max_positions': self.max_positions,
+            'fill_model': self.fill_model
+        }
+        candidates = self._candidates(fold, grid)
+        result = FoldResult(fold=fold, candidates=len(candidates))
+
+        train = self.window(fold.train_start, fold.train_end)
+        table = pd.DataFrame(evaluate_grid(train, candidates, **settings))
+        qualified = table[table['total_trades'] >= self.min_trades] if len(table) else table
+        if len(qualified):
+            # 目標值相同時保留網格順序（穩定排序）
+            best_index = qualified.sort_values(self.objective, ascending=False, kind='stable').index[0]
+            best = candidates[best_index]
+            result.best = asdict(best)
+            result.in_sample = _metrics(table.loc[best_index].to_dict())
+
+            test = self.window(fold.test_start, fold.test_end)
+            result.out_of_sample = _metrics(evaluate_grid(test, [best], **settings)[0])
+
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def run(self, grid: List[ParameterSet], folds: Optional[List[Fold]] = None) -> List[FoldResult]:
+        """
+        Run every fold.
+
+        Args:
+            grid: Parameter sets to optimize over (see parameter_grid)
+            folds: Folds to run (default: self.folds())
+
+        Returns:
+            List of FoldResult in fold order
+        """
+        with quiet_logs(True):
+            self.prepare()
+            folds = self.folds() if folds is None else folds
+            started = time.perf_counter()
+
+            workers = min(self.max_workers, len(folds))
+            if workers <= 1:
+                results = [self.run_fold(fold, grid) for fold in folds]
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(self,)
+                ) as pool:
+                    results = list(pool.map(_run_fold_in_worker, [(fold, grid) for fold in folds]))
+
+            self.results = results
+            self.stats['folds'] += len(results)
+            self.stats['folds_without_selection'] += sum(1 for r in results if r.best is None)
+            self.stats['run_time'] += time.perf_counter() - started
+
+        logger.info(
+            f"Walk-forward: {len(folds)} folds × {len(grid)} parameter sets "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        return results
+
+    def stability_report(self, results: Optional[List[FoldResult]] = None) -> Dict[str, Any]:
+        """
+        Parameter stability across folds + aggregated out-of-sample performance.
+
+        Returns:
+            Dict with per-parameter statistics (mode, share of folds choosing it,
+            mean / std / range), per-fold results, out-of-sample totals and the
+            recommended values as Config / strategy overrides
+        """
+        results = self.results if results is None else results
+        selected = [r for r in results if r.best is not None]
+
+        parameters = {}
+        recommended = {}
+        for name in (f.name for f in fields(ParameterSet)):
+            values = np.array([r.best[name] for r in selected], dtype=np.float64)
+            if len(values) == 0:
+                continue
+            unique, counts = np.unique(values, return_counts=True)
+            mode = float(unique[np.argmax(counts)])
+            parameters[name] = {
+                'values': values.tolist(),
+                'mode': mode,
+                'mode_share': float(counts.max() / len(values)),
+                'mean': float(values.mean()),
+                'std': float(values.std()),
+                'min': float(values.min()),
+                'max': float(values.max())
+            }
+            recommended[name] = mode
+
+        out_of_sample = [r.out_of_sample for r in selected]
+        trades = sum(m['total_trades'] for m in out_of_sample)
+        wins = sum(m['win_rate'] / 100 * m['total_trades'] for m in out_of_sample)
+        in_sample_return = np.mean([r.in_sample['return_percent'] for r in selected]) if selected else 0.0
+        out_of_sample_return = np.mean([m['return_percent'] for m in out_of_sample]) if selected else 0.0
+        compounded = np.prod([1 + m['return_percent'] / 100 for m in out_of_sample]) - 1 if selected else 0.0
+
+        report = {
+            'generated_at': pd.Timestamp.utcnow().isoformat(),
+            'objective': self.objective,
+            'min_trades': self.min_trades,
+            'seed': self.seed,
+            'sample_size': self.sample_size,
+            'folds': [r.to_dict() for r in results],
+            'parameters': parameters,
+            'out_of_sample': {
+                'folds': len(selected),
+                'total_trades': trades,
+                'win_rate': wins / trades * 100 if trades else 0.0,
+                'net_pnl': sum(m['net_pnl'] for m in out_of_sample),
+                'compounded_return_percent': compounded * 100,
+                'mean_return_percent': out_of_sample_return,
+                'worst_drawdown': max((m['max_drawdown'] for m in out_of_sample), default=0.0),
+                'profitable_folds': sum(1 for m in out_of_sample if m['net_pnl'] > 0),
+                # 樣本外 / 樣本內平均收益（walk-forward efficiency）
+                'efficiency': out_of_sample_return / in_sample_return if in_sample_return else None
+            },
+            'recommended': recommended,
+            'config': {CONFIG_KEYS[k]: v for k, v in recommended.items() if k in CONFIG_KEYS}
+        }
+        return _jsonable(report)
+
+    def save_report(self, path: str, results: Optional[List[FoldResult]] = None) -> Dict[str, Any]:
+        """Write the stability report as JSON."""
+        report = self.stability_report(results)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        logger.info(f"Walk-forward report saved to {path}")
+        return report
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get walk-forward statistics."""
+        return {
+            **self.stats,
+            'symbols': len(self.features or [])
+        }
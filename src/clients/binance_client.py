@@ -1,4 +1,5 @@
 import asyncio
+import json
 import time
 from binance.client import Client
 from binance import AsyncClient, BinanceSocketManager
@@ -20,6 +21,46 @@ INVALID_SYMBOLS = {
     "测试测试USDT", "币安人生USDT"
 }
 
+
+# /fapi/v1/batchOrders 每批上限
+BATCH_ORDER_LIMIT = 5
+BATCH_CANCEL_LIMIT = 10
+
+
+def _batch_value(value):
+    """batchOrders 內的參數值一律為字符串（布爾值小寫，浮點數不用科學計數法）"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float):
+        return np.format_float_positional(value, trim='-')
+    return str(value)
+
+
+def _with_base_url(client_class, base_url=None, stream_url=None):
+    """
+    python-binance 客戶端子類，REST / WebSocket 指向自定義地址（例如本地模擬服務器）
+    
+    URL 為類屬性，且構造函數內會先 ping，因此需在實例化前覆蓋（子類），不能事後修改實例
+    """
+    overrides = {}
+    if base_url:
+        base_url = base_url.rstrip('/')
+        overrides['API_URL'] = base_url + '/api'
+        overrides['FUTURES_URL'] = base_url + '/fapi'
+        overrides['FUTURES_DATA_URL'] = base_url + '/futures/data'
+    if stream_url:
+        overrides['STREAM_URL'] = stream_url
+        overrides['FSTREAM_URL'] = stream_url
+    return type(f"Local{client_class.__name__}", (client_class,), overrides)
+
+
+def _stream_url():
+    """WebSocket 基礎地址：BINANCE_STREAM_URL，或由 BINANCE_BASE_URL 推導（http → ws）"""
+    if Config.BINANCE_STREAM_URL:
+        return Config.BINANCE_STREAM_URL.rstrip('/') + '/'
+    return Config.BINANCE_BASE_URL.rstrip('/').replace('http', 'ws', 1) + '/'
+
+
 class BinanceDataClient:
     def __init__(self):
         self.api_key = Config.BINANCE_API_KEY
@@ -35,7 +76,12 @@ class BinanceDataClient:
             return
         
         try:
-            if self.testnet:
+            if Config.BINANCE_BASE_URL:
+                # 自定義地址（本地模擬服務器等）：不使用測試網 URL
+                self.testnet = False
+                self.client = _with_base_url(Client, Config.BINANCE_BASE_URL)(self.api_key, self.api_secret)
+                logger.info(f"Initialized Binance client against {Config.BINANCE_BASE_URL}")
+            elif self.testnet:
                 self.client = Client(
                     self.api_key, 
                     self.api_secret,
@@ -62,12 +108,19 @@ class BinanceDataClient:
             logger.warning("Cannot initialize async client - credentials not configured")
             return
         
-        self.async_client = await AsyncClient.create(
-            self.api_key, 
-            self.api_secret,
-            testnet=self.testnet
-        )
-        self.bsm = BinanceSocketManager(self.async_client)
+        if Config.BINANCE_BASE_URL:
+            self.async_client = await _with_base_url(AsyncClient, Config.BINANCE_BASE_URL).create(
+                self.api_key,
+                self.api_secret
+            )
+            self.bsm = _with_base_url(BinanceSocketManager, stream_url=_stream_url())(self.async_client)
+        else:
+            self.async_client = await AsyncClient.create(
+                self.api_key, 
+                self.api_secret,
+                testnet=self.testnet
+            )
+            self.bsm = BinanceSocketManager(self.async_client)
         logger.info("Async client initialized")
     
     @retry_on_failure(
@@ -276,10 +329,11 @@ class BinanceDataClient:
         
         try:
             exchange_info = self.client.futures_exchange_info()
+            # 一次請求即緩存所有交易對，後續查詢不再觸發 REST
             for s in exchange_info['symbols']:
-                if s['symbol'] == symbol:
-                    self.symbol_info_cache[symbol] = s
-                    return s
+                self.symbol_info_cache[s['symbol']] = s
+            if symbol in self.symbol_info_cache:
+                return self.symbol_info_cache[symbol]
             
             logger.warning(f"Symbol {symbol} not found in exchange info")
             return None
@@ -287,6 +341,36 @@ class BinanceDataClient:
         except Exception as e:
             logger.error(f"Error fetching symbol info for {symbol}: {e}")
             return None
+
+    def preload_symbol_info(self):
+        """
+        預先緩存所有交易對的過濾器（LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL）
+
+        啟動時調用一次，下單前的數量 / 價格格式化即只讀內存。
+
+        Returns:
+            緩存的交易對數量
+        """
+        if not self.client:
+            return 0
+        try:
+            exchange_info = self.client.futures_exchange_info()
+            for s in exchange_info['symbols']:
+                self.symbol_info_cache[s['symbol']] = s
+            logger.info(f"✅ Cached exchange filters for {len(self.symbol_info_cache)} symbols")
+        except Exception as e:
+            logger.error(f"Error preloading exchange info: {e}")
+        return len(self.symbol_info_cache)
+
+    def format_price(self, symbol, price):
+        """按 PRICE_FILTER tickSize 舍入價格（無過濾器信息時原樣返回）"""
+        symbol_info = self.get_symbol_info(symbol)
+        if not symbol_info or price is None:
+            return price
+        for f in symbol_info['filters']:
+            if f['filterType'] == 'PRICE_FILTER' and float(f.get('tickSize', 0)):
+                return round_step_size(price, float(f['tickSize']))
+        return price
     
     def get_min_notional(self, symbol):
         """獲取交易對的最小名義價值要求"""
@@ -638,6 +722,16 @@ class BinanceDataClient:
             logger.error(f"Error fetching open stop orders: {e}")
             return []
     
+    def get_open_orders(self, symbol=None):
+        """獲取當前所有未完成訂單（用戶數據流初始快照），失敗返回 None"""
+        try:
+            if symbol:
+                return self.client.futures_get_open_orders(symbol=symbol)
+            return self.client.futures_get_open_orders()
+        except Exception as e:
+            logger.error(f"Error fetching open orders: {e}")
+            return None
+    
     def get_all_usdt_perpetual_pairs(self):
         """
         獲取所有有效的 USDT 永續合約交易對（使用動態驗證）
@@ -757,7 +851,43 @@ class BinanceDataClient:
         except Exception as e:
             logger.error(f"Error fetching async klines for {symbol}: {e}")
             return None
-    
+
+    async def get_klines_history_async(self, symbol, interval='1m', end_time=None, limit=1500):
+        """
+        獲取 end_time（epoch ms，開盤時間）及之前的最多 limit 根期貨 K 線
+
+        get_klines 只返回最近的 K 線；歷史下載器用 end_time 向前翻頁。
+        上市之前返回空 DataFrame，出錯返回 None。
+        """
+        if not self.async_client:
+            await self.initialize_async()
+
+        if not self.async_client:
+            logger.error("Async client not available")
+            return None
+
+        try:
+            params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+            if end_time is not None:
+                params['endTime'] = int(end_time)
+            klines = await self.async_client.futures_klines(**params)
+
+            df = pd.DataFrame(klines, columns=[
+                'timestamp', 'open', 'high', 'low', 'close', 'volume',
+                'close_time', 'quote_volume', 'trades', 'taker_buy_base',
+                'taker_buy_quote', 'ignore'
+            ])
+
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+            for col in ['open', 'high', 'low', 'close', 'volume']:
+                df[col] = df[col].astype(float)
+
+            return df
+
+        except Exception as e:
+            logger.error(f"Error fetching historical klines for {symbol} {interval} (end {end_time}): {e}")
+            return None
+
     async def get_ticker(self, symbol):
         """Async get ticker (v3.0 compatible method)."""
         if not self.async_client:
@@ -773,6 +903,161 @@ class BinanceDataClient:
             logger.error(f"Error fetching ticker for {symbol}: {e}")
             return None
     
+    async def create_order_async(self, params):
+        """
+        異步下單（原生 AsyncClient，不佔用線程池）
+
+        Args:
+            params: futures_create_order 參數（數量/價格已格式化）
+
+        Returns:
+            訂單響應或 None
+        """
+        if not Config.ENABLE_TRADING:
+            logger.warning("Trading is disabled. Set ENABLE_TRADING=true to enable.")
+            return None
+
+        if not self.async_client:
+            await self.initialize_async()
+
+        if not self.async_client:
+            logger.error("Async client not available")
+            return None
+
+        try:
+            order = await self.async_client.futures_create_order(**params)
+            logger.info(f"✅ Futures order placed: {params.get('symbol')} {params.get('type')} {order.get('orderId', 'N/A')}")
+            return order
+        except Exception as e:
+            logger.error(f"❌ Futures order failed for {params.get('symbol')} {params.get('type')}: {e}")
+            return None
+
+    async def place_batch_orders_async(self, orders):
+        """
+        批量下單 POST /fapi/v1/batchOrders（每批最多 5 筆，一次往返）
+
+        各筆訂單在交易所獨立處理：部分成功時，失敗的一筆返回 None。
+
+        Args:
+            orders: futures_create_order 參數字典列表
+
+        Returns:
+            與 orders 對齊的訂單響應列表（失敗為 None）；整批失敗時全部為 None
+        """
+        if not Config.ENABLE_TRADING:
+            logger.warning("Trading is disabled. Set ENABLE_TRADING=true to enable.")
+            return [None] * len(orders)
+
+        if not self.async_client:
+            await self.initialize_async()
+
+        if not self.async_client:
+            logger.error("Async client not available")
+            return [None] * len(orders)
+
+        results = []
+        for start in range(0, len(orders), BATCH_ORDER_LIMIT):
+            chunk = orders[start:start + BATCH_ORDER_LIMIT]
+            payload = json.dumps([{k: _batch_value(v) for k, v in order.items()} for order in chunk])
+            try:
+                # futures_place_batch_order 在 1.0.19 中對 JSON 二次編碼，直接發送已序列化的 batchOrders
+                responses = await self.async_client._request_futures_api(
+                    'post', 'batchOrders', True, data={'batchOrders': payload}
+                )
+            except Exception as e:
+                logger.error(f"❌ Batch order failed ({len(chunk)} orders): {e}")
+                results.extend([None] * len(chunk))
+                continue
+
+            for order, response in zip(chunk, responses):
+                if not isinstance(response, dict) or 'code' in response:
+                    logger.error(
+                        f"❌ Batch leg rejected: {order.get('symbol')} {order.get('type')} "
+                        f"{order.get('side')}: {response}"
+                    )
+                    results.append(None)
+                else:
+                    results.append(response)
+        return results
+
+    async def cancel_orders_async(self, symbol, order_ids):
+        """
+        批量撤單 DELETE /fapi/v1/batchOrders（每批最多 10 筆）
+
+        Returns:
+            與 order_ids 對齊的撤單響應列表（失敗為 None）
+        """
+        if not Config.ENABLE_TRADING:
+            logger.warning("Trading is disabled. Set ENABLE_TRADING=true to enable.")
+            return [None] * len(order_ids)
+
+        if not self.async_client:
+            await self.initialize_async()
+
+        if not self.async_client:
+            logger.error("Async client not available")
+            return [None] * len(order_ids)
+
+        results = []
+        for start in range(0, len(order_ids), BATCH_CANCEL_LIMIT):
+            chunk = [int(order_id) for order_id in order_ids[start:start + BATCH_CANCEL_LIMIT]]
+            try:
+                responses = await self.async_client.futures_cancel_orders(
+                    symbol=symbol, orderIdList=json.dumps(chunk)
+                )
+            except Exception as e:
+                logger.error(f"❌ Batch cancel failed for {symbol} {chunk}: {e}")
+                results.extend([None] * len(chunk))
+                continue
+
+            for order_id, response in zip(chunk, responses):
+                if not isinstance(response, dict) or 'code' in response:
+                    logger.warning(f"Cancel of {symbol} #{order_id} rejected: {response}")
+                    results.append(None)
+                else:
+                    results.append(response)
+        return results
+
+    async def create_listen_key_async(self):
+        """創建用戶數據流 listenKey（POST /fapi/v1/listenKey），失敗返回 None"""
+        if not self.async_client:
+            await self.initialize_async()
+
+        if not self.async_client:
+            logger.error("Async client not available")
+            return None
+
+        try:
+            return await self.async_client.futures_stream_get_listen_key()
+        except Exception as e:
+            logger.error(f"Failed to create listen key: {e}")
+            return None
+
+    async def keepalive_listen_key_async(self, listen_key):
+        """延長 listenKey 有效期 60 分鐘（PUT /fapi/v1/listenKey）；listenKey 已失效時返回 False"""
+        try:
+            await self.async_client.futures_stream_keepalive(listenKey=listen_key)
+            return True
+        except Exception as e:
+            logger.warning(f"Listen key keepalive failed: {e}")
+            return False
+
+    async def close_listen_key_async(self, listen_key):
+        try:
+            await self.async_client.futures_stream_close(listenKey=listen_key)
+        except Exception as e:
+            logger.debug(f"Failed to close listen key: {e}")
+
+    def user_stream_url(self, listen_key):
+        """用戶數據流 WebSocket 地址"""
+        if Config.BINANCE_BASE_URL or Config.BINANCE_STREAM_URL:
+            base = _stream_url()
+        elif self.testnet:
+            base = BinanceSocketManager.FSTREAM_TESTNET_URL
+        else:
+            base = BinanceSocketManager.FSTREAM_URL.format('com')
+        return f"{base}ws/{listen_key}"
+
     def create_order(self, symbol, side, type, quantity, price=None):
         """Create order (v3.0 compatible method)."""
         return self.place_order(symbol, side, type, quantity, price)
@@ -7,6 +7,8 @@ class Config:
     BINANCE_API_KEY = os.getenv('BINANCE_API_KEY', '')
     BINANCE_SECRET_KEY = os.getenv('BINANCE_SECRET_KEY', '')
     BINANCE_TESTNET = os.getenv('BINANCE_TESTNET', 'true').lower() == 'true'
+    BINANCE_BASE_URL = os.getenv('BINANCE_BASE_URL', '')  # REST 基礎地址覆蓋（空 = 官方 / 測試網；例如本地模擬服務器 http://127.0.0.1:8765）
+    BINANCE_STREAM_URL = os.getenv('BINANCE_STREAM_URL', '')  # WebSocket 基礎地址覆蓋（空 = 由 BINANCE_BASE_URL 推導）
     
     DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN', '')
     DISCORD_CHANNEL_ID = os.getenv('DISCORD_CHANNEL_ID', '')
@@ -19,6 +21,23 @@ class Config:
     # 訂單執行方式
     ORDER_TYPE = os.getenv('ORDER_TYPE', 'MARKET')  # 'MARKET' = 市價單（立即成交），'LIMIT' = 限價單（掛單等待）
     LIMIT_ORDER_OFFSET_PERCENT = float(os.getenv('LIMIT_ORDER_OFFSET_PERCENT', '0.1'))  # 限價單價格偏移（0.1% = 稍微更好的價格）
+    PRETRADE_MAX_AGE_SECONDS = float(os.getenv('PRETRADE_MAX_AGE_SECONDS', '30'))  # 排名階段預備的下單參數有效期（過期則重新預備）
+    
+    # 倉位監控（每個週期並發檢查所有持倉）
+    POSITION_MONITOR_CONCURRENCY = int(os.getenv('POSITION_MONITOR_CONCURRENCY', '10'))  # 同時檢查的倉位數
+    POSITION_MONITOR_TIMEOUT = float(os.getenv('POSITION_MONITOR_TIMEOUT', '15'))  # 單個倉位檢查期限（秒）
+    
+    # 用戶數據流（listenKey WebSocket：餘額 / 倉位 / 訂單推送，取代每週期輪詢）
+    USER_DATA_STREAM = os.getenv('USER_DATA_STREAM', 'true').lower() == 'true'  # 實盤時啟用
+    USER_STREAM_KEEPALIVE_SECONDS = float(os.getenv('USER_STREAM_KEEPALIVE_SECONDS', '1800'))  # listenKey 續期間隔（60 分鐘過期）
+    USER_STREAM_RECONNECT_SECONDS = float(os.getenv('USER_STREAM_RECONNECT_SECONDS', '5'))  # 斷線重連初始等待（指數退避，最多 60 秒）
+    
+    # 信號管線（掃描器分批發布信號到優先隊列，獨立執行器按窗口取前 K 個入場）
+    SIGNAL_PIPELINE = os.getenv('SIGNAL_PIPELINE', 'true').lower() == 'true'  # 關閉則整個週期同步掃描後再執行
+    SIGNAL_SCAN_CHUNK = int(os.getenv('SIGNAL_SCAN_CHUNK', '50'))  # 每批掃描的交易對數（每批完成即發布信號）
+    SIGNAL_WINDOW_SECONDS = float(os.getenv('SIGNAL_WINDOW_SECONDS', '0.5'))  # 第一個信號到達後收集競爭信號的時間
+    SIGNAL_MAX_AGE_SECONDS = float(os.getenv('SIGNAL_MAX_AGE_SECONDS', '60'))  # 隊列中等待超過此時間的信號丟棄
+    ANALYSIS_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv('ANALYSIS_SNAPSHOT_MAX_AGE_SECONDS', '30'))  # 分析快照有效期（監控 / 驗證 / 重新掃描直接復用）
     
     # 智能槓桿調整機制
     ENABLE_DYNAMIC_LEVERAGE = os.getenv('ENABLE_DYNAMIC_LEVERAGE', 'true').lower() == 'true'
@@ -26,6 +45,7 @@ class Config:
     MAX_LEVERAGE = float(os.getenv('MAX_LEVERAGE', '20.0'))  # 最大槓桿
     
     # 槓桿調整參數
+    MIN_CONFIDENCE_THRESHOLD = float(os.getenv('MIN_CONFIDENCE_THRESHOLD', '70.0'))  # 策略生成信號的最低信心度
     HIGH_CONFIDENCE_THRESHOLD = 90.0  # 高信心度門檻
     MEDIUM_CONFIDENCE_THRESHOLD = 80.0  # 中信心度門檻
     ULTRA_HIGH_CONFIDENCE_THRESHOLD = 100.0  # 超高信心度門檻
@@ -69,9 +89,9 @@ class Config:
     EXECUTION_TIMEFRAME = '1m'  # 1分鐘K線用於執行交易
     
     # 動態風險回報比配置（根據信心度調整）
-    MIN_RISK_REWARD_RATIO = 1.0  # 最小風險回報比（低信心度 70-80%）
-    MAX_RISK_REWARD_RATIO = 2.0  # 最大風險回報比（高信心度 90%+）
-    MEDIUM_RISK_REWARD_RATIO = 1.5  # 中等風險回報比（中信心度 80-90%）
+    MIN_RISK_REWARD_RATIO = float(os.getenv('MIN_RISK_REWARD_RATIO', '1.0'))  # 最小風險回報比（低信心度 70-80%）
+    MAX_RISK_REWARD_RATIO = float(os.getenv('MAX_RISK_REWARD_RATIO', '2.0'))  # 最大風險回報比（高信心度 90%+）
+    MEDIUM_RISK_REWARD_RATIO = float(os.getenv('MEDIUM_RISK_REWARD_RATIO', '1.5'))  # 中等風險回報比（中信心度 80-90%）
     
     MODEL_RETRAIN_INTERVAL = 3600
     LOOKBACK_PERIODS = 100
@@ -80,6 +100,7 @@ class Config:
     RISK_REWARD_RATIO = float(os.getenv('RISK_REWARD_RATIO', '2.0'))  # 風險收益比 1:1 或 1:2
     STOP_LOSS_ATR_MULTIPLIER = 2.0
     TAKE_PROFIT_ATR_MULTIPLIER = 3.0
+    BREAKEVEN_STOP_ATR_MULTIPLIER = float(os.getenv('BREAKEVEN_STOP_ATR_MULTIPLIER', '1.5'))  # 止損距離損益平衡價格的 ATR 倍數
     
     # 交易手續費（Binance 期貨）
     MAKER_FEE_RATE = float(os.getenv('MAKER_FEE_RATE', '0.0002'))  # 0.02% 掛單手續費
@@ -90,8 +111,74 @@ class Config:
     
     LOG_FILE = 'data/logs/trading_bot.log'
     TRADES_FILE = 'data/trades.json'
+    TRADE_JOURNAL_SEGMENT_MB = float(os.getenv('TRADE_JOURNAL_SEGMENT_MB', '16'))  # 交易日誌分段大小（MB），超過後切換新分段
     
     # 虛擬倉位追蹤配置
     MAX_VIRTUAL_POSITIONS = int(os.getenv('MAX_VIRTUAL_POSITIONS', '10'))  # 最大併發虛擬倉位數
     VIRTUAL_MIN_CONFIDENCE = float(os.getenv('VIRTUAL_MIN_CONFIDENCE', '70.0'))  # 虛擬倉位最低信心度
     VIRTUAL_MAX_AGE_CYCLES = int(os.getenv('VIRTUAL_MAX_AGE_CYCLES', '96'))  # 虛擬倉位最大追蹤週期數（約 1.6 小時）
+    
+    # 策略分析執行模式（'async' = 事件循環內串行計算，'process' = 多進程並行）
+    STRATEGY_EXECUTOR = os.getenv('STRATEGY_EXECUTOR', 'async').lower()
+    STRATEGY_WORKERS = int(os.getenv('STRATEGY_WORKERS', str(os.cpu_count() or 1)))  # 進程池大小
+    STRATEGY_MP_START_METHOD = os.getenv('STRATEGY_MP_START_METHOD', 'spawn')  # 進程啟動方式
+    STRATEGY_PROCESS_MIN_SYMBOLS = int(os.getenv('STRATEGY_PROCESS_MIN_SYMBOLS', '20'))  # 少於此數量時仍用 async 模式
+    
+    # 向量化預篩選（在完整 ICT/SMC 分析前剔除不可能達到信心度門檻的交易對）
+    PRESCREEN_ENABLED = os.getenv('PRESCREEN_ENABLED', 'true').lower() == 'true'
+    PRESCREEN_MIN_VOLUME = float(os.getenv('PRESCREEN_MIN_VOLUME', '0'))  # 最小成交量（0 = 不過濾）
+    PRESCREEN_MIN_ATR_PERCENT = float(os.getenv('PRESCREEN_MIN_ATR_PERCENT', '0'))  # ATR 下限%（0 = 不過濾）
+    PRESCREEN_MAX_ATR_PERCENT = float(os.getenv('PRESCREEN_MAX_ATR_PERCENT', '0'))  # ATR 上限%（0 = 不過濾）
+    PRESCREEN_AUDIT_RATE = float(os.getenv('PRESCREEN_AUDIT_RATE', '0'))  # 被剔除交易對的抽樣審計比例
+    
+    # 多策略信號融合（'weighted' = 加權信心度，'voting' = 投票，'veto' = 主策略 + 否決，'primary' = 僅主策略）
+    STRATEGY_COMBINER = os.getenv('STRATEGY_COMBINER', 'weighted').lower()
+    STRATEGY_WEIGHTS = os.getenv('STRATEGY_WEIGHTS', '')  # 例如 'ict_smc:1.0,momentum:0.5'（缺省權重 1.0）
+    STRATEGY_MIN_VOTES = int(os.getenv('STRATEGY_MIN_VOTES', '0'))  # voting 模式最少票數（0 = 過半數）
+    
+    # 歷史回測（重放 K 線，複用生產環境的指標 / 策略 / 風控組件）
+    BACKTEST_DATA_DIR = os.getenv('BACKTEST_DATA_DIR', 'data/klines')  # 每個交易對一個 CSV / Parquet 文件
+    BACKTEST_INITIAL_BALANCE = float(os.getenv('BACKTEST_INITIAL_BALANCE', '10000'))  # 初始資金 (USDT)
+    BACKTEST_WINDOW_SIZE = int(os.getenv('BACKTEST_WINDOW_SIZE', '186'))  # 分析窗口（200 根 K 線扣除指標暖機行）
+    BACKTEST_SLIPPAGE_BPS = float(os.getenv('BACKTEST_SLIPPAGE_BPS', '1.0'))  # 市價成交滑點（基點）
+    BACKTEST_MODE = os.getenv('BACKTEST_MODE', 'replay').lower()  # replay：逐根 K 棒走生產管線 / vectorized：預計算特徵（快，策略的獨立實現）
+    
+    # 紙上交易（ENABLE_TRADING=false 時以模擬交易所撮合訂單，計算手續費 / 滑點 / 部分成交）
+    PAPER_TRADING = os.getenv('PAPER_TRADING', 'false').lower() == 'true'
+    PAPER_INITIAL_BALANCE = float(os.getenv('PAPER_INITIAL_BALANCE', '10000'))  # 模擬賬戶初始資金 (USDT)
+    PAPER_LATENCY_MS = float(os.getenv('PAPER_LATENCY_MS', '50'))  # 訂單到達撮合的延遲
+    PAPER_SLIPPAGE_BPS = float(os.getenv('PAPER_SLIPPAGE_BPS', '1.0'))  # 市價 / 觸發單滑點（基點）
+    PAPER_MAX_PARTICIPATION = float(os.getenv('PAPER_MAX_PARTICIPATION', '0.1'))  # 限價單每根 K 線最多成交其成交量的比例（0 = 不限）
+    
+    # 歷史 K 線歸檔（python -m src.backtest.archive：按交易對 / 月份分區的列式存儲）
+    KLINE_ARCHIVE_DIR = os.getenv('KLINE_ARCHIVE_DIR', 'data/kline_archive')  # 歸檔根目錄
+    KLINE_ARCHIVE_INTERVALS = os.getenv('KLINE_ARCHIVE_INTERVALS', '1m,15m,1h')  # 下載的時間框架
+    KLINE_ARCHIVE_START = os.getenv('KLINE_ARCHIVE_START', '2023-01-01')  # 最早的 K 線（或上市日）
+    KLINE_ARCHIVE_COMPRESS = os.getenv('KLINE_ARCHIVE_COMPRESS', 'false').lower() == 'true'  # 壓縮分區（不可內存映射）
+    KLINE_DOWNLOAD_CONCURRENCY = int(os.getenv('KLINE_DOWNLOAD_CONCURRENCY', '8'))  # 並發下載的 (交易對, 時間框架)
+    KLINE_DOWNLOAD_WEIGHT_PER_MINUTE = int(os.getenv('KLINE_DOWNLOAD_WEIGHT_PER_MINUTE', '1200'))  # 請求權重預算（上限 2400）
+    
+    # 滾動前推優化（樣本內優化參數，樣本外驗證）
+    WALK_FORWARD_IN_SAMPLE = os.getenv('WALK_FORWARD_IN_SAMPLE', '30D')  # 樣本內窗口長度（pandas Timedelta 格式）
+    WALK_FORWARD_OUT_OF_SAMPLE = os.getenv('WALK_FORWARD_OUT_OF_SAMPLE', '7D')  # 樣本外窗口長度
+    WALK_FORWARD_STEP = os.getenv('WALK_FORWARD_STEP', '')  # 窗口滾動步長（空 = 樣本外長度）
+    WALK_FORWARD_OBJECTIVE = os.getenv('WALK_FORWARD_OBJECTIVE', 'net_pnl')  # 樣本內選參指標
+    WALK_FORWARD_MIN_TRADES = int(os.getenv('WALK_FORWARD_MIN_TRADES', '10'))  # 樣本內最少交易數
+    WALK_FORWARD_SEED = int(os.getenv('WALK_FORWARD_SEED', '42'))  # 參數抽樣隨機種子
+    
+    # 本地 Binance Futures 模擬服務器（壓力 / 延遲測試，python -m src.simulation.exchange_stub）
+    EXCHANGE_STUB_HOST = os.getenv('EXCHANGE_STUB_HOST', '127.0.0.1')  # 監聽地址
+    EXCHANGE_STUB_PORT = int(os.getenv('EXCHANGE_STUB_PORT', '8765'))  # 監聽端口
+    EXCHANGE_STUB_SYMBOLS = int(os.getenv('EXCHANGE_STUB_SYMBOLS', '648'))  # 合成數據的交易對數量
+    EXCHANGE_STUB_DATA_DIR = os.getenv('EXCHANGE_STUB_DATA_DIR', '')  # 錄製的 K 線目錄（空 = 合成數據）
+    EXCHANGE_STUB_SPEED = float(os.getenv('EXCHANGE_STUB_SPEED', '1.0'))  # 市場時鐘倍速
+    EXCHANGE_STUB_LATENCY_MS = float(os.getenv('EXCHANGE_STUB_LATENCY_MS', '0'))  # 注入的基礎延遲
+    EXCHANGE_STUB_LATENCY_JITTER_MS = float(os.getenv('EXCHANGE_STUB_LATENCY_JITTER_MS', '0'))  # 隨機延遲上限
+    EXCHANGE_STUB_ERROR_RATE = float(os.getenv('EXCHANGE_STUB_ERROR_RATE', '0'))  # 隨機 5xx 比例
+    EXCHANGE_STUB_RATE_LIMIT_RATE = float(os.getenv('EXCHANGE_STUB_RATE_LIMIT_RATE', '0'))  # 隨機 429 比例
+    EXCHANGE_STUB_DISCONNECT_RATE = float(os.getenv('EXCHANGE_STUB_DISCONNECT_RATE', '0'))  # 隨機斷線比例
+    EXCHANGE_STUB_WEIGHT_LIMIT = int(os.getenv('EXCHANGE_STUB_WEIGHT_LIMIT', '2400'))  # 每分鐘權重上限（0 = 不限制）
+    
+    # 行情錄製（記錄 BinanceDataClient 的所有響應，供 ReplayDriver 回放）
+    MARKET_RECORDING_PATH = os.getenv('MARKET_RECORDING_PATH', '')  # 錄製文件路徑（空 = 不錄製）
+    MARKET_RECORDING_FLUSH_RECORDS = int(os.getenv('MARKET_RECORDING_FLUSH_RECORDS', '256'))  # 每個壓縮塊的記錄數
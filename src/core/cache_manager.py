@@ -53,6 +53,7 @@ class CacheManager:
         self.default_ttl = default_ttl
         self.cache: Dict[str, CacheEntry] = {}
         self.lock = asyncio.Lock()
+        self.time_scale = 1.0  # 回放加速倍數（TTL 按比例縮短）
         
         # Statistics
         self.hits = 0
@@ -100,6 +101,7 @@ class CacheManager:
                 await self._evict_lru()
             
             entry_ttl = ttl if ttl is not None else self.default_ttl
+            entry_ttl /= self.time_scale
             self.cache[key] = CacheEntry(value, entry_ttl)
     
     async def delete(self, key: str) -> bool:
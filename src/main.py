@@ -6,6 +6,7 @@ Main orchestrator that coordinates all services.
 
 import asyncio
 import logging
+from dataclasses import replace
 from datetime import datetime
 import sys
 
@@ -26,10 +27,16 @@ from src.config import Config
 # Import services
 from src.services import DataService, StrategyEngine, ExecutionService, MonitoringService
 from src.services.virtual_position_tracker import VirtualPositionTracker
+from src.services.user_data_stream import AccountModel, UserDataStream
+from src.services.signal_trace import SignalTrace
+from src.services.signal_queue import SignalQueue
+from src.services.analysis_snapshot import AnalysisSnapshot
 from src.clients.binance_client import BinanceClient
 from src.integrations.discord_bot import TradingBotNotifier as DiscordBot
 from src.managers.risk_manager import RiskManager
 from src.managers.trade_logger import TradeLogger
+from src.simulation.paper_exchange import PaperExchange
+from src.simulation.recorder import MarketRecorder
 
 
 class TradingBotV3:
@@ -43,8 +50,14 @@ class TradingBotV3:
     - MonitoringService: System metrics and alerts
     """
     
-    def __init__(self):
-        """Initialize trading bot with all services."""
+    def __init__(self, binance_client=None):
+        """
+        Initialize trading bot with all services.
+        
+        Args:
+            binance_client: Exchange client (default: BinanceClient from Config;
+                the replay harness passes a ReplayBinanceClient)
+        """
         logger.info("="*70)
         logger.info("Initializing Cryptocurrency Trading Bot v3.2")
         logger.info("="*70)
@@ -57,10 +70,28 @@ class TradingBotV3:
         logger.info("="*70)
         
         # Core components (BinanceClient reads from Config automatically)
-        self.binance = BinanceClient()
+        self.binance = binance_client or BinanceClient()
+        
+        # Market-data recording (replayed with src.simulation.ReplayDriver)
+        self.recorder = None
+        if Config.MARKET_RECORDING_PATH:
+            try:
+                self.recorder = MarketRecorder()
+                self.recorder.attach(self.binance)
+            except Exception as e:
+                logger.error(f"Failed to start market recorder: {e}")
+                self.recorder = None
+        
+        # Paper trading: orders are matched by an in-process simulated exchange
+        self.paper_trading = Config.PAPER_TRADING and not Config.ENABLE_TRADING
+        if self.paper_trading:
+            self.binance = PaperExchange(self.binance)
         
         self.risk_manager = RiskManager()
-        self.trade_logger = TradeLogger(Config.TRADES_FILE)
+        self.trade_logger = TradeLogger(
+            Config.TRADES_FILE,
+            segment_max_bytes=int(Config.TRADE_JOURNAL_SEGMENT_MB * 1024 * 1024)
+        )
         
         # Trading configuration（先定義，因為後面 ExecutionService 需要用）
         self.symbols = []
@@ -92,10 +123,14 @@ class TradingBotV3:
             risk_manager=self.risk_manager,
             discord_bot=self.discord,
             enable_trading=Config.ENABLE_TRADING,
-            trade_logger=self.trade_logger  # 📊 傳遞 trade_logger 供 XGBoost 學習
+            trade_logger=self.trade_logger,  # 📊 傳遞 trade_logger 供 XGBoost 學習
+            paper_trading=self.paper_trading
         )
         
-        logger.info(f"⚙️  Trading mode: {'🔴 LIVE' if Config.ENABLE_TRADING else '🟡 SIMULATION'}")
+        logger.info(
+            f"⚙️  Trading mode: "
+            f"{'🔴 LIVE' if Config.ENABLE_TRADING else '🟢 PAPER' if self.paper_trading else '🟡 SIMULATION'}"
+        )
         
         # 註冊平倉後立即重新掃描回調
         self.execution_service.on_position_closed_callback = self.rescan_symbol_immediately
@@ -110,6 +145,16 @@ class TradingBotV3:
         self.monitoring_service = MonitoringService(
             discord_bot=self.discord
         )
+        self.execution_service.monitoring_service = self.monitoring_service
+        self.execution_service.gateway.monitoring_service = self.monitoring_service
+        
+        # 用戶數據流：實盤時以推送維護餘額 / 倉位 / 訂單，熱路徑不再輪詢 REST
+        self.account_model = AccountModel()
+        self.user_stream = None
+        if Config.ENABLE_TRADING and Config.USER_DATA_STREAM and hasattr(type(self.binance), 'create_listen_key_async'):
+            self.user_stream = UserDataStream(self.binance, self.account_model)
+            self.execution_service.account_model = self.account_model
+            self.account_model.order_listeners.append(self.execution_service.on_order_update)
         
         # Initialize Virtual Position Tracker
         self.virtual_tracker = VirtualPositionTracker(
@@ -121,6 +166,17 @@ class TradingBotV3:
             max_age_cycles=Config.VIRTUAL_MAX_AGE_CYCLES
         )
         
+        # 信號管線：掃描器發布、執行器任務按窗口消費（run() 中啟動；直接調用 run_cycle 時同步執行）
+        self.signal_queue = SignalQueue(
+            window_seconds=Config.SIGNAL_WINDOW_SECONDS,
+            max_age_seconds=Config.SIGNAL_MAX_AGE_SECONDS,
+            monitoring_service=self.monitoring_service
+        )
+        self.signal_executor = None
+        
+        # 本週期的分析快照（倉位監控 / 信號驗證 / 平倉特徵 / 重新掃描共用）
+        self.analysis_snapshot = None
+        
         # State
         self.is_running = False
         self.cycle_count = 0
@@ -168,6 +224,10 @@ class TradingBotV3:
             self.symbols = Config.STATIC_SYMBOLS
             logger.info(f"Fallback to {len(self.symbols)} static symbols")
         
+        # 啟動用戶數據流（首次快照後，餘額與倉位從內存模型讀取）
+        if self.user_stream:
+            await self.user_stream.start()
+        
         # Verify API connections
         await self._verify_connections()
         
@@ -221,6 +281,12 @@ class TradingBotV3:
             self.monitoring_service.update_health('binance_api', 'unhealthy')
             logger.error(f"❌ Binance API connection failed: {e}")
         
+        # 預先緩存交易所過濾器：下單前的數量 / 價格格式化不再觸發 REST
+        preload = getattr(self.binance, 'preload_symbol_info', None)
+        if Config.ENABLE_TRADING and preload:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, preload)
+        
         # Always attempt to load balance (will use default if fails)
         await self._load_account_balance()
         
@@ -235,8 +301,7 @@ class TradingBotV3:
         """Load real account balance from Binance and update RiskManager."""
         try:
             # 讀取 Binance 期貨帳戶實際餘額
-            loop = asyncio.get_event_loop()
-            actual_balance = await loop.run_in_executor(None, self.binance.get_futures_balance)
+            actual_balance = await self._read_balance()
             
             # 區分 API 失敗（None）和實際餘額為 0（0.0）
             if actual_balance is not None:
@@ -250,6 +315,173 @@ class TradingBotV3:
         except Exception as e:
             logger.error(f"❌ 讀取 Binance 餘額失敗: {e}，使用默認值: ${self.risk_manager.account_balance:.2f} USDT")
     
+    async def _read_balance(self):
+        """帳戶餘額：用戶數據流已連接時讀內存模型（無 REST 調用），否則查詢 Binance"""
+        if self.account_model.ready:
+            return self.account_model.get_futures_balance()
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.binance.get_futures_balance)
+
+    @staticmethod
+    def _attach_cycle_trace(signal, cycle_trace: SignalTrace, klines):
+        """把本週期的抓取 / 指標階段與觸發 K 線收盤時間併入信號追蹤"""
+        if signal.trace is None:
+            signal.trace = SignalTrace()
+        signal.trace.merge(cycle_trace)
+        if klines is not None and not klines.empty and 'timestamp' in klines.columns:
+            # 最後一根是形成中的 K 線，其開盤時間即上一根的收盤時間（UTC）
+            signal.trace.mark_wall('candle_closed', klines['timestamp'].iloc[-1].value / 1e9)
+
+    async def _scan(self, symbols, timing):
+        """
+        Fetch klines, compute indicators and analyze a set of symbols.
+        
+        Args:
+            symbols: Symbols to scan
+            timing: {'fetch', 'analysis'} seconds, accumulated in place
+            
+        Returns:
+            (symbols_data, signals); signals carry the scan's trace stages
+        """
+        loop = asyncio.get_event_loop()
+        
+        # Step 1: Fetch market data (concurrent batch fetching)
+        logger.info(f"📥 Fetching data for {len(symbols)} symbols...")
+        fetch_start = loop.time()
+        
+        klines_data = await self.data_service.fetch_klines_batch(
+            symbols=symbols,
+            timeframe=self.timeframe,
+            limit=200
+        )
+        
+        cycle_trace = SignalTrace()
+        cycle_trace.mark('data_fetched')
+        timing['fetch'] += loop.time() - fetch_start
+        
+        # Step 2: Analyze all symbols and generate signals
+        logger.info(f"🔍 Analyzing market data...")
+        analysis_start = loop.time()
+        
+        # Prepare data for analysis (v3.2 優化：批量向量化指標計算)
+        from src.utils.indicators import TechnicalIndicators
+        
+        # 批量計算所有 symbols 的技術指標（向量化優化）
+        valid_klines = {sym: df for sym, df in klines_data.items() if df is not None and not df.empty}
+        
+        symbols_data = {}
+        if valid_klines:
+            # 使用批量計算方法（一次性處理所有 symbols，減少重複計算）
+            indicators_data = TechnicalIndicators.batch_calculate_indicators(
+                valid_klines,
+                optimize_memory=True  # 使用 float32 和只保留必要的列
+            )
+            cycle_trace.mark('indicators_done')
+            
+            # 準備分析數據
+            for symbol, df_with_indicators in indicators_data.items():
+                if df_with_indicators is not None and not df_with_indicators.empty:
+                    current_price = float(df_with_indicators.iloc[-1]['close'])
+                    symbols_data[symbol] = (df_with_indicators, current_price)
+        
+        # Run analysis (v3.1: 使用 DataService 緩存獲取趨勢數據)
+        signals = await self.strategy_engine.analyze_batch(symbols_data, data_service=self.data_service)
+        for signal in signals:
+            self._attach_cycle_trace(signal, cycle_trace, klines_data.get(signal.symbol))
+        if self.analysis_snapshot is not None:
+            self.analysis_snapshot.add(symbols_data, signals)
+        # 新到的 K 線更新持倉（真實 / 虛擬）的運行中 MFE/MAE
+        self.execution_service.update_excursions(symbols_data)
+        self.virtual_tracker.update_excursions(symbols_data)
+        
+        timing['analysis'] += loop.time() - analysis_start
+        return symbols_data, signals
+    
+    async def _execute_top_signals(self, signals):
+        """
+        Rank signals and fill the free position slots with the best of them.
+        
+        Returns:
+            (executed, dropped): signals that opened a position, and the rest
+            ordered by confidence (candidates for virtual positions)
+        """
+        # Step 3: Rank and filter signals
+        if signals:
+            top_signals = self.strategy_engine.rank_signals(
+                signals=signals,
+                mode='confidence',  # or 'roi'
+                limit=self.execution_service.max_positions
+            )
+            for signal in top_signals:
+                signal.trace.mark('ranked')
+            
+            # 預備下單參數（過濾器、舍入、名義價值與保證金驗證），執行時只剩一次網絡請求
+            await asyncio.gather(*(self.execution_service.prepare_signal(s) for s in top_signals))
+            
+            logger.info(f"🎯 Top {len(top_signals)} signals selected:")
+            for i, signal in enumerate(top_signals, 1):
+                logger.info(
+                    f"  {i}. {signal.symbol}: {signal.action} @ {signal.price:.4f} "
+                    f"(confidence: {signal.confidence:.1f}%, ROI: {signal.expected_roi:.2f}%)"
+                )
+        else:
+            top_signals = []
+            logger.info("ℹ️  No signals generated this cycle")
+        
+        # Step 4: Execute signals (if any positions available)
+        available_slots = (
+            self.execution_service.max_positions
+            - len(self.execution_service.positions)
+            - len(self.execution_service.reserved_slots)
+        )
+        
+        if available_slots > 0 and top_signals:
+            logger.info(f"💼 Executing signals ({available_slots} slots available)...")
+            
+            # 各名額並發入場（ExecutionService 原子預留名額，不會超過上限）
+            attempted = top_signals[:available_slots]
+            results = await asyncio.gather(
+                *(self.execution_service.execute_signal(signal) for signal in attempted)
+            )
+            executed = [signal for signal, ok in zip(attempted, results) if ok]
+        else:
+            executed = []
+        
+        executed_ids = {id(signal) for signal in executed}
+        dropped = sorted(
+            (signal for signal in signals if id(signal) not in executed_ids),
+            key=lambda s: s.confidence, reverse=True
+        )
+        return executed, dropped
+    
+    def _create_virtual_positions(self, dropped):
+        """Track signals that did not get a real slot as virtual positions."""
+        # 已有真實倉位或正在入場的交易對不建虛擬倉位
+        candidates = [
+            signal for signal in dropped
+            if signal.symbol not in self.execution_service.positions
+            and signal.symbol not in self.execution_service.reserved_slots
+        ]
+        if candidates:
+            logger.info(f"🔷 Creating virtual positions from {len(candidates)} unexecuted signals...")
+            self.virtual_tracker.create_virtual_positions(candidates, start_rank=1)
+    
+    async def _run_signal_executor(self):
+        """
+        Executor task of the signal pipeline: consume the signal queue one
+        window at a time, ranking each window's signals like a cycle's.
+        """
+        while self.is_running:
+            try:
+                window, superseded = await self.signal_queue.next_window(limit=self.execution_service.max_positions)
+                _, dropped = await self._execute_top_signals(window)
+                # 本窗口未執行的信號（含落選者）即為虛擬倉位候選
+                self._create_virtual_positions(sorted(dropped + superseded, key=lambda s: s.confidence, reverse=True))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in signal executor: {e}", exc_info=True)
+    
     async def rescan_symbol_immediately(self, symbol: str):
         """
         立即重新掃描單一交易對並嘗試開倉。
@@ -271,25 +503,31 @@ class TradingBotV3:
                 logger.info(f"ℹ️  無可用倉位槽位 ({current_positions}/{self.execution_service.max_positions})")
                 return
             
-            # 獲取該交易對的最新數據（強制刷新，繞過緩存）
-            logger.info(f"📥 獲取 {symbol} 最新數據（強制刷新）...")
-            klines = await self.data_service.fetch_klines(
-                symbol=symbol,
-                timeframe=self.timeframe,
-                limit=200,
-                force_refresh=True  # 繞過緩存，確保獲取最新數據
-            )
-            
-            if klines is None or klines.empty:
-                logger.warning(f"⚠️  無法獲取 {symbol} 數據")
-                return
-            
-            # 分析該交易對
-            current_price = float(klines.iloc[-1]['close'])
-            logger.info(f"🔍 分析 {symbol} @ {current_price:.4f}...")
-            
-            symbols_data = {symbol: (klines, current_price)}
-            signals = await self.strategy_engine.analyze_batch(symbols_data)
+            analysis = self.analysis_snapshot.get(symbol) if self.analysis_snapshot else None
+            if analysis is not None:
+                # 本週期快照已分析過該交易對（同一根 K 線）：直接使用其信號
+                logger.info(f"🔍 使用本週期分析快照 {symbol} @ {analysis.price:.4f}")
+                signals = [replace(analysis.signal, trace=SignalTrace(), prepared=None)] if analysis.signal else []
+            else:
+                # 獲取該交易對的最新數據（強制刷新，繞過緩存）
+                logger.info(f"📥 獲取 {symbol} 最新數據（強制刷新）...")
+                klines = await self.data_service.fetch_klines(
+                    symbol=symbol,
+                    timeframe=self.timeframe,
+                    limit=200,
+                    force_refresh=True  # 繞過緩存，確保獲取最新數據
+                )
+                
+                if klines is None or klines.empty:
+                    logger.warning(f"⚠️  無法獲取 {symbol} 數據")
+                    return
+                
+                # 分析該交易對
+                current_price = float(klines.iloc[-1]['close'])
+                logger.info(f"🔍 分析 {symbol} @ {current_price:.4f}...")
+                
+                symbols_data = {symbol: (klines, current_price)}
+                signals = await self.strategy_engine.analyze_batch(symbols_data)
             
             if not signals:
                 logger.info(f"ℹ️  {symbol} 未產生新信號")
@@ -329,6 +567,8 @@ class TradingBotV3:
         """Execute one complete trading cycle."""
         self.cycle_count += 1
         cycle_start = asyncio.get_event_loop().time()
+        if self.recorder:
+            self.recorder.mark('cycle', number=self.cycle_count)
         
         logger.info(f"\n{'='*70}")
         logger.info(f"📊 Trading Cycle #{self.cycle_count} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -336,8 +576,7 @@ class TradingBotV3:
         
         # 每個交易週期更新帳戶餘額
         try:
-            loop = asyncio.get_event_loop()
-            current_balance = await loop.run_in_executor(None, self.binance.get_futures_balance)
+            current_balance = await self._read_balance()
             
             # 區分 API 失敗（None）和實際餘額為 0（0.0）
             if current_balance is not None:
@@ -356,87 +595,43 @@ class TradingBotV3:
             logger.debug(f"餘額更新失敗: {e}")
         
         try:
-            # Step 1: Fetch market data (concurrent batch fetching)
-            logger.info(f"📥 Fetching data for {len(self.symbols)} symbols...")
-            fetch_start = asyncio.get_event_loop().time()
-            
-            klines_data = await self.data_service.fetch_klines_batch(
-                symbols=self.symbols,
-                timeframe=self.timeframe,
-                limit=200
+            # Steps 1-2: Fetch market data and analyze all symbols
+            timing = {'fetch': 0.0, 'analysis': 0.0}
+            self.analysis_snapshot = AnalysisSnapshot(
+                cycle=self.cycle_count,
+                max_age_seconds=Config.ANALYSIS_SNAPSHOT_MAX_AGE_SECONDS
             )
-            
-            fetch_time = asyncio.get_event_loop().time() - fetch_start
-            self.monitoring_service.record_metric('fetch_time_seconds', fetch_time)
-            logger.info(f"✅ Fetched data in {fetch_time:.2f}s")
-            
-            # Step 2: Analyze all symbols and generate signals
-            logger.info(f"🔍 Analyzing market data...")
-            analysis_start = asyncio.get_event_loop().time()
-            
-            # Prepare data for analysis (v3.2 優化：批量向量化指標計算)
-            from src.utils.indicators import TechnicalIndicators
-            
-            # 批量計算所有 symbols 的技術指標（向量化優化）
-            valid_klines = {sym: df for sym, df in klines_data.items() if df is not None and not df.empty}
-            
-            if valid_klines:
-                # 使用批量計算方法（一次性處理所有 symbols，減少重複計算）
-                indicators_data = TechnicalIndicators.batch_calculate_indicators(
-                    valid_klines,
-                    optimize_memory=True  # 使用 float32 和只保留必要的列
-                )
-                
-                # 準備分析數據
-                symbols_data = {}
-                for symbol, df_with_indicators in indicators_data.items():
-                    if df_with_indicators is not None and not df_with_indicators.empty:
-                        current_price = float(df_with_indicators.iloc[-1]['close'])
-                        symbols_data[symbol] = (df_with_indicators, current_price)
+            self.execution_service.analysis_snapshot = self.analysis_snapshot
+            if self.signal_executor is None:
+                symbols_data, signals = await self._scan(self.symbols, timing)
             else:
-                symbols_data = {}
-            
-            # Run analysis (v3.1: 使用 DataService 緩存獲取趨勢數據)
-            signals = await self.strategy_engine.analyze_batch(symbols_data, data_service=self.data_service)
-            
-            analysis_time = asyncio.get_event_loop().time() - analysis_start
+                # 管線模式：每批交易對分析完即把信號發布給執行器，不等整個掃描結束
+                symbols_data, signals = {}, []
+                chunk = max(Config.SIGNAL_SCAN_CHUNK, 1)
+                for start in range(0, len(self.symbols), chunk):
+                    chunk_data, chunk_signals = await self._scan(self.symbols[start:start + chunk], timing)
+                    symbols_data.update(chunk_data)
+                    signals.extend(chunk_signals)
+                    for signal in chunk_signals:
+                        self.signal_queue.publish(signal)
+            
+            fetch_time = timing['fetch']
+            analysis_time = timing['analysis']
+            self.monitoring_service.record_metric('fetch_time_seconds', fetch_time)
             self.monitoring_service.record_metric('analysis_time_seconds', analysis_time)
-            logger.info(f"✅ Analysis complete in {analysis_time:.2f}s - {len(signals)} signals generated")
-            
-            # Step 3: Rank and filter signals
-            if signals:
-                top_signals = self.strategy_engine.rank_signals(
-                    signals=signals,
-                    mode='confidence',  # or 'roi'
-                    limit=self.execution_service.max_positions
-                )
-                
-                logger.info(f"🎯 Top {len(top_signals)} signals selected:")
-                for i, signal in enumerate(top_signals, 1):
-                    logger.info(
-                        f"  {i}. {signal.symbol}: {signal.action} @ {signal.price:.4f} "
-                        f"(confidence: {signal.confidence:.1f}%, ROI: {signal.expected_roi:.2f}%)"
-                    )
-            else:
-                top_signals = []
-                logger.info("ℹ️  No signals generated this cycle")
+            logger.info(
+                f"✅ Fetched data in {fetch_time:.2f}s, analysis complete in {analysis_time:.2f}s "
+                f"- {len(signals)} signals generated"
+            )
             
-            # Step 4: Execute signals (if any positions available)
             current_positions = len(self.execution_service.positions)
-            available_slots = self.execution_service.max_positions - current_positions
-            
-            if available_slots > 0 and top_signals:
-                logger.info(f"💼 Executing signals ({available_slots} slots available)...")
+            if self.signal_executor is None:
+                # Steps 3-4: Rank, then execute signals (if any positions available)
+                _, dropped = await self._execute_top_signals(signals)
                 
-                for signal in top_signals[:available_slots]:
-                    success = await self.execution_service.execute_signal(signal)
-            
-            # Step 5: Create virtual positions from remaining signals (rank 4+)
-            if signals and len(signals) > 3:
-                logger.info(f"🔷 Creating virtual positions from rank 4+ signals...")
-                # Sort all signals by confidence (same as top_signals logic)
-                sorted_signals = sorted(signals, key=lambda s: s.confidence, reverse=True)
-                self.virtual_tracker.create_virtual_positions(sorted_signals, start_rank=4)
+                # Step 5: Create virtual positions from the signals that were not executed
+                # （管線模式由執行器在每個窗口之後處理）
+                self._create_virtual_positions(dropped)
             
             # Step 6: Check existing virtual positions
             await self.virtual_tracker.check_virtual_positions(self.data_service)
@@ -450,6 +645,10 @@ class TradingBotV3:
             # Step 8: Cleanup cache
             await self.data_service.cleanup_cache()
             
+            # 交易日誌後台寫入的持久化延遲 / 隊列深度
+            self.monitoring_service.record_metric('journal_durability_lag_seconds', self.trade_logger.writer.durability_lag())
+            self.monitoring_service.record_metric('journal_queue_depth', self.trade_logger.writer.depth)
+            
             # Calculate cycle time
             cycle_time = asyncio.get_event_loop().time() - cycle_start
             self.monitoring_service.record_metric('cycle_time_seconds', cycle_time)
@@ -493,6 +692,10 @@ class TradingBotV3:
             asyncio.create_task(self.discord.start_bot())
             await asyncio.sleep(2)  # Wait for Discord to connect
         
+        if Config.SIGNAL_PIPELINE:
+            self.signal_executor = asyncio.create_task(self._run_signal_executor())
+            logger.info("⚡ Signal pipeline enabled: signals execute as soon as their scan chunk is analyzed")
+        
         try:
             while self.is_running:
                 await self.run_cycle()
@@ -516,6 +719,13 @@ class TradingBotV3:
         
         self.is_running = False
         
+        # 停止信號執行器（隊列中未執行的信號丟棄）
+        if self.signal_executor:
+            self.signal_executor.cancel()
+            await asyncio.gather(self.signal_executor, return_exceptions=True)
+            self.signal_executor = None
+            self.signal_queue.clear()
+        
         # Save virtual positions
         logger.info("Saving virtual positions...")
         self.virtual_tracker.save_virtual_positions()
@@ -532,6 +742,12 @@ class TradingBotV3:
                 except Exception as e:
                     logger.error(f"Error closing {symbol}: {e}")
         
+        if self.user_stream:
+            await self.user_stream.stop()
+        
+        # 等待後台的開倉日誌 / 通知寫完
+        await self.execution_service.flush_background()
+        
         # Export monitoring data
         self.monitoring_service.export_metrics()
         
@@ -540,14 +756,21 @@ class TradingBotV3:
         stats = self.monitoring_service.get_trading_stats(
             self.data_service,
             self.strategy_engine,
-            self.execution_service
+            self.execution_service,
+            self.signal_queue
         )
         
         for service_name, service_stats in stats.items():
             logger.info(f"\n{service_name}:")
             for key, value in service_stats.items():
                 logger.info(f"  {key}: {value}")
-        
+
+        # Stop strategy worker processes (process executor mode)
+        self.strategy_engine.shutdown()
+
+        if self.recorder:
+            self.recorder.close()
+
         logger.info("\n✅ Shutdown complete")
         logger.info("="*70)
 
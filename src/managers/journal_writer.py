@@ -0,0 +1,213 @@
+"""
+Journal Writer - Background thread that owns all TradeJournal I/O.
+
+Responsibilities:
+- Accept journal operations (append / put / delete) from the trading loop
+  through a bounded queue; submit() never encodes JSON, touches disk or blocks
+  (when the queue is full, records spill to an overflow list the writer drains
+  in order)
+- Group commit: the first queued record opens a batch, everything arriving
+  within sync_interval (or up to batch_max records) is encoded and written,
+  then each touched journal is fsynced once
+- Snapshot journals whose dead records warrant it, after the sync
+- Measure durability lag: time from submit() to the fsync covering the record
+
+Handoff contract: a submitted record belongs to the writer. Callers build
+a fresh dict per record and do not mutate it afterwards, so the writer
+serializes the exact state that was handed over.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from src.utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+_BARRIER = 'barrier'
+_STOP = 'stop'
+
+
+class JournalWriter:
+    """Single writer thread for TradeJournals with a bounded queue, overflow spill and batched fsync."""
+
+    def __init__(self, max_queue: int = 10000, batch_max: int = 500, sync_interval: float = 0.2):
+        """
+        Start the writer thread.
+
+        Args:
+            max_queue: Queue bound; beyond it records spill to the overflow list
+            batch_max: Records written per fsync at most
+            sync_interval: How long a batch collects records after its first one (seconds)
+        """
+        self.batch_max = batch_max
+        self.sync_interval = sync_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._overflow: deque = deque()   # 隊列滿時的溢出記錄（按提交順序）
+        self._overflow_lock = threading.Lock()
+
+        # Statistics
+        self.stats = {
+            'submitted': 0,
+            'written': 0,
+            'batches': 0,
+            'syncs': 0,
+            'snapshots': 0,
+            'errors': 0,
+            'overflowed': 0,
+            'max_depth': 0
+        }
+        self._lag_last = 0.0
+        self._lag_max = 0.0
+        self._lag_total = 0.0
+        self._lag_count = 0
+        self._oldest_pending: Optional[float] = None   # 已寫入但尚未 fsync 的最早提交時間
+
+        self._thread = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() + len(self._overflow)
+
+    def submit(self, journal, op: str, key: Optional[str] = None, value: Any = None):
+        """Queue one operation ('append', 'put' or 'delete') for a journal."""
+        self._enqueue((journal, op, key, value, time.monotonic()), submitted=True)
+
+    def _enqueue(self, item: tuple, submitted: bool = False):
+        # 不阻塞事件循環：隊列滿時溢出到無界列表，寫入線程按順序取回，交易記錄不丟棄
+        # 提交方計數（submitted / overflowed / max_depth）可能來自多個線程：在鎖內更新；
+        # 其餘計數只由寫入線程更新
+        with self._overflow_lock:
+            if submitted:
+                self.stats['submitted'] += 1
+            if not self._overflow:
+                try:
+                    self._queue.put_nowait(item)
+                    item = None
+                except queue.Full:
+                    logger.warning(f"Journal writer queue full ({self._queue.maxsize}), spilling to overflow")
+            if item is not None:
+                self._overflow.append(item)
+                self.stats['overflowed'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], self.depth)
+
+    def _refill(self):
+        """Move overflowed records into the queue slots the writer just freed."""
+        if not self._overflow:
+            return
+        with self._overflow_lock:
+            while self._overflow:
+                try:
+                    self._queue.put_nowait(self._overflow[0])
+                except queue.Full:
+                    break
+                self._overflow.popleft()
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """Block until everything submitted so far is written and fsynced."""
+        if not self._thread.is_alive():
+            return self._queue.empty() and not self._overflow   # 已關閉：關閉前已全部落盤
+        done = threading.Event()
+        self._enqueue((None, _BARRIER, None, done, time.monotonic()))
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Flush and stop the writer thread."""
+        if not self._thread.is_alive():
+            return
+        self._enqueue((None, _STOP, None, None, time.monotonic()))
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            self._refill()
+            deadline = time.monotonic() + self.sync_interval
+            while len(batch) < self.batch_max and batch[-1][1] not in (_BARRIER, _STOP):
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                self._refill()
+            if not self._commit(batch):
+                return
+
+    def _commit(self, batch: list) -> bool:
+        """Write a batch, fsync each touched journal once; returns False on stop."""
+        touched = {}
+        barriers = []
+        stop = False
+        for journal, op, key, value, submitted_at in batch:
+            if op == _BARRIER:
+                barriers.append(value)
+                continue
+            if op == _STOP:
+                stop = True
+                continue
+            try:
+                if op == 'append':
+                    journal.append(value)
+                elif op == 'put':
+                    journal.put(key, value)
+                elif op == 'delete':
+                    journal.delete(key)
+                touched[id(journal)] = journal
+                self.stats['written'] += 1
+                if self._oldest_pending is None:
+                    self._oldest_pending = submitted_at
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Journal writer failed to {op} {key or ''} in {journal.directory}: {e}")
+
+        for journal in touched.values():
+            try:
+                journal.sync()
+                self.stats['syncs'] += 1
+                if journal.maybe_compact():
+                    self.stats['snapshots'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Journal writer failed to sync {journal.directory}: {e}")
+
+        synced_at = time.monotonic()
+        for _, op, _, _, submitted_at in batch:
+            if op not in (_BARRIER, _STOP):
+                self._record_lag(synced_at - submitted_at)
+        self._oldest_pending = None
+        self.stats['batches'] += 1
+
+        for done in barriers:
+            done.set()
+        return not stop
+
+    def _record_lag(self, seconds: float):
+        self._lag_last = seconds
+        self._lag_max = max(self._lag_max, seconds)
+        self._lag_total += seconds
+        self._lag_count += 1
+
+    def durability_lag(self) -> float:
+        """Seconds the oldest not-yet-durable record has been waiting (0 when caught up)."""
+        oldest = self._oldest_pending
+        if oldest is None and self.depth:
+            try:
+                oldest = self._queue.queue[0][4]
+            except IndexError:
+                oldest = None
+        return time.monotonic() - oldest if oldest is not None else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get writer statistics."""
+        return {
+            **self.stats,
+            'depth': self.depth,
+            'durability_lag_ms': round(self.durability_lag() * 1000, 3),
+            'lag_last_ms': round(self._lag_last * 1000, 3),
+            'lag_max_ms': round(self._lag_max * 1000, 3),
+            'lag_mean_ms': round(self._lag_total / self._lag_count * 1000, 3) if self._lag_count else None
+        }
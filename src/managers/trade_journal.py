@@ -0,0 +1,380 @@
+"""
+Trade Journal - Crash-safe write-ahead log with snapshots, shared by
+TradeLogger and VirtualPositionTracker.
+
+Layout of a journal directory:
+
+    snapshot.jsonl            live state as of segment N (atomically renamed)
+    00000001.jsonl, ...       WAL segments written after the snapshot
+
+Each line is one checksummed record, "<crc32 hex> <json>":
+
+    {"k": key, "v": value}    put (replaces an earlier record of the key)
+    {"k": key, "d": 1}        delete
+    {"v": value}              keyless append (plain log records)
+    {"snapshot": N}           snapshot header (first line of snapshot.jsonl)
+
+- Writes append one line to the active segment, so they cost O(record size)
+- The active segment rotates at segment_max_bytes
+- An in-memory index maps each live key to (segment, offset, length); it is
+  rebuilt on open by loading the snapshot and replaying the newer segments
+- Overwritten / deleted records are dead bytes; once they exceed
+  compact_min_bytes and half the journal, snapshot() writes the live records
+  to a temporary file, fsyncs it, renames it over snapshot.jsonl and only
+  then removes the segments it covers
+
+On open, a torn last line (crash mid-write) is truncated away; any other
+record failing its checksum is logged and skipped, never the whole file.
+Lines without a checksum (written before records were checksummed) are
+still read.
+"""
+
+import json
+import os
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.utils.helpers import setup_logger
+
+logger = setup_logger(__name__)
+
+SEGMENT_SUFFIX = '.jsonl'
+SNAPSHOT_FILE = 'snapshot.jsonl'
+SNAPSHOT = 0    # 索引中表示快照文件的分段號
+
+
+def journal_path(json_file: str) -> str:
+    """Journal directory that replaces a legacy whole-file JSON store (trades.json → trades.journal)."""
+    root, _ = os.path.splitext(json_file)
+    return root + '.journal'
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    """One WAL line: crc32 of the JSON payload, a space, the payload, newline."""
+    payload = json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    return b'%08x ' % zlib.crc32(payload) + payload + b'\n'
+
+
+def decode_record(line: bytes) -> Optional[Dict[str, Any]]:
+    """Parse a WAL line; None if it is torn or fails its checksum."""
+    if not line.endswith(b'\n'):
+        return None
+    body = line[:-1]
+    try:
+        if body[:1] == b'{':
+            return json.loads(body)   # 未帶校驗和的舊記錄
+        crc, _, payload = body.partition(b' ')
+        if len(crc) != 8 or int(crc, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class TradeJournal:
+    """Checksummed WAL segments plus an atomically replaced snapshot, with a key → offset index."""
+
+    def __init__(self, directory: str, segment_max_bytes: int = 16 * 1024 * 1024,
+                 compact_min_bytes: int = 1024 * 1024):
+        """
+        Open (or create) a journal, replaying snapshot and WAL.
+
+        Args:
+            directory: Journal directory
+            segment_max_bytes: Rotate the active segment past this size
+            compact_min_bytes: Dead bytes needed before a snapshot is considered
+        """
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.compact_min_bytes = compact_min_bytes
+
+        self._lock = threading.RLock()
+        self.index: Dict[str, Tuple[int, int, int]] = {}   # key → (segment, offset, length)
+        self.segments: List[int] = []
+        self.keyless: List[Tuple[int, int, int]] = []      # 無鍵記錄的位置（按寫入順序）
+        self.through = 0                                   # 快照已涵蓋的最後一個分段
+        self.total_bytes = 0
+        self.dead_bytes = 0
+        self._active = None
+        self._active_size = 0
+
+        self.stats = {
+            'appends': 0,
+            'deletes': 0,
+            'bytes_written': 0,
+            'syncs': 0,
+            'rotations': 0,
+            'snapshots': 0,
+            'torn_records': 0,
+            'corrupt_records': 0
+        }
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.total_bytes)
+
+    def _segment_file(self, segment: int) -> str:
+        if segment == SNAPSHOT:
+            return os.path.join(self.directory, SNAPSHOT_FILE)
+        return os.path.join(self.directory, f"{segment:08d}{SEGMENT_SUFFIX}")
+
+    def _load(self):
+        """Recover state: the snapshot, then every WAL segment after it (startup only)."""
+        snapshot_path = self._segment_file(SNAPSHOT)
+        if os.path.exists(snapshot_path):
+            self._replay(SNAPSHOT, last=False)
+
+        segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+        )
+        for segment in segments:
+            if segment <= self.through:
+                # 快照改名成功後、刪除舊分段前崩潰留下的分段：內容已在快照中
+                os.remove(self._segment_file(segment))
+                continue
+            self.segments.append(segment)
+        for segment in self.segments:
+            self._replay(segment, last=segment == self.segments[-1])
+        if self.segments:
+            self._active_size = os.path.getsize(self._segment_file(self.segments[-1]))
+
+        tmp = snapshot_path + '.tmp'
+        if os.path.exists(tmp):
+            os.remove(tmp)   # 未完成的快照（改名前崩潰），WAL 仍完整
+
+    def _replay(self, segment: int, last: bool):
+        path = self._segment_file(segment)
+        with open(path, 'rb') as f:
+            lines = f.readlines()
+        offset = 0
+        for i, line in enumerate(lines):
+            record = decode_record(line)
+            if record is None:
+                if last and i == len(lines) - 1:
+                    # 殘缺的尾行（寫入中途崩潰）：截斷，之後的追加從乾淨的行首開始
+                    self.stats['torn_records'] += 1
+                    logger.warning(f"Truncating torn record in {path} at offset {offset}")
+                    with open(path, 'r+b') as f:
+                        f.truncate(offset)
+                    break
+                self.stats['corrupt_records'] += 1
+                logger.error(f"Skipping corrupt record in {path} at offset {offset} (checksum mismatch)")
+            elif 'snapshot' in record:
+                self.through = int(record['snapshot'])
+            else:
+                self._apply(record, segment, offset, len(line))
+            offset += len(line)
+            self.total_bytes += len(line)
+
+    def _apply(self, record: Dict[str, Any], segment: int, offset: int, length: int):
+        """Update the index for one record read or written at (segment, offset)."""
+        if 'k' not in record:
+            self.keyless.append((segment, offset, length))
+            return
+        key = record['k']
+        previous = self.index.pop(key, None)
+        if previous is not None:
+            self.dead_bytes += previous[2]
+        if record.get('d'):
+            self.dead_bytes += length   # 刪除標記本身也只在下次快照前有意義
+        else:
+            self.index[key] = (segment, offset, length)
+
+    def _write(self, record: Dict[str, Any]):
+        line = encode_record(record)
+        with self._lock:
+            if self._active is None or (self._active_size and self._active_size + len(line) > self.segment_max_bytes):
+                self._open_active()
+            segment = self.segments[-1]
+            offset = self._active_size
+            self._active.write(line)
+            self._active_size += len(line)
+            self.total_bytes += len(line)
+            self.stats['bytes_written'] += len(line)
+            self._apply(record, segment, offset, len(line))
+
+    def _open_active(self):
+        """Open the segment appends go to: the last one if it has room, else a new one."""
+        if self._active is not None:
+            self._close_active()
+            self._new_segment()
+            self.stats['rotations'] += 1
+        elif not self.segments or self._active_size >= self.segment_max_bytes:
+            self._new_segment()
+        self._active = open(self._segment_file(self.segments[-1]), 'ab')
+
+    def _new_segment(self):
+        self.segments.append((self.segments[-1] if self.segments else self.through) + 1)
+        self._active_size = 0
+
+    def _close_active(self):
+        self._active.flush()
+        os.fsync(self._active.fileno())
+        self._active.close()
+        self._active = None
+
+    def _fsync_directory(self):
+        """Make renames / removals in the journal directory durable (no-op where unsupported)."""
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def append(self, value: Any):
+        """Append a keyless record."""
+        self._write({'v': value})
+        self.stats['appends'] += 1
+
+    def put(self, key: str, value: Any):
+        """Write a record under key (the previous record of the key becomes dead)."""
+        self._write({'k': key, 'v': value})
+        self.stats['appends'] += 1
+
+    def delete(self, key: str):
+        """Delete key (no-op if it is not live)."""
+        with self._lock:
+            if key not in self.index:
+                return
+            self._write({'k': key, 'd': 1})
+        self.stats['deletes'] += 1
+
+    def sync(self):
+        """Flush the active segment to disk (fsync)."""
+        with self._lock:
+            if self._active is not None:
+                self._active.flush()
+                os.fsync(self._active.fileno())
+                self.stats['syncs'] += 1
+
+    def _read(self, location: Tuple[int, int, int]) -> Dict[str, Any]:
+        segment, offset, length = location
+        if self._active is not None and self.segments and segment == self.segments[-1]:
+            self._active.flush()
+        with open(self._segment_file(segment), 'rb') as f:
+            f.seek(offset)
+            return decode_record(f.read(length))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Read one key's value from disk via the index."""
+        with self._lock:
+            location = self.index.get(key)
+            return self._read(location)['v'] if location else default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.index) + len(self.keyless)
+
+    def _scan(self) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+        """All readable records (snapshot first, then WAL) as (segment, offset, record)."""
+        if self._active is not None:
+            self._active.flush()
+        files = ([SNAPSHOT] if os.path.exists(self._segment_file(SNAPSHOT)) else []) + list(self.segments)
+        for segment in files:
+            offset = 0
+            with open(self._segment_file(segment), 'rb') as f:
+                for line in f:
+                    record = decode_record(line)
+                    if record is not None:
+                        yield segment, offset, record
+                    offset += len(line)
+
+    def _is_live(self, segment: int, offset: int, record: Dict[str, Any]) -> bool:
+        if 'v' not in record:
+            return False
+        return 'k' not in record or self.index.get(record['k'], (None, None))[:2] == (segment, offset)
+
+    def values(self) -> List[Any]:
+        """Live values (keyless records and live keys) in write order."""
+        with self._lock:
+            return [record['v'] for segment, offset, record in self._scan() if self._is_live(segment, offset, record)]
+
+    def items(self) -> Dict[str, Any]:
+        """Live key → value."""
+        with self._lock:
+            return {
+                record['k']: record['v'] for segment, offset, record in self._scan()
+                if 'k' in record and self._is_live(segment, offset, record)
+            }
+
+    def should_compact(self) -> bool:
+        return self.dead_bytes >= self.compact_min_bytes and self.dead_bytes * 2 >= self.total_bytes
+
+    def maybe_compact(self) -> bool:
+        """Snapshot if enough of the journal is dead; returns True if it ran."""
+        with self._lock:
+            if not self.should_compact():
+                return False
+            self.snapshot()
+            return True
+
+    def snapshot(self):
+        """
+        Write the live records to snapshot.jsonl and drop the WAL segments it covers.
+
+        The new snapshot is written to a temporary file, fsynced and renamed
+        over the old one; segments are removed only after the rename, so a
+        crash at any point leaves either the old snapshot plus the full WAL,
+        or the new snapshot (leftover covered segments are skipped on open).
+        """
+        with self._lock:
+            live_records = [record for segment, offset, record in self._scan() if self._is_live(segment, offset, record)]
+            if self._active is not None:
+                self._close_active()
+            through = self.segments[-1] if self.segments else self.through
+            before = self.total_bytes
+
+            self.index, self.keyless = {}, []
+            self.dead_bytes = 0
+            path = self._segment_file(SNAPSHOT)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                header = encode_record({'snapshot': through})
+                f.write(header)
+                offset = len(header)
+                for record in live_records:
+                    line = encode_record(record)
+                    f.write(line)
+                    self._apply(record, SNAPSHOT, offset, len(line))
+                    offset += len(line)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            self._fsync_directory()
+
+            for segment in self.segments:
+                os.remove(self._segment_file(segment))
+            self._fsync_directory()
+            self.segments = []
+            self.through = through
+            self.total_bytes = offset
+            self._active_size = 0
+            self.stats['snapshots'] += 1
+            logger.info(f"Snapshot of journal {self.directory}: {before} → {self.total_bytes} bytes")
+
+    def close(self):
+        with self._lock:
+            if self._active is not None:
+                self._close_active()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get journal statistics."""
+        return {
+            **self.stats,
+            'segments': len(self.segments),
+            'records': len(self),
+            'total_bytes': self.total_bytes,
+            'dead_bytes': self.dead_bytes
+        }
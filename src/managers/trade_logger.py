@@ -6,6 +6,8 @@ import atexit
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from src.utils.helpers import setup_logger
+from src.managers.trade_journal import TradeJournal, journal_path
+from src.managers.journal_writer import JournalWriter
 
 logger = setup_logger(__name__)
 
@@ -71,25 +73,35 @@ class TradeLogger:
     1. 記錄開倉時的完整特徵數據（技術指標、K線快照、信號特徵）
     2. 記錄平倉時的完整歷史數據（K線歷史、MFE/MAE、交易結果）
     3. 合併開倉/平倉數據生成完整的 ML 訓練樣本
-    4. 保存基本交易記錄和 ML 訓練數據到不同文件
-    5. 智能 Flush 機制：每 10 筆交易或 30 秒自動保存
+    4. 保存基本交易記錄和 ML 訓練數據到不同的追加式日誌（JSONL 分段，寫入只追加單條記錄）
+    5. 後台寫入線程：記錄經有界隊列交給 JournalWriter，批量編碼 / 寫入 / fsync，事件循環不做磁盤 I/O
     6. 數據完整性驗證：確保所有開倉都有對應的平倉
     7. 統計追蹤：記錄完整性、特徵覆蓋率等
     """
     
-    def __init__(self, log_file='trades.json', ml_file='ml_training_data.json', buffer_size=10, auto_flush_interval=30):
+    def __init__(self, log_file='trades.json', ml_file='ml_training_data.json', buffer_size=10, auto_flush_interval=30,
+                 segment_max_bytes=16 * 1024 * 1024, sync_interval=0.2, max_queue=10000):
         """
         初始化交易日誌記錄器
         
         Args:
-            log_file: 基本交易記錄文件
-            ml_file: ML 訓練數據文件
-            buffer_size: 緩衝區大小（多少條記錄後保存一次）
-            auto_flush_interval: 自動 flush 時間間隔（秒）
+            log_file: 基本交易記錄文件（日誌目錄為同名 .journal；舊的 JSON 文件首次啟動時導入）
+            ml_file: ML 訓練數據文件（同上）
+            buffer_size: 緩衝區大小（保留參數；寫入線程按批次 fsync）
+            auto_flush_interval: 自動 flush 時間間隔（保留參數；由 sync_interval 取代）
+            segment_max_bytes: 日誌分段大小上限（超過後切換到新分段）
+            sync_interval: 寫入線程一批記錄的收集時間（秒），即正常情況下的持久化延遲上限
+            max_queue: 寫入隊列上限（滿時溢出到無界列表，提交方不阻塞）
         """
         self.log_file = log_file
         self.ml_file = ml_file
         self.pending_entries_file = 'ml_pending_entries.json'
+        
+        # 追加式分段日誌：交易記錄（無鍵）、ML 樣本與待平倉開倉記錄（以 trade_id 為鍵）
+        self.trades_journal = TradeJournal(journal_path(log_file), segment_max_bytes)
+        self.ml_journal = TradeJournal(journal_path(ml_file), segment_max_bytes)
+        self.pending_journal = TradeJournal(journal_path(self.pending_entries_file), segment_max_bytes)
+        
         self.buffer_size = buffer_size
         self.auto_flush_interval = auto_flush_interval
         self.unsaved_count = 0
@@ -118,10 +130,11 @@ class TradeLogger:
         self.stats['incomplete_pairs'] = len(self.pending_entries)
         self.stats['complete_pairs'] = len(self.ml_data)
         
-        # 啟動自動 flush 線程
-        self._stop_auto_flush = threading.Event()
-        self._auto_flush_thread = threading.Thread(target=self._auto_flush_worker, daemon=True)
-        self._auto_flush_thread.start()
+        # 內存狀態（trades / ml_data / pending_entries / stats）鎖：開倉日誌可能在線程池中寫入
+        self._state_lock = threading.RLock()
+        
+        # 後台寫入線程：日誌的所有編碼、寫入與 fsync 都在這裡進行
+        self.writer = JournalWriter(max_queue=max_queue, sync_interval=sync_interval)
         
         # 註冊退出時強制 flush
         atexit.register(self._on_exit)
@@ -131,54 +144,58 @@ class TradeLogger:
             f"trades={len(self.trades)}, "
             f"ml_samples={len(self.ml_data)}, "
             f"pending_entries={len(self.pending_entries)}, "
-            f"auto_flush_interval={auto_flush_interval}s"
+            f"sync_interval={sync_interval}s"
         )
     
-    def _auto_flush_worker(self):
-        """自動 flush 工作線程 - 每 N 秒檢查並 flush"""
-        while not self._stop_auto_flush.is_set():
-            try:
-                time.sleep(self.auto_flush_interval)
-                
-                current_time = time.time()
-                time_since_last_flush = current_time - self.last_flush_time
-                
-                if time_since_last_flush >= self.auto_flush_interval:
-                    if self.unsaved_count > 0 or len(self.ml_data) > 0:
-                        logger.debug(f"Auto-flush triggered (interval: {self.auto_flush_interval}s)")
-                        self.flush()
-                
-            except Exception as e:
-                logger.error(f"Error in auto-flush worker: {e}")
-    
     def _on_exit(self):
         """程序退出時的清理函數"""
         logger.info("TradeLogger shutting down, flushing all data...")
-        self._stop_auto_flush.set()
         self.flush()
+        self.writer.close()
+        for journal in (self.trades_journal, self.ml_journal, self.pending_journal):
+            journal.close()
         logger.info("TradeLogger shutdown complete")
     
-    def load_trades(self) -> List[Dict]:
-        """加載現有交易記錄"""
-        if os.path.exists(self.log_file):
+    def _load_legacy_json(self, path: str, default):
+        """讀取舊版整檔 JSON（僅在對應日誌為空時用於導入）"""
+        if os.path.exists(path):
             try:
-                with open(self.log_file, 'r', encoding='utf-8') as f:
+                with open(path, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except Exception as e:
-                logger.error(f"Error loading trades: {e}")
-                return []
-        return []
+                logger.error(f"Error loading legacy {path}: {e}")
+        return default
+    
+    def load_trades(self) -> List[Dict]:
+        """加載現有交易記錄"""
+        try:
+            if not self.trades_journal.exists:
+                for trade in self._load_legacy_json(self.log_file, []):
+                    self.trades_journal.append(trade)
+                self.trades_journal.sync()
+            return self.trades_journal.values()
+        except Exception as e:
+            logger.error(f"Error loading trades: {e}")
+            return []
     
     def load_ml_data(self) -> List[Dict]:
         """加載現有 ML 訓練數據"""
-        if os.path.exists(self.ml_file):
-            try:
-                with open(self.ml_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"Error loading ML data: {e}")
-                return []
-        return []
+        try:
+            if not self.ml_journal.exists:
+                for sample in self._load_legacy_json(self.ml_file, []):
+                    self._append_ml_sample(sample)
+                self.ml_journal.sync()
+            return self.ml_journal.values()
+        except Exception as e:
+            logger.error(f"Error loading ML data: {e}")
+            return []
+    
+    def _append_ml_sample(self, sample: Dict):
+        """導入時直接追加一條 ML 樣本到日誌（有 trade_id 時建立索引；寫入線程啟動前調用）"""
+        if sample.get('trade_id'):
+            self.ml_journal.put(sample['trade_id'], sample)
+        else:
+            self.ml_journal.append(sample)
     
     def load_pending_entries(self) -> Dict[str, Dict]:
         """
@@ -189,48 +206,44 @@ class TradeLogger:
         Returns:
             待處理的開倉記錄字典
         """
-        if os.path.exists(self.pending_entries_file):
-            try:
-                with open(self.pending_entries_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    logger.info(f"Loaded {len(data)} pending entries from {self.pending_entries_file}")
-                    return data
-            except Exception as e:
-                logger.error(f"Error loading pending entries: {e}")
-                return {}
-        return {}
+        try:
+            if not self.pending_journal.exists:
+                for trade_id, entry in self._load_legacy_json(self.pending_entries_file, {}).items():
+                    self.pending_journal.put(trade_id, entry)
+                self.pending_journal.sync()
+            data = self.pending_journal.items()
+            logger.info(f"Loaded {len(data)} pending entries from {self.pending_journal.directory}")
+            return data
+        except Exception as e:
+            logger.error(f"Error loading pending entries: {e}")
+            return {}
+    
+    def _wait_durable(self, what: str) -> bool:
+        """阻塞直到寫入線程把已提交的記錄 fsync（僅供 flush / 關閉路徑，不在事件循環熱路徑調用）"""
+        if self.writer.flush():
+            return True
+        logger.error(f"Timed out waiting for journal writer to persist {what} (lag {self.writer.durability_lag():.1f}s)")
+        return False
     
     def save_pending_entries(self):
         """
-        保存待處理的開倉記錄到文件
+        等待待處理開倉記錄落盤
         
-        確保重啟後不會丟失待處理的開倉記錄
+        記錄本身在開倉 / 平倉時已提交給寫入線程（put / delete），壓縮也由寫入線程在 fsync 後進行
         """
-        try:
-            with open(self.pending_entries_file, 'w', encoding='utf-8') as f:
-                json.dump(self.pending_entries, f, indent=2, ensure_ascii=False)
-            logger.debug(f"Saved {len(self.pending_entries)} pending entries to {self.pending_entries_file}")
-        except Exception as e:
-            logger.error(f"Error saving pending entries: {e}")
+        if self._wait_durable('pending entries'):
+            logger.debug(f"Persisted {len(self.pending_entries)} pending entries to {self.pending_journal.directory}")
     
     def save_trades(self):
-        """保存交易記錄到文件"""
-        try:
-            with open(self.log_file, 'w', encoding='utf-8') as f:
-                json.dump(self.trades, f, indent=2, ensure_ascii=False)
-            logger.info(f"Saved {len(self.trades)} trades to {self.log_file}")
+        """等待交易記錄落盤（記錄已在 log_trade 時提交）"""
+        if self._wait_durable('trades'):
+            logger.info(f"Persisted {self.unsaved_count} new trades to {self.trades_journal.directory} (total {len(self.trades)})")
             self.unsaved_count = 0
-        except Exception as e:
-            logger.error(f"Error saving trades: {e}")
     
     def save_ml_data(self):
-        """保存 ML 訓練數據到單獨文件"""
-        try:
-            with open(self.ml_file, 'w', encoding='utf-8') as f:
-                json.dump(self.ml_data, f, indent=2, ensure_ascii=False)
-            logger.info(f"✅ Saved {len(self.ml_data)} ML training samples to {self.ml_file}")
-        except Exception as e:
-            logger.error(f"Error saving ML data: {e}")
+        """等待 ML 訓練數據落盤（樣本已在平倉時提交）"""
+        if self._wait_durable('ML data'):
+            logger.info(f"✅ Persisted {len(self.ml_data)} ML training samples to {self.ml_journal.directory}")
     
     def validate_entry_data(self, trade_data: Dict) -> tuple[bool, List[str]]:
         """
@@ -419,6 +432,7 @@ class TradeLogger:
                 'margin': self._safe_float(trade_data.get('margin'), 0.0),
                 'margin_percent': self._safe_float(trade_data.get('margin_percent'), 0.0),
                 'is_virtual': is_virtual,
+                'latency_trace': trade_data.get('latency_trace'),  # 信號到受保護倉位的階段延遲（ms）
                 
                 # ICT/SMC 信號特徵
                 'signal_features': {
@@ -471,24 +485,20 @@ class TradeLogger:
             coverage = self.calculate_feature_coverage(entry_record)
             self.stats['feature_coverage'] = coverage
             
-            # 暫存開倉數據，等待平倉後合併
-            self.pending_entries[trade_id] = entry_record
-            
-            # 更新統計
-            self.stats['total_entries'] += 1
-            self.stats['incomplete_pairs'] = len(self.pending_entries)
-            
-            # 立即持久化到文件，避免進程重啟導致孤立交易
-            self.save_pending_entries()
+            # 暫存開倉數據，等待平倉後合併；同時交給寫入線程持久化（避免進程重啟導致孤立交易）
+            with self._state_lock:
+                self.pending_entries[trade_id] = entry_record
+                self.writer.submit(self.pending_journal, 'put', trade_id, entry_record)
+                
+                # 更新統計
+                self.stats['total_entries'] += 1
+                self.stats['incomplete_pairs'] = len(self.pending_entries)
             
             logger.info(
                 f"📥 Logged position entry: {trade_id} ({trade_data.get('symbol', 'UNKNOWN')} {trade_data.get('side', 'BUY')}), "
                 f"feature_coverage: {coverage}"
             )
             
-            # 檢查是否需要 flush（每 buffer_size 條記錄）
-            self._check_and_flush()
-            
             return trade_id
             
         except Exception as e:
@@ -512,6 +522,7 @@ class TradeLogger:
                 - entry_time: 開倉時間（用於獲取 K 線歷史）
                 - exit_time: 平倉時間
                 - metadata: 平倉時的技術指標
+                - excursion: 運行中的 MFE/MAE 摘要（可選；提供時不再獲取 K 線歷史）
             binance_client: Binance 客戶端（用於獲取 K 線歷史）
             timeframe: 時間框架
             is_virtual: 是否為虛擬倉位（默認 False）
@@ -535,7 +546,7 @@ class TradeLogger:
                 self.stats['incomplete_pairs'] += 1
                 entry_record = None
             else:
-                entry_record = self.pending_entries[trade_id]
+                entry_record = self.pending_entries.get(trade_id)
             
             # 驗證並解析時間戳
             entry_time = trade_data.get('entry_time')
@@ -560,9 +571,12 @@ class TradeLogger:
             if exit_time is None:
                 exit_time = datetime.utcnow()
             
-            # 獲取從開倉到平倉的完整 K 線歷史
+            # 持倉期間的運行中 MFE/MAE（ExcursionTracker.summary）：有則直接使用，無需 REST 查詢
+            excursion = trade_data.get('excursion')
+            
+            # 獲取從開倉到平倉的完整 K 線歷史（無運行中追蹤時的降級路徑，最多 1000 根）
             kline_history = []
-            if binance_client and entry_record and entry_time:
+            if excursion is None and binance_client and entry_record and entry_time:
                 try:
                     kline_history = self._fetch_kline_history(
                         binance_client,
@@ -578,11 +592,15 @@ class TradeLogger:
             entry_price = self._safe_float(entry_record.get('entry_price')) if entry_record else self._safe_float(trade_data.get('entry_price'), 0)
             entry_side = entry_record.get('side') if entry_record else trade_data.get('side', 'BUY')
             
-            mfe, mae = self._calculate_mfe_mae(
-                kline_history,
-                entry_price,
-                entry_side
-            )
+            if excursion is not None:
+                mfe = excursion.get('max_favorable_excursion', 0.0)
+                mae = excursion.get('max_adverse_excursion', 0.0)
+            else:
+                mfe, mae = self._calculate_mfe_mae(
+                    kline_history,
+                    entry_price,
+                    entry_side
+                )
             
             # 從 metadata 中提取平倉時的技術指標
             exit_metadata = trade_data.get('metadata', {})
@@ -601,6 +619,9 @@ class TradeLogger:
                 # 從開倉到平倉的完整 K 線歷史
                 'kline_history': kline_history,
                 
+                # 持倉期間的高低點 / 路徑長度（運行中追蹤）
+                'excursion': excursion,
+                
                 # 平倉時的技術指標
                 'exit_features': {
                     'macd': self._safe_float(exit_metadata.get('macd')),
@@ -625,30 +646,28 @@ class TradeLogger:
             }
             
             # 更新統計
-            self.stats['total_exits'] += 1
+            with self._state_lock:
+                self.stats['total_exits'] += 1
             
             # 如果有對應的開倉記錄，合併生成完整的 ML 訓練樣本
             if entry_record:
                 ml_sample = self._merge_entry_exit_data(entry_record, exit_record)
-                self.ml_data.append(ml_sample)
-                
-                # 從暫存中移除
-                del self.pending_entries[trade_id]
-                
-                # 更新統計
-                self.stats['complete_pairs'] += 1
-                self.stats['incomplete_pairs'] = len(self.pending_entries)
-                
-                # 立即持久化 pending_entries（刪除已完成的條目）
-                self.save_pending_entries()
+                with self._state_lock:
+                    self.ml_data.append(ml_sample)
+                    self.writer.submit(self.ml_journal, 'put', trade_id, ml_sample)
+                    
+                    # 從暫存中移除（寫入線程隨後記錄刪除）
+                    self.pending_entries.pop(trade_id, None)
+                    self.writer.submit(self.pending_journal, 'delete', trade_id)
+                    
+                    # 更新統計
+                    self.stats['complete_pairs'] += 1
+                    self.stats['incomplete_pairs'] = len(self.pending_entries)
                 
                 logger.info(
                     f"✅ Logged position exit and created ML sample: {trade_id} "
                     f"(PnL: {trade_data.get('pnl_percent', 0):.2f}%, MFE: {mfe:.2f}%, MAE: {mae:.2f}%)"
                 )
-                
-                # 檢查是否需要 flush
-                self._check_and_flush()
             else:
                 logger.warning(f"⚠️  No entry record for {trade_id}, ML sample not created - incomplete pair!")
             
@@ -656,13 +675,6 @@ class TradeLogger:
             logger.error(f"Error logging position exit: {e}")
             logger.exception(e)
     
-    def _check_and_flush(self):
-        """檢查並在需要時執行 flush"""
-        # 計數觸發
-        if self.stats['total_entries'] % self.buffer_size == 0:
-            logger.debug(f"Count-based flush triggered (every {self.buffer_size} entries)")
-            self.flush()
-    
     def log_trade(self, trade_data: Dict):
         """
         記錄交易（保持向後兼容）
@@ -684,12 +696,13 @@ class TradeLogger:
             'reason': trade_data.get('reason'),
             'strategy': trade_data.get('strategy')
         }
+        if trade_data.get('latency_trace'):
+            trade_entry['latency_trace'] = trade_data['latency_trace']  # 信號到受保護倉位的階段延遲
         
-        self.trades.append(trade_entry)
-        self.unsaved_count += 1
-        
-        if self.unsaved_count >= self.buffer_size or trade_data.get('type') == 'CLOSE':
-            self.save_trades()
+        with self._state_lock:
+            self.trades.append(trade_entry)
+            self.writer.submit(self.trades_journal, 'append', value=trade_entry)
+            self.unsaved_count += 1
         
         logger.info(f"Logged trade: {trade_data.get('symbol')} {trade_data.get('type')}")
     
@@ -702,7 +715,10 @@ class TradeLogger:
         """
         incomplete = []
         
-        for trade_id, entry_record in self.pending_entries.items():
+        with self._state_lock:
+            pending = list(self.pending_entries.items())
+        
+        for trade_id, entry_record in pending:
             incomplete.append({
                 'trade_id': trade_id,
                 'symbol': entry_record.get('symbol'),
@@ -1039,15 +1055,9 @@ class TradeLogger:
         if incomplete:
             logger.warning(f"⚠️  Warning: {len(incomplete)} incomplete trade pairs will be persisted")
         
-        # 保存所有數據
-        if self.unsaved_count > 0:
-            self.save_trades()
-        
-        if len(self.ml_data) > 0:
-            self.save_ml_data()
-        
-        # 保存待處理的開倉記錄
-        self.save_pending_entries()
+        # 等待寫入線程把所有已提交的記錄（交易 / ML 樣本 / 待處理開倉）fsync
+        if self._wait_durable('all journals'):
+            self.unsaved_count = 0
         
         # 更新統計
         self.stats['total_flushes'] += 1
@@ -1096,7 +1106,9 @@ class TradeLogger:
                 'validation_errors': self.stats['validation_errors'],
                 'total_flushes': self.stats['total_flushes'],
                 'last_flush': self.stats.get('last_flush_timestamp', 'Never')
-            }
+            },
+            # 後台寫入線程：隊列深度、批次 / fsync 次數、持久化延遲
+            'persistence': self.writer.get_stats()
         }
     
     def get_ml_statistics(self) -> Dict:
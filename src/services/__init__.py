@@ -19,9 +19,42 @@ except ImportError:
     ExecutionService = None
     Position = None
 
+try:
+    from .order_gateway import OrderGateway
+except ImportError:
+    OrderGateway = None
+
+try:
+    from .user_data_stream import AccountModel, UserDataStream
+except ImportError:
+    AccountModel = None
+    UserDataStream = None
+
+try:
+    from .analysis_snapshot import AnalysisSnapshot
+except ImportError:
+    AnalysisSnapshot = None
+
+try:
+    from .excursion_tracker import ExcursionTracker
+except ImportError:
+    ExcursionTracker = None
+
+try:
+    from .signal_queue import SignalQueue
+except ImportError:
+    SignalQueue = None
+
+try:
+    from .signal_trace import SignalTrace
+except ImportError:
+    SignalTrace = None
+
 try:
     from .monitoring_service import MonitoringService
 except ImportError:
     MonitoringService = None
 
-__all__ = ['DataService', 'StrategyEngine', 'ExecutionService', 'MonitoringService', 'Signal', 'Position']
+__all__ = ['DataService', 'StrategyEngine', 'ExecutionService', 'OrderGateway', 'AccountModel', 'UserDataStream',
+           'MonitoringService', 'Signal', 'Position', 'SignalTrace', 'SignalQueue',
+           'AnalysisSnapshot', 'ExcursionTracker']
@@ -0,0 +1,79 @@
+"""
+Analysis Snapshot - The cycle's per-symbol analysis, shared by every consumer.
+
+Responsibilities:
+- Hold each scanned symbol's indicator frame, last price, market structure
+  and signal (None when the symbol produced no signal)
+- Serve position monitoring, signal validation, exit-feature capture and
+  post-close rescans, so an open position never refetches klines or
+  recomputes indicators / strategies for a candle the scan already analysed
+
+A snapshot older than max_age_seconds is treated as missing and callers
+fall back to fetching.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from src.utils.helpers import get_market_structure_change
+
+# 平倉特徵（ML 記錄）取自指標幀最後一行的欄位
+EXIT_FEATURE_COLUMNS = ('macd', 'macd_signal', 'ema_9', 'ema_21', 'ema_50', 'ema_200', 'atr', 'rsi')
+
+
+@dataclass
+class SymbolAnalysis:
+    """One symbol's result of the cycle scan."""
+    symbol: str
+    frame: pd.DataFrame          # K 線 + 技術指標
+    price: float                 # 掃描時的最新價（最後一根 K 線收盤）
+    structure: str               # 市場結構：bullish / bearish / neutral
+    signal: Optional[Any] = None
+    scanned_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class AnalysisSnapshot:
+    """Per-cycle analysis results keyed by symbol."""
+    cycle: int = 0
+    max_age_seconds: float = 30.0
+    symbols: Dict[str, SymbolAnalysis] = field(default_factory=dict)
+
+    def add(self, symbols_data: Dict[str, tuple], signals):
+        """Record a scanned batch: symbols_data {symbol: (frame, price)} and its signals."""
+        by_symbol = {signal.symbol: signal for signal in signals}
+        for symbol, (frame, price) in symbols_data.items():
+            signal = by_symbol.get(symbol)
+            structure = (signal.metadata.get('market_structure') if signal else None) \
+                or get_market_structure_change(frame)
+            self.symbols[symbol] = SymbolAnalysis(symbol, frame, price, structure, signal)
+
+    def get(self, symbol: str) -> Optional[SymbolAnalysis]:
+        """The symbol's analysis, or None if it was not scanned or is older than max_age_seconds."""
+        analysis = self.symbols.get(symbol)
+        if analysis is None or time.monotonic() - analysis.scanned_at > self.max_age_seconds:
+            return None
+        return analysis
+
+    def exit_features(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Indicator values of the last candle (for the exit record), or None."""
+        analysis = self.get(symbol)
+        if analysis is None or analysis.frame is None or analysis.frame.empty:
+            return None
+        return features_from_frame(analysis.frame)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+
+def features_from_frame(frame: pd.DataFrame) -> Dict[str, Any]:
+    """EXIT_FEATURE_COLUMNS from the last row of an indicator frame (missing columns → None)."""
+    latest = frame.iloc[-1]
+    features = {}
+    for column in EXIT_FEATURE_COLUMNS:
+        value = latest.get(column)
+        features[column] = float(value) if value is not None and pd.notna(value) else None
+    return features
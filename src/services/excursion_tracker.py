@@ -0,0 +1,126 @@
+"""
+Excursion Tracker - Running MFE / MAE of an open (real or virtual) position.
+
+Responsibilities:
+- Keep the high / low seen since entry, the path length (sum of absolute
+  price moves) and the number of prices / candles observed
+- Take updates from monitoring prices and from the scanned kline frames as
+  candles arrive (only candles opened at or after entry, as the exit-time
+  kline history did)
+- Give the exit record MFE / MAE in O(1), exact however long the trade is
+
+MFE / MAE are computed against the entry price at read time, so a fill that
+corrects the entry price does not invalidate what was tracked.
+"""
+
+import math
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class ExcursionTracker:
+    """High / low / path since entry of one position."""
+    side: str                          # 'BUY' / 'SELL'（亦接受 'LONG' / 'SHORT'）
+    since: float                       # 開倉時間（epoch 秒）
+    high: Optional[float] = None
+    low: Optional[float] = None
+    last_price: Optional[float] = None
+    path_length: float = 0.0           # 價格路徑長度：相鄰觀測價差絕對值之和
+    observations: int = 0
+    candles: int = 0
+    last_candle_ns: Optional[int] = None  # 已處理的最後一根 K 線開盤時間（ns）
+
+    @classmethod
+    def open(cls, side: str, opened_at: datetime, entry_price: Optional[float] = None) -> 'ExcursionTracker':
+        """Start tracking at entry (naive opened_at is local time, as datetime.now())."""
+        tracker = cls(side=side, since=opened_at.timestamp())
+        if entry_price:
+            tracker.update_price(entry_price)
+        return tracker
+
+    @classmethod
+    def open_utc(cls, side: str, opened_at_iso: str, entry_price: Optional[float] = None) -> 'ExcursionTracker':
+        """Start tracking from a naive UTC ISO timestamp (datetime.utcnow().isoformat())."""
+        opened_at = datetime.fromisoformat(opened_at_iso)
+        if opened_at.tzinfo is None:
+            opened_at = opened_at.replace(tzinfo=timezone.utc)
+        return cls.open(side, opened_at, entry_price)
+
+    def update_price(self, price: float):
+        """Record an observed price (ticker, fill, exit)."""
+        if not price or not math.isfinite(price):
+            return
+        self._extend(price, price)
+        if self.last_price is not None:
+            self.path_length += abs(price - self.last_price)
+        self.last_price = price
+        self.observations += 1
+
+    def update_frame(self, frame: Optional[pd.DataFrame]):
+        """
+        Record the candles of a kline frame that opened since entry.
+
+        Only candles from the last processed one on are read (the last one
+        again, since it may have grown), so each call costs O(new candles).
+        """
+        if frame is None or frame.empty or 'timestamp' not in frame:
+            return
+        opened_ns = frame['timestamp'].values.astype('datetime64[ns]').astype(np.int64)
+        floor_ns = int(self.since * 1e9) if self.last_candle_ns is None else self.last_candle_ns
+        start = int(np.searchsorted(opened_ns, floor_ns, side='left'))
+        if start >= len(frame):
+            return
+        highs = frame['high'].values[start:]
+        lows = frame['low'].values[start:]
+        closes = frame['close'].values[start:]
+        for i in range(len(highs)):
+            candle_ns = int(opened_ns[start + i])
+            if candle_ns != self.last_candle_ns:
+                self.candles += 1
+                self.last_candle_ns = candle_ns
+            self._extend(float(highs[i]), float(lows[i]))
+            self.update_price(float(closes[i]))
+
+    def _extend(self, high: float, low: float):
+        if math.isfinite(high) and high > 0:
+            self.high = high if self.high is None else max(self.high, high)
+        if math.isfinite(low) and low > 0:
+            self.low = low if self.low is None else min(self.low, low)
+
+    def mfe_mae(self, entry_price: float) -> tuple:
+        """(mfe_percent, mae_percent) against entry_price, same convention as the kline-history calculation."""
+        if not entry_price or self.high is None or self.low is None:
+            return (0.0, 0.0)
+        if self.side in ('BUY', 'LONG'):
+            favorable = (self.high - entry_price) / entry_price * 100
+            adverse = (self.low - entry_price) / entry_price * 100
+        else:
+            favorable = (entry_price - self.low) / entry_price * 100
+            adverse = (entry_price - self.high) / entry_price * 100
+        return (max(favorable, 0.0), min(adverse, 0.0))
+
+    def summary(self, entry_price: float) -> Dict[str, Any]:
+        """Exit-record form: MFE / MAE plus the raw running values."""
+        mfe, mae = self.mfe_mae(entry_price)
+        return {
+            'max_favorable_excursion': mfe,
+            'max_adverse_excursion': mae,
+            'high': self.high,
+            'low': self.low,
+            'path_length': self.path_length,
+            'path_length_pct': self.path_length / entry_price * 100 if entry_price else 0.0,
+            'observations': self.observations,
+            'candles': self.candles
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional['ExcursionTracker']:
+        return cls(**data) if data else None
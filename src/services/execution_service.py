@@ -9,11 +9,19 @@ Responsibilities:
 """
 
 import asyncio
-from typing import List, Dict, Optional, Any
+import time
+from typing import List, Dict, Optional, Any, Set
 from dataclasses import dataclass
 import logging
 from datetime import datetime
 
+from src.config import Config
+from src.services.order_gateway import OrderGateway, PreparedOrder
+from src.services.signal_trace import SignalTrace
+from src.services.analysis_snapshot import features_from_frame
+from src.services.excursion_tracker import ExcursionTracker
+from src.utils.indicators import TechnicalIndicators
+
 logger = logging.getLogger(__name__)
 
 
@@ -32,12 +40,22 @@ class Position:
     allocated_capital: float
     leverage: float = 1.0
     trade_id: Optional[str] = None  # 用於關聯開倉和平倉的 ML 數據
+    entry_order_id: Optional[int] = None        # 入場單（成交回報更新實際均價）
+    stop_loss_order_id: Optional[int] = None    # 交易所止損單（動態調整時撤換）
+    take_profit_order_id: Optional[int] = None  # 交易所止盈單
+    trace: Optional[SignalTrace] = None         # 信號到受保護倉位的階段時間線
+    excursion: Optional[ExcursionTracker] = None  # 持倉期間運行中的 MFE/MAE（平倉記錄直接使用）
+    
+    def __post_init__(self):
+        if self.excursion is None:
+            self.excursion = ExcursionTracker.open(self.action, self.opened_at, self.entry_price)
 
 
 class ExecutionService:
     """Service for executing and managing trades."""
     
-    def __init__(self, binance_client, risk_manager, discord_bot=None, enable_trading: bool = False, trade_logger=None):
+    def __init__(self, binance_client, risk_manager, discord_bot=None, enable_trading: bool = False, trade_logger=None,
+                 paper_trading: bool = False):
         """
         Initialize execution service.
         
@@ -47,15 +65,29 @@ class ExecutionService:
             discord_bot: Discord bot for notifications
             enable_trading: Enable live trading
             trade_logger: Trade logger for ML training data
+            paper_trading: Orders go to a simulated exchange (PaperExchange)
         """
         self.binance = binance_client
         self.risk_manager = risk_manager
         self.discord = discord_bot
-        self.enable_trading = enable_trading
+        self.enable_trading = enable_trading or paper_trading  # 是否向交易所（真實或模擬）下單
+        self.paper_trading = paper_trading
         self.trade_logger = trade_logger
+        self.gateway = OrderGateway(binance_client)  # 異步下單（入場與止損/止盈批量提交）
         
         self.positions: Dict[str, Position] = {}
-        self.max_positions = 3
+        self.max_positions = Config.MAX_CONCURRENT_POSITIONS
+        
+        # 並發入場：下單期間預留的倉位名額（與 positions 合計不超過 max_positions）
+        self.reserved_slots: Set[str] = set()
+        self._slot_lock = asyncio.Lock()
+        # 入場下單期間到達的成交回報（批次響應之前推送的 FILLED 事件），倉位記錄建立後重放
+        self._early_fills: Dict[str, List[Dict[str, Any]]] = {}
+        
+        # 入場後的後台副作用（交易日誌、通知）；日誌寫入串行化
+        self._background_tasks: Set[asyncio.Task] = set()
+        self._entry_records: Dict[str, asyncio.Task] = {}
+        self._log_lock = asyncio.Lock()
         
         # Callback for position closed event (平倉後立即重新掃描)
         self.on_position_closed_callback = None
@@ -63,8 +95,15 @@ class ExecutionService:
         # Strategy engine reference (will be set externally for signal validation)
         self.strategy_engine = None
         self.data_service = None
+        self.monitoring_service = None  # 記錄每個倉位檢查耗時（外部設置）
+        self.account_model = None  # 用戶數據流賬戶模型（外部設置；未連接時回退 REST）
+        self.analysis_snapshot = None  # 本週期的分析快照（外部設置；驗證 / 監控 / 平倉特徵共用）
         self.timeframe = '15m'  # Will be set from Config.TIMEFRAME
         
+        # 倉位監控並發度與單倉位期限
+        self.monitor_concurrency = Config.POSITION_MONITOR_CONCURRENCY
+        self.monitor_timeout = Config.POSITION_MONITOR_TIMEOUT
+        
         # Statistics
         self.stats = {
             'total_signals_received': 0,
@@ -74,38 +113,41 @@ class ExecutionService:
             'stop_losses_hit': 0,
             'take_profits_hit': 0,
             'signal_invalidation_exits': 0,
-            'dynamic_adjustments': 0
+            'dynamic_adjustments': 0,
+            'monitor_timeouts': 0,
+            'monitor_errors': 0
         }
         
         logger.info(
             f"ExecutionService initialized: "
-            f"trading={'ENABLED' if enable_trading else 'DISABLED'}, "
+            f"trading={'PAPER' if paper_trading else 'ENABLED' if enable_trading else 'DISABLED'}, "
             f"max_positions={self.max_positions}"
         )
     
-    async def execute_signal(self, signal) -> bool:
+    @property
+    def mode(self) -> str:
+        """Trade-log mode label: LIVE / PAPER / SIMULATION."""
+        if not self.enable_trading:
+            return 'SIMULATION'
+        return 'PAPER' if self.paper_trading else 'LIVE'
+    
+    async def prepare_signal(self, signal) -> Optional[PreparedOrder]:
         """
-        Execute a trading signal.
+        Pre-trade preparation, run while signals are ranked.
+        
+        Sizes the position and resolves filters, rounding, notional and margin
+        from in-memory metadata and the signal's price, so execute_signal only
+        has to submit. The result is stored on signal.prepared.
         
         Args:
             signal: Signal object from strategy engine
             
         Returns:
-            True if executed, False if rejected
+            PreparedOrder, or None if the signal cannot be traded
         """
-        self.stats['total_signals_received'] += 1
-        
-        # Check if we can open new position
-        if len(self.positions) >= self.max_positions:
-            logger.info(f"Max positions reached ({self.max_positions}), rejecting {signal.symbol}")
-            self.stats['trades_rejected'] += 1
-            return False
-        
-        # Check if already have position in this symbol
-        if signal.symbol in self.positions:
-            logger.info(f"Already have position in {signal.symbol}, rejecting")
-            self.stats['trades_rejected'] += 1
-            return False
+        if getattr(signal, 'trace', None) is None:
+            signal.trace = SignalTrace()
+        signal.prepared = None
         
         # 計算動態槓桿（基於勝率或信心度）
         atr = signal.metadata.get('atr', 0)
@@ -127,23 +169,120 @@ class ExecutionService:
         
         if not position_params:
             logger.warning(f"Risk check failed for {signal.symbol}")
+            return None
+        
+        if self.enable_trading:
+            prepared = await self.gateway.prepare(
+                signal.symbol,
+                signal.action,
+                position_params['quantity'],
+                signal.stop_loss,
+                signal.take_profit,
+                signal.price,  # 本週期價格（限價單價格與名義價值驗證）
+                leverage=position_params['leverage'],
+                available_margin=self._available_margin()
+            )
+            if prepared is None:
+                return None
+        else:
+            # 模擬模式不下單：沿用風控計算的原始數量
+            prepared = PreparedOrder(
+                symbol=signal.symbol,
+                action=signal.action,
+                quantity=position_params['quantity'],
+                entry={},
+                protection=[],
+                notional=position_params['position_value'],
+                margin=position_params['margin']
+            )
+        prepared.sizing = position_params
+        signal.trace.mark('risk_sized')
+        signal.prepared = prepared
+        return prepared
+    
+    def _available_margin(self) -> Optional[float]:
+        """可用保證金估算：錢包餘額（用戶數據流模型，否則 RiskManager）減去已開倉位佔用的保證金"""
+        balance = None
+        if self.account_model is not None and self.account_model.ready:
+            balance = self.account_model.get_futures_balance()
+        if balance is None:
+            balance = getattr(self.risk_manager, 'account_balance', None)
+        if balance is None:
+            return None
+        return balance - sum(position.allocated_capital for position in self.positions.values())
+    
+    async def execute_signal(self, signal) -> bool:
+        """
+        Execute a trading signal.
+        
+        Args:
+            signal: Signal object from strategy engine
+            
+        Returns:
+            True if executed, False if rejected
+        """
+        self.stats['total_signals_received'] += 1
+        
+        # 原子地預留倉位名額：並發執行的信號不會超過 max_positions
+        if not await self._reserve_slot(signal.symbol):
+            self.stats['trades_rejected'] += 1
+            return False
+        
+        try:
+            return await self._execute_reserved(signal)
+        finally:
+            self.reserved_slots.discard(signal.symbol)
+            self._early_fills.pop(signal.symbol, None)
+    
+    async def _reserve_slot(self, symbol: str) -> bool:
+        """Reserve a position slot for symbol (False if full or the symbol is already open / in flight)."""
+        async with self._slot_lock:
+            # Check if we can open new position
+            if len(self.positions) + len(self.reserved_slots) >= self.max_positions:
+                logger.info(f"Max positions reached ({self.max_positions}), rejecting {symbol}")
+                return False
+            
+            # Check if already have position in this symbol
+            if symbol in self.positions or symbol in self.reserved_slots:
+                logger.info(f"Already have position in {symbol}, rejecting")
+                return False
+            
+            self.reserved_slots.add(symbol)
+            return True
+    
+    async def _execute_reserved(self, signal) -> bool:
+        """Place and record the position for a signal whose slot is reserved."""
+        # 下單參數通常已在排名階段預備好；過期或缺失時在此預備
+        prepared = getattr(signal, 'prepared', None)
+        if prepared is None or prepared.age() > Config.PRETRADE_MAX_AGE_SECONDS:
+            prepared = await self.prepare_signal(signal)
+        if prepared is None:
             self.stats['trades_rejected'] += 1
             return False
+        position_params = prepared.sizing
+        trace = signal.trace
         
         # Execute trade
+        entry_price = signal.price
+        quantity = position_params['quantity']
+        placed = None
         if self.enable_trading:
             try:
-                # Place order (MARKET or LIMIT based on config)
-                order = await self._place_order(
-                    signal.symbol,
-                    signal.action,
-                    position_params['quantity'],
-                    signal.price  # Pass entry price for limit order calculation
-                )
+                # 入場單（MARKET 或 LIMIT）與止損/止盈單一次提交
+                placed = await self.gateway.submit(prepared, trace=trace)
+                order = placed['entry']
                 
                 if not order:
                     self.stats['trades_rejected'] += 1
                     return False
+                
+                # 已成交的訂單以實際成交均價記錄；數量以交易所格式化後為準
+                entry_price = float(order.get('avgPrice') or 0) or signal.price
+                quantity = placed['quantity']
+                logger.info(
+                    f"✅ Order placed successfully: {order.get('orderId', 'N/A')} "
+                    f"(protected in {placed['seconds'] * 1000:.0f}ms)"
+                )
                     
             except Exception as e:
                 logger.error(f"Error placing order for {signal.symbol}: {e}")
@@ -154,15 +293,17 @@ class ExecutionService:
         position = Position(
             symbol=signal.symbol,
             action=signal.action,
-            entry_price=signal.price,
-            quantity=position_params['quantity'],
+            entry_price=entry_price,
+            quantity=quantity,
             stop_loss=signal.stop_loss,
             take_profit=signal.take_profit,
             opened_at=datetime.now(),
             strategy=signal.strategy,
             confidence=signal.confidence,
             allocated_capital=position_params['margin'],  # 保證金
-            leverage=position_params['leverage']
+            leverage=position_params['leverage'],
+            entry_order_id=placed['entry'].get('orderId') if placed else None,
+            trace=trace
         )
         
         # Add to risk manager
@@ -186,61 +327,97 @@ class ExecutionService:
             f"(confidence: {signal.confidence:.1f}%)"
         )
         
-        # 🔒 設置交易所級別的止損/止盈訂單（關鍵安全功能）
-        if self.enable_trading:
-            await self._set_stop_loss_take_profit(position)
+        # 🔒 交易所級別的止損/止盈訂單已隨入場提交（關鍵安全功能）
+        if placed:
+            await self._record_protection(position, placed['stop_loss'], placed['take_profit'])
         
-        # 📊 記錄開倉數據供 XGBoost 學習
+        # 批次響應之前已推送的成交（入場 FILLED / 已觸發的止損止盈）：訂單號已知，現在應用
+        for early in self._early_fills.pop(signal.symbol, []):
+            self.on_order_update(early)
+        if self.monitoring_service:
+            self.monitoring_service.record_trace(trace, signal.symbol)
+        
+        # 📊 交易日誌（含 K 線快照）與 Discord 通知在後台完成，不阻塞其他信號入場
+        self._entry_records[signal.symbol] = self._spawn(
+            self._record_entry(signal, position, position_params)
+        )
+        
+        return True
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Run a side effect in the background (reference kept until done, errors logged)."""
+        task = asyncio.get_event_loop().create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_done)
+        return task
+    
+    def _background_done(self, task: asyncio.Task):
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Background task failed: {task.exception()}")
+    
+    async def flush_background(self):
+        """Wait for pending trade-log / notification tasks (shutdown)."""
+        if self._background_tasks:
+            await asyncio.gather(*list(self._background_tasks), return_exceptions=True)
+    
+    async def _record_entry(self, signal, position: Position, position_params: Dict):
+        """Entry side effects (trade log, Discord), run as a background task after the position is open."""
         if self.trade_logger:
-            trade_data = {
-                'type': 'OPEN',
-                'symbol': signal.symbol,
-                'side': signal.action,
-                'entry_price': signal.price,
-                'quantity': position_params['quantity'],
-                'stop_loss': signal.stop_loss,
-                'take_profit': signal.take_profit,
-                'leverage': position_params['leverage'],
-                'confidence': signal.confidence,
-                'expected_roi': signal.expected_roi,
-                'strategy': signal.strategy,
-                'reason': signal.reason,
-                # 技術指標 (供 XGBoost 學習)
-                'metadata': signal.metadata,  # 包含 MACD, EMA, ATR, structure 等
-                'margin': position_params['margin'],
-                'margin_percent': position_params['margin_percent'],
-                'position_value': position_params['position_value'],
-                'mode': 'LIVE' if self.enable_trading else 'SIMULATION'
-            }
-            # 保持向後兼容的簡單記錄
-            self.trade_logger.log_trade(trade_data)
-            
-            # 新增：記錄詳細的 ML 訓練數據（開倉）
-            try:
-                trade_id = self.trade_logger.log_position_entry(
-                    trade_data=trade_data,
-                    binance_client=self.binance,
-                    timeframe=self.timeframe
-                )
-                # 修復問題 2.4：處理 trade_id 缺失情況
-                if trade_id:
-                    position.trade_id = trade_id
-                    logger.debug(f"Assigned trade_id {trade_id} to position {signal.symbol}")
-                else:
-                    # 降級處理：生成臨時 trade_id（避免平倉時無法記錄）
-                    position.trade_id = f"{signal.symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_fallback"
-                    logger.warning(f"log_position_entry failed, using fallback trade_id: {position.trade_id}")
-            except Exception as e:
-                logger.error(f"Failed to log position entry for ML: {e}")
-                logger.exception(e)
-                # 即使失敗，也生成一個降級的 trade_id
-                position.trade_id = f"{signal.symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_error"
+            loop = asyncio.get_event_loop()
+            async with self._log_lock:
+                await loop.run_in_executor(None, self._log_entry, signal, position, position_params)
         
         # Send Discord notification for new position
         if self.discord:
             await self._notify_position_opened(position, position_params)
+    
+    def _log_entry(self, signal, position: Position, position_params: Dict):
+        """記錄開倉數據供 XGBoost 學習（K 線快照為同步 REST 請求，在線程池中執行；落盤由 TradeLogger 寫入線程完成）"""
+        trade_data = {
+            'type': 'OPEN',
+            'symbol': signal.symbol,
+            'side': signal.action,
+            'entry_price': signal.price,
+            'quantity': position_params['quantity'],
+            'stop_loss': signal.stop_loss,
+            'take_profit': signal.take_profit,
+            'leverage': position_params['leverage'],
+            'confidence': signal.confidence,
+            'expected_roi': signal.expected_roi,
+            'strategy': signal.strategy,
+            'reason': signal.reason,
+            # 技術指標 (供 XGBoost 學習)
+            'metadata': signal.metadata,  # 包含 MACD, EMA, ATR, structure 等
+            'margin': position_params['margin'],
+            'margin_percent': position_params['margin_percent'],
+            'position_value': position_params['position_value'],
+            'mode': self.mode,
+            'latency_trace': position.trace.to_dict() if position.trace else None
+        }
+        # 保持向後兼容的簡單記錄
+        self.trade_logger.log_trade(trade_data)
         
-        return True
+        # 新增：記錄詳細的 ML 訓練數據（開倉）
+        try:
+            trade_id = self.trade_logger.log_position_entry(
+                trade_data=trade_data,
+                binance_client=self.binance,
+                timeframe=self.timeframe
+            )
+            # 修復問題 2.4：處理 trade_id 缺失情況
+            if trade_id:
+                position.trade_id = trade_id
+                logger.debug(f"Assigned trade_id {trade_id} to position {signal.symbol}")
+            else:
+                # 降級處理：生成臨時 trade_id（避免平倉時無法記錄）
+                position.trade_id = f"{signal.symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_fallback"
+                logger.warning(f"log_position_entry failed, using fallback trade_id: {position.trade_id}")
+        except Exception as e:
+            logger.error(f"Failed to log position entry for ML: {e}")
+            logger.exception(e)
+            # 即使失敗，也生成一個降級的 trade_id
+            position.trade_id = f"{signal.symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_error"
     
     async def load_positions_from_binance(self):
         """
@@ -251,9 +428,12 @@ class ExecutionService:
         try:
             logger.info("🔍 Loading current positions from Binance API...")
             
-            # 從 Binance API 獲取持倉
-            loop = asyncio.get_event_loop()
-            binance_positions = await loop.run_in_executor(None, self.binance.get_current_positions)
+            # 從用戶數據流賬戶模型（已連接時）或 Binance API 獲取持倉
+            if self.account_model is not None and self.account_model.ready:
+                binance_positions = self.account_model.get_current_positions()
+            else:
+                loop = asyncio.get_event_loop()
+                binance_positions = await loop.run_in_executor(None, self.binance.get_current_positions)
             
             if not binance_positions:
                 logger.info("No positions to load from Binance")
@@ -374,50 +554,40 @@ class ExecutionService:
             symbol = position.symbol
             quantity = position.quantity
             
-            # 確定平倉方向和持倉側
-            # LONG 倉位 (BUY 開倉) → SELL 平倉，positionSide=LONG
-            # SHORT 倉位 (SELL 開倉) → BUY 平倉，positionSide=SHORT
-            if position.action == 'BUY':
-                close_side = 'SELL'
-                position_side = 'LONG'
-            else:
-                close_side = 'BUY'
-                position_side = 'SHORT'
+            # LONG 倉位 (BUY 開倉) → SELL 平倉；SHORT 倉位 (SELL 開倉) → BUY 平倉
+            position_side = 'LONG' if position.action == 'BUY' else 'SHORT'
             
             logger.info(
                 f"🔒 Setting exchange-level protection for {symbol} {position_side}: "
                 f"SL @ {position.stop_loss:.8f}, TP @ {position.take_profit:.8f}"
             )
             
-            # 設置止損訂單（異步執行同步方法）
-            loop = asyncio.get_event_loop()
-            sl_order = await loop.run_in_executor(
-                None,
-                self.binance.set_stop_loss_order,
+            # 止損/止盈一次往返提交
+            sl_order, tp_order = await self.gateway.protect(
                 symbol,
-                close_side,
+                position.action,
                 quantity,
                 position.stop_loss,
-                position_side
+                position.take_profit
             )
+            await self._record_protection(position, sl_order, tp_order)
             
+        except Exception as e:
+            logger.error(f"Error setting stop-loss/take-profit for {position.symbol}: {e}")
+            logger.exception(e)
+    
+    async def _record_protection(self, position: Position, sl_order: Optional[Dict], tp_order: Optional[Dict]):
+        """記錄保護單 ID，並在保護不完整時告警"""
+        symbol = position.symbol
+        try:
             if sl_order:
+                position.stop_loss_order_id = sl_order.get('orderId')
                 logger.info(f"✅ Stop-loss order set successfully for {symbol}: {sl_order.get('orderId', 'N/A')}")
             else:
                 logger.error(f"❌ Failed to set stop-loss for {symbol}")
             
-            # 設置止盈訂單（異步執行同步方法）
-            tp_order = await loop.run_in_executor(
-                None,
-                self.binance.set_take_profit_order,
-                symbol,
-                close_side,
-                quantity,
-                position.take_profit,
-                position_side
-            )
-            
             if tp_order:
+                position.take_profit_order_id = tp_order.get('orderId')
                 logger.info(f"✅ Take-profit order set successfully for {symbol}: {tp_order.get('orderId', 'N/A')}")
             else:
                 logger.error(f"❌ Failed to set take-profit for {symbol}")
@@ -454,9 +624,34 @@ class ExecutionService:
                         logger.error(f"Failed to send Discord alert: {e}")
             
         except Exception as e:
-            logger.error(f"Error setting stop-loss/take-profit for {position.symbol}: {e}")
+            logger.error(f"Error recording protection for {symbol}: {e}")
             logger.exception(e)
     
+    async def _exit_features(self, symbol: str) -> Dict[str, Any]:
+        """Indicator values for the exit record: from the cycle snapshot, else fetched and computed."""
+        if self.analysis_snapshot:
+            features = self.analysis_snapshot.exit_features(symbol)
+            if features is not None:
+                return features
+        if not self.data_service:
+            return {}
+        try:
+            klines = await self.data_service.fetch_klines(
+                symbol=symbol,
+                timeframe=self.timeframe,
+                limit=200,
+                force_refresh=False
+            )
+            if klines is None or klines.empty:
+                return {}
+            indicators_df = TechnicalIndicators.calculate_all_indicators(klines)
+            if indicators_df is None or indicators_df.empty:
+                return {}
+            return features_from_frame(indicators_df)
+        except Exception as e:
+            logger.warning(f"Failed to fetch exit metadata for {symbol}: {e}")
+            return {}
+    
     async def _notify_position_opened(self, position: Position, position_params: Dict):
         """Send Discord notification when position is opened."""
         if not self.discord:
@@ -477,91 +672,13 @@ class ExecutionService:
                 'allocated_capital': position.allocated_capital,
                 'risk_amount': position_params.get('risk_amount', 0),
                 'leverage': position.leverage,
-                'mode': 'LIVE' if self.enable_trading else 'SIMULATION'
+                'mode': self.mode
             }
             await self.discord.send_trade_notification(trade_info)
         except Exception as e:
             logger.error(f"Failed to send Discord notification: {e}")
             logger.exception(e)
     
-    async def _place_order(self, symbol: str, action: str, quantity: float, price: float = None) -> Optional[Dict]:
-        """
-        Place order on Binance (supports both MARKET and LIMIT orders).
-        
-        Args:
-            symbol: Trading symbol
-            action: 'BUY' or 'SELL'
-            quantity: Order quantity
-            price: Entry price for limit order calculation (optional)
-            
-        Returns:
-            Order response or None
-        """
-        try:
-            from config import Config
-            
-            side = 'BUY' if action == 'BUY' else 'SELL'
-            order_type = Config.ORDER_TYPE
-            
-            # 計算限價單價格（如果使用限價單）
-            limit_price = None
-            if order_type == 'LIMIT':
-                if price is None:
-                    # 獲取當前價格
-                    price = self.binance.get_ticker_price(symbol)
-                
-                offset_pct = Config.LIMIT_ORDER_OFFSET_PERCENT / 100
-                
-                if action == 'BUY':
-                    # 做多：設置稍低於市價的限價（等待更好的買入價）
-                    limit_price = price * (1 - offset_pct)
-                else:
-                    # 做空：設置稍高於市價的限價（等待更好的賣出價）
-                    limit_price = price * (1 + offset_pct)
-                
-                # 格式化限價（使用 PRICE_FILTER 精度）
-                limit_price = round(limit_price, 8)  # Binance 最多 8 位小數
-                
-                logger.info(
-                    f"{'[LIVE]' if self.enable_trading else '[SIM]'} Placing {side} LIMIT order: "
-                    f"{symbol} qty={quantity:.6f}, price={limit_price:.8f} "
-                    f"(market: {price:.8f}, offset: {Config.LIMIT_ORDER_OFFSET_PERCENT}%)"
-                )
-            else:
-                logger.info(
-                    f"{'[LIVE]' if self.enable_trading else '[SIM]'} Placing {side} MARKET order: "
-                    f"{symbol} qty={quantity:.6f}"
-                )
-            
-            # 下單
-            if order_type == 'LIMIT':
-                order = self.binance.create_order(
-                    symbol=symbol,
-                    side=side,
-                    type='LIMIT',
-                    quantity=quantity,
-                    price=limit_price
-                )
-            else:
-                order = self.binance.create_order(
-                    symbol=symbol,
-                    side=side,
-                    type='MARKET',
-                    quantity=quantity
-                )
-            
-            if order:
-                logger.info(f"✅ Order placed successfully: {order.get('orderId', 'N/A')}")
-            else:
-                logger.warning(f"⚠️  Order returned None (trading may be disabled)")
-            
-            return order
-            
-        except Exception as e:
-            logger.error(f"❌ Order placement failed for {symbol}: {e}")
-            logger.exception(e)
-            return None
-    
     async def monitor_positions(self) -> List[str]:
         """
         Monitor open positions and close if stop-loss, take-profit, or signal invalidation.
@@ -572,83 +689,155 @@ class ExecutionService:
         3. 如果信號失效，提前平倉
         4. 如果市場條件改善，調整止損/止盈
         
+        所有倉位並發檢查（最多 monitor_concurrency 個同時進行），每個倉位的
+        行情獲取與信號驗證有 monitor_timeout 秒的期限；單個倉位超時或出錯
+        不影響其他倉位的平倉。
+        
         Returns:
             List of closed position symbols
         """
         if not self.positions:
             return []
         
-        closed_symbols = []
+        semaphore = asyncio.Semaphore(self.monitor_concurrency)
         
-        for symbol, position in list(self.positions.items()):
+        async def bounded(symbol: str, position: Position) -> Optional[str]:
+            async with semaphore:
+                return await self._monitor_position(symbol, position)
+        
+        results = await asyncio.gather(*[
+            bounded(symbol, position) for symbol, position in list(self.positions.items())
+        ])
+        return [symbol for symbol in results if symbol]
+    
+    async def _monitor_position(self, symbol: str, position: Position) -> Optional[str]:
+        """
+        Check one position; returns the symbol if it was closed.
+        
+        The deadline covers only the ticker fetch and signal validation. Acting on
+        the result (closing, adjusting, notifying) is never cancelled halfway.
+        """
+        started = time.perf_counter()
+        outcome = 'hold'
+        try:
             try:
-                # Get current price
-                ticker = await self.binance.get_ticker(symbol)
-                if not ticker:
-                    continue
-                
-                current_price = float(ticker.get('lastPrice', 0))
-                if current_price == 0:
-                    continue
-                
-                should_close = False
-                reason = ""
-                
-                # === 第一步：檢查傳統止損/止盈 ===
-                # Check stop-loss
-                if position.action == 'BUY' and current_price <= position.stop_loss:
-                    should_close = True
-                    reason = "stop-loss"
-                    self.stats['stop_losses_hit'] += 1
-                elif position.action == 'SELL' and current_price >= position.stop_loss:
-                    should_close = True
-                    reason = "stop-loss"
-                    self.stats['stop_losses_hit'] += 1
-                
-                # Check take-profit
-                if position.action == 'BUY' and current_price >= position.take_profit:
-                    should_close = True
-                    reason = "take-profit"
-                    self.stats['take_profits_hit'] += 1
-                elif position.action == 'SELL' and current_price <= position.take_profit:
-                    should_close = True
-                    reason = "take-profit"
-                    self.stats['take_profits_hit'] += 1
-                
-                # === 第二步：如果未觸發止損/止盈，驗證信號是否仍然有效 ===
-                if not should_close and self.strategy_engine and self.data_service:
-                    validation_result = await self.validate_position_signal(symbol, position, current_price)
-                    
-                    if validation_result['action'] == 'CLOSE':
-                        should_close = True
-                        reason = validation_result['reason']
-                        self.stats['signal_invalidation_exits'] += 1
-                        logger.warning(
-                            f"⚠️  {symbol} 信號失效: {validation_result['details']}"
+                check = await asyncio.wait_for(
+                    self._evaluate_position(symbol, position),
+                    timeout=self.monitor_timeout
+                )
+            except asyncio.TimeoutError:
+                outcome = 'timeout'
+                self.stats['monitor_timeouts'] += 1
+                logger.warning(f"⏱️  Monitoring {symbol} exceeded {self.monitor_timeout:.0f}s deadline, skipped this cycle")
+                return None
+            
+            if check is None:
+                return None
+            
+            current_price = check['price']
+            validation_result = check.get('validation')
+            if validation_result:
+                if validation_result['action'] == 'CLOSE':
+                    logger.warning(
+                        f"⚠️  {symbol} 信號失效: {validation_result['details']}"
+                    )
+                elif validation_result['action'] == 'ADJUST':
+                    # 動態調整止損/止盈
+                    outcome = 'adjusted'
+                    await self.adjust_position_levels(symbol, position, validation_result)
+                    self.stats['dynamic_adjustments'] += 1
+                elif validation_result['action'] == 'WARN':
+                    # 發送警告但不平倉
+                    outcome = 'warned'
+                    if self.discord:
+                        await self.discord.send_notification(
+                            f"⚠️ **倉位警告** - {symbol}\n"
+                            f"方向: {position.action}\n"
+                            f"當前價格: {current_price:.4f}\n"
+                            f"警告: {validation_result['details']}\n"
+                            f"建議: 密切關注市場變化"
                         )
-                    elif validation_result['action'] == 'ADJUST':
-                        # 動態調整止損/止盈
-                        await self.adjust_position_levels(symbol, position, validation_result)
-                        self.stats['dynamic_adjustments'] += 1
-                    elif validation_result['action'] == 'WARN':
-                        # 發送警告但不平倉
-                        if self.discord:
-                            await self.discord.send_notification(
-                                f"⚠️ **倉位警告** - {symbol}\n"
-                                f"方向: {position.action}\n"
-                                f"當前價格: {current_price:.4f}\n"
-                                f"警告: {validation_result['details']}\n"
-                                f"建議: 密切關注市場變化"
-                            )
-                
-                if should_close:
-                    await self.close_position(symbol, current_price, reason)
-                    closed_symbols.append(symbol)
-                    
-            except Exception as e:
-                logger.error(f"Error monitoring {symbol}: {e}")
+            
+            if check['close']:
+                outcome = 'closed'
+                await self.close_position(symbol, current_price, check['reason'])
+                return symbol
+            return None
+        
+        except Exception as e:
+            outcome = 'error'
+            self.stats['monitor_errors'] += 1
+            logger.error(f"Error monitoring {symbol}: {e}")
+            return None
+        
+        finally:
+            if self.monitoring_service:
+                self.monitoring_service.record_metric(
+                    'position_check_seconds',
+                    time.perf_counter() - started,
+                    tags={'symbol': symbol, 'outcome': outcome}
+                )
+    
+    async def _evaluate_position(self, symbol: str, position: Position) -> Optional[Dict[str, Any]]:
+        """
+        Get the price (cycle snapshot, else ticker) and decide whether a position should close.
         
-        return closed_symbols
+        Returns:
+            {'close', 'reason', 'price', 'validation'} or None if no price is available
+        """
+        # Get current price（本週期快照已有該交易對時直接使用，不再查詢行情）
+        analysis = self.analysis_snapshot.get(symbol) if self.analysis_snapshot else None
+        if analysis is not None:
+            current_price = analysis.price
+        else:
+            ticker = await self.binance.get_ticker(symbol)
+            if not ticker:
+                return None
+            current_price = float(ticker.get('lastPrice', 0))
+        if current_price == 0:
+            return None
+        position.excursion.update_price(current_price)
+        
+        should_close = False
+        reason = ""
+        
+        # === 第一步：檢查傳統止損/止盈 ===
+        # Check stop-loss
+        if position.action == 'BUY' and current_price <= position.stop_loss:
+            should_close = True
+            reason = "stop-loss"
+            self.stats['stop_losses_hit'] += 1
+        elif position.action == 'SELL' and current_price >= position.stop_loss:
+            should_close = True
+            reason = "stop-loss"
+            self.stats['stop_losses_hit'] += 1
+        
+        # Check take-profit
+        if position.action == 'BUY' and current_price >= position.take_profit:
+            should_close = True
+            reason = "take-profit"
+            self.stats['take_profits_hit'] += 1
+        elif position.action == 'SELL' and current_price <= position.take_profit:
+            should_close = True
+            reason = "take-profit"
+            self.stats['take_profits_hit'] += 1
+        
+        # === 第二步：如果未觸發止損/止盈，驗證信號是否仍然有效 ===
+        validation_result = None
+        if not should_close and self.strategy_engine and self.data_service:
+            validation_result = await self.validate_position_signal(symbol, position, current_price)
+            
+            if validation_result['action'] == 'CLOSE':
+                should_close = True
+                reason = validation_result['reason']
+                self.stats['signal_invalidation_exits'] += 1
+        
+        return {
+            'close': should_close,
+            'reason': reason,
+            'price': current_price,
+            'validation': validation_result
+        }
     
     async def validate_position_signal(self, symbol: str, position: Position, current_price: float) -> Dict[str, Any]:
         """
@@ -675,29 +864,34 @@ class ExecutionService:
             }
         """
         try:
-            # 獲取最新市場數據（使用配置的時間框架）
-            klines = await self.data_service.fetch_klines(
-                symbol=symbol,
-                timeframe=self.timeframe,  # 使用與開倉一致的時間框架
-                limit=200,
-                force_refresh=False  # 使用緩存以減少 API 壓力
-            )
-            
-            # 如果無法獲取數據，返回警告（而非靜默 HOLD）
-            if klines is None or klines.empty:
-                logger.warning(f"{symbol} 無法獲取市場數據，無法驗證信號")
-                # 如果開倉時信心度很高，發送警告
-                if position.confidence >= 80.0:
-                    return {
-                        'action': 'WARN',
-                        'reason': 'no_validation_data',
-                        'details': '無法獲取市場數據進行驗證，建議檢查 API 連接'
-                    }
-                return {'action': 'HOLD', 'reason': 'no_data', 'details': '無法獲取市場數據'}
-            
-            # 重新分析當前市場
-            symbols_data = {symbol: (klines, current_price)}
-            signals = await self.strategy_engine.analyze_batch(symbols_data)
+            analysis = self.analysis_snapshot.get(symbol) if self.analysis_snapshot else None
+            if analysis is not None:
+                # 本週期掃描已分析過該交易對：直接使用其信號，不重新抓取 K 線或重算
+                signals = [analysis.signal] if analysis.signal else []
+            else:
+                # 獲取最新市場數據（使用配置的時間框架）
+                klines = await self.data_service.fetch_klines(
+                    symbol=symbol,
+                    timeframe=self.timeframe,  # 使用與開倉一致的時間框架
+                    limit=200,
+                    force_refresh=False  # 使用緩存以減少 API 壓力
+                )
+                
+                # 如果無法獲取數據，返回警告（而非靜默 HOLD）
+                if klines is None or klines.empty:
+                    logger.warning(f"{symbol} 無法獲取市場數據，無法驗證信號")
+                    # 如果開倉時信心度很高，發送警告
+                    if position.confidence >= 80.0:
+                        return {
+                            'action': 'WARN',
+                            'reason': 'no_validation_data',
+                            'details': '無法獲取市場數據進行驗證，建議檢查 API 連接'
+                        }
+                    return {'action': 'HOLD', 'reason': 'no_data', 'details': '無法獲取市場數據'}
+                
+                # 重新分析當前市場
+                symbols_data = {symbol: (klines, current_price)}
+                signals = await self.strategy_engine.analyze_batch(symbols_data)
             
             # 如果沒有新信號
             if not signals:
@@ -839,6 +1033,10 @@ class ExecutionService:
             else:
                 new_tp = old_tp  # 用於日誌顯示
             
+            # 撤換交易所的止損/止盈單（先下新單，再批量撤銷舊單）
+            if self.enable_trading:
+                await self._replace_protection(position, old_sl, old_tp)
+            
             # 更新 risk manager
             if symbol in self.risk_manager.open_positions:
                 self.risk_manager.open_positions[symbol]['stop_loss'] = position.stop_loss
@@ -868,7 +1066,76 @@ class ExecutionService:
         except Exception as e:
             logger.error(f"Error adjusting position levels for {symbol}: {e}")
     
-    async def close_position(self, symbol: str, price: float, reason: str = "manual") -> bool:
+    async def _replace_protection(self, position: Position, old_sl: float, old_tp: float):
+        """Move exchange-level SL/TP to the position's adjusted levels."""
+        new_sl = position.stop_loss if position.stop_loss != old_sl else None
+        new_tp = position.take_profit if position.take_profit != old_tp else None
+        if new_sl is None and new_tp is None:
+            return
+        
+        replaced = await self.gateway.replace_protection(
+            position.symbol,
+            position.action,
+            position.quantity,
+            stop_loss=new_sl,
+            take_profit=new_tp,
+            stop_loss_order_id=position.stop_loss_order_id,
+            take_profit_order_id=position.take_profit_order_id
+        )
+        # 撤換失敗時交易所保留舊單作為後備，內存中的新水平仍由倉位監控執行
+        if replaced['stop_loss']:
+            position.stop_loss_order_id = replaced['stop_loss'].get('orderId')
+        if replaced['take_profit']:
+            position.take_profit_order_id = replaced['take_profit'].get('orderId')
+    
+    def update_excursions(self, symbols_data: Dict[str, tuple]):
+        """Feed freshly scanned kline frames ({symbol: (frame, price)}) to open positions' excursion trackers."""
+        for symbol, position in list(self.positions.items()):
+            scanned = symbols_data.get(symbol)
+            if scanned is not None:
+                position.excursion.update_frame(scanned[0])
+    
+    def on_order_update(self, order: Dict[str, Any]):
+        """
+        AccountModel order listener (user data stream).
+        
+        Records the real entry fill price, and closes the position record when
+        its exchange-level SL/TP fills (no closing order needed) and cancels
+        the sibling protection order. Fills of a symbol whose entry is still
+        being submitted are buffered and applied once the position exists.
+        """
+        if order['status'] != 'FILLED':
+            return
+        position = self.positions.get(order['symbol'])
+        if position is None:
+            if order['symbol'] in self.reserved_slots:
+                self._early_fills.setdefault(order['symbol'], []).append(order)
+            return
+        
+        price = float(order.get('avgPrice') or 0)
+        if order['orderId'] == position.entry_order_id and price:
+            position.entry_price = price
+            position.excursion.update_price(price)
+            if position.trace:
+                position.trace.mark('filled')
+        elif order['orderId'] in (position.stop_loss_order_id, position.take_profit_order_id):
+            if order['orderId'] == position.stop_loss_order_id:
+                reason = "exchange stop-loss"
+                sibling = position.take_profit_order_id
+                self.stats['stop_losses_hit'] += 1
+            else:
+                reason = "exchange take-profit"
+                sibling = position.stop_loss_order_id
+                self.stats['take_profits_hit'] += 1
+            logger.info(f"📡 {order['symbol']} {reason} filled @ {price:.8f} (order {order['orderId']})")
+            # 倉位已平：撤銷另一張保護單（reduceOnly，但不應殘留在交易所）
+            if sibling:
+                self._spawn(self.gateway.cancel(order['symbol'], [sibling]))
+            asyncio.get_event_loop().create_task(
+                self.close_position(order['symbol'], price, reason, send_order=False)
+            )
+    
+    async def close_position(self, symbol: str, price: float, reason: str = "manual", send_order: bool = True) -> bool:
         """
         Close a position.
         
@@ -876,6 +1143,7 @@ class ExecutionService:
             symbol: Trading symbol
             price: Closing price
             reason: Reason for closing
+            send_order: Place the closing order (False when the exchange already closed it)
             
         Returns:
             True if closed successfully
@@ -886,17 +1154,28 @@ class ExecutionService:
         position = self.positions[symbol]
         
         # Execute closing trade if live trading
-        if self.enable_trading:
+        if self.enable_trading and send_order:
             try:
-                # Close position with market order
-                opposite_side = 'SELL' if position.action == 'BUY' else 'BUY'
-                await self._place_order(symbol, opposite_side, position.quantity)
+                # Close position with market order (same positionSide), then cancel its SL/TP
+                order = await self.gateway.close_position(
+                    symbol,
+                    position.action,
+                    position.quantity,
+                    (position.stop_loss_order_id, position.take_profit_order_id)
+                )
+                if order:
+                    price = float(order.get('avgPrice') or 0) or price
             except Exception as e:
                 logger.error(f"Error closing position {symbol}: {e}")
                 return False
+            
+            # 下單期間已由交易所止損/止盈成交回報平倉
+            if symbol not in self.positions:
+                return False
         
         # Remove from risk manager
         self.risk_manager.close_position(symbol)
+        position.excursion.update_price(price)
         
         # Calculate PnL
         if position.action == 'BUY':
@@ -917,92 +1196,67 @@ class ExecutionService:
         
         # 📊 記錄平倉數據供 XGBoost 學習
         if self.trade_logger:
-            trade_data = {
-                'type': 'CLOSE',
-                'symbol': symbol,
-                'side': position.action,
-                'entry_price': position.entry_price,
-                'exit_price': price,
-                'quantity': position.quantity,
-                'stop_loss': position.stop_loss,
-                'take_profit': position.take_profit,
-                'leverage': position.leverage,
-                'pnl': pnl,
-                'pnl_percent': pnl_pct,
-                'reason': reason,
-                'strategy': position.strategy,
-                'confidence': position.confidence,
-                'allocated_capital': position.allocated_capital,
-                'duration_hours': (datetime.now() - position.opened_at).total_seconds() / 3600,
-                'mode': 'LIVE' if self.enable_trading else 'SIMULATION',
-                # 交易結果標記 (供 XGBoost 學習)
-                'is_winner': pnl > 0,
-                'hit_stop_loss': 'STOP' in reason.upper(),
-                'hit_take_profit': 'PROFIT' in reason.upper() or 'TARGET' in reason.upper()
-            }
-            # 保持向後兼容的簡單記錄
-            self.trade_logger.log_trade(trade_data)
-            
-            # 新增：記錄詳細的 ML 訓練數據（平倉）
-            try:
-                # 獲取當前市場數據（用於記錄平倉時的技術指標）
-                exit_metadata = {}
-                if self.data_service:
-                    try:
-                        klines = await self.data_service.fetch_klines(
-                            symbol=symbol,
-                            timeframe=self.timeframe,
-                            limit=200,
-                            force_refresh=False
-                        )
-                        if klines is not None and not klines.empty:
-                            # 提取最新的技術指標（修復問題 2.2：添加導入錯誤處理）
-                            try:
-                                from utils.indicators import calculate_indicators
-                            except ImportError as e:
-                                logger.error(f"Failed to import calculate_indicators: {e}")
-                                raise
-                            
-                            indicators_df = calculate_indicators(klines)
-                            if not indicators_df.empty:
-                                latest = indicators_df.iloc[-1]
-                                exit_metadata = {
-                                    'macd': latest.get('macd'),
-                                    'macd_signal': latest.get('macd_signal'),
-                                    'ema_9': latest.get('ema_9'),
-                                    'ema_21': latest.get('ema_21'),
-                                    'ema_50': latest.get('ema_50'),
-                                    'ema_200': latest.get('ema_200'),
-                                    'atr': latest.get('atr'),
-                                    'rsi': latest.get('rsi')
-                                }
-                    except Exception as e:
-                        logger.warning(f"Failed to fetch exit metadata for {symbol}: {e}")
-                
-                # 修復問題 2.1：確保 exit_data 包含所有必要字段
-                exit_data = {
-                    'trade_id': getattr(position, 'trade_id', None),
+            # 開倉記錄（trade_id）可能仍在後台寫入：先等它完成
+            entry_record = self._entry_records.pop(symbol, None)
+            if entry_record:
+                await asyncio.wait([entry_record])
+            async with self._log_lock:
+                trade_data = {
+                    'type': 'CLOSE',
                     'symbol': symbol,
-                    'side': position.action,  # 從 position 對象獲取 side（修復 2.1）
-                    'entry_price': position.entry_price,  # 從 position 對象獲取 entry_price（修復 2.1）
+                    'side': position.action,
+                    'entry_price': position.entry_price,
                     'exit_price': price,
-                    'exit_reason': reason,
+                    'quantity': position.quantity,
+                    'stop_loss': position.stop_loss,
+                    'take_profit': position.take_profit,
+                    'leverage': position.leverage,
                     'pnl': pnl,
                     'pnl_percent': pnl_pct,
-                    'holding_duration_minutes': (datetime.now() - position.opened_at).total_seconds() / 60,
-                    'entry_time': position.opened_at,
-                    'exit_time': datetime.now(),
-                    'metadata': exit_metadata
+                    'reason': reason,
+                    'strategy': position.strategy,
+                    'confidence': position.confidence,
+                    'allocated_capital': position.allocated_capital,
+                    'duration_hours': (datetime.now() - position.opened_at).total_seconds() / 3600,
+                    'mode': self.mode,
+                    # 交易結果標記 (供 XGBoost 學習)
+                    'is_winner': pnl > 0,
+                    'hit_stop_loss': 'STOP' in reason.upper(),
+                    'hit_take_profit': 'PROFIT' in reason.upper() or 'TARGET' in reason.upper()
                 }
+                # 保持向後兼容的簡單記錄
+                self.trade_logger.log_trade(trade_data)
                 
-                self.trade_logger.log_position_exit(
-                    trade_data=exit_data,
-                    binance_client=self.binance,
-                    timeframe=self.timeframe
-                )
-            except Exception as e:
-                logger.error(f"Failed to log position exit for ML: {e}")
-                logger.exception(e)
+                # 新增：記錄詳細的 ML 訓練數據（平倉）
+                try:
+                    # 平倉時的技術指標（本週期快照，或抓取後計算）
+                    exit_metadata = await self._exit_features(symbol)
+                    
+                    # 修復問題 2.1：確保 exit_data 包含所有必要字段
+                    exit_data = {
+                        'trade_id': getattr(position, 'trade_id', None),
+                        'symbol': symbol,
+                        'side': position.action,  # 從 position 對象獲取 side（修復 2.1）
+                        'entry_price': position.entry_price,  # 從 position 對象獲取 entry_price（修復 2.1）
+                        'exit_price': price,
+                        'exit_reason': reason,
+                        'pnl': pnl,
+                        'pnl_percent': pnl_pct,
+                        'holding_duration_minutes': (datetime.now() - position.opened_at).total_seconds() / 60,
+                        'entry_time': position.opened_at,
+                        'exit_time': datetime.now(),
+                        'metadata': exit_metadata,
+                        'excursion': position.excursion.summary(position.entry_price)
+                    }
+                    
+                    self.trade_logger.log_position_exit(
+                        trade_data=exit_data,
+                        binance_client=self.binance,
+                        timeframe=self.timeframe
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to log position exit for ML: {e}")
+                    logger.exception(e)
         
         # Send Discord notification for closed position
         if self.discord:
@@ -1034,7 +1288,7 @@ class ExecutionService:
                 'reason': reason.upper(),
                 'strategy': position.strategy,
                 'duration': (datetime.now() - position.opened_at).total_seconds() / 3600,
-                'mode': 'LIVE' if self.enable_trading else 'SIMULATION'
+                'mode': self.mode
             }
             await self.discord.send_trade_notification(trade_info)
         except Exception as e:
@@ -1068,6 +1322,7 @@ class ExecutionService:
         return {
             **self.stats,
             'active_positions': len(self.positions),
+            'order_gateway': self.gateway.get_stats(),
             'execution_rate': (
                 self.stats['trades_executed'] / 
                 max(self.stats['total_signals_received'], 1)
@@ -1086,5 +1341,9 @@ class ExecutionService:
             'trades_rejected': 0,
             'positions_closed': 0,
             'stop_losses_hit': 0,
-            'take_profits_hit': 0
+            'take_profits_hit': 0,
+            'signal_invalidation_exits': 0,
+            'dynamic_adjustments': 0,
+            'monitor_timeouts': 0,
+            'monitor_errors': 0
         }
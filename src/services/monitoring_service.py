@@ -3,6 +3,7 @@ Monitoring Service - System metrics and performance tracking.
 
 Responsibilities:
 - Collect performance metrics
+- Aggregate signal-to-order stage latencies (SignalTrace) into histograms
 - Track trading statistics
 - Monitor system health
 - Generate alerts
@@ -15,6 +16,8 @@ import logging
 from datetime import datetime
 import json
 
+from src.services.signal_trace import STAGES, LatencyHistogram, SignalTrace
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,6 +46,9 @@ class MonitoringService:
         self.metrics: List[PerformanceMetric] = []
         self.max_metrics = 1000  # Keep last 1000 metrics
         
+        # 信號各階段延遲直方圖（stage → LatencyHistogram，'total' 為全程）
+        self.stage_latency: Dict[str, LatencyHistogram] = {}
+        
         # System health
         self.health = {
             'binance_api': 'unknown',
@@ -63,7 +69,8 @@ class MonitoringService:
         self.stats = {
             'metrics_recorded': 0,
             'alerts_sent': 0,
-            'health_checks': 0
+            'health_checks': 0,
+            'traces_recorded': 0
         }
         
         logger.info("MonitoringService initialized")
@@ -91,6 +98,31 @@ class MonitoringService:
         if len(self.metrics) > self.max_metrics:
             self.metrics = self.metrics[-self.max_metrics:]
     
+    def record_trace(self, trace: SignalTrace, symbol: str = None):
+        """
+        Aggregate a signal's stage latencies into the per-stage histograms.
+        
+        Args:
+            trace: Completed SignalTrace of an executed signal
+            symbol: Trading symbol (logged with slow traces)
+        """
+        latencies = trace.stage_latencies()
+        if not latencies:
+            return
+        for stage, seconds in latencies.items():
+            self.stage_latency.setdefault(stage, LatencyHistogram()).add(seconds)
+        total = trace.total()
+        self.stage_latency.setdefault('total', LatencyHistogram()).add(total)
+        self.record_metric('signal_to_protected_seconds', total, {'symbol': symbol or '', 'slowest': trace.slowest_stage()})
+        self.stats['traces_recorded'] += 1
+    
+    def get_latency_histograms(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage latency histograms (ms), in stage order."""
+        return {
+            stage: self.stage_latency[stage].to_dict()
+            for stage in STAGES + ('total',) if stage in self.stage_latency
+        }
+    
     def get_metrics(self, name: str = None, limit: int = 100) -> List[Dict]:
         """
         Get recorded metrics.
@@ -142,7 +174,7 @@ class MonitoringService:
             'degraded_components': degraded
         }
     
-    def get_trading_stats(self, data_service, strategy_engine, execution_service) -> Dict[str, Any]:
+    def get_trading_stats(self, data_service, strategy_engine, execution_service, signal_queue=None) -> Dict[str, Any]:
         """
         Aggregate trading statistics from all services.
         
@@ -150,6 +182,7 @@ class MonitoringService:
             data_service: DataService instance
             strategy_engine: StrategyEngine instance
             execution_service: ExecutionService instance
+            signal_queue: SignalQueue instance (signal pipeline)
             
         Returns:
             Aggregated statistics
@@ -158,6 +191,7 @@ class MonitoringService:
             'data_service': data_service.get_stats() if data_service else {},
             'strategy_engine': strategy_engine.get_stats() if strategy_engine else {},
             'execution_service': execution_service.get_stats() if execution_service else {},
+            'signal_queue': signal_queue.get_stats() if signal_queue else {},
             'monitoring': self.get_stats()
         }
     
@@ -261,6 +295,7 @@ class MonitoringService:
                 'exported_at': datetime.now().isoformat(),
                 'metrics': [asdict(m) for m in self.metrics],
                 'health': self.health,
+                'stage_latency': self.get_latency_histograms(),
                 'stats': self.stats
             }
             
@@ -285,6 +320,8 @@ class MonitoringService:
         self.stats = {
             'metrics_recorded': 0,
             'alerts_sent': 0,
-            'health_checks': 0
+            'health_checks': 0,
+            'traces_recorded': 0
         }
         self.metrics.clear()
+        self.stage_latency.clear()
@@ -0,0 +1,465 @@
+"""
+Order Gateway - Async order submission with batched protection orders.
+
+Responsibilities:
+- Build entry / stop-loss / take-profit order parameters (hedge mode)
+- Pre-trade preparation (filters, rounding, notional / margin checks) from
+  cached exchange metadata, so submitting an entry is one network call
+- Submit a market entry and its SL / TP in one /fapi/v1/batchOrders round
+  trip, re-submitting only the protection legs that were rejected
+- Amend protection by placing the new SL / TP and batch-cancelling the
+  orders they replace
+- Time every step (per-step statistics and MonitoringService metrics)
+
+Clients without the native async batch methods (e.g. ReplayBinanceClient)
+are driven through their synchronous order methods in the thread pool.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.config import Config
+from src.services.signal_trace import SignalTrace
+
+logger = logging.getLogger(__name__)
+
+ENTRY = 'entry'
+STOP_LOSS = 'stop_loss'
+TAKE_PROFIT = 'take_profit'
+PROTECTION_LEGS = {'STOP_MARKET': STOP_LOSS, 'TAKE_PROFIT_MARKET': TAKE_PROFIT}
+
+
+@dataclass
+class PreparedOrder:
+    """Entry and protection parameters ready to send (filters applied, notional / margin checked)."""
+    symbol: str
+    action: str
+    quantity: float
+    entry: Dict[str, Any]
+    protection: List[Dict[str, Any]]
+    notional: float
+    margin: float
+    prepared_at: float = field(default_factory=time.monotonic)
+    sizing: Dict[str, Any] = field(default_factory=dict)  # 風控計算結果（ExecutionService 使用）
+
+    def age(self) -> float:
+        return time.monotonic() - self.prepared_at
+
+
+def close_side(action: str) -> Tuple[str, str]:
+    """(closing side, positionSide) of a position opened with action."""
+    return ('SELL', 'LONG') if action == 'BUY' else ('BUY', 'SHORT')
+
+
+def protection_legs(protection: List[Dict[str, Any]]) -> List[str]:
+    """Result key (stop_loss / take_profit) of each protection order, aligned with the list."""
+    return [PROTECTION_LEGS[order['type']] for order in protection]
+
+
+class OrderGateway:
+    """Native async order path for ExecutionService."""
+
+    def __init__(self, binance_client, monitoring_service=None):
+        """
+        Initialize order gateway.
+
+        Args:
+            binance_client: BinanceDataClient (or PaperExchange / replay client)
+            monitoring_service: Receives 'order_latency_seconds' metrics
+        """
+        self.binance = binance_client
+        self.monitoring_service = monitoring_service
+
+        # 每個步驟的耗時：step → {'count', 'total', 'max'}
+        self.latency: Dict[str, Dict[str, float]] = {}
+
+        # Statistics
+        self.stats = {
+            'orders_submitted': 0,
+            'orders_failed': 0,
+            'batches': 0,
+            'protection_retries': 0,
+            'protections_replaced': 0,
+            'orders_canceled': 0,
+            'unprotected_positions': 0
+        }
+
+    @property
+    def native(self) -> bool:
+        """Client supports the async batch endpoints."""
+        return callable(getattr(self.binance, 'place_batch_orders_async', None))
+
+    # ------------------------------------------------------------------
+    # Order parameters
+    # ------------------------------------------------------------------
+
+    async def format_quantity(self, symbol: str, quantity: float, price: Optional[float]) -> Optional[float]:
+        """LOT_SIZE / MIN_NOTIONAL formatting, done once for every leg of a position."""
+        formatter = getattr(self.binance, 'format_quantity', None)
+        if formatter is None:
+            return quantity
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, formatter, symbol, quantity, price)
+
+    @staticmethod
+    def entry_params(symbol: str, action: str, quantity: float, limit_price: Optional[float] = None) -> Dict[str, Any]:
+        params = {
+            'symbol': symbol,
+            'side': action,
+            'type': 'LIMIT' if limit_price else 'MARKET',
+            'quantity': quantity,
+            'positionSide': 'LONG' if action == 'BUY' else 'SHORT'  # 雙向持倉模式必需
+        }
+        if limit_price:
+            params['price'] = round(limit_price, 8)
+            params['timeInForce'] = 'GTC'
+        return params
+
+    @staticmethod
+    def protection_params(symbol: str, action: str, quantity: float, stop_loss: Optional[float] = None,
+                          take_profit: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Stop-loss and / or take-profit orders for a position opened with action."""
+        side, position_side = close_side(action)
+        orders = []
+        for order_type, trigger in (('STOP_MARKET', stop_loss), ('TAKE_PROFIT_MARKET', take_profit)):
+            if trigger is None:
+                continue
+            orders.append({
+                'symbol': symbol,
+                'side': side,
+                'type': order_type,
+                'stopPrice': round(trigger, 8),
+                'quantity': quantity,
+                'positionSide': position_side,
+                'reduceOnly': True,        # 只平倉，不開新倉（安全保護）
+                'workingType': 'MARK_PRICE',
+                'priceProtect': True
+            })
+        return orders
+
+    @staticmethod
+    def limit_price(action: str, price: float) -> float:
+        """Entry limit price offset from the market by LIMIT_ORDER_OFFSET_PERCENT."""
+        offset_pct = Config.LIMIT_ORDER_OFFSET_PERCENT / 100
+        # 做多掛低於市價，做空掛高於市價
+        return round(price * (1 - offset_pct) if action == 'BUY' else price * (1 + offset_pct), 8)
+
+    # ------------------------------------------------------------------
+    # Position operations
+    # ------------------------------------------------------------------
+
+    async def prepare(self, symbol: str, action: str, quantity: float, stop_loss: float, take_profit: float,
+                      price: Optional[float], leverage: Optional[float] = None, available_margin: Optional[float] = None,
+                      order_type: Optional[str] = None) -> Optional[PreparedOrder]:
+        """
+        Pre-trade preparation: everything open_position needs short of the network call.
+
+        Resolves the symbol filters, rounds quantity and prices and checks
+        notional and margin, from in-memory exchange metadata and the given
+        price (the cycle's price board), so it can run while signals are ranked.
+        Without a price the notional / margin checks are skipped.
+
+        Returns:
+            PreparedOrder, or None when the order cannot be placed
+        """
+        order_type = order_type or Config.ORDER_TYPE
+        limit_price = self.limit_price(action, price) if order_type == 'LIMIT' and price else None
+
+        loop = asyncio.get_event_loop()
+        quantity, limit_price, stop_loss, take_profit = await loop.run_in_executor(
+            None, self._format_sync, symbol, quantity, limit_price or price, limit_price, stop_loss, take_profit
+        )
+        if quantity is None:
+            logger.error(f"❌ Order rejected: {symbol} cannot meet MIN_NOTIONAL requirement")
+            return None
+
+        notional = float(quantity) * (limit_price or price or 0.0)
+        margin = notional / leverage if leverage else notional
+        if available_margin is not None and margin > available_margin:
+            logger.warning(
+                f"❌ Order rejected: {symbol} needs ${margin:.2f} margin, ${available_margin:.2f} available"
+            )
+            return None
+
+        return PreparedOrder(
+            symbol=symbol,
+            action=action,
+            quantity=float(quantity),
+            entry=self.entry_params(symbol, action, quantity, limit_price),
+            protection=self.protection_params(symbol, action, quantity, stop_loss, take_profit),
+            notional=notional,
+            margin=margin
+        )
+
+    async def open_position(self, symbol: str, action: str, quantity: float, stop_loss: float,
+                            take_profit: float, price: Optional[float] = None,
+                            order_type: Optional[str] = None,
+                            trace: Optional[SignalTrace] = None) -> Dict[str, Any]:
+        """
+        Prepare and submit an entry with its exchange-level SL / TP.
+
+        Returns:
+            {'entry', 'stop_loss', 'take_profit': order or None, 'quantity', 'seconds'}
+        """
+        order_type = order_type or Config.ORDER_TYPE
+        if order_type == 'LIMIT' and price is None:
+            price = await self._ticker_price(symbol)
+        prepared = await self.prepare(symbol, action, quantity, stop_loss, take_profit, price, order_type=order_type)
+        if prepared is None:
+            return {ENTRY: None, STOP_LOSS: None, TAKE_PROFIT: None, 'quantity': None, 'seconds': 0.0}
+        return await self.submit(prepared, trace=trace)
+
+    async def submit(self, prepared: PreparedOrder, trace: Optional[SignalTrace] = None) -> Dict[str, Any]:
+        """
+        Submit a prepared entry with its exchange-level SL / TP.
+
+        MARKET entries go out in the same batch as their protection; a LIMIT
+        entry may rest, so its protection follows once it is accepted.
+        order_sent / order_acked / filled / sl_placed / tp_placed are marked
+        on trace when given.
+
+        Returns:
+            {'entry', 'stop_loss', 'take_profit': order or None, 'quantity', 'seconds'}
+        """
+        started = time.perf_counter()
+        symbol, entry, protection = prepared.symbol, prepared.entry, prepared.protection
+        result = {ENTRY: None, STOP_LOSS: None, TAKE_PROFIT: None, 'quantity': prepared.quantity, 'seconds': 0.0}
+        limit_price = entry.get('price')
+        levels = ' / '.join(f"{order['type']} {order['stopPrice']:.8f}" for order in protection)
+        logger.info(
+            f"Placing {prepared.action} {entry['type']} {symbol} qty={prepared.quantity}"
+            f"{f' @ {limit_price:.8f}' if limit_price else ''} with {levels}"
+        )
+
+        trace = trace if trace is not None else SignalTrace()
+        trace.mark('order_sent')
+        if entry['type'] == 'MARKET':
+            responses = await self._submit('entry_with_protection', symbol, [entry] + protection)
+            result[ENTRY] = responses[0]
+            # 只有一個止損 / 止盈價位時批次中只有一筆保護單：按訂單類型歸位
+            for leg, response in zip(protection_legs(protection), responses[1:]):
+                result[leg] = response
+            if result[ENTRY] is None:
+                # 入場失敗時，同批次已接受的保護單沒有倉位可保護
+                await self.cancel(symbol, [r['orderId'] for r in responses[1:] if r])
+                return result
+            self._mark_placed(trace, result)
+            # 批次內各筆獨立處理：被拒的保護單（例如先於入場成交處理）單獨重試
+            await self._complete_protection(symbol, protection, result, steps=('protection_retry',))
+        else:
+            result[ENTRY], = await self._submit(ENTRY, symbol, [entry])
+            if result[ENTRY] is None:
+                return result
+            self._mark_placed(trace, result)
+            await self._complete_protection(symbol, protection, result)
+        self._mark_placed(trace, result)
+        result['seconds'] = time.perf_counter() - started
+        self._record('entry_to_protected', symbol, result['seconds'])
+        return result
+
+    async def protect(self, symbol: str, action: str, quantity: float, stop_loss: float,
+                      take_profit: float) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """Place SL and TP for an existing position in one round trip."""
+        result = {STOP_LOSS: None, TAKE_PROFIT: None}
+        quantity = await self.format_quantity(symbol, quantity, stop_loss)
+        if quantity is None:
+            logger.error(f"❌ Protection orders rejected: {symbol} cannot meet requirements")
+            return None, None
+        protection = self.protection_params(symbol, action, quantity, stop_loss, take_profit)
+        await self._complete_protection(symbol, protection, result)
+        return result[STOP_LOSS], result[TAKE_PROFIT]
+
+    async def replace_protection(self, symbol: str, action: str, quantity: float,
+                                 stop_loss: Optional[float] = None, take_profit: Optional[float] = None,
+                                 stop_loss_order_id: Optional[int] = None,
+                                 take_profit_order_id: Optional[int] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Amend protection: place the new orders, then batch-cancel the ones they replace.
+
+        The new order goes in first so the position is never left without a
+        stop; an old order is only cancelled once its replacement is live.
+
+        Returns:
+            {'stop_loss', 'take_profit': new order or None (not replaced)}
+        """
+        replaced = {STOP_LOSS: None, TAKE_PROFIT: None}
+        quantity = await self.format_quantity(symbol, quantity, stop_loss or take_profit)
+        if quantity is None:
+            return replaced
+
+        protection = self.protection_params(symbol, action, quantity, stop_loss, take_profit)
+        if not protection:
+            return replaced
+        legs = protection_legs(protection)
+        responses = await self._submit('replace_protection', symbol, protection)
+
+        old_ids = {STOP_LOSS: stop_loss_order_id, TAKE_PROFIT: take_profit_order_id}
+        stale = []
+        for leg, response in zip(legs, responses):
+            replaced[leg] = response
+            if response and old_ids[leg]:
+                stale.append(old_ids[leg])
+            elif not response:
+                logger.error(f"❌ Failed to replace {leg} for {symbol}, keeping existing order")
+        if stale:
+            await self.cancel(symbol, stale)
+        self.stats['protections_replaced'] += sum(1 for response in responses if response)
+        return replaced
+
+    async def close_position(self, symbol: str, action: str, quantity: float,
+                             order_ids: Sequence[Optional[int]] = ()) -> Optional[Dict]:
+        """Market-close a position (its own positionSide) and cancel its protection orders."""
+        side, position_side = close_side(action)
+        quantity = await self.format_quantity(symbol, quantity, None)
+        order = {
+            'symbol': symbol,
+            'side': side,
+            'type': 'MARKET',
+            'quantity': quantity,
+            'positionSide': position_side
+        }
+        response, = await self._submit('close', symbol, [order])
+        ids = [order_id for order_id in order_ids if order_id]
+        if response and ids:
+            await self.cancel(symbol, ids)
+        return response
+
+    async def cancel(self, symbol: str, order_ids: Sequence[int]) -> List[Optional[Dict]]:
+        """Batch-cancel orders (already filled / expired ones just come back as None)."""
+        if not order_ids:
+            return []
+        started = time.perf_counter()
+        if self.native:
+            responses = await self.binance.cancel_orders_async(symbol, list(order_ids))
+        else:
+            cancel_order = getattr(self.binance, 'cancel_order', None)
+            loop = asyncio.get_event_loop()
+            responses = []
+            for order_id in order_ids:
+                responses.append(
+                    await loop.run_in_executor(None, cancel_order, symbol, order_id) if cancel_order else None
+                )
+        self._record('cancel', symbol, time.perf_counter() - started)
+        self.stats['orders_canceled'] += sum(1 for response in responses if response)
+        return responses
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _mark_placed(trace: SignalTrace, result: Dict[str, Any]):
+        """Mark the stages whose orders are now acknowledged (earlier marks are kept)."""
+        if result[ENTRY]:
+            trace.mark('order_acked')
+            if result[ENTRY].get('status') == 'FILLED':
+                trace.mark('filled')
+        if result[STOP_LOSS]:
+            trace.mark('sl_placed')
+        if result[TAKE_PROFIT]:
+            trace.mark('tp_placed')
+
+    async def _complete_protection(self, symbol: str, protection: List[Dict[str, Any]], result: Dict[str, Any],
+                                   steps: Tuple[str, ...] = ('protection', 'protection_retry')):
+        """Submit whichever of SL / TP is still missing from result, one step per attempt."""
+        for step in steps:
+            missing = [(leg, params) for leg, params in zip(protection_legs(protection), protection)
+                       if result[leg] is None]
+            if not missing:
+                break
+            if step == 'protection_retry':
+                self.stats['protection_retries'] += 1
+            responses = await self._submit(step, symbol, [params for _, params in missing])
+            for (leg, _), response in zip(missing, responses):
+                result[leg] = response
+
+        # 告警由 ExecutionService 處理（只計算應有的保護單）
+        if any(result[leg] is None for leg in protection_legs(protection)):
+            self.stats['unprotected_positions'] += 1
+
+    async def _submit(self, step: str, symbol: str, orders: List[Dict[str, Any]]) -> List[Optional[Dict]]:
+        """Submit orders in one batch (or one by one through the sync methods); results align with orders."""
+        started = time.perf_counter()
+        try:
+            if self.native:
+                if len(orders) == 1:
+                    responses = [await self.binance.create_order_async(orders[0])]
+                else:
+                    responses = await self.binance.place_batch_orders_async(orders)
+                    self.stats['batches'] += 1
+            else:
+                loop = asyncio.get_event_loop()
+                responses = [await loop.run_in_executor(None, self._submit_sync, order) for order in orders]
+        except Exception as e:
+            logger.error(f"❌ Order step '{step}' failed for {symbol}: {e}")
+            responses = [None] * len(orders)
+
+        self._record(step, symbol, time.perf_counter() - started)
+        self.stats['orders_submitted'] += len(orders)
+        self.stats['orders_failed'] += sum(1 for response in responses if not response)
+        return responses
+
+    def _format_sync(self, symbol: str, quantity: float, notional_price: Optional[float],
+                     limit_price: Optional[float], stop_loss: Optional[float], take_profit: Optional[float]) -> tuple:
+        """Quantity (LOT_SIZE / MIN_NOTIONAL) and prices (PRICE_FILTER) in one pass over the cached filters."""
+        formatter = getattr(self.binance, 'format_quantity', None)
+        if formatter is not None:
+            quantity = formatter(symbol, quantity, notional_price)
+        format_price = getattr(self.binance, 'format_price', None)
+        if format_price is None:
+            return quantity, limit_price, stop_loss, take_profit
+        return (quantity,) + tuple(
+            format_price(symbol, level) if level is not None else None
+            for level in (limit_price, stop_loss, take_profit)
+        )
+
+    def _submit_sync(self, params: Dict[str, Any]) -> Optional[Dict]:
+        """One order through the client's synchronous BinanceDataClient-style methods."""
+        symbol, side, quantity = params['symbol'], params['side'], params['quantity']
+        if params['type'] == 'STOP_MARKET':
+            return self.binance.set_stop_loss_order(symbol, side, quantity, params['stopPrice'], params['positionSide'])
+        if params['type'] == 'TAKE_PROFIT_MARKET':
+            return self.binance.set_take_profit_order(symbol, side, quantity, params['stopPrice'], params['positionSide'])
+        return self.binance.place_order(symbol, side, params['type'], quantity, params.get('price'))
+
+    async def _ticker_price(self, symbol: str) -> Optional[float]:
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(None, self.binance.get_ticker_price, symbol)
+        except Exception as e:
+            logger.error(f"Error fetching price for {symbol}: {e}")
+            return None
+
+    def _record(self, step: str, symbol: str, seconds: float):
+        entry = self.latency.setdefault(step, {'count': 0, 'total': 0.0, 'max': 0.0})
+        entry['count'] += 1
+        entry['total'] += seconds
+        entry['max'] = max(entry['max'], seconds)
+        logger.debug(f"Order step '{step}' for {symbol}: {seconds * 1000:.1f}ms")
+        if self.monitoring_service:
+            self.monitoring_service.record_metric(
+                'order_latency_seconds', seconds, {'step': step, 'symbol': symbol}
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get order gateway statistics."""
+        return {
+            **self.stats,
+            'native': self.native,
+            'latency': {
+                step: {
+                    'count': entry['count'],
+                    'mean_ms': entry['total'] / entry['count'] * 1000,
+                    'max_ms': entry['max'] * 1000
+                }
+                for step, entry in self.latency.items()
+            }
+        }
+
+    def reset_stats(self):
+        """Reset statistics counters."""
+        self.stats = {key: 0 for key in self.stats}
+        self.latency = {}
@@ -0,0 +1,351 @@
+"""
+Parallel Analysis - Multi-core strategy evaluation for StrategyEngine.
+
+Responsibilities:
+- Pack indicator frames into one shared-memory block (no pickled DataFrames)
+- Shard symbols across a ProcessPoolExecutor
+- Run every registered strategy's pure evaluation in worker processes
+- Return compact result records to the event loop
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Columns shipped to workers (everything the strategy reads)
+FRAME_COLUMNS = [
+    'timestamp', 'open', 'high', 'low', 'close', 'volume',
+    'ema_9', 'ema_21', 'ema_50',
+    'macd', 'macd_signal', 'macd_hist',
+    'rsi', 'atr',
+    'bb_upper', 'bb_middle', 'bb_lower'
+]
+
+# Worker-process strategy instances (installed once per worker by the initializer)
+_worker_strategies: Dict[str, Any] = {}
+
+
+class SharedFrameBlock:
+    """
+    Indicator frames of many symbols packed into one shared-memory array.
+
+    Layout: float64 array of shape (n_symbols, max_rows, n_columns), padded
+    with NaN, plus the real row count of each symbol. Timestamps are stored
+    as epoch milliseconds; each column's original dtype is recorded so the
+    workers rebuild frames that are bit-identical to the parent's.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], columns: List[str] = FRAME_COLUMNS):
+        """
+        Pack frames into shared memory.
+
+        Args:
+            frames: Dict of {symbol: DataFrame with indicators}
+            columns: Columns to pack (missing columns are left as NaN)
+        """
+        self.symbols = list(frames.keys())
+        self.columns = list(columns)
+        self.lengths = [len(frames[sym]) for sym in self.symbols]
+        self.dtypes = self._column_dtypes(frames)
+
+        max_rows = max(self.lengths) if self.lengths else 1
+        self.shape = (len(self.symbols), max_rows, len(self.columns))
+        nbytes = max(int(np.prod(self.shape)) * 8, 8)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        block = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        block.fill(np.nan)
+
+        for i, sym in enumerate(self.symbols):
+            df = frames[sym]
+            n = self.lengths[i]
+            for j, col in enumerate(self.columns):
+                if col not in df.columns:
+                    continue
+                values = df[col].values
+                if col == 'timestamp':
+                    values = pd.to_datetime(values).asi8 // 1_000_000
+                block[i, :n, j] = values
+
+    def _column_dtypes(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, str]:
+        """Record the dtype of each numeric column (taken from the first frame)."""
+        dtypes = {}
+        for df in frames.values():
+            for col in self.columns:
+                if col in df.columns and col != 'timestamp':
+                    dtypes[col] = str(df[col].dtype)
+            break
+        return dtypes
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def descriptor(self) -> Dict[str, Any]:
+        """Small picklable description of the block sent to workers."""
+        return {
+            'name': self.shm.name,
+            'shape': self.shape,
+            'columns': self.columns,
+            'dtypes': self.dtypes
+        }
+
+    def release(self):
+        """Close and unlink the shared-memory segment."""
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _init_worker(strategies: Dict[str, Any]):
+    """Process-pool initializer: install a copy of every registered strategy."""
+    global _worker_strategies
+    _worker_strategies = dict(strategies)
+
+
+def _frame_from_block(block: np.ndarray, index: int, length: int, descriptor: Dict[str, Any]) -> pd.DataFrame:
+    """Rebuild one symbol's DataFrame from the shared block."""
+    data = {}
+    for j, col in enumerate(descriptor['columns']):
+        column = block[index, :length, j]
+        if col == 'timestamp':
+            data[col] = pd.to_datetime(column.astype(np.int64), unit='ms')
+        else:
+            data[col] = column.astype(descriptor['dtypes'].get(col, 'float64'))
+    return pd.DataFrame(data)
+
+
+def _to_compact_record(strategy_name: str, symbol: str, result) -> Optional[Tuple]:
+    """Reduce a StrategyResult to a small tuple (None when there is no signal)."""
+    if not result.has_signal:
+        return None
+
+    signal = result.signal
+    metadata = {}
+    for key, value in signal.get('metadata', {}).items():
+        if isinstance(value, (np.floating, np.integer)):
+            value = value.item()
+        metadata[key] = value
+
+    return (
+        strategy_name,
+        symbol,
+        signal['type'],
+        float(signal['price']),
+        float(signal['confidence']),
+        float(signal.get('expected_roi', 3.0)),
+        float(signal['stop_loss']),
+        float(signal['take_profit']),
+        signal.get('reason', ''),
+        result.structure,
+        metadata
+    )
+
+
+def _analyze_shard(
+    descriptor: Dict[str, Any],
+    shard: List[Tuple[int, str, int, str]]
+) -> Tuple[List[Tuple], int, float, Dict[str, float]]:
+    """
+    Worker entry point: evaluate a shard of symbols with every strategy.
+
+    Args:
+        descriptor: SharedFrameBlock.descriptor()
+        shard: List of (block_index, symbol, row_count, trend_15m)
+
+    Returns:
+        (compact signal records, symbols evaluated, CPU seconds,
+         {strategy_name: seconds})
+    """
+    started = time.perf_counter()
+    # Pool workers share the parent's resource tracker, and the parent owns
+    # (and unlinks) the segment, so attaching needs no extra bookkeeping
+    shm = shared_memory.SharedMemory(name=descriptor['name'])
+
+    records = []
+    frames = {}
+    trends = {}
+    try:
+        block = np.ndarray(descriptor['shape'], dtype=np.float64, buffer=shm.buf)
+        for index, symbol, length, trend_15m in shard:
+            try:
+                frames[symbol] = _frame_from_block(block, index, length, descriptor)
+                trends[symbol] = trend_15m
+            except Exception as e:
+                logger.error(f"Worker error loading {symbol}: {e}")
+        # Frames own copies of the data; drop the view before closing the mapping
+        del block
+    finally:
+        shm.close()
+
+    # Frames are rebuilt once and shared by all strategies
+    timings = {}
+    for name, strategy in _worker_strategies.items():
+        strategy_started = time.perf_counter()
+        try:
+            if hasattr(strategy, 'evaluate_batch'):
+                results = strategy.evaluate_batch(frames, trends=trends)
+            else:
+                results = {
+                    symbol: strategy.evaluate(df, trend_15m=trends[symbol], symbol=symbol)
+                    for symbol, df in frames.items()
+                }
+        except Exception as e:
+            logger.error(f"Worker error in strategy {name}: {e}")
+            results = {}
+        timings[name] = time.perf_counter() - strategy_started
+
+        for symbol, result in results.items():
+            record = _to_compact_record(name, symbol, result)
+            if record is not None:
+                records.append(record)
+
+    return records, len(frames), time.perf_counter() - started, timings
+
+
+class ProcessPoolAnalyzer:
+    """Shards strategy evaluation across a pool of worker processes."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        strategies: Optional[Dict[str, Any]] = None,
+        start_method: str = 'spawn',
+        shards_per_worker: int = 2
+    ):
+        """
+        Initialize process-pool analyzer.
+
+        Args:
+            max_workers: Pool size (default: CPU count)
+            strategies: {name: strategy} copied into every worker (must be picklable)
+            start_method: multiprocessing start method ('spawn', 'forkserver', 'fork')
+            shards_per_worker: Shards per worker (>1 smooths uneven shards)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.strategies = strategies or {}
+        self.start_method = start_method
+        self.shards_per_worker = max(1, shards_per_worker)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        # Statistics
+        self.stats = {
+            'batches': 0,
+            'symbols_evaluated': 0,
+            'worker_cpu_seconds': 0.0,
+            'wall_seconds': 0.0,
+            'pool_restarts': 0
+        }
+
+        logger.info(f"ProcessPoolAnalyzer initialized: workers={self.max_workers}, start_method={start_method}")
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Create the pool lazily (workers are reused across cycles)."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=_init_worker,
+                initargs=(self.strategies,)
+            )
+        return self._pool
+
+    def _make_shards(self, items: List[Tuple[int, str, int, str]]) -> List[List[Tuple[int, str, int, str]]]:
+        """Split work into roughly equal shards (largest frames spread first)."""
+        n_shards = min(len(items), self.max_workers * self.shards_per_worker)
+        shards = [[] for _ in range(n_shards)]
+        for k, item in enumerate(sorted(items, key=lambda x: -x[2])):
+            shards[k % n_shards].append(item)
+        return shards
+
+    async def analyze(
+        self,
+        frames: Dict[str, pd.DataFrame],
+        trends: Dict[str, str]
+    ) -> Tuple[List[Tuple], Dict[str, float]]:
+        """
+        Evaluate all frames in worker processes without blocking the event loop.
+
+        Args:
+            frames: Dict of {symbol: DataFrame with indicators}
+            trends: Dict of {symbol: trend_15m}
+
+        Returns:
+            (compact signal records (see _to_compact_record),
+             {strategy_name: worker seconds})
+        """
+        if not frames:
+            return [], {}
+
+        started = time.perf_counter()
+        block = SharedFrameBlock(frames)
+
+        try:
+            items = [
+                (i, sym, block.lengths[i], trends.get(sym, 'neutral'))
+                for i, sym in enumerate(block.symbols)
+            ]
+            descriptor = block.descriptor()
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+
+            futures = [
+                loop.run_in_executor(pool, _analyze_shard, descriptor, shard)
+                for shard in self._make_shards(items)
+            ]
+            shard_results = await asyncio.gather(*futures)
+        finally:
+            block.release()
+
+        records = []
+        timings = {}
+        for shard_records, evaluated, cpu_seconds, shard_timings in shard_results:
+            records.extend(shard_records)
+            self.stats['symbols_evaluated'] += evaluated
+            self.stats['worker_cpu_seconds'] += cpu_seconds
+            for name, seconds in shard_timings.items():
+                timings[name] = timings.get(name, 0.0) + seconds
+
+        elapsed = time.perf_counter() - started
+        self.stats['batches'] += 1
+        self.stats['wall_seconds'] += elapsed
+
+        logger.info(
+            f"Process pool analyzed {len(frames)} symbols in {elapsed:.2f}s "
+            f"({self.max_workers} workers, {len(records)} signals)"
+        )
+        return records, timings
+
+    def restart(self):
+        """Discard a broken pool; a fresh one is created on next use."""
+        self.shutdown(wait=False)
+        self.stats['pool_restarts'] += 1
+
+    def shutdown(self, wait: bool = True):
+        """Shut down worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get analyzer statistics."""
+        return {
+            **self.stats,
+            'max_workers': self.max_workers,
+            'parallel_efficiency': (
+                self.stats['worker_cpu_seconds'] /
+                max(self.stats['wall_seconds'] * self.max_workers, 1e-9)
+            )
+        }
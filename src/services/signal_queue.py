@@ -0,0 +1,139 @@
+"""
+Signal Queue - Priority queue between the market scanner and the executor.
+
+Responsibilities:
+- Accept signals as soon as each scanned chunk of symbols is analysed
+- Hand them to the executor one window at a time: the first signal opens a
+  window, everything that arrives within window_seconds competes, and the
+  top K (free position slots) by the ranking mode are returned
+- Drop signals that waited longer than max_age_seconds
+- Expose depth and wait-time statistics
+
+Signals that lose their window are returned alongside the winners, so the
+executor can track them as virtual positions like the lower-ranked signals
+of a lockstep cycle.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Tuple
+
+from src.services.signal_trace import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+def signal_priority(signal, mode: str = 'confidence') -> float:
+    """Ranking key of StrategyEngine.rank_signals (higher is better)."""
+    if mode == 'confidence':
+        return signal.confidence
+    if mode == 'roi':
+        return signal.expected_roi
+    return signal.confidence * signal.expected_roi
+
+
+class SignalQueue:
+    """Priority queue of Signal objects, consumed in top-K windows."""
+
+    def __init__(self, mode: str = 'confidence', window_seconds: float = 0.5,
+                 max_age_seconds: float = 60.0, monitoring_service=None):
+        """
+        Initialize signal queue.
+
+        Args:
+            mode: Ranking mode ('confidence', 'roi' or combined), as rank_signals
+            window_seconds: How long a window collects signals after the first one
+            max_age_seconds: Signals older than this are dropped unexecuted
+            monitoring_service: Receives 'signal_queue_depth' / 'signal_queue_wait_seconds' metrics
+        """
+        self.mode = mode
+        self.window_seconds = window_seconds
+        self.max_age_seconds = max_age_seconds
+        self.monitoring_service = monitoring_service
+
+        # (-priority, 序號, 入隊時間, signal)：同優先級按到達順序
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._available = asyncio.Event()
+        self.wait_time = LatencyHistogram()
+
+        # Statistics
+        self.stats = {
+            'published': 0,
+            'consumed': 0,
+            'windows': 0,
+            'superseded': 0,
+            'dropped_stale': 0,
+            'max_depth': 0
+        }
+
+    @property
+    def depth(self) -> int:
+        return len(self._heap)
+
+    def publish(self, signal):
+        """Enqueue a signal (non-blocking; called by the scanner)."""
+        heapq.heappush(self._heap, (-signal_priority(signal, self.mode), next(self._seq), time.monotonic(), signal))
+        self.stats['published'] += 1
+        self.stats['max_depth'] = max(self.stats['max_depth'], self.depth)
+        self._available.set()
+        if self.monitoring_service:
+            self.monitoring_service.record_metric('signal_queue_depth', self.depth)
+
+    async def next_window(self, limit: int) -> Tuple[List[Any], List[Any]]:
+        """
+        Wait for a signal, collect for window_seconds, then split off the best `limit`.
+
+        Returns:
+            (selected, superseded): the best `limit` signals, and the rest of
+            the window in priority order (stale signals are dropped)
+        """
+        while not self._heap:
+            self._available.clear()
+            await self._available.wait()
+        if self.window_seconds > 0:
+            await asyncio.sleep(self.window_seconds)
+        self.stats['windows'] += 1
+
+        now = time.monotonic()
+        selected = []
+        superseded = []
+        while self._heap:
+            _, _, enqueued_at, signal = heapq.heappop(self._heap)
+            waited = now - enqueued_at
+            if waited > self.max_age_seconds:
+                self.stats['dropped_stale'] += 1
+                logger.info(f"⌛ Dropping stale signal {signal.symbol} (queued {waited:.1f}s)")
+                continue
+            if len(selected) >= limit:
+                self.stats['superseded'] += 1
+                superseded.append(signal)
+                continue
+            selected.append(signal)
+            self.wait_time.add(waited)
+            if self.monitoring_service:
+                self.monitoring_service.record_metric('signal_queue_wait_seconds', waited, {'symbol': signal.symbol})
+        self.stats['consumed'] += len(selected)
+        return selected, superseded
+
+    def clear(self) -> int:
+        """Discard everything queued (shutdown)."""
+        dropped = self.depth
+        self._heap.clear()
+        return dropped
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get signal queue statistics."""
+        return {
+            **self.stats,
+            'depth': self.depth,
+            'wait_ms': self.wait_time.to_dict()
+        }
+
+    def reset_stats(self):
+        """Reset statistics counters."""
+        self.stats = {key: 0 for key in self.stats}
+        self.wait_time = LatencyHistogram()
@@ -0,0 +1,122 @@
+"""
+Signal Trace - Monotonic timeline of a signal from candle close to protected position.
+
+Responsibilities:
+- SignalTrace: per-signal stage timestamps (time.monotonic), carried on the
+  Signal and then the Position
+- LatencyHistogram: fixed log-spaced buckets MonitoringService aggregates
+  each stage's latency into
+
+A stage's latency is the time since the previous stage the trace reached,
+so a slow entry points at the stage responsible.
+"""
+
+import bisect
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# 按發生順序排列的階段
+STAGES = (
+    'candle_closed',      # 觸發信號的 K 線收盤（數據推導的牆鐘時間）
+    'data_fetched',
+    'indicators_done',
+    'signal_generated',
+    'ranked',
+    'risk_sized',
+    'order_sent',
+    'order_acked',
+    'filled',
+    'sl_placed',
+    'tp_placed'
+)
+
+
+@dataclass
+class SignalTrace:
+    """Stage → time.monotonic() of one signal."""
+    marks: Dict[str, float] = field(default_factory=dict)
+
+    def mark(self, stage: str, at: Optional[float] = None):
+        """Record a stage (now, or at a given monotonic time); the first mark of a stage wins."""
+        if stage not in self.marks:
+            self.marks[stage] = time.monotonic() if at is None else at
+
+    def mark_wall(self, stage: str, wall_time: float):
+        """Record a stage that happened at an epoch time (candle close, signal timestamp)."""
+        self.mark(stage, time.monotonic() - (time.time() - wall_time))
+
+    def merge(self, other: 'SignalTrace'):
+        """Add stages recorded on another trace (e.g. the cycle-wide fetch / indicator stages)."""
+        for stage, at in other.marks.items():
+            self.mark(stage, at)
+
+    def ordered(self) -> List[tuple]:
+        return [(stage, self.marks[stage]) for stage in STAGES if stage in self.marks]
+
+    def stage_latencies(self) -> Dict[str, float]:
+        """Seconds from the previous reached stage to each stage (the first stage has none)."""
+        ordered = self.ordered()
+        return {stage: max(at - ordered[i][1], 0.0) for i, (stage, at) in enumerate(ordered[1:])}
+
+    def total(self) -> float:
+        ordered = self.ordered()
+        return ordered[-1][1] - ordered[0][1] if len(ordered) > 1 else 0.0
+
+    def slowest_stage(self) -> Optional[str]:
+        latencies = self.stage_latencies()
+        return max(latencies, key=latencies.get) if latencies else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON form for the trade log (monotonic times as ms offsets from the first stage)."""
+        ordered = self.ordered()
+        start = ordered[0][1] if ordered else 0.0
+        return {
+            'offsets_ms': {stage: round((at - start) * 1000, 3) for stage, at in ordered},
+            'stages_ms': {stage: round(s * 1000, 3) for stage, s in self.stage_latencies().items()},
+            'total_ms': round(self.total() * 1000, 3),
+            'slowest_stage': self.slowest_stage()
+        }
+
+
+class LatencyHistogram:
+    """Latency histogram with fixed bucket upper bounds (ms)."""
+
+    BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000, 300000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)   # 最後一格：超出最大邊界
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound (ms) of the bucket holding the q-quantile (max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= rank and n:
+                return float(self.BOUNDS_MS[i]) if i < len(self.BOUNDS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={b}ms" for b in self.BOUNDS_MS] + [f">{self.BOUNDS_MS[-1]}ms"]
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else None,
+            'p50_ms': self.quantile(0.5),
+            'p90_ms': self.quantile(0.9),
+            'p99_ms': self.quantile(0.99),
+            'max_ms': self.max,
+            'buckets': {label: n for label, n in zip(labels, self.counts) if n}
+        }
@@ -4,17 +4,25 @@ Strategy Engine - Multi-strategy analysis and signal generation.
 Responsibilities:
 - Execute technical analysis across strategies
 - Multi-factor signal scoring
+- Signal fusion across strategies (voting / weighted / veto)
 - Signal filtering and ranking
 - Strategy performance tracking
 """
 
 import asyncio
+import inspect
+import time
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 import pandas as pd
 import logging
 
-from src.strategies.ict_smc import ICTSMCStrategy
+from src.config import Config
+from src.services.signal_trace import SignalTrace
+from src.strategies.ict_smc import ICTSMCStrategy, StrategyResult
+from src.strategies.prescreen import SignalPrescreen
+from src.strategies.signal_fusion import SignalCombiner, create_combiner, parse_weights
+from src.strategies.structure_tracker import StructureTracker
 
 logger = logging.getLogger(__name__)
 
@@ -32,37 +40,92 @@ class Signal:
     strategy: str
     timestamp: float
     metadata: Dict[str, Any]
+    reason: str = ''
+    trace: Optional[SignalTrace] = None  # 從 K 線收盤到下單保護的階段時間線
+    prepared: Optional[Any] = None       # 排名階段預備的下單參數（ExecutionService.prepare_signal）
 
 
 class StrategyEngine:
     """Engine for running multiple trading strategies and ranking signals."""
     
-    def __init__(self, risk_manager, data_service=None):
+    def __init__(
+        self,
+        risk_manager,
+        data_service=None,
+        executor_mode: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        combiner: Optional[SignalCombiner] = None
+    ):
         """
         Initialize strategy engine.
         
         Args:
             risk_manager: Risk management instance
             data_service: DataService instance for cached market data
+            executor_mode: 'async' (default) or 'process' (multi-core process pool)
+            max_workers: Process pool size (default: Config.STRATEGY_WORKERS)
+            combiner: Signal combiner (default: Config.STRATEGY_COMBINER)
         """
         self.risk_manager = risk_manager
         self.data_service = data_service
+        self.executor_mode = (executor_mode or Config.STRATEGY_EXECUTOR).lower()
+        self.max_workers = max_workers or Config.STRATEGY_WORKERS
+        self._process_analyzer = None
         
         # Initialize strategies
         self.strategies = {
             'ict_smc': ICTSMCStrategy()
         }
+        self.primary_strategy = 'ict_smc'
+        
+        # 多策略信號融合
+        self.combiner = combiner or create_combiner(
+            Config.STRATEGY_COMBINER,
+            primary=self.primary_strategy,
+            weights=parse_weights(Config.STRATEGY_WEIGHTS),
+            min_confidence=self.strategies['ict_smc'].min_confidence_threshold,
+            min_votes=Config.STRATEGY_MIN_VOTES or None
+        )
         
         # Statistics
-        self.stats = {
+        self.stats = self._new_stats()
+        
+        # Memo of the last pure evaluation: {(strategy_name, symbol): (key, StrategyResult)}
+        self._evaluation_cache: Dict[tuple, tuple] = {}
+        
+        # 增量市場結構追蹤（訂單塊 / 流動性區域 / 擺動點跨週期保留，所有策略共用）
+        self.structure_tracker = StructureTracker()
+        
+        # 向量化預篩選（只有可能達到信心度門檻的交易對才進入完整分析）
+        self.prescreen_enabled = Config.PRESCREEN_ENABLED
+        self.prescreen = SignalPrescreen(
+            min_confidence=self.strategies['ict_smc'].min_confidence_threshold,
+            min_volume=Config.PRESCREEN_MIN_VOLUME,
+            min_atr_percent=Config.PRESCREEN_MIN_ATR_PERCENT,
+            max_atr_percent=Config.PRESCREEN_MAX_ATR_PERCENT,
+            audit_rate=Config.PRESCREEN_AUDIT_RATE
+        )
+        
+        logger.info(
+            f"StrategyEngine initialized with {len(self.strategies)} strategies "
+            f"(executor={self.executor_mode}, combiner={self.combiner.name})"
+        )
+    
+    def _new_stats(self) -> Dict[str, Any]:
+        return {
             'total_analyses': 0,
             'signals_generated': 0,
             'signals_filtered': 0,
-            'strategy_stats': {name: {'analyses': 0, 'signals': 0} 
-                              for name in self.strategies.keys()}
+            'strategy_stats': {name: self._new_strategy_stats() for name in self.strategies.keys()},
+            'evaluation_cache_hits': 0,
+            'process_batches': 0,
+            'process_fallbacks': 0
         }
-        
-        logger.info(f"StrategyEngine initialized with {len(self.strategies)} strategies")
+    
+    @staticmethod
+    def _new_strategy_stats() -> Dict[str, Any]:
+        # eval_time_ms：批次牆鐘時間；worker_cpu_ms：進程池模式下各分片在 worker 中的耗時總和
+        return {'analyses': 0, 'signals': 0, 'batches': 0, 'eval_time_ms': 0.0, 'worker_cpu_ms': 0.0, 'errors': 0}
     
     async def analyze_symbol(
         self,
@@ -83,42 +146,13 @@ class StrategyEngine:
         Returns:
             Signal object or None
         """
-        self.stats['total_analyses'] += 1
-        
         # Use data_service from instance if not provided
         if data_service is None:
             data_service = self.data_service
-        
-        # For now, use ICT/SMC strategy
-        # Future: Run multiple strategies and combine signals
-        strategy = self.strategies['ict_smc']
-        self.stats['strategy_stats']['ict_smc']['analyses'] += 1
-        
-        try:
-            # v3.1 優化：使用 DataService 緩存獲取趨勢數據
-            result = await strategy.generate_signal(df, symbol=symbol, data_service=data_service)
-            
-            if result and result.get('type') != 'HOLD':
-                # Create signal object
-                signal = Signal(
-                    symbol=symbol,
-                    action=result['type'],
-                    price=result['price'],
-                    confidence=result['confidence'],
-                    expected_roi=result.get('expected_roi', 3.0),
-                    stop_loss=result['stop_loss'],
-                    take_profit=result['take_profit'],
-                    strategy='ict_smc',
-                    timestamp=pd.Timestamp.now().timestamp(),
-                    metadata=result.get('metadata', {})
-                )
-                
-                self.stats['signals_generated'] += 1
-                self.stats['strategy_stats']['ict_smc']['signals'] += 1
-                
-                return signal
             
-            return None
+        try:
+            signals = await self._analyze_frames({symbol: df}, data_service)
+            return signals[0] if signals else None
             
         except Exception as e:
             logger.error(f"Error analyzing {symbol}: {e}")
@@ -142,20 +176,451 @@ class StrategyEngine:
         # Use data_service from instance if not provided
         if data_service is None:
             data_service = self.data_service
+            
+        candidates = symbols_data
+        audit_symbols = []
+        if self._prescreen_applicable():
+            candidates, audit_symbols = self._prescreen_batch(symbols_data)
+            
+        frames = {
+            symbol: df for symbol, (df, price) in candidates.items()
+            if df is not None and not df.empty
+        }
         
-        tasks = []
-        for symbol, (df, price) in symbols_data.items():
-            if df is not None and not df.empty:
-                tasks.append(self.analyze_symbol(symbol, df, price, data_service=data_service))
+        signals = None
+        if self._use_process_pool(frames):
+            try:
+                signals = await self._analyze_batch_process(frames, data_service)
+            except Exception as e:
+                # BrokenProcessPool 等錯誤：重建進程池並退回 async 模式
+                logger.error(f"Process pool analysis failed, falling back to async: {e}")
+                self.stats['process_fallbacks'] += 1
+                if self._process_analyzer is not None:
+                    self._process_analyzer.restart()
+                    
+        if signals is None:
+            signals = await self._analyze_frames(frames, data_service)
+            logger.info(f"Generated {len(signals)} signals from {len(frames)} symbols")
+            
+        if audit_symbols:
+            await self._audit_prescreen(audit_symbols, symbols_data, data_service)
+            
+        return signals
+    
+    async def _analyze_frames(self, frames: Dict[str, pd.DataFrame], data_service=None) -> List[Signal]:
+        """
+        Shared pipeline: trends fetched once, every strategy evaluated over the
+        same frames and structure state, then fused per symbol.
+        """
+        trends = await self._resolve_trends(frames, data_service)
+        per_strategy = await self._evaluate_strategies(frames, trends)
         
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.stats['total_analyses'] += len(frames)
         
-        # Filter out None and exceptions
-        signals = [r for r in results if isinstance(r, Signal)]
+        signals = []
+        for symbol in frames:
+            signal = self._fuse(symbol, {
+                name: results.get(symbol) for name, results in per_strategy.items()
+            })
+            if signal is not None:
+                signals.append(signal)
+        return signals
+    
+    async def _resolve_trends(self, frames: Dict[str, pd.DataFrame], data_service=None) -> Dict[str, str]:
+        """Fetch 15m trend context once per symbol for all strategies (errors → neutral)."""
+        resolver = getattr(self.strategies.get(self.primary_strategy), 'resolve_trend', None)
+        if resolver is None:
+            return {symbol: 'neutral' for symbol in frames}
+            
+        trend_results = await asyncio.gather(
+            *[resolver(symbol, data_service) for symbol in frames],
+            return_exceptions=True
+        )
+        return {
+            symbol: (trend if isinstance(trend, str) else 'neutral')
+            for symbol, trend in zip(frames, trend_results)
+        }
+    
+    async def _evaluate_strategies(
+        self,
+        frames: Dict[str, pd.DataFrame],
+        trends: Dict[str, str]
+    ) -> Dict[str, Dict[str, StrategyResult]]:
+        """
+        Evaluate every registered strategy over the shared inputs.
         
-        logger.info(f"Generated {len(signals)} signals from {len(symbols_data)} symbols")
+        Memo hits are reused, structure state is advanced once for all
+        strategies, and strategies with pending work run concurrently in
+        worker threads (evaluation is pure, so no locking is needed).
+        
+        Returns:
+            {strategy_name: {symbol: StrategyResult}}
+        """
+        results = {}
+        misses = {}
+        for name in list(self.strategies.keys()):
+            results[name], misses[name] = self._cached_results(name, frames, trends)
+            
+        missed_symbols = {symbol for pending in misses.values() for symbol in pending}
+        structure_states = self._structure_states(
+            {symbol: frames[symbol] for symbol in missed_symbols}
+        ) if missed_symbols else {}
+        
+        pending = [name for name, missed in misses.items() if missed]
+        if len(pending) > 1:
+            outcomes = await asyncio.gather(*[
+                asyncio.to_thread(self._run_strategy, name, misses[name], trends, structure_states)
+                for name in pending
+            ])
+        else:
+            outcomes = [
+                self._run_strategy(name, misses[name], trends, structure_states)
+                for name in pending
+            ]
+            
+        for name, (evaluated, elapsed, errors) in zip(pending, outcomes):
+            self._store_results(name, misses[name], trends, evaluated)
+            results[name].update(evaluated)
+            strategy_stats = self.stats['strategy_stats'][name]
+            strategy_stats['errors'] += errors
+            strategy_stats['batches'] += 1
+            strategy_stats['eval_time_ms'] += elapsed * 1000
+            
+        for name, strategy_results in results.items():
+            strategy_stats = self.stats['strategy_stats'][name]
+            strategy_stats['analyses'] += len(frames)
+            strategy_stats['signals'] += sum(1 for r in strategy_results.values() if r.has_signal)
+            
+        return results
+    
+    def _run_strategy(
+        self,
+        name: str,
+        frames: Dict[str, pd.DataFrame],
+        trends: Dict[str, str],
+        structure_states: Dict[str, Any]
+    ):
+        """
+        Evaluate one strategy over frames (thread-safe, no engine state mutated;
+        callers apply the error count to stats on the loop thread).
+        
+        Returns:
+            ({symbol: StrategyResult}, elapsed seconds, errors)
+        """
+        strategy = self.strategies[name]
+        started = time.perf_counter()
+        results = {}
+        errors = 0
+        
+        try:
+            if hasattr(strategy, 'evaluate_batch'):
+                results = strategy.evaluate_batch(
+                    frames, trends=trends, structure_states=structure_states
+                )
+            else:
+                accepts_state = self._accepts_structure_state(strategy)
+                for symbol, df in frames.items():
+                    kwargs = {'trend_15m': trends.get(symbol, 'neutral'), 'symbol': symbol}
+                    if accepts_state:
+                        kwargs['structure_state'] = structure_states.get(symbol)
+                    results[symbol] = strategy.evaluate(df, **kwargs)
+        except Exception as e:
+            # 單一策略失敗只讓該策略棄權，不影響其他策略
+            logger.error(f"Strategy {name} evaluation failed: {e}")
+            errors = 1
+            results = {}
+            
+        return results, time.perf_counter() - started, errors
+    
+    @staticmethod
+    def _accepts_structure_state(strategy) -> bool:
+        try:
+            return 'structure_state' in inspect.signature(strategy.evaluate).parameters
+        except (TypeError, ValueError):
+            return False
+    
+    def _cached_results(self, strategy_name: str, frames: Dict[str, pd.DataFrame], trends: Dict[str, str]):
+        """Split frames into memo hits and misses for one strategy."""
+        hits = {}
+        misses = {}
+        for symbol, df in frames.items():
+            key = self._evaluation_key(strategy_name, df, trends.get(symbol, 'neutral'))
+            cached = self._evaluation_cache.get((strategy_name, symbol))
+            if cached is not None and key is not None and cached[0] == key:
+                self.stats['evaluation_cache_hits'] += 1
+                hits[symbol] = cached[1]
+            else:
+                misses[symbol] = df
+        return hits, misses
+    
+    def _store_results(self, strategy_name: str, frames: Dict[str, pd.DataFrame], trends: Dict[str, str], results: Dict[str, StrategyResult]):
+        """Memoize freshly evaluated results."""
+        for symbol, result in results.items():
+            key = self._evaluation_key(strategy_name, frames[symbol], trends.get(symbol, 'neutral'))
+            if key is not None:
+                self._evaluation_cache[(strategy_name, symbol)] = (key, result)
+    
+    def _structure_states(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+        """Advance incremental structure for each frame (failed symbols are omitted)."""
+        states = {}
+        for symbol, df in frames.items():
+            state = self._update_structure(symbol, df)
+            if state is not None:
+                states[symbol] = state
+        return states
+    
+    def evaluate_symbol(
+        self,
+        strategy_name: str,
+        symbol: str,
+        df: pd.DataFrame,
+        trend_15m: str = 'neutral'
+    ) -> StrategyResult:
+        """
+        Run a strategy's pure evaluation, memoized per (strategy, symbol).
+        
+        The memo key is the last candle (timestamp, close), the frame length
+        and the trend context, so an unchanged candle is never re-evaluated
+        (e.g. position validation or a rescan in the same cycle).
+        
+        Args:
+            strategy_name: Registered strategy name
+            symbol: Trading symbol
+            df: DataFrame with indicators
+            trend_15m: Trend context
+            
+        Returns:
+            StrategyResult
+        """
+        results = self.evaluate_batch(strategy_name, {symbol: df}, {symbol: trend_15m})
+        if symbol not in results:
+            return StrategyResult(symbol=symbol, signal=None, trend_15m=trend_15m)
+        return results[symbol]
+    
+    def evaluate_batch(
+        self,
+        strategy_name: str,
+        frames: Dict[str, pd.DataFrame],
+        trends: Dict[str, str]
+    ) -> Dict[str, StrategyResult]:
+        """
+        Batch counterpart of evaluate_symbol: memo hits are reused, all misses
+        are evaluated in one strategy call.
+        """
+        results, misses = self._cached_results(strategy_name, frames, trends)
+        
+        if misses:
+            evaluated, _, errors = self._run_strategy(
+                strategy_name, misses, trends, self._structure_states(misses)
+            )
+            self.stats['strategy_stats'][strategy_name]['errors'] += errors
+            self._store_results(strategy_name, misses, trends, evaluated)
+            results.update(evaluated)
+            
+        return results
+    
+    def _update_structure(self, symbol: str, df: pd.DataFrame):
+        """Advance the symbol's incremental structure (None → strategy rescans the window)."""
+        try:
+            return self.structure_tracker.update(symbol, df)
+        except Exception as e:
+            logger.warning(f"Structure tracking failed for {symbol}, using full scan: {e}")
+            self.structure_tracker.discard(symbol)
+            return None
+    
+    @staticmethod
+    def _evaluation_key(strategy_name: str, df: pd.DataFrame, trend_15m: str) -> Optional[tuple]:
+        """Build the memo key for a frame (None if the frame cannot be keyed)."""
+        try:
+            # 逐列取值，避免 df.iloc[-1] 構建混合類型的行 Series
+            return (
+                strategy_name, str(df['timestamp'].iat[-1]), float(df['close'].iat[-1]),
+                len(df), trend_15m
+            )
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+    
+    def _fuse(self, symbol: str, results: Dict[str, Optional[StrategyResult]]) -> Optional[Signal]:
+        """Fuse per-strategy results for a symbol into one Signal."""
+        fused = self.combiner.combine({
+            name: (result.signal if result is not None else None)
+            for name, result in results.items()
+        })
+        if fused is None:
+            return None
+            
+        signal = Signal(
+            symbol=symbol,
+            action=fused['type'],
+            price=fused['price'],
+            confidence=fused['confidence'],
+            expected_roi=fused.get('expected_roi', 3.0),
+            stop_loss=fused['stop_loss'],
+            take_profit=fused['take_profit'],
+            strategy=fused['strategy'],
+            timestamp=pd.Timestamp.now().timestamp(),
+            metadata=fused.get('metadata', {}),
+            reason=fused.get('reason', ''),
+            trace=SignalTrace()
+        )
+        signal.trace.mark('signal_generated')
+        
+        self.stats['signals_generated'] += 1
+        
+        return signal
+    
+    def _prescreen_applicable(self) -> bool:
+        """
+        The prescreen bounds ICT/SMC confidence, so it is only sound when the
+        fused decision requires an ICT/SMC signal (single strategy, or a
+        combiner driven by the primary strategy).
+        """
+        if not self.prescreen_enabled:
+            return False
+        if not isinstance(self.strategies.get(self.primary_strategy), ICTSMCStrategy):
+            return False
+        return len(self.strategies) == 1 or self.combiner.name in ('primary', 'veto')
+    
+    def screen_history(self, df: pd.DataFrame):
+        """
+        Rows of a full-history indicator frame where a signal is possible.
+        
+        Returns:
+            Boolean numpy array, or None when the prescreen is not applicable
+            (every row must then be analyzed)
+        """
+        if not self._prescreen_applicable():
+            return None
+        return self.prescreen.screen_history(df)
+    
+    def _prescreen_batch(self, symbols_data: Dict[str, tuple]):
+        """
+        Run the vectorized prescreen.
+        
+        Returns:
+            (surviving symbols_data, rejected symbols sampled for audit)
+        """
+        frames = {
+            symbol: df for symbol, (df, price) in symbols_data.items()
+            if df is not None and not df.empty
+        }
+        
+        try:
+            screened = self.prescreen.screen(frames)
+        except Exception as e:
+            logger.error(f"Prescreen failed, analyzing all symbols: {e}")
+            return symbols_data, []
+            
+        survivors = {symbol: symbols_data[symbol] for symbol in screened.passed}
+        logger.info(
+            f"🔎 預篩選: {len(survivors)}/{len(frames)} 個交易對進入完整分析 "
+            f"(通過率 {screened.pass_rate:.1%})"
+        )
+        return survivors, self.prescreen.audit_sample(screened)
+    
+    async def _audit_prescreen(self, audit_symbols: List[str], symbols_data: Dict[str, tuple], data_service=None):
+        """Run rejected symbols through the full pipeline to detect false negatives."""
+        strategy = self.strategies[self.primary_strategy]
+        false_negatives = []
+        
+        for symbol in audit_symbols:
+            df, price = symbols_data[symbol]
+            try:
+                trend_15m = await strategy.resolve_trend(symbol, data_service)
+                if strategy.evaluate(df, trend_15m=trend_15m, symbol=symbol).has_signal:
+                    false_negatives.append(symbol)
+            except Exception as e:
+                logger.debug(f"Prescreen audit error for {symbol}: {e}")
+                
+        self.prescreen.record_audit(len(audit_symbols), false_negatives)
+    
+    def _use_process_pool(self, frames: Dict[str, Any]) -> bool:
+        """Process mode only pays off for batches large enough to amortize IPC."""
+        return (
+            self.executor_mode == 'process'
+            and self.max_workers > 1
+            and len(frames) >= Config.STRATEGY_PROCESS_MIN_SYMBOLS
+        )
+    
+    def _get_process_analyzer(self):
+        """Create the process-pool analyzer on first use (workers get a copy of every strategy)."""
+        if self._process_analyzer is None:
+            from src.services.parallel_analysis import ProcessPoolAnalyzer
+            
+            self._process_analyzer = ProcessPoolAnalyzer(
+                max_workers=self.max_workers,
+                strategies=dict(self.strategies),
+                start_method=Config.STRATEGY_MP_START_METHOD
+            )
+        return self._process_analyzer
+    
+    async def _analyze_batch_process(
+        self,
+        frames: Dict[str, pd.DataFrame],
+        data_service=None
+    ) -> List[Signal]:
+        """
+        Analyze a batch in worker processes.
+        
+        Trend context (I/O) is resolved concurrently on the event loop; the
+        CPU-bound evaluation of all strategies runs in the process pool via
+        run_in_executor, so the loop stays responsive while workers compute.
+        """
+        trends = await self._resolve_trends(frames, data_service)
+        
+        analyzer = self._get_process_analyzer()
+        started = time.perf_counter()
+        records, timings = await analyzer.analyze(frames, trends)
+        wall_ms = (time.perf_counter() - started) * 1000
+        
+        self.stats['total_analyses'] += len(frames)
+        self.stats['process_batches'] += 1
+        
+        per_strategy = {name: {} for name in self.strategies}
+        for (strategy_name, symbol, action, price, confidence, expected_roi,
+             stop_loss, take_profit, reason, structure, metadata) in records:
+            per_strategy.setdefault(strategy_name, {})[symbol] = StrategyResult(
+                symbol=symbol,
+                signal={
+                    'type': action,
+                    'price': price,
+                    'confidence': confidence,
+                    'expected_roi': expected_roi,
+                    'stop_loss': stop_loss,
+                    'take_profit': take_profit,
+                    'reason': reason,
+                    'metadata': metadata
+                },
+                structure=structure,
+                trend_15m=trends.get(symbol, 'neutral')
+            )
+            
+        for name in self.strategies:
+            strategy_stats = self.stats['strategy_stats'][name]
+            strategy_stats['analyses'] += len(frames)
+            strategy_stats['signals'] += len(per_strategy.get(name, {}))
+            strategy_stats['batches'] += 1
+            # 與 async 路徑可比：記錄批次牆鐘時間（各策略在同一批分片中一起評估）
+            strategy_stats['eval_time_ms'] += wall_ms
+            strategy_stats['worker_cpu_ms'] += timings.get(name, 0.0) * 1000
+            
+        signals = []
+        for symbol in frames:
+            signal = self._fuse(symbol, {
+                name: per_strategy.get(name, {}).get(symbol) for name in self.strategies
+            })
+            if signal is not None:
+                signals.append(signal)
+                
+        logger.info(f"Generated {len(signals)} signals from {len(frames)} symbols (process pool)")
         return signals
     
+    def shutdown(self):
+        """Release worker processes (if the process executor was used)."""
+        if self._process_analyzer is not None:
+            self._process_analyzer.shutdown()
+            self._process_analyzer = None
+    
     def rank_signals(
         self,
         signals: List[Signal],
@@ -175,7 +640,7 @@ class StrategyEngine:
         """
         if not signals:
             return []
-        
+            
         # Sort by chosen metric
         if mode == 'confidence':
             sorted_signals = sorted(signals, key=lambda s: s.confidence, reverse=True)
@@ -188,7 +653,7 @@ class StrategyEngine:
                 key=lambda s: s.confidence * s.expected_roi,
                 reverse=True
             )
-        
+            
         # Take top N
         top_signals = sorted_signals[:limit]
         
@@ -196,37 +661,61 @@ class StrategyEngine:
         if filtered_count > 0:
             self.stats['signals_filtered'] += filtered_count
             logger.info(f"Filtered {filtered_count} signals, kept top {len(top_signals)}")
-        
+            
         return top_signals
     
     def add_strategy(self, name: str, strategy):
-        """Add a new strategy to the engine."""
+        """
+        Add a new strategy to the engine.
+        
+        The strategy must expose evaluate(df, trend_15m=..., symbol=...) returning
+        a StrategyResult (optionally evaluate_batch and a structure_state argument).
+        """
+        if not (hasattr(strategy, 'evaluate') or hasattr(strategy, 'evaluate_batch')):
+            raise ValueError(f"Strategy {name} must implement evaluate() or evaluate_batch()")
+            
         self.strategies[name] = strategy
-        self.stats['strategy_stats'][name] = {'analyses': 0, 'signals': 0}
+        self.stats['strategy_stats'][name] = self._new_strategy_stats()
+        # 進程池中的策略副本需要重建
+        self.shutdown()
         logger.info(f"Added strategy: {name}")
     
     def remove_strategy(self, name: str):
         """Remove a strategy from the engine."""
         if name in self.strategies:
             del self.strategies[name]
+            self._evaluation_cache = {
+                cache_key: entry for cache_key, entry in self._evaluation_cache.items()
+                if cache_key[0] != name
+            }
+            self.shutdown()
             logger.info(f"Removed strategy: {name}")
     
     def get_stats(self) -> Dict[str, Any]:
         """Get strategy engine statistics."""
-        return {
+        stats = {
             **self.stats,
+            'strategy_stats': {
+                name: {
+                    **strategy_stats,
+                    'avg_eval_ms': strategy_stats['eval_time_ms'] / max(strategy_stats['batches'], 1),
+                    'signal_rate': strategy_stats['signals'] / max(strategy_stats['analyses'], 1)
+                }
+                for name, strategy_stats in self.stats['strategy_stats'].items()
+            },
             'signal_rate': (
                 self.stats['signals_generated'] / max(self.stats['total_analyses'], 1)
             ),
-            'active_strategies': len(self.strategies)
+            'active_strategies': len(self.strategies),
+            'combiner': self.combiner.name,
+            'executor_mode': self.executor_mode
         }
+        if self._process_analyzer is not None:
+            stats['process_pool'] = self._process_analyzer.get_stats()
+        stats['structure_tracker'] = self.structure_tracker.get_stats()
+        stats['prescreen'] = self.prescreen.get_stats()
+        return stats
     
     def reset_stats(self):
         """Reset statistics counters."""
-        self.stats = {
-            'total_analyses': 0,
-            'signals_generated': 0,
-            'signals_filtered': 0,
-            'strategy_stats': {name: {'analyses': 0, 'signals': 0} 
-                              for name in self.strategies.keys()}
-        }
+        self.stats = self._new_stats()
@@ -0,0 +1,363 @@
+"""
+User Data Stream - Push-based account state from the Binance listenKey stream.
+
+Responsibilities:
+- AccountModel: in-memory balances, positions and open orders, seeded once
+  from REST and kept current from ACCOUNT_UPDATE / ORDER_TRADE_UPDATE /
+  ACCOUNT_CONFIG_UPDATE events
+- UserDataStream: create the listenKey, keep it alive, consume the
+  WebSocket and reconnect (re-seeding the model) after any gap
+
+Readers (RiskManager balance, ExecutionService positions) query the model
+instead of calling REST on the hot path.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_TYPES = ('STOP_MARKET', 'TAKE_PROFIT_MARKET')
+FINAL_STATUSES = ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED')
+
+
+class AccountModel:
+    """USDT-M futures account state (hedge mode) maintained from user-data events."""
+
+    def __init__(self, asset: str = 'USDT'):
+        self.asset = asset
+        self.balances: Dict[str, float] = {}                           # asset → 錢包餘額
+        self.positions: Dict[Tuple[str, str], Dict[str, Any]] = {}     # (symbol, positionSide) → 倉位
+        self.orders: Dict[int, Dict[str, Any]] = {}                    # orderId → 未完成訂單
+        self.leverage: Dict[str, int] = {}
+        self.ready = False          # 已有快照且數據流在線
+        self.event_time = 0         # 最近事件時間（ms）
+
+        # 訂單狀態變化回調：callback(order)，order 為 REST 格式字段
+        self.order_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+        # Statistics
+        self.stats = {
+            'events': 0,
+            'account_updates': 0,
+            'order_updates': 0,
+            'fills': 0,
+            'snapshots': 0
+        }
+
+    # ------------------------------------------------------------------
+    # Seeding
+    # ------------------------------------------------------------------
+
+    def seed(self, balance: Optional[float], positions: Optional[List[Dict[str, Any]]],
+             open_orders: Optional[List[Dict[str, Any]]]):
+        """Replace the state with a complete REST snapshot (balance / futures_position_information / open orders)."""
+        if balance is not None:
+            self.balances[self.asset] = float(balance)
+        if positions is not None:
+            self.positions = {}
+            for pos in positions:
+                amount = float(pos.get('positionAmt', 0))
+                if amount == 0:
+                    continue
+                symbol = pos['symbol']
+                if pos.get('leverage'):
+                    self.leverage[symbol] = int(pos['leverage'])
+                self._set_position(symbol, pos.get('positionSide', 'BOTH'), amount,
+                                   float(pos.get('entryPrice', 0)), float(pos.get('unRealizedProfit', 0)))
+        if open_orders is not None:
+            self.orders = {int(order['orderId']): dict(order) for order in open_orders}
+        self.stats['snapshots'] += 1
+
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
+
+    def apply(self, event: Dict[str, Any]):
+        """Apply one user-data stream event."""
+        kind = event.get('e')
+        self.stats['events'] += 1
+        self.event_time = max(self.event_time, int(event.get('E', 0)))
+        if kind == 'ACCOUNT_UPDATE':
+            self._on_account_update(event['a'])
+        elif kind == 'ORDER_TRADE_UPDATE':
+            self._on_order_update(event['o'])
+        elif kind == 'ACCOUNT_CONFIG_UPDATE' and 'ac' in event:
+            self.leverage[event['ac']['s']] = int(event['ac']['l'])
+
+    def _on_account_update(self, update: Dict[str, Any]):
+        self.stats['account_updates'] += 1
+        for balance in update.get('B', []):
+            self.balances[balance['a']] = float(balance['wb'])
+        # P 只包含變化的倉位，數值為絕對值（不是增量）
+        for pos in update.get('P', []):
+            self._set_position(pos['s'], pos.get('ps', 'BOTH'), float(pos['pa']),
+                               float(pos['ep']), float(pos.get('up', 0)))
+
+    def _on_order_update(self, o: Dict[str, Any]):
+        self.stats['order_updates'] += 1
+        order = {
+            'orderId': int(o['i']),
+            'clientOrderId': o.get('c'),
+            'symbol': o['s'],
+            'side': o['S'],
+            'type': o['o'],
+            'positionSide': o.get('ps', 'BOTH'),
+            'origQty': o['q'],
+            'price': o['p'],
+            'stopPrice': o.get('sp', '0'),
+            'avgPrice': o.get('ap', '0'),
+            'executedQty': o['z'],
+            'status': o['X'],
+            'executionType': o['x'],
+            'lastFilledQty': o.get('l', '0'),
+            'lastFilledPrice': o.get('L', '0'),
+            'realizedProfit': o.get('rp', '0'),
+            'reduceOnly': o.get('R', False),
+            'updateTime': o.get('T', 0)
+        }
+        if order['executionType'] == 'TRADE':
+            self.stats['fills'] += 1
+        if order['status'] in FINAL_STATUSES:
+            self.orders.pop(order['orderId'], None)
+        else:
+            self.orders[order['orderId']] = order
+
+        for listener in self.order_listeners:
+            try:
+                listener(order)
+            except Exception as e:
+                logger.error(f"Order update listener failed for {order['symbol']} #{order['orderId']}: {e}")
+
+    def _set_position(self, symbol: str, position_side: str, amount: float, entry: float, unrealized: float):
+        key = (symbol, position_side)
+        if amount == 0:
+            self.positions.pop(key, None)
+            return
+        self.positions[key] = {
+            'symbol': symbol,
+            'positionSide': position_side,
+            'positionAmt': amount,
+            'entryPrice': entry,
+            'unRealizedProfit': unrealized,
+            'leverage': self.leverage.get(symbol, 1)
+        }
+
+    # ------------------------------------------------------------------
+    # Queries (BinanceDataClient-compatible shapes)
+    # ------------------------------------------------------------------
+
+    def get_futures_balance(self) -> Optional[float]:
+        return self.balances.get(self.asset)
+
+    def get_current_positions(self) -> List[Dict[str, Any]]:
+        return [dict(pos, leverage=self.leverage.get(pos['symbol'], pos['leverage']))
+                for pos in self.positions.values()]
+
+    def get_position(self, symbol: str, position_side: str) -> Optional[Dict[str, Any]]:
+        return self.positions.get((symbol, position_side))
+
+    def get_open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [order for order in self.orders.values() if symbol is None or order['symbol'] == symbol]
+
+    def get_open_stop_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [order for order in self.get_open_orders(symbol) if order['type'] in TRIGGER_TYPES]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get account model statistics."""
+        return {
+            **self.stats,
+            'ready': self.ready,
+            'positions': len(self.positions),
+            'open_orders': len(self.orders),
+            'event_lag_ms': int(time.time() * 1000) - self.event_time if self.event_time else None
+        }
+
+
+class UserDataStream:
+    """listenKey user-data stream consumer feeding an AccountModel."""
+
+    def __init__(
+        self,
+        binance_client,
+        account_model: Optional[AccountModel] = None,
+        keepalive_interval: Optional[float] = None,
+        reconnect_delay: Optional[float] = None,
+        max_reconnect_delay: float = 60.0
+    ):
+        """
+        Initialize user data stream.
+
+        Args:
+            binance_client: BinanceDataClient (listen key + REST snapshot)
+            account_model: Model to maintain (default: new AccountModel)
+            keepalive_interval: Seconds between listenKey keepalives
+            reconnect_delay: Initial reconnect backoff (doubles up to max_reconnect_delay)
+        """
+        self.binance = binance_client
+        self.model = account_model or AccountModel()
+        self.keepalive_interval = keepalive_interval or Config.USER_STREAM_KEEPALIVE_SECONDS
+        self.reconnect_delay = reconnect_delay or Config.USER_STREAM_RECONNECT_SECONDS
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.listen_key: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._running = False
+        self._connected = asyncio.Event()
+
+        # Statistics
+        self.stats = {
+            'connections': 0,
+            'reconnects': 0,
+            'keepalives': 0,
+            'keepalive_failures': 0,
+            'listen_key_expired': 0,
+            'messages': 0,
+            'parse_errors': 0
+        }
+
+    async def start(self, timeout: float = 10.0) -> bool:
+        """Start consuming in the background; waits up to timeout for the first snapshot."""
+        if self._task:
+            return self.model.ready
+        self._running = True
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"User data stream not connected after {timeout:.0f}s, falling back to REST until it is")
+        return self.model.ready
+
+    async def stop(self):
+        self._running = False
+        if self._ws is not None:
+            await self._ws.close()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.listen_key:
+            await self.binance.close_listen_key_async(self.listen_key)
+            self.listen_key = None
+        self.model.ready = False
+        logger.info("User data stream stopped")
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        async with aiohttp.ClientSession() as session:
+            while self._running:
+                started = time.monotonic()
+                try:
+                    await self._session(session)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"User data stream error: {e}")
+                finally:
+                    self.model.ready = False
+                    self._ws = None
+                if not self._running:
+                    break
+                self.stats['reconnects'] += 1
+                # 正常斷開（24 小時輪換 / listenKey 過期）也退避：連接剛建立就被關閉時不會密集重連
+                if time.monotonic() - started >= self.max_reconnect_delay:
+                    delay = self.reconnect_delay
+                logger.warning(f"User data stream reconnecting in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _session(self, session: aiohttp.ClientSession):
+        """One connection: listenKey → connect → snapshot → consume until closed."""
+        if not self.listen_key:
+            self.listen_key = await self.binance.create_listen_key_async()
+            if not self.listen_key:
+                raise ConnectionError("could not obtain a listen key")
+
+        url = self.binance.user_stream_url(self.listen_key)
+        async with session.ws_connect(url, heartbeat=60) as ws:
+            self._ws = ws
+            self.stats['connections'] += 1
+
+            # 先連接再取快照：快照期間的事件留在緩衝區，之後按順序應用（倉位 / 餘額為絕對值）
+            # 快照不完整時拋出異常，保持 ready=False 並退避重連
+            await self._snapshot()
+            self.model.ready = True
+            self._connected.set()
+            logger.info(
+                f"📡 User data stream connected: {len(self.model.positions)} positions, "
+                f"{len(self.model.orders)} open orders, balance {self.model.get_futures_balance()}"
+            )
+
+            keepalive = asyncio.create_task(self._keepalive(ws))
+            try:
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        self._handle(msg.data)
+                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+            finally:
+                keepalive.cancel()
+        logger.warning("User data stream disconnected")
+
+    def _handle(self, raw: str):
+        self.stats['messages'] += 1
+        try:
+            event = json.loads(raw)
+        except ValueError:
+            self.stats['parse_errors'] += 1
+            return
+        if event.get('e') == 'listenKeyExpired':
+            # 重新申請 listenKey 並重連（期間的事件由重連後的快照補齊）
+            self.stats['listen_key_expired'] += 1
+            logger.warning("Listen key expired, reconnecting with a new one")
+            self.listen_key = None
+            asyncio.create_task(self._ws.close())
+            return
+        self.model.apply(event)
+
+    async def _snapshot(self):
+        """
+        Seed the model from REST; raises unless balance, positions and orders all loaded.
+
+        Positions come straight from futures_position_information:
+        get_current_positions() returns [] on a REST error, which would be
+        indistinguishable from a flat account and wipe the model.
+        """
+        if not self.binance.client:
+            raise ConnectionError("Binance client not initialized")
+        loop = asyncio.get_event_loop()
+        balance, positions, orders = await asyncio.gather(
+            loop.run_in_executor(None, self.binance.get_futures_balance),
+            loop.run_in_executor(None, self.binance.client.futures_position_information),
+            loop.run_in_executor(None, self.binance.get_open_orders)
+        )
+        missing = [name for name, value in (('balance', balance), ('open orders', orders)) if value is None]
+        if missing:
+            raise ConnectionError(f"incomplete account snapshot: {', '.join(missing)} unavailable")
+        self.model.seed(balance, positions, orders)
+
+    async def _keepalive(self, ws: aiohttp.ClientWebSocketResponse):
+        while not ws.closed:
+            await asyncio.sleep(self.keepalive_interval)
+            if await self.binance.keepalive_listen_key_async(self.listen_key):
+                self.stats['keepalives'] += 1
+                continue
+            # listenKey 已失效：換新 key 重連
+            self.stats['keepalive_failures'] += 1
+            self.listen_key = None
+            await ws.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get user data stream statistics."""
+        return {**self.stats, 'connected': self.model.ready, 'model': self.model.get_stats()}
@@ -4,7 +4,7 @@ Virtual Position Tracker - 虛擬倉位追蹤系統
 功能：
 1. 追蹤排名第 4 名以後的交易信號（不實際開倉）
 2. 收集虛擬交易數據供 XGBoost 訓練
-3. 持久化虛擬倉位（進程重啟不丟失）
+3. 持久化虛擬倉位（預寫日誌 + 快照，進程重啟 / 崩潰不丟失）
 4. 檢查止盈/止損觸發並記錄完整數據
 """
 
@@ -16,6 +16,9 @@ from datetime import datetime
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass, asdict
 
+from src.managers.trade_journal import TradeJournal, journal_path
+from src.services.excursion_tracker import ExcursionTracker
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,6 +40,13 @@ class VirtualPosition:
     metadata: Dict[str, Any]  # 完整的信號 metadata
     leverage: float = 1.0  # 槓桿
     margin: float = 0.0  # 保證金
+    excursion: Optional[ExcursionTracker] = None  # 運行中的 MFE/MAE（隨倉位持久化）
+    
+    def __post_init__(self):
+        if isinstance(self.excursion, dict):
+            self.excursion = ExcursionTracker.from_dict(self.excursion)
+        elif self.excursion is None:
+            self.excursion = ExcursionTracker.open_utc(self.side, self.opened_at, self.entry_price)
 
 
 class VirtualPositionTracker:
@@ -70,7 +80,7 @@ class VirtualPositionTracker:
         - max_virtual_positions: 最大併發虛擬倉位數（默認 10）
         - min_confidence: 最低信心度閾值（默認 70%）
         - max_age_cycles: 最大追蹤週期數（默認 96，約 1.6 小時）
-        - persistence_file: 持久化文件路徑
+        - persistence_file: 持久化文件路徑（日誌目錄為同名 .journal；舊的 JSON 文件首次啟動時導入）
         """
         self.trade_logger = trade_logger
         self.risk_manager = risk_manager
@@ -79,6 +89,8 @@ class VirtualPositionTracker:
         self.min_confidence = min_confidence
         self.max_age_cycles = max_age_cycles
         self.persistence_file = persistence_file
+        self.journal = TradeJournal(journal_path(persistence_file))
+        self._persisted_ids = set()  # 日誌中仍存活的 trade_id（用於記錄刪除）
         
         # 虛擬倉位存儲
         self.virtual_positions: Dict[str, VirtualPosition] = {}
@@ -349,6 +361,7 @@ class VirtualPositionTracker:
                     if current_price is None:
                         logger.debug(f"No price available for {pos.symbol}, skipping check")
                         continue
+                    pos.excursion.update_price(current_price)
                     
                     # 檢查是否觸發止盈/止損
                     exit_reason = None
@@ -392,11 +405,11 @@ class VirtualPositionTracker:
                     except Exception as e:
                         logger.error(f"Error closing virtual position {trade_id}: {e}")
                 
-                # 持久化更新
-                self.save_virtual_positions()
-                
                 logger.info(f"Closed {len(positions_to_close)} virtual positions")
             
+            # 持久化更新（週期計數 / MFE/MAE 每週期都會變；每個倉位追加一條記錄，無需重寫整個文件）
+            self.save_virtual_positions()
+            
         except Exception as e:
             logger.error(f"Error in check_virtual_positions: {e}")
     
@@ -432,6 +445,7 @@ class VirtualPositionTracker:
                 pnl = (pos.entry_price - exit_price) * pos.quantity
             
             pnl_percent = (pnl / pos.margin) * 100 if pos.margin > 0 else 0
+            pos.excursion.update_price(exit_price)
             
             # 準備平倉數據
             exit_data = {
@@ -450,7 +464,8 @@ class VirtualPositionTracker:
                 'confidence': pos.confidence,
                 'expected_roi': pos.expected_roi,
                 'cycles_held': pos.cycles_since_open,
-                'metadata': pos.metadata
+                'metadata': pos.metadata,
+                'excursion': pos.excursion.summary(pos.entry_price)
             }
             
             # 記錄平倉到 TradeLogger
@@ -480,38 +495,65 @@ class VirtualPositionTracker:
         except Exception as e:
             logger.error(f"Error closing virtual position {trade_id}: {e}")
     
+    def update_excursions(self, symbols_data: Dict[str, tuple]):
+        """用本週期掃描的 K 線幀（{symbol: (frame, price)}）更新虛擬倉位的 MFE/MAE 追蹤"""
+        for pos in self.virtual_positions.values():
+            scanned = symbols_data.get(pos.symbol)
+            if scanned is not None:
+                pos.excursion.update_frame(scanned[0])
+    
     def load_virtual_positions(self):
-        """從文件加載虛擬倉位"""
+        """從日誌恢復虛擬倉位（快照 + 預寫日誌重放）"""
         try:
-            if os.path.exists(self.persistence_file):
+            # 首次啟動：導入舊版整檔 JSON
+            if not self.journal.exists and os.path.exists(self.persistence_file):
                 with open(self.persistence_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    # ✅ 修復：重建 VirtualPosition 對象（使用 trade_id 作為鍵）
-                    for trade_id, pos_dict in data.items():
-                        self.virtual_positions[trade_id] = VirtualPosition(**pos_dict)
-                    
-                    logger.info(f"Loaded {len(self.virtual_positions)} virtual positions from {self.persistence_file}")
-            else:
-                logger.info(f"No existing virtual positions file found at {self.persistence_file}")
-                
+                    for trade_id, pos_dict in json.load(f).items():
+                        self.journal.put(trade_id, pos_dict)
+                self.journal.sync()
+                logger.info(f"Imported virtual positions from {self.persistence_file} into {self.journal.directory}")
+            data = self.journal.items()
         except Exception as e:
             logger.error(f"Error loading virtual positions: {e}")
-            self.virtual_positions = {}
+            return
+        
+        # ✅ 修復：重建 VirtualPosition 對象（使用 trade_id 作為鍵）；單條記錄損壞不影響其他倉位
+        for trade_id, pos_dict in data.items():
+            try:
+                self.virtual_positions[trade_id] = VirtualPosition(**pos_dict)
+            except Exception as e:
+                logger.error(f"Error restoring virtual position {trade_id}: {e}")
+        self._persisted_ids = set(data)
+        
+        logger.info(f"Loaded {len(self.virtual_positions)} virtual positions from {self.journal.directory}")
     
     def save_virtual_positions(self):
-        """保存虛擬倉位到文件"""
+        """
+        持久化虛擬倉位：每個倉位追加一條記錄，已平倉的追加刪除記錄
+        
+        有 TradeLogger 寫入線程時交給它（事件循環不做磁盤 I/O），否則直接寫入並 fsync
+        """
         try:
             # ✅ 修復：轉換為可序列化的字典（使用 trade_id 作為鍵）
-            data = {}
-            for trade_id, pos in self.virtual_positions.items():
-                data[trade_id] = asdict(pos)
-            
-            # 保存到文件
-            with open(self.persistence_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.debug(f"Saved {len(self.virtual_positions)} virtual positions to {self.persistence_file}")
+            records = {trade_id: asdict(pos) for trade_id, pos in self.virtual_positions.items()}
+            removed = self._persisted_ids - set(records)
+            
+            writer = getattr(self.trade_logger, 'writer', None)
+            if writer is not None:
+                for trade_id, record in records.items():
+                    writer.submit(self.journal, 'put', trade_id, record)
+                for trade_id in removed:
+                    writer.submit(self.journal, 'delete', trade_id)
+            else:
+                for trade_id, record in records.items():
+                    self.journal.put(trade_id, record)
+                for trade_id in removed:
+                    self.journal.delete(trade_id)
+                self.journal.sync()
+                self.journal.maybe_compact()
+            self._persisted_ids = set(records)
+            
+            logger.debug(f"Saved {len(self.virtual_positions)} virtual positions to {self.journal.directory}")
             
         except Exception as e:
             logger.error(f"Error saving virtual positions: {e}")
@@ -0,0 +1,22 @@
+"""
+Simulated exchange components for offline load, latency and replay testing.
+"""
+
+from .market import SimulatedMarket, synthetic_klines, synthetic_symbols
+from .paper_exchange import PaperExchange, PaperOrder, PaperPosition
+from .recorder import MarketRecorder, read_recording
+from .replay import ReplayBinanceClient, ReplayDriver
+
+try:
+    from .exchange_stub import BinanceStubServer, FaultProfile, StubAccount
+except ImportError:
+    BinanceStubServer = None
+    FaultProfile = None
+    StubAccount = None
+
+__all__ = [
+    'SimulatedMarket', 'synthetic_klines', 'synthetic_symbols',
+    'PaperExchange', 'PaperOrder', 'PaperPosition',
+    'MarketRecorder', 'read_recording', 'ReplayBinanceClient', 'ReplayDriver',
+    'BinanceStubServer', 'FaultProfile', 'StubAccount'
+]
@@ -0,0 +1,857 @@
+"""
+Exchange Stub - Local Binance Futures stand-in for load and latency testing.
+
+Responsibilities:
+- Serve the REST endpoints the bot uses (klines, ticker, exchangeInfo, order,
+  batchOrders, positionRisk, account, ...) from a SimulatedMarket
+- Stream kline / markPrice WebSocket events (raw and combined streams)
+- Inject latency, request-weight headers, 429 responses and faults
+- Keep a minimal hedge-mode account so order / position round-trips work,
+  with its user-data stream (listenKey, ORDER_TRADE_UPDATE / ACCOUNT_UPDATE)
+
+Point the bot at it with BINANCE_BASE_URL=http://127.0.0.1:<port>; run it with
+    python -m src.simulation.exchange_stub
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from aiohttp import WSMsgType, web
+
+from src.backtest.data import load_klines_directory
+from src.config import Config
+from src.simulation.market import SimulatedMarket
+
+logger = logging.getLogger(__name__)
+
+_TAKER_FEE = 0.0004
+_FUNDING_INTERVAL_MS = 8 * 3600 * 1000
+
+
+@dataclass
+class FaultProfile:
+    """Latency, rate-limit and fault injection settings."""
+    latency_ms: float = 0.0            # 每個請求的基礎延遲
+    latency_jitter_ms: float = 0.0     # 額外的隨機延遲（均勻分佈）
+    error_rate: float = 0.0            # 隨機返回 5xx 的比例
+    rate_limit_rate: float = 0.0       # 隨機返回 429 的比例（與權重無關）
+    disconnect_rate: float = 0.0       # 隨機斷開連接的比例
+    weight_limit: int = 2400           # 每分鐘權重上限（0 = 不限制）
+    order_limit_10s: int = 300         # 每 10 秒下單上限（0 = 不限制）
+    ws_interval: float = 1.0           # WebSocket 推送間隔（秒）
+    seed: int = 0
+
+    @classmethod
+    def from_config(cls) -> 'FaultProfile':
+        return cls(
+            latency_ms=Config.EXCHANGE_STUB_LATENCY_MS,
+            latency_jitter_ms=Config.EXCHANGE_STUB_LATENCY_JITTER_MS,
+            error_rate=Config.EXCHANGE_STUB_ERROR_RATE,
+            rate_limit_rate=Config.EXCHANGE_STUB_RATE_LIMIT_RATE,
+            disconnect_rate=Config.EXCHANGE_STUB_DISCONNECT_RATE,
+            weight_limit=Config.EXCHANGE_STUB_WEIGHT_LIMIT
+        )
+
+
+def request_weight(path: str, params: Dict[str, str]) -> int:
+    """Binance request weight of an endpoint (USDT-M futures weight table)."""
+    endpoint = path.rsplit('/', 1)[-1]
+    has_symbol = 'symbol' in params
+    if endpoint == 'klines':
+        limit = int(params.get('limit', 500))
+        return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+    if path.endswith('ticker/24hr'):
+        return 1 if has_symbol else 40
+    if path.endswith('ticker/price'):
+        return 1 if has_symbol else 2
+    if endpoint == 'openOrders':
+        return 1 if has_symbol else 40
+    if endpoint in ('positionRisk', 'account', 'balance'):
+        return 5
+    if endpoint == 'fundingRate':
+        return 0
+    return 1
+
+
+class StubAccount:
+    """Minimal hedge-mode USDT-M account (market fills, stop / take-profit triggers)."""
+
+    def __init__(self, market: SimulatedMarket, balance: float = 10000.0):
+        self.market = market
+        self.balance = balance
+        self.positions: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.orders: Dict[int, Dict[str, Any]] = {}
+        self.leverage: Dict[str, int] = {}
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []  # 用戶數據流事件接收者
+        self._order_ids = itertools.count(1)
+
+        # Statistics
+        self.stats = {
+            'orders': 0,
+            'fills': 0,
+            'triggered': 0,
+            'canceled': 0,
+            'rejected': 0
+        }
+
+    def create_order(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """POST /fapi/v1/order"""
+        symbol = params.get('symbol', '')
+        price = self.market.last_price(symbol)
+        if price is None:
+            self.stats['rejected'] += 1
+            raise web.HTTPBadRequest(
+                text=json.dumps({'code': -1121, 'msg': 'Invalid symbol.'}), content_type='application/json'
+            )
+
+        self.stats['orders'] += 1
+        order = {
+            'orderId': next(self._order_ids),
+            'clientOrderId': params.get('newClientOrderId', f"stub_{int(time.time() * 1000)}"),
+            'symbol': symbol,
+            'side': params.get('side', 'BUY'),
+            'type': params.get('type', 'MARKET'),
+            'positionSide': params.get('positionSide', 'BOTH'),
+            'origQty': params.get('quantity', '0'),
+            'executedQty': '0',
+            'price': params.get('price', '0'),
+            'stopPrice': params.get('stopPrice', '0'),
+            'avgPrice': '0',
+            'reduceOnly': params.get('reduceOnly', 'false').lower() == 'true',
+            'closePosition': params.get('closePosition', 'false').lower() == 'true',
+            'workingType': params.get('workingType', 'CONTRACT_PRICE'),
+            'timeInForce': params.get('timeInForce', 'GTC'),
+            'status': 'NEW',
+            'updateTime': self.market.now_ms()
+        }
+
+        self._emit_order(order, 'NEW')
+        if order['type'] == 'MARKET':
+            self._fill(order, price)
+        else:
+            self.orders[order['orderId']] = order
+            self.match()
+        return order
+
+    def cancel_order(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """DELETE /fapi/v1/order"""
+        order = self.orders.pop(int(params.get('orderId', 0)), None)
+        if order is None:
+            raise web.HTTPBadRequest(
+                text=json.dumps({'code': -2011, 'msg': 'Unknown order sent.'}), content_type='application/json'
+            )
+        order['status'] = 'CANCELED'
+        self.stats['canceled'] += 1
+        self._emit_order(order, 'CANCELED')
+        return order
+
+    def cancel_all(self, symbol: str) -> int:
+        """DELETE /fapi/v1/allOpenOrders"""
+        ids = [order_id for order_id, order in self.orders.items() if order['symbol'] == symbol]
+        for order_id in ids:
+            order = self.orders.pop(order_id)
+            order['status'] = 'CANCELED'
+            self._emit_order(order, 'CANCELED')
+        self.stats['canceled'] += len(ids)
+        return len(ids)
+
+    def match(self):
+        """Trigger resting stop / take-profit / limit orders against the last price."""
+        for order_id, order in list(self.orders.items()):
+            price = self.market.last_price(order['symbol'])
+            if price is None:
+                continue
+
+            buy = order['side'] == 'BUY'
+            if order['type'] in ('STOP_MARKET', 'STOP'):
+                stop = float(order['stopPrice'])
+                hit = price >= stop if buy else price <= stop
+            elif order['type'] in ('TAKE_PROFIT_MARKET', 'TAKE_PROFIT'):
+                stop = float(order['stopPrice'])
+                hit = price <= stop if buy else price >= stop
+            elif order['type'] == 'LIMIT':
+                limit = float(order['price'])
+                hit = price <= limit if buy else price >= limit
+                price = limit if hit else price
+            else:
+                hit = False
+
+            if hit:
+                self.orders.pop(order_id)
+                self.stats['triggered'] += 1
+                self._fill(order, price)
+
+    def _fill(self, order: Dict[str, Any], price: float):
+        """Apply a fill to the position of (symbol, positionSide) and the wallet."""
+        key = (order['symbol'], order['positionSide'])
+        position = self.positions.setdefault(key, {'amount': 0.0, 'entry': 0.0})
+        quantity = float(order['origQty'])
+        if order['closePosition']:
+            quantity = abs(position['amount'])
+        signed = quantity if order['side'] == 'BUY' else -quantity
+
+        amount = position['amount']
+        if order['reduceOnly'] or (amount and (amount > 0) != (signed > 0)):
+            # 減倉：按平均開倉價實現盈虧
+            closed = min(abs(signed), abs(amount))
+            direction = 1 if amount > 0 else -1
+            self.balance += (price - position['entry']) * closed * direction
+            position['amount'] = amount - closed * direction
+            if position['amount'] == 0:
+                position['entry'] = 0.0
+            quantity = closed
+        else:
+            total = amount + signed
+            if total:
+                position['entry'] = (position['entry'] * abs(amount) + price * abs(signed)) / abs(total)
+            position['amount'] = total
+
+        self.balance -= price * quantity * _TAKER_FEE
+        order.update({
+            'status': 'FILLED',
+            'executedQty': f"{quantity}",
+            'avgPrice': f"{price:.8f}",
+            'cumQuote': f"{price * quantity:.8f}",
+            'updateTime': self.market.now_ms()
+        })
+        self.stats['fills'] += 1
+        self._emit_order(order, 'TRADE')
+        self._emit_account(key, position)
+
+    def _emit(self, event: Dict[str, Any]):
+        for listener in self.listeners:
+            listener(event)
+
+    def _emit_order(self, order: Dict[str, Any], execution: str):
+        """ORDER_TRADE_UPDATE user-data event."""
+        if not self.listeners:
+            return
+        now = self.market.now_ms()
+        self._emit({
+            'e': 'ORDER_TRADE_UPDATE', 'E': now, 'T': now,
+            'o': {
+                's': order['symbol'], 'c': order['clientOrderId'], 'S': order['side'], 'o': order['type'],
+                'f': order['timeInForce'], 'q': order['origQty'], 'p': order['price'], 'ap': order['avgPrice'],
+                'sp': order['stopPrice'], 'x': execution, 'X': order['status'], 'i': order['orderId'],
+                'l': order['executedQty'] if execution == 'TRADE' else '0', 'z': order['executedQty'],
+                'L': order['avgPrice'] if execution == 'TRADE' else '0', 'T': now,
+                'R': order['reduceOnly'], 'wt': order['workingType'], 'ot': order['type'],
+                'ps': order['positionSide'], 'cp': order['closePosition'], 'rp': '0'
+            }
+        })
+
+    def _emit_account(self, key: Tuple[str, str], position: Dict[str, float]):
+        """ACCOUNT_UPDATE user-data event for a fill (wallet + the changed position)."""
+        if not self.listeners:
+            return
+        now = self.market.now_ms()
+        self._emit({
+            'e': 'ACCOUNT_UPDATE', 'E': now, 'T': now,
+            'a': {
+                'm': 'ORDER',
+                'B': [{'a': 'USDT', 'wb': f"{self.balance:.8f}", 'cw': f"{self.balance:.8f}", 'bc': '0'}],
+                'P': [{
+                    's': key[0], 'pa': f"{position['amount']}", 'ep': f"{position['entry']:.8f}",
+                    'cr': '0', 'up': '0', 'mt': 'cross', 'iw': '0', 'ps': key[1]
+                }]
+            }
+        })
+
+    def position_risk(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """GET /fapi/v2/positionRisk"""
+        self.match()
+        rows = []
+        for (pos_symbol, side), position in self.positions.items():
+            if symbol and pos_symbol != symbol:
+                continue
+            mark = self.market.last_price(pos_symbol) or position['entry']
+            leverage = self.leverage.get(pos_symbol, 20)
+            rows.append({
+                'symbol': pos_symbol,
+                'positionSide': side,
+                'positionAmt': f"{position['amount']}",
+                'entryPrice': f"{position['entry']:.8f}",
+                'markPrice': f"{mark:.8f}",
+                'unRealizedProfit': f"{(mark - position['entry']) * position['amount']:.8f}",
+                'leverage': str(leverage),
+                'marginType': 'cross',
+                'isolatedMargin': '0',
+                'liquidationPrice': '0',
+                'notional': f"{mark * position['amount']:.8f}",
+                'updateTime': self.market.now_ms()
+            })
+        return rows
+
+    def account(self) -> Dict[str, Any]:
+        """GET /fapi/v2/account"""
+        positions = self.position_risk()
+        unrealized = sum(float(p['unRealizedProfit']) for p in positions)
+        margin = sum(abs(float(p['notional'])) / int(p['leverage']) for p in positions)
+        wallet = f"{self.balance:.8f}"
+        return {
+            'totalWalletBalance': wallet,
+            'totalUnrealizedProfit': f"{unrealized:.8f}",
+            'totalMarginBalance': f"{self.balance + unrealized:.8f}",
+            'totalPositionInitialMargin': f"{margin:.8f}",
+            'availableBalance': f"{self.balance + unrealized - margin:.8f}",
+            'maxWithdrawAmount': f"{self.balance - margin:.8f}",
+            'assets': [{'asset': 'USDT', 'walletBalance': wallet, 'availableBalance': f"{self.balance - margin:.8f}"}],
+            'positions': positions
+        }
+
+
+class BinanceStubServer:
+    """aiohttp application serving the Binance Futures subset the bot uses."""
+
+    def __init__(
+        self,
+        market: SimulatedMarket,
+        faults: Optional[FaultProfile] = None,
+        account: Optional[StubAccount] = None,
+        host: str = '127.0.0.1',
+        port: int = 0
+    ):
+        """
+        Initialize exchange stub.
+
+        Args:
+            market: Kline source (recorded or synthetic)
+            faults: Fault injection profile
+            account: Simulated account (default: 10000 USDT)
+            host / port: Bind address (port 0 = pick a free port)
+        """
+        self.market = market
+        self.faults = faults or FaultProfile()
+        self.account = account or StubAccount(market)
+        self.host = host
+        self.port = port
+
+        self._random = random.Random(self.faults.seed)
+        self._weight_minute = 0
+        self._used_weight = 0
+        self._order_window: List[float] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._sockets: Set[web.WebSocketResponse] = set()
+        self._listen_keys: Set[str] = set()
+
+        # Statistics
+        self.stats = {
+            'requests': 0,
+            'by_endpoint': {},
+            'rate_limited': 0,
+            'errors_injected': 0,
+            'disconnects': 0,
+            'ws_connections': 0,
+            'ws_messages': 0
+        }
+
+        self.app = web.Application(middlewares=[self._middleware])
+        self._add_routes()
+
+    def _add_routes(self):
+        r = self.app.router
+        for prefix in ('/api/v3', '/fapi/v1'):
+            r.add_get(f'{prefix}/ping', self._ping)
+            r.add_get(f'{prefix}/time', self._time)
+            r.add_get(f'{prefix}/klines', self._klines)
+            r.add_get(f'{prefix}/ticker/price', self._ticker_price)
+            r.add_get(f'{prefix}/ticker/24hr', self._ticker_24h)
+            r.add_get(f'{prefix}/exchangeInfo', self._exchange_info)
+        r.add_get('/fapi/v1/premiumIndex', self._premium_index)
+        r.add_get('/fapi/v1/fundingRate', self._funding_rate)
+        r.add_get('/futures/data/topLongShortAccountRatio', self._long_short_ratio)
+        r.add_post('/fapi/v1/order', self._create_order)
+        r.add_delete('/fapi/v1/order', self._cancel_order)
+        r.add_delete('/fapi/v1/allOpenOrders', self._cancel_all)
+        r.add_post('/fapi/v1/batchOrders', self._batch_orders)
+        r.add_delete('/fapi/v1/batchOrders', self._cancel_batch)
+        r.add_get('/fapi/v1/openOrders', self._open_orders)
+        r.add_post('/fapi/v1/listenKey', self._listen_key)
+        r.add_put('/fapi/v1/listenKey', self._listen_key)
+        r.add_delete('/fapi/v1/listenKey', self._listen_key)
+        r.add_post('/fapi/v1/leverage', self._set_leverage)
+        r.add_post('/fapi/v1/marginType', self._ack)
+        r.add_post('/fapi/v1/positionSide/dual', self._ack)
+        for version in ('v1', 'v2'):
+            r.add_get(f'/fapi/{version}/positionRisk', self._position_risk)
+            r.add_get(f'/fapi/{version}/account', self._account)
+            r.add_get(f'/fapi/{version}/balance', self._balance)
+        r.add_get('/ws/{streams:.*}', self._websocket)
+        r.add_get('/stream', self._websocket)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self) -> str:
+        """Start serving; returns the base URL."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(
+            f"Exchange stub listening on {self.base_url} "
+            f"({len(self.market.symbols)} symbols, latency {self.faults.latency_ms}ms)"
+        )
+        return self.base_url
+
+    async def stop(self):
+        for ws in list(self._sockets):
+            await ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        logger.info("Exchange stub stopped")
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def stream_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/"
+
+    # ------------------------------------------------------------------
+    # Fault injection / weight accounting
+    # ------------------------------------------------------------------
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.stats['requests'] += 1
+        endpoint = request.path
+        self.stats['by_endpoint'][endpoint] = self.stats['by_endpoint'].get(endpoint, 0) + 1
+
+        delay = self.faults.latency_ms + self._random.uniform(0, self.faults.latency_jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if request.path.startswith(('/ws', '/stream')):
+            return await handler(request)
+
+        roll = self._random.random()
+        if roll < self.faults.disconnect_rate:
+            self.stats['disconnects'] += 1
+            request.transport.close()
+            return web.Response(status=500)
+        roll -= self.faults.disconnect_rate
+        if roll < self.faults.error_rate:
+            self.stats['errors_injected'] += 1
+            return self._error(503, -1001, 'Internal error; unable to process your request. Please try your request again.')
+        roll -= self.faults.error_rate
+        if roll < self.faults.rate_limit_rate:
+            return self._rate_limited(60)
+
+        # 按分鐘窗口累計權重（與交易所一致：固定分鐘邊界）
+        now = time.time()
+        minute = int(now // 60)
+        if minute != self._weight_minute:
+            self._weight_minute = minute
+            self._used_weight = 0
+        self._used_weight += request_weight(request.path, dict(request.query))
+        if self.faults.weight_limit and self._used_weight > self.faults.weight_limit:
+            return self._rate_limited(60 - int(now % 60))
+
+        headers = {'X-MBX-USED-WEIGHT-1M': str(self._used_weight)}
+        if request.method == 'POST' and request.path.endswith('/order'):
+            self._order_window = [t for t in self._order_window if now - t < 10] + [now]
+            if self.faults.order_limit_10s and len(self._order_window) > self.faults.order_limit_10s:
+                return self._error(429, -1015, 'Too many new orders.', headers={'Retry-After': '10'})
+            headers['X-MBX-ORDER-COUNT-10S'] = str(len(self._order_window))
+
+        try:
+            response = await handler(request)
+        except web.HTTPException as e:
+            e.headers.update(headers)
+            raise
+        response.headers.update(headers)
+        return response
+
+    def _rate_limited(self, retry_after: int) -> web.Response:
+        self.stats['rate_limited'] += 1
+        return self._error(
+            429, -1003, 'Too many requests; current limit is exceeded.',
+            headers={'Retry-After': str(max(1, retry_after)), 'X-MBX-USED-WEIGHT-1M': str(self._used_weight)}
+        )
+
+    @staticmethod
+    def _error(status: int, code: int, msg: str, headers: Optional[Dict[str, str]] = None) -> web.Response:
+        return web.json_response({'code': code, 'msg': msg}, status=status, headers=headers)
+
+    @staticmethod
+    async def _params(request: web.Request) -> Dict[str, str]:
+        """Query string + form body (python-binance sends signed POST/DELETE data as a form)."""
+        params = dict(request.query)
+        if request.body_exists:
+            params.update(await request.post())
+        return params
+
+    def _require_symbol(self, symbol: Optional[str]) -> str:
+        if not symbol or symbol not in self.market.data.frames:
+            raise web.HTTPBadRequest(
+                text=json.dumps({'code': -1121, 'msg': 'Invalid symbol.'}), content_type='application/json'
+            )
+        return symbol
+
+    # ------------------------------------------------------------------
+    # Market data
+    # ------------------------------------------------------------------
+
+    async def _ping(self, request):
+        return web.json_response({})
+
+    async def _time(self, request):
+        return web.json_response({'serverTime': self.market.now_ms()})
+
+    async def _klines(self, request):
+        params = request.query
+        symbol = self._require_symbol(params.get('symbol'))
+        rows = await self.market.klines(
+            symbol,
+            interval=params.get('interval', '1m'),
+            limit=min(int(params.get('limit', 500)), 1500),
+            start_time=int(params['startTime']) if 'startTime' in params else None,
+            end_time=int(params['endTime']) if 'endTime' in params else None
+        )
+        return web.json_response(rows)
+
+    async def _ticker_price(self, request):
+        symbol = request.query.get('symbol')
+        now = self.market.now_ms()
+        if symbol:
+            price = self.market.last_price(self._require_symbol(symbol))
+            return web.json_response({'symbol': symbol, 'price': f"{price:.8f}", 'time': now})
+        return web.json_response([
+            {'symbol': s, 'price': f"{self.market.last_price(s):.8f}", 'time': now}
+            for s in self.market.symbols if self.market.last_price(s) is not None
+        ])
+
+    async def _ticker_24h(self, request):
+        symbol = request.query.get('symbol')
+        if symbol:
+            return web.json_response(self.market.ticker_24h(self._require_symbol(symbol)))
+        tickers = (self.market.ticker_24h(s) for s in self.market.symbols)
+        return web.json_response([t for t in tickers if t is not None])
+
+    async def _premium_index(self, request):
+        symbol = request.query.get('symbol')
+        if symbol:
+            return web.json_response(self._mark_price(self._require_symbol(symbol)))
+        return web.json_response([self._mark_price(s) for s in self.market.symbols])
+
+    async def _funding_rate(self, request):
+        symbol = self._require_symbol(request.query.get('symbol'))
+        now = self.market.now_ms()
+        return web.json_response([{
+            'symbol': symbol,
+            'fundingRate': '0.00010000',
+            'fundingTime': now - now % _FUNDING_INTERVAL_MS
+        }])
+
+    async def _long_short_ratio(self, request):
+        symbol = self._require_symbol(request.query.get('symbol'))
+        return web.json_response([{
+            'symbol': symbol,
+            'longAccount': '0.5200',
+            'shortAccount': '0.4800',
+            'longShortRatio': '1.0833',
+            'timestamp': self.market.now_ms()
+        }])
+
+    async def _exchange_info(self, request):
+        symbols = []
+        for symbol in self.market.symbols:
+            price = self.market.last_price(symbol) or 1.0
+            # 價格 / 數量精度按價格量級推導（約 5 位有效數字）
+            price_precision = max(0, min(8, 4 - int(f"{price:e}".split('e')[1])))
+            quantity_precision = max(0, min(3, int(f"{price:e}".split('e')[1])))
+            step = f"{10 ** -quantity_precision:.{quantity_precision}f}"
+            symbols.append({
+                'symbol': symbol,
+                'pair': symbol,
+                'contractType': 'PERPETUAL',
+                'status': 'TRADING',
+                'baseAsset': symbol[:-4],
+                'quoteAsset': 'USDT',
+                'marginAsset': 'USDT',
+                'pricePrecision': price_precision,
+                'quantityPrecision': quantity_precision,
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'minPrice': '0', 'maxPrice': '1000000',
+                     'tickSize': f"{10 ** -price_precision:.{price_precision}f}"},
+                    {'filterType': 'LOT_SIZE', 'stepSize': step, 'minQty': step, 'maxQty': '1000000'},
+                    {'filterType': 'MARKET_LOT_SIZE', 'stepSize': step, 'minQty': step, 'maxQty': '1000000'},
+                    {'filterType': 'MIN_NOTIONAL', 'notional': '5'}
+                ]
+            })
+        return web.json_response({
+            'timezone': 'UTC',
+            'serverTime': self.market.now_ms(),
+            'rateLimits': [
+                {'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1,
+                 'limit': self.faults.weight_limit},
+                {'rateLimitType': 'ORDERS', 'interval': 'SECOND', 'intervalNum': 10,
+                 'limit': self.faults.order_limit_10s}
+            ],
+            'symbols': symbols
+        })
+
+    def _mark_price(self, symbol: str) -> Dict[str, Any]:
+        price = self.market.last_price(symbol) or 0.0
+        now = self.market.now_ms()
+        return {
+            'symbol': symbol,
+            'markPrice': f"{price:.8f}",
+            'indexPrice': f"{price:.8f}",
+            'lastFundingRate': '0.00010000',
+            'nextFundingTime': now - now % _FUNDING_INTERVAL_MS + _FUNDING_INTERVAL_MS,
+            'time': now
+        }
+
+    # ------------------------------------------------------------------
+    # Trading / account
+    # ------------------------------------------------------------------
+
+    async def _create_order(self, request):
+        params = await self._params(request)
+        self._require_symbol(params.get('symbol'))
+        return web.json_response(self.account.create_order(params))
+
+    async def _cancel_order(self, request):
+        return web.json_response(self.account.cancel_order(await self._params(request)))
+
+    @staticmethod
+    def _each(action, items) -> List[Dict[str, Any]]:
+        """Batch endpoints answer per item: the order, or its {'code', 'msg'} error."""
+        results = []
+        for item in items:
+            try:
+                results.append(action(item))
+            except web.HTTPBadRequest as e:
+                results.append(json.loads(e.text))
+        return results
+
+    async def _batch_orders(self, request):
+        params = await self._params(request)
+        orders = json.loads(params.get('batchOrders', '[]'))
+        return web.json_response(self._each(self.account.create_order, orders))
+
+    async def _cancel_batch(self, request):
+        params = await self._params(request)
+        order_ids = json.loads(params.get('orderIdList', '[]'))
+        return web.json_response(self._each(lambda order_id: self.account.cancel_order({'orderId': order_id}), order_ids))
+
+    async def _cancel_all(self, request):
+        params = await self._params(request)
+        self.account.cancel_all(self._require_symbol(params.get('symbol')))
+        return web.json_response({'code': 200, 'msg': 'The operation of cancel all open order is done.'})
+
+    async def _open_orders(self, request):
+        self.account.match()
+        symbol = request.query.get('symbol')
+        return web.json_response([
+            order for order in self.account.orders.values() if not symbol or order['symbol'] == symbol
+        ])
+
+    async def _set_leverage(self, request):
+        params = await self._params(request)
+        symbol = self._require_symbol(params.get('symbol'))
+        self.account.leverage[symbol] = int(params.get('leverage', 20))
+        return web.json_response({
+            'symbol': symbol, 'leverage': self.account.leverage[symbol], 'maxNotionalValue': '1000000'
+        })
+
+    async def _listen_key(self, request):
+        """POST creates, PUT keeps alive, DELETE closes a user-data stream listenKey."""
+        if request.method == 'POST':
+            key = f"stubListenKey{len(self._listen_keys) + 1}"
+            self._listen_keys.add(key)
+            return web.json_response({'listenKey': key})
+        key = (await self._params(request)).get('listenKey')
+        if key not in self._listen_keys:
+            return self._error(400, -1125, 'This listenKey does not exist.')
+        if request.method == 'DELETE':
+            self._listen_keys.discard(key)
+        return web.json_response({})
+
+    async def _ack(self, request):
+        return web.json_response({'code': 200, 'msg': 'success'})
+
+    async def _position_risk(self, request):
+        return web.json_response(self.account.position_risk(request.query.get('symbol')))
+
+    async def _account(self, request):
+        return web.json_response(self.account.account())
+
+    async def _balance(self, request):
+        account = self.account.account()
+        return web.json_response([{
+            'asset': 'USDT',
+            'balance': account['totalWalletBalance'],
+            'crossWalletBalance': account['totalWalletBalance'],
+            'crossUnPnl': account['totalUnrealizedProfit'],
+            'availableBalance': account['availableBalance'],
+            'maxWithdrawAmount': account['maxWithdrawAmount']
+        }])
+
+    # ------------------------------------------------------------------
+    # WebSocket streams
+    # ------------------------------------------------------------------
+
+    async def _websocket(self, request):
+        """
+        /ws/<stream>[/<stream>...] (raw events) or /stream?streams=a/b (combined).
+
+        Supported streams: <symbol>@kline_<interval>, <symbol>@markPrice[@1s],
+        !markPrice@arr[@1s], and a listenKey (user-data events); SUBSCRIBE /
+        UNSUBSCRIBE / LIST_SUBSCRIPTIONS messages are honoured.
+        """
+        combined = request.path.startswith('/stream')
+        raw = request.query.get('streams', '') if combined else request.match_info.get('streams', '')
+        streams = {s for s in raw.split('/') if s}
+
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        self.stats['ws_connections'] += 1
+
+        if streams & self._listen_keys:
+            pusher = asyncio.create_task(self._push_user_data(ws))
+        else:
+            pusher = asyncio.create_task(self._push(ws, streams, combined))
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    command = json.loads(msg.data)
+                except ValueError:
+                    continue
+                method = command.get('method')
+                if method == 'SUBSCRIBE':
+                    streams.update(command.get('params', []))
+                elif method == 'UNSUBSCRIBE':
+                    streams.difference_update(command.get('params', []))
+                result = sorted(streams) if method == 'LIST_SUBSCRIPTIONS' else None
+                await ws.send_json({'result': result, 'id': command.get('id')})
+        finally:
+            pusher.cancel()
+            self._sockets.discard(ws)
+        return ws
+
+    async def _push(self, ws: web.WebSocketResponse, streams: Set[str], combined: bool):
+        """Send one event per subscribed stream every ws_interval seconds."""
+        try:
+            while not ws.closed:
+                for stream in list(streams):
+                    data = await self._stream_event(stream)
+                    if data is None:
+                        continue
+                    await ws.send_json({'stream': stream, 'data': data} if combined else data)
+                    self.stats['ws_messages'] += 1
+                await asyncio.sleep(self.faults.ws_interval)
+        except (asyncio.CancelledError, ConnectionResetError):
+            pass
+
+    async def _push_user_data(self, ws: web.WebSocketResponse):
+        """Forward the account's ORDER_TRADE_UPDATE / ACCOUNT_UPDATE events."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self.account.listeners.append(queue.put_nowait)
+        try:
+            while not ws.closed:
+                await ws.send_json(await queue.get())
+                self.stats['ws_messages'] += 1
+        except (asyncio.CancelledError, ConnectionResetError):
+            pass
+        finally:
+            self.account.listeners.remove(queue.put_nowait)
+
+    async def _stream_event(self, stream: str) -> Optional[Any]:
+        now = self.market.now_ms()
+        if stream.startswith('!markPrice@arr'):
+            return [self._mark_price_event(s, now) for s in self.market.symbols]
+
+        name, _, kind = stream.partition('@')
+        symbol = name.upper()
+        if symbol not in self.market.data.frames:
+            return None
+
+        if kind.startswith('markPrice'):
+            return self._mark_price_event(symbol, now)
+
+        if kind.startswith('kline_'):
+            interval = kind[len('kline_'):]
+            rows = await self.market.klines(symbol, interval, limit=1)
+            if not rows:
+                return None
+            row = rows[-1]
+            return {
+                'e': 'kline', 'E': now, 's': symbol,
+                'k': {
+                    't': row[0], 'T': row[6], 's': symbol, 'i': interval, 'f': 0, 'L': row[8],
+                    'o': row[1], 'c': row[4], 'h': row[2], 'l': row[3], 'v': row[5], 'n': row[8],
+                    'x': now >= row[6], 'q': row[7], 'V': row[9], 'Q': row[10], 'B': '0'
+                }
+            }
+        return None
+
+    def _mark_price_event(self, symbol: str, now: int) -> Dict[str, Any]:
+        mark = self._mark_price(symbol)
+        return {
+            'e': 'markPriceUpdate', 'E': now, 's': symbol,
+            'p': mark['markPrice'], 'i': mark['indexPrice'], 'P': mark['markPrice'],
+            'r': mark['lastFundingRate'], 'T': mark['nextFundingTime']
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get stub server statistics."""
+        return {
+            **self.stats,
+            'used_weight_1m': self._used_weight,
+            'open_ws': len(self._sockets),
+            'account': dict(self.account.stats),
+            'market': self.market.get_stats()
+        }
+
+
+async def main():
+    """Run the stub with Config.EXCHANGE_STUB_* settings until interrupted."""
+    if Config.EXCHANGE_STUB_DATA_DIR:
+        market = SimulatedMarket(
+            load_klines_directory(Config.EXCHANGE_STUB_DATA_DIR),
+            speed=Config.EXCHANGE_STUB_SPEED
+        )
+    else:
+        market = SimulatedMarket.synthetic(
+            symbols=Config.EXCHANGE_STUB_SYMBOLS,
+            speed=Config.EXCHANGE_STUB_SPEED
+        )
+
+    server = BinanceStubServer(
+        market,
+        faults=FaultProfile.from_config(),
+        host=Config.EXCHANGE_STUB_HOST,
+        port=Config.EXCHANGE_STUB_PORT
+    )
+    await server.start()
+    try:
+        while True:
+            await asyncio.sleep(60)
+            stats = server.get_stats()
+            logger.info(
+                f"Stub: {stats['requests']} requests, {stats['rate_limited']} rate-limited, "
+                f"{stats['errors_injected']} errors, {stats['ws_messages']} ws messages"
+            )
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,224 @@
+"""
+Simulated Market - Recorded or synthetic klines on a running clock.
+
+Responsibilities:
+- Generate deterministic synthetic 1m klines for any number of symbols
+- Advance a market clock at N-times wall-clock speed over stored klines
+- Serve klines / prices / 24h tickers in Binance REST shapes (exchange stub)
+"""
+
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.data import HistoricalDataService, timeframe_to_offset
+
+_MS = 1_000_000            # ns → ms
+_DAY_CANDLES = 1440        # 24h 統計所用的 1m K 棒數
+
+
+def synthetic_klines(
+    symbol: str,
+    n: int = 3000,
+    end: Optional[pd.Timestamp] = None,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    Deterministic random-walk 1m klines for a symbol.
+
+    The price level and volatility are derived from the symbol name, so the
+    same (symbol, seed) always produces the same series.
+    """
+    rng = np.random.default_rng([zlib.crc32(symbol.encode()), seed])
+    end = pd.Timestamp(end or pd.Timestamp.utcnow().tz_localize(None)).floor('1min')
+
+    base_price = 10 ** rng.uniform(-2, 4)
+    volatility = rng.uniform(0.0008, 0.003)
+    returns = rng.normal(0, volatility, n) + volatility * 0.15 * np.sin(np.arange(n) / rng.uniform(120, 600))
+    close = base_price * np.exp(np.cumsum(returns))
+    open_ = np.r_[base_price, close[:-1]]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, volatility / 2, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, volatility / 2, n)))
+    volume = rng.lognormal(np.log(1e5 / base_price), 0.6, n)
+
+    return pd.DataFrame({
+        'timestamp': pd.date_range(end=end, periods=n, freq='1min'),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': volume
+    })
+
+
+def synthetic_symbols(count: int) -> List[str]:
+    """count pseudo USDT-perpetual symbols (BTCUSDT, ETHUSDT, ... SYM0007USDT)."""
+    majors = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'SOLUSDT', 'XRPUSDT']
+    return (majors + [f"SYM{i:04d}USDT" for i in range(max(0, count - len(majors)))])[:count]
+
+
+class SimulatedMarket:
+    """
+    Kline source with a running clock.
+
+    The clock starts warmup candles into the data and advances speed market
+    seconds per wall-clock second, stopping at the last stored candle.
+    """
+
+    def __init__(
+        self,
+        klines: Dict[str, pd.DataFrame],
+        warmup: int = 1000,
+        speed: float = 1.0,
+        base_timeframe: str = '1m'
+    ):
+        """
+        Initialize simulated market.
+
+        Args:
+            klines: Dict of {symbol: kline DataFrame in the base timeframe}
+            warmup: Candles already in the past when the clock starts
+            speed: Market seconds per wall-clock second (0 = frozen clock)
+            base_timeframe: Timeframe of the stored klines
+        """
+        self.data = HistoricalDataService(klines, base_timeframe=base_timeframe)
+        self.speed = speed
+        self.base_offset = timeframe_to_offset(base_timeframe)
+
+        frames = [df['timestamp'] for df in self.data.frames.values() if len(df)]
+        self.first_ns = min(ts.iat[0].value for ts in frames) if frames else 0
+        self.last_ns = max(ts.iat[-1].value for ts in frames) if frames else 0
+        self.start_ns = min(self.first_ns + warmup * self.base_offset.value, self.last_ns)
+        self._started = time.monotonic()
+
+        # 24h 統計用的累計量（O(1) 區間求和）
+        self._cum_volume = {}
+        self._cum_quote = {}
+        for symbol, df in self.data.frames.items():
+            volume = df['volume'].values
+            self._cum_volume[symbol] = np.r_[0.0, np.cumsum(volume)]
+            self._cum_quote[symbol] = np.r_[0.0, np.cumsum(volume * df['close'].values)]
+
+    @classmethod
+    def synthetic(
+        cls,
+        symbols: int = 648,
+        history: int = 3000,
+        warmup: int = 1000,
+        speed: float = 1.0,
+        seed: int = 0
+    ) -> 'SimulatedMarket':
+        """Market over synthetic klines for count symbols."""
+        end = pd.Timestamp.utcnow().tz_localize(None).floor('1min') + pd.Timedelta(minutes=history - warmup)
+        klines = {
+            symbol: synthetic_klines(symbol, history, end=end, seed=seed)
+            for symbol in synthetic_symbols(symbols)
+        }
+        return cls(klines, warmup=warmup, speed=speed)
+
+    @property
+    def symbols(self) -> List[str]:
+        return self.data.symbols
+
+    def now_ns(self) -> int:
+        """Current market time (epoch ns)."""
+        elapsed = (time.monotonic() - self._started) * self.speed
+        return min(self.start_ns + int(elapsed * 1e9), self.last_ns)
+
+    def now_ms(self) -> int:
+        return self.now_ns() // _MS
+
+    def _row(self, symbol: str) -> int:
+        self.data.set_time(self.now_ns())
+        return self.data.position(symbol)
+
+    def last_price(self, symbol: str) -> Optional[float]:
+        i = self._row(symbol)
+        if i < 0:
+            return None
+        return float(self.data.frames[symbol]['close'].values[i])
+
+    async def klines(
+        self,
+        symbol: str,
+        interval: str = '1m',
+        limit: int = 500,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None
+    ) -> List[list]:
+        """
+        Klines visible at the market clock in the Binance REST row format.
+
+        Args:
+            start_time / end_time: Optional bounds in epoch ms (as the API takes them)
+        """
+        now = self.now_ns()
+        as_of = min(now, end_time * _MS) if end_time is not None else now
+        self.data.set_time(as_of)
+
+        fetch_limit = limit
+        if start_time is not None:
+            # 從 start_time 往後取 limit 根：先取到 as_of 為止的整段，再截取
+            span = max(0, as_of - start_time * _MS)
+            fetch_limit = int(span // timeframe_to_offset(interval).value) + 1
+
+        df = await self.data.fetch_klines(symbol, interval, fetch_limit)
+        if df is None or len(df) == 0:
+            return []
+
+        ts = df['timestamp'].values.astype('datetime64[ns]').astype(np.int64)
+        if start_time is not None:
+            keep = ts >= start_time * _MS
+            df, ts = df[keep].iloc[:limit], ts[keep][:limit]
+        else:
+            df, ts = df.iloc[-limit:], ts[-limit:]
+
+        interval_ms = timeframe_to_offset(interval).value // _MS
+        rows = []
+        for t, o, h, l, c, v in zip(ts // _MS, df['open'].values, df['high'].values, df['low'].values,
+                                    df['close'].values, df['volume'].values):
+            rows.append([
+                int(t), f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}", f"{v:.3f}",
+                int(t + interval_ms - 1), f"{v * c:.4f}", max(1, int(v / 10)),
+                f"{v / 2:.3f}", f"{v * c / 2:.4f}", "0"
+            ])
+        return rows
+
+    def ticker_24h(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """24h rolling statistics (GET /fapi/v1/ticker/24hr shape)."""
+        i = self._row(symbol)
+        if i < 0:
+            return None
+
+        df = self.data.frames[symbol]
+        start = max(0, i - _DAY_CANDLES + 1)
+        open_price = float(df['open'].values[start])
+        last = float(df['close'].values[i])
+        change = last - open_price
+        return {
+            'symbol': symbol,
+            'priceChange': f"{change:.8f}",
+            'priceChangePercent': f"{change / open_price * 100 if open_price else 0:.3f}",
+            'weightedAvgPrice': f"{last:.8f}",
+            'lastPrice': f"{last:.8f}",
+            'lastQty': '1',
+            'openPrice': f"{open_price:.8f}",
+            'highPrice': f"{df['high'].values[start:i + 1].max():.8f}",
+            'lowPrice': f"{df['low'].values[start:i + 1].min():.8f}",
+            'volume': f"{self._cum_volume[symbol][i + 1] - self._cum_volume[symbol][start]:.3f}",
+            'quoteVolume': f"{self._cum_quote[symbol][i + 1] - self._cum_quote[symbol][start]:.4f}",
+            'openTime': int(df['timestamp'].values[start].astype('datetime64[ms]').astype(np.int64)),
+            'closeTime': self.now_ms(),
+            'count': i - start + 1
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get market statistics."""
+        return {
+            **self.data.get_stats(),
+            'speed': self.speed,
+            'clock': pd.Timestamp(self.now_ns()).isoformat()
+        }
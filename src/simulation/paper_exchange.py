@@ -0,0 +1,609 @@
+"""
+Paper Exchange - In-process simulated futures account behind the order interface.
+
+Responsibilities:
+- Accept create_order / place_order / set_stop_loss_order /
+  set_take_profit_order and the async single / batch order methods exactly
+  like BinanceDataClient (hedge mode)
+- Match orders against the candles and tickers the bot fetches (live or
+  replayed), after a configurable order latency
+- Fill market and triggered orders with slippage and taker fees, resting
+  limit orders at their price with maker fees, partially when the candle's
+  traded volume can't absorb them
+- Maintain wallet balance, positions, margin and open-order margin
+
+All other attribute access is forwarded to the wrapped market-data client,
+so the bot uses one object for data and execution.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.backtest.engine import FillModel
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_TYPES = ('STOP_MARKET', 'TAKE_PROFIT_MARKET')
+
+
+@dataclass
+class PaperOrder:
+    """Simulated order (Binance futures order fields)."""
+    order_id: int
+    symbol: str
+    side: str                 # 'BUY' / 'SELL'
+    position_side: str        # 'LONG' / 'SHORT'
+    type: str                 # MARKET / LIMIT / STOP_MARKET / TAKE_PROFIT_MARKET
+    quantity: float
+    price: float = 0.0        # LIMIT 價格
+    stop_price: float = 0.0   # 觸發價格
+    reduce_only: bool = False
+    active_at: float = 0.0    # 延遲後到達撮合引擎的時刻（epoch 秒）
+    executed_qty: float = 0.0
+    cum_quote: float = 0.0
+    status: str = 'NEW'
+    update_time: float = 0.0
+    reserved: float = 0.0     # 佔用的委託保證金
+    resting: bool = False     # 已掛入訂單簿（到達時未立即成交）
+
+    @property
+    def remaining(self) -> float:
+        return self.quantity - self.executed_qty
+
+    @property
+    def avg_price(self) -> float:
+        return self.cum_quote / self.executed_qty if self.executed_qty else 0.0
+
+    @property
+    def opens(self) -> bool:
+        """True when the order increases its position side."""
+        return (self.side == 'BUY') == (self.position_side == 'LONG')
+
+    def to_response(self) -> Dict[str, Any]:
+        return {
+            'orderId': self.order_id,
+            'symbol': self.symbol,
+            'status': self.status,
+            'clientOrderId': f"paper_{self.order_id}",
+            'price': f"{self.price:.8f}",
+            'avgPrice': f"{self.avg_price:.8f}",
+            'origQty': f"{self.quantity:.8f}",
+            'executedQty': f"{self.executed_qty:.8f}",
+            'cumQuote': f"{self.cum_quote:.8f}",
+            'type': self.type,
+            'side': self.side,
+            'positionSide': self.position_side,
+            'stopPrice': f"{self.stop_price:.8f}",
+            'reduceOnly': self.reduce_only,
+            'updateTime': int(self.update_time * 1000)
+        }
+
+
+@dataclass
+class PaperPosition:
+    """One side of a hedge-mode position."""
+    symbol: str
+    position_side: str
+    quantity: float = 0.0     # 絕對數量
+    entry_price: float = 0.0
+    leverage: float = 1.0
+
+    def unrealized(self, price: float) -> float:
+        sign = 1 if self.position_side == 'LONG' else -1
+        return (price - self.entry_price) * self.quantity * sign
+
+    @property
+    def margin(self) -> float:
+        return self.quantity * self.entry_price / self.leverage
+
+
+def _first_cross(path: List[float], level: float, below: bool) -> Optional[int]:
+    """Index of the first path point at or beyond level (the move reaches it from the previous point)."""
+    for i, price in enumerate(path):
+        if (price <= level) if below else (price >= level):
+            return i
+    return None
+
+
+class PaperExchange:
+    """Simulated USDT-M futures account in hedge mode."""
+
+    def __init__(
+        self,
+        client=None,
+        balance: Optional[float] = None,
+        latency_ms: Optional[float] = None,
+        fill_model: Optional[FillModel] = None,
+        max_participation: Optional[float] = None,
+        leverage: Optional[float] = None,
+        timeframe: Optional[str] = None
+    ):
+        """
+        Initialize paper exchange.
+
+        Args:
+            client: Market-data client (BinanceDataClient / ReplayBinanceClient)
+            balance: Initial USDT wallet balance (default: Config.PAPER_INITIAL_BALANCE)
+            latency_ms: Order latency before an order can match (default: Config.PAPER_LATENCY_MS)
+            fill_model: Fees and slippage (default: FillModel with Config.PAPER_SLIPPAGE_BPS)
+            max_participation: Share of a candle's volume resting limit orders can fill
+            leverage: Default leverage per symbol (default: Config.DEFAULT_LEVERAGE)
+            timeframe: Kline interval matched against (default: Config.TIMEFRAME)
+        """
+        self.client = client
+        self.balance = Config.PAPER_INITIAL_BALANCE if balance is None else balance
+        self.latency = (Config.PAPER_LATENCY_MS if latency_ms is None else latency_ms) / 1000
+        self.fill_model = fill_model or FillModel(slippage_bps=Config.PAPER_SLIPPAGE_BPS)
+        self.max_participation = Config.PAPER_MAX_PARTICIPATION if max_participation is None else max_participation
+        self.default_leverage = leverage or Config.DEFAULT_LEVERAGE
+        self.timeframe = timeframe or Config.TIMEFRAME
+
+        self.orders: Dict[str, Dict[int, PaperOrder]] = {}         # symbol → 未完成訂單（按下單順序）
+        self.positions: Dict[Tuple[str, str], PaperPosition] = {}
+        self.leverage: Dict[str, float] = {}
+        self.last_price: Dict[str, float] = {}
+        self.trades = deque(maxlen=10000)                          # 最近成交
+        self._candles: Dict[str, Tuple[int, float, float, float, float]] = {}  # symbol → (ts, high, low, close, volume)
+        self._reserved_margin = 0.0
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()  # 止損 / 止盈在線程池中下單
+
+        # Statistics
+        self.stats = {
+            'orders_submitted': 0,
+            'orders_rejected': 0,
+            'orders_filled': 0,
+            'partial_fills': 0,
+            'orders_canceled': 0,
+            'orders_expired': 0,
+            'fees_paid': 0.0,
+            'realized_pnl': 0.0,
+            'candles_processed': 0
+        }
+
+        logger.info(
+            f"PaperExchange initialized: balance={self.balance:,.2f} USDT, latency={self.latency * 1000:.0f}ms, "
+            f"slippage={self.fill_model.slippage_bps}bps, participation={self.max_participation:.0%}"
+        )
+
+    def __getattr__(self, name):
+        # 行情等其他方法交給真實 / 回放客戶端
+        client = self.__dict__.get('client')
+        if client is None:
+            raise AttributeError(name)
+        return getattr(client, name)
+
+    # ------------------------------------------------------------------
+    # Order interface (BinanceDataClient-compatible)
+    # ------------------------------------------------------------------
+
+    def place_order(self, symbol, side, order_type, quantity, price=None):
+        """Market / limit order; positionSide follows the side, as in BinanceDataClient."""
+        position_side = 'LONG' if side == 'BUY' else 'SHORT'
+        return self.submit_order(symbol, side, order_type, quantity, price=price, position_side=position_side)
+
+    def create_order(self, symbol, side, type, quantity, price=None):
+        return self.place_order(symbol, side, type, quantity, price)
+
+    def set_stop_loss_order(self, symbol, side, quantity, stop_price, position_side):
+        return self.submit_order(symbol, side, 'STOP_MARKET', quantity, stop_price=stop_price,
+                                 position_side=position_side, reduce_only=True)
+
+    def set_take_profit_order(self, symbol, side, quantity, tp_price, position_side):
+        return self.submit_order(symbol, side, 'TAKE_PROFIT_MARKET', quantity, stop_price=tp_price,
+                                 position_side=position_side, reduce_only=True)
+
+    async def create_order_async(self, params):
+        await self._prefetch_price(params['symbol'])
+        return self._submit_params(params, fetch_price=False)
+
+    async def place_batch_orders_async(self, orders):
+        """Batch legs are matched in submission order (entry before its SL / TP)."""
+        for symbol in {params['symbol'] for params in orders}:
+            await self._prefetch_price(symbol)
+        return [self._submit_params(params, fetch_price=False) for params in orders]
+
+    async def cancel_orders_async(self, symbol, order_ids):
+        return [self.cancel_order(symbol, int(order_id)) for order_id in order_ids]
+
+    def _submit_params(self, params: Dict[str, Any], fetch_price: bool = True) -> Optional[Dict[str, Any]]:
+        """Order from futures_create_order-style parameters (as OrderGateway builds them)."""
+        return self.submit_order(
+            params['symbol'], params['side'], params['type'], params['quantity'],
+            price=params.get('price'),
+            stop_price=params.get('stopPrice'),
+            position_side=params.get('positionSide'),
+            reduce_only=str(params.get('reduceOnly', False)).lower() == 'true',
+            fetch_price=fetch_price
+        )
+
+    def submit_order(
+        self,
+        symbol: str,
+        side: str,
+        order_type: str,
+        quantity: float,
+        price: Optional[float] = None,
+        stop_price: Optional[float] = None,
+        position_side: Optional[str] = None,
+        reduce_only: bool = False,
+        fetch_price: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Submit an order.
+
+        Without a cached price for the symbol the synchronous ticker REST call
+        is used (fetch_price=False on the async paths, which prefetch it).
+
+        Returns:
+            Order response, or None if rejected (as BinanceDataClient does on errors)
+        """
+        with self._lock:
+            self.stats['orders_submitted'] += 1
+            quantity = float(quantity)
+            if quantity <= 0 or side not in ('BUY', 'SELL'):
+                return self._reject(symbol, f"invalid order {side} {quantity}")
+            if order_type == 'LIMIT' and not price:
+                return self._reject(symbol, "LIMIT order without price")
+            if order_type in TRIGGER_TYPES and not stop_price:
+                return self._reject(symbol, f"{order_type} without stopPrice")
+
+            now = time.time()
+            order = PaperOrder(
+                order_id=next(self._ids),
+                symbol=symbol,
+                side=side,
+                position_side=position_side or ('LONG' if side == 'BUY' else 'SHORT'),
+                type=order_type,
+                quantity=quantity,
+                price=float(price or 0.0),
+                stop_price=float(stop_price or 0.0),
+                reduce_only=reduce_only,
+                active_at=now + self.latency,
+                update_time=now
+            )
+
+            if order.opens and not reduce_only:
+                reference = order.price or self._reference_price(symbol, fetch_price)
+                if reference is None:
+                    return self._reject(symbol, "no price available")
+                required = quantity * reference / self._leverage(symbol)
+                available = self.available_balance()
+                if required + self.fill_model.fee(quantity * reference) > available:
+                    return self._reject(symbol, f"insufficient margin ({required:,.2f} > {available:,.2f} available)")
+                order.reserved = required
+                self._reserved_margin += required
+
+            self.orders.setdefault(symbol, {})[order.order_id] = order
+
+            # 無延遲的市價單以最新價立即成交
+            if order_type == 'MARKET' and self.latency == 0:
+                price_now = self._reference_price(symbol, fetch_price)
+                if price_now is not None:
+                    self._match(symbol, [price_now], float('inf'), now)
+
+            logger.debug(f"[PAPER] {order_type} {side} {symbol} qty={quantity} → #{order.order_id} {order.status}")
+            return order.to_response()
+
+    def cancel_order(self, symbol: str, order_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            book = self.orders.get(symbol, {})
+            order = book.get(order_id)
+            if order is None:
+                return None
+            self._finish(book, order, 'CANCELED')
+            order.update_time = time.time()
+            return order.to_response()
+
+    def cancel_all_orders(self, symbol: str) -> int:
+        with self._lock:
+            book = self.orders.get(symbol, {})
+            count = len(book)
+            for order in list(book.values()):
+                self._finish(book, order, 'CANCELED')
+            return count
+
+    def get_open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            books = [self.orders.get(symbol, {})] if symbol else list(self.orders.values())
+            return [order.to_response() for book in books for order in book.values()]
+
+    def get_open_stop_orders(self, symbol=None):
+        return [order for order in self.get_open_orders(symbol) if order['type'] in TRIGGER_TYPES]
+
+    def set_leverage(self, symbol: str, leverage: float):
+        self.leverage[symbol] = float(leverage)
+
+    # ------------------------------------------------------------------
+    # Account
+    # ------------------------------------------------------------------
+
+    def get_futures_balance(self):
+        return self.balance
+
+    def unrealized_pnl(self) -> float:
+        return sum(
+            position.unrealized(self.last_price.get(position.symbol, position.entry_price))
+            for position in self.positions.values()
+        )
+
+    def position_margin(self) -> float:
+        return sum(position.margin for position in self.positions.values())
+
+    def open_order_margin(self) -> float:
+        return self._reserved_margin
+
+    def available_balance(self) -> float:
+        return self.balance + self.unrealized_pnl() - self.position_margin() - self.open_order_margin()
+
+    def get_account(self) -> Dict[str, float]:
+        """Account summary (GET /fapi/v2/account totals)."""
+        with self._lock:
+            unrealized = self.unrealized_pnl()
+            return {
+                'totalWalletBalance': self.balance,
+                'totalUnrealizedProfit': unrealized,
+                'totalMarginBalance': self.balance + unrealized,
+                'totalPositionInitialMargin': self.position_margin(),
+                'totalOpenOrderInitialMargin': self.open_order_margin(),
+                'availableBalance': self.available_balance()
+            }
+
+    def get_current_positions(self):
+        """Open positions in the BinanceDataClient.get_current_positions shape."""
+        with self._lock:
+            result = []
+            for position in self.positions.values():
+                price = self.last_price.get(position.symbol, position.entry_price)
+                sign = 1 if position.position_side == 'LONG' else -1
+                result.append({
+                    'symbol': position.symbol,
+                    'positionSide': position.position_side,
+                    'positionAmt': str(position.quantity * sign),
+                    'entryPrice': str(position.entry_price),
+                    'markPrice': str(price),
+                    'unRealizedProfit': str(position.unrealized(price)),
+                    'leverage': str(int(position.leverage))
+                })
+            return result
+
+    # ------------------------------------------------------------------
+    # Market data (feeds the matcher)
+    # ------------------------------------------------------------------
+
+    async def get_klines_async(self, symbol, interval='1h', limit=500):
+        df = await self.client.get_klines_async(symbol, interval, limit)
+        if interval == self.timeframe:
+            self.on_klines(symbol, df)
+        return df
+
+    def get_klines(self, symbol, interval='1h', limit=500):
+        df = self.client.get_klines(symbol, interval, limit)
+        if interval == self.timeframe:
+            self.on_klines(symbol, df)
+        return df
+
+    async def get_ticker(self, symbol):
+        ticker = await self.client.get_ticker(symbol)
+        if ticker:
+            price = float(ticker.get('lastPrice') or ticker.get('price') or 0)
+            if price > 0:
+                self.on_price(symbol, price)
+        return ticker
+
+    def get_ticker_price(self, symbol):
+        price = self.client.get_ticker_price(symbol)
+        if price:
+            self.on_price(symbol, float(price))
+        return price
+
+    def on_price(self, symbol: str, price: float):
+        """A traded price was observed (no volume: limit orders fill without a participation cap)."""
+        with self._lock:
+            self._match(symbol, [price], float('inf'), time.time())
+
+    def on_klines(self, symbol: str, df):
+        """
+        Match against candles not seen before, and the unseen part of the
+        still-forming candle (only its new extremes and close).
+        """
+        if df is None or len(df) == 0:
+            return
+        ts = df['timestamp'].values.astype('datetime64[ns]').astype(np.int64)
+        opens, highs, lows = df['open'].values, df['high'].values, df['low'].values
+        closes, volumes = df['close'].values, df['volume'].values
+
+        with self._lock:
+            now = time.time()
+            seen = self._candles.get(symbol)
+            if seen is None:
+                # 首次看到：只建立基準，不回溯撮合歷史 K 線
+                self.last_price[symbol] = float(closes[-1])
+            else:
+                seen_ts, seen_high, seen_low, seen_close, seen_volume = seen
+                start = int(np.searchsorted(ts, seen_ts, 'left'))
+                for i in range(start, len(ts)):
+                    if ts[i] == seen_ts:
+                        path = [seen_close]
+                        extensions = []
+                        if lows[i] < seen_low:
+                            extensions.append(float(lows[i]))
+                        if highs[i] > seen_high:
+                            extensions.append(float(highs[i]))
+                        path += sorted(extensions, reverse=closes[i] < seen_close) + [float(closes[i])]
+                        volume = volumes[i] - seen_volume
+                    else:
+                        o, h, l, c = float(opens[i]), float(highs[i]), float(lows[i]), float(closes[i])
+                        path = [o, l, h, c] if c >= o else [o, h, l, c]
+                        volume = volumes[i]
+                    liquidity = max(volume, 0.0) * self.max_participation if self.max_participation else float('inf')
+                    self._match(symbol, path, liquidity, now)
+                    self.stats['candles_processed'] += 1
+
+            self._candles[symbol] = (int(ts[-1]), float(highs[-1]), float(lows[-1]),
+                                     float(closes[-1]), float(volumes[-1]))
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+
+    def _match(self, symbol: str, path: List[float], liquidity: float, now: float):
+        """Fill orders of one symbol along a price path, earliest trigger first."""
+        self.last_price[symbol] = path[-1]
+        book = self.orders.get(symbol)
+        if not book:
+            return
+
+        triggered = []
+        for order in book.values():
+            if order.active_at > now:
+                continue
+            arriving, order.resting = not order.resting, True
+            if order.type == 'MARKET':
+                index, price, maker = 0, path[0], False
+            elif order.type == 'LIMIT':
+                index = _first_cross(path, order.price, below=order.side == 'BUY')
+                if index is None:
+                    continue
+                price = path[0] if index == 0 else order.price
+                maker = not arriving or index > 0  # 到達即可成交的限價單按吃單處理
+            else:
+                # 止損：價格朝不利方向觸發；止盈：朝有利方向觸發
+                long_side = order.position_side == 'LONG'
+                below = long_side if order.type == 'STOP_MARKET' else not long_side
+                index = _first_cross(path, order.stop_price, below=below)
+                if index is None:
+                    continue
+                price, maker = (path[0] if index == 0 else order.stop_price), False
+            triggered.append((index, order.order_id, order, price, maker))
+
+        for _, _, order, price, maker in sorted(triggered, key=lambda item: item[:2]):
+            if order.order_id not in book:
+                continue  # 同批次中因倉位歸零而失效
+            if not maker:
+                price = self.fill_model.market_price(order.side, price)
+                if order.type == 'LIMIT':
+                    price = min(price, order.price) if order.side == 'BUY' else max(price, order.price)
+                quantity = order.remaining
+            else:
+                quantity = min(order.remaining, liquidity)
+                liquidity -= quantity
+
+            if not order.opens:
+                position = self.positions.get((symbol, order.position_side))
+                quantity = min(quantity, position.quantity if position else 0.0)
+                if quantity <= 0:
+                    self._finish(book, order, 'EXPIRED')
+                    continue
+            if quantity > 0:
+                self._fill(order, quantity, price, maker, now)
+            if order.remaining <= 1e-12:
+                self._finish(book, order, 'FILLED')
+            elif order.executed_qty > 0:
+                order.status = 'PARTIALLY_FILLED'
+                self.stats['partial_fills'] += 1
+
+    def _fill(self, order: PaperOrder, quantity: float, price: float, maker: bool, now: float):
+        symbol = order.symbol
+        fee = self.fill_model.fee(quantity * price, maker=maker)
+        self.balance -= fee
+        self.stats['fees_paid'] += fee
+
+        key = (symbol, order.position_side)
+        position = self.positions.get(key)
+        realized = 0.0
+        if order.opens:
+            if position is None:
+                position = self.positions[key] = PaperPosition(
+                    symbol, order.position_side, leverage=self._leverage(symbol)
+                )
+            total = position.quantity + quantity
+            position.entry_price = (position.entry_price * position.quantity + price * quantity) / total
+            position.quantity = total
+        else:
+            sign = 1 if order.position_side == 'LONG' else -1
+            realized = (price - position.entry_price) * quantity * sign
+            position.quantity -= quantity
+            self.balance += realized
+            self.stats['realized_pnl'] += realized
+            if position.quantity <= 1e-12:
+                del self.positions[key]
+                self._expire_reduce_only(symbol, order.position_side, keep=order.order_id)
+
+        if order.reserved:
+            released = order.reserved * quantity / order.remaining
+            order.reserved -= released
+            self._reserved_margin -= released
+        order.executed_qty += quantity
+        order.cum_quote += quantity * price
+        order.update_time = now
+        self.trades.append({
+            'orderId': order.order_id, 'symbol': symbol, 'side': order.side,
+            'positionSide': order.position_side, 'type': order.type, 'price': price,
+            'qty': quantity, 'fee': fee, 'maker': maker, 'realizedPnl': realized, 'time': now
+        })
+
+    def _finish(self, book: Dict[int, PaperOrder], order: PaperOrder, status: str):
+        book.pop(order.order_id, None)
+        self._reserved_margin -= order.reserved
+        order.reserved = 0.0
+        order.status = status
+        self.stats[f'orders_{status.lower()}'] += 1
+
+    def _expire_reduce_only(self, symbol: str, position_side: str, keep: int):
+        """Closing a position expires its remaining reduce-only orders (the sibling SL / TP)."""
+        book = self.orders.get(symbol, {})
+        for order_id, order in list(book.items()):
+            if order_id != keep and order.reduce_only and order.position_side == position_side:
+                self._finish(book, order, 'EXPIRED')
+
+    def _reject(self, symbol: str, reason: str):
+        self.stats['orders_rejected'] += 1
+        logger.warning(f"[PAPER] Order rejected for {symbol}: {reason}")
+        return None
+
+    def _leverage(self, symbol: str) -> float:
+        return self.leverage.get(symbol, self.default_leverage)
+
+    async def _prefetch_price(self, symbol: str):
+        """Cache a reference price through the async ticker, so the async order path never blocks on REST."""
+        if symbol in self.last_price or self.client is None or not hasattr(self.client, 'get_ticker'):
+            return
+        try:
+            ticker = await self.client.get_ticker(symbol)
+            price = float((ticker or {}).get('lastPrice') or (ticker or {}).get('price') or 0)
+            if price > 0:
+                with self._lock:
+                    self.last_price.setdefault(symbol, price)
+        except Exception as e:
+            logger.debug(f"Reference price unavailable for {symbol}: {e}")
+
+    def _reference_price(self, symbol: str, fetch: bool = True) -> Optional[float]:
+        price = self.last_price.get(symbol)
+        if price is None and fetch and self.client is not None and hasattr(self.client, 'get_ticker_price'):
+            try:
+                price = self.client.get_ticker_price(symbol)
+                if price:
+                    price = self.last_price[symbol] = float(price)
+            except Exception as e:
+                logger.debug(f"Reference price unavailable for {symbol}: {e}")
+        return price
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get paper exchange statistics."""
+        with self._lock:
+            return {
+                **self.stats,
+                'balance': self.balance,
+                'unrealized_pnl': self.unrealized_pnl(),
+                'open_orders': sum(len(book) for book in self.orders.values()),
+                'open_positions': len(self.positions)
+            }
@@ -0,0 +1,326 @@
+"""
+Market Recorder - Append-only capture of everything BinanceDataClient returns.
+
+Responsibilities:
+- Wrap a BinanceDataClient instance so every kline, ticker, balance,
+  position and order response is recorded with its call arguments, wall
+  time and latency
+- Store klines as deltas against the previous response of the same
+  (method, symbol, interval), since consecutive fetches overlap almost
+  entirely
+- Write zlib-compressed, CRC-checked blocks to an append-only file, and read
+  them back, tolerating a truncated tail after a crash (a recorder reopening
+  the file truncates that tail before appending)
+
+File layout: MAGIC, then repeated [u32 length][u32 crc32][zlib(pickle(records))].
+"""
+
+import functools
+import inspect
+import logging
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'WINREC1\n'
+_BLOCK_HEADER = struct.Struct('<II')
+
+# 被錄製的 BinanceDataClient 方法
+KLINE_METHODS = ('get_klines', 'get_klines_async')
+RECORDED_METHODS = KLINE_METHODS + (
+    'get_ticker',
+    'get_ticker_price',
+    'get_futures_balance',
+    'get_current_positions',
+    'get_open_stop_orders',
+    'get_all_usdt_perpetual_pairs',
+    'get_symbol_info',
+    'place_order',
+    'set_stop_loss_order',
+    'set_take_profit_order',
+    'create_order_async',
+    'place_batch_orders_async',
+    'cancel_orders_async'
+)
+
+# 記錄類型
+KIND_CALL = 'call'
+KIND_MARK = 'mark'
+
+
+def frame_to_columns(df: pd.DataFrame) -> Tuple[List[str], List[np.ndarray]]:
+    return list(df.columns), [df[col].values for col in df.columns]
+
+
+def columns_to_frame(columns: List[str], data: List[np.ndarray]) -> pd.DataFrame:
+    return pd.DataFrame(dict(zip(columns, data)), columns=columns)
+
+
+class KlineDeltaEncoder:
+    """
+    Encode successive kline responses of one stream as deltas.
+
+    A response is stored as (first_ts, rows, new rows) when it starts inside
+    the previous response and agrees with it on the overlap; only rows from
+    the previous last candle on (which may still have been forming) are new.
+    """
+
+    def __init__(self):
+        self._previous: Dict[tuple, pd.DataFrame] = {}
+
+    def encode(self, stream: tuple, df: Optional[pd.DataFrame]):
+        if df is None or not isinstance(df, pd.DataFrame):
+            return ('raw', df)
+
+        previous = self._previous.get(stream)
+        self._previous[stream] = df.copy()
+        if previous is not None and len(previous) and len(df) and list(previous.columns) == list(df.columns):
+            ts = df['timestamp'].values
+            prev_ts = previous['timestamp'].values
+            if ts[0] >= prev_ts[0]:
+                overlap_prev = previous[(prev_ts >= ts[0]) & (prev_ts < prev_ts[-1])]
+                overlap_new = df.iloc[:len(overlap_prev)]
+                if len(overlap_new) == len(overlap_prev) and overlap_new.reset_index(drop=True).equals(
+                        overlap_prev.reset_index(drop=True)):
+                    return ('delta', ts[0], len(df), frame_to_columns(df.iloc[len(overlap_prev):]))
+
+        return ('full', frame_to_columns(df))
+
+
+class KlineDeltaDecoder:
+    """Inverse of KlineDeltaEncoder (one instance per replayed stream set)."""
+
+    def __init__(self):
+        self._previous: Dict[tuple, pd.DataFrame] = {}
+
+    def decode(self, stream: tuple, payload) -> Optional[pd.DataFrame]:
+        kind = payload[0]
+        if kind == 'raw':
+            return payload[1]
+        if kind == 'full':
+            df = columns_to_frame(*payload[1])
+        else:
+            _, first_ts, rows, new = payload
+            previous = self._previous[stream]
+            prev_ts = previous['timestamp'].values
+            kept = previous[(prev_ts >= first_ts) & (prev_ts < prev_ts[-1])]
+            df = pd.concat([kept, columns_to_frame(*new)], ignore_index=True).iloc[:rows]
+        self._previous[stream] = df
+        return df
+
+
+class MarketRecorder:
+    """Records BinanceDataClient responses to an append-only file."""
+
+    def __init__(self, path: Optional[str] = None, flush_records: Optional[int] = None):
+        """
+        Initialize market recorder.
+
+        Args:
+            path: Recording file (appended to if it exists; default: Config.MARKET_RECORDING_PATH)
+            flush_records: Records buffered before a compressed block is written
+        """
+        self.path = path or Config.MARKET_RECORDING_PATH
+        self.flush_records = flush_records or Config.MARKET_RECORDING_FLUSH_RECORDS
+        self._encoder = KlineDeltaEncoder()
+        self._buffer: List[tuple] = []
+        self._lock = threading.Lock()  # 同步方法可能在線程池中調用
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Statistics
+        self.stats = {
+            'records': 0,
+            'kline_deltas': 0,
+            'kline_full': 0,
+            'blocks': 0,
+            'bytes_written': 0,
+            'truncated_bytes': 0
+        }
+
+        is_new = self._recover_tail()
+        self._file = open(self.path, 'ab')
+        if is_new:
+            self._file.write(MAGIC)
+            self._file.flush()
+
+        logger.info(f"MarketRecorder writing to {self.path}")
+
+    def _recover_tail(self) -> bool:
+        """
+        Truncate a torn last block left by a crash, so new blocks follow the
+        last valid one (read_recording stops at the first bad block).
+
+        Returns:
+            True when the file has to be started (missing, empty or torn MAGIC)
+        """
+        if not os.path.exists(self.path):
+            return True
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            head = f.read(len(MAGIC))
+            if head != MAGIC:
+                if size < len(MAGIC) and MAGIC.startswith(head):
+                    end = 0   # 寫入文件頭時崩潰
+                else:
+                    raise ValueError(f"{self.path} is not a market recording")
+            else:
+                end = len(MAGIC)
+                for end, _ in _scan_blocks(f, self.path):
+                    pass
+        if end < size:
+            logger.warning(f"Truncating {size - end} bytes of torn recording tail in {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+            self.stats['truncated_bytes'] += size - end
+        return end == 0
+
+    def attach(self, client, methods: Tuple[str, ...] = RECORDED_METHODS):
+        """Wrap the client's methods in place (instance attributes, class untouched)."""
+        attached = 0
+        for name in methods:
+            original = getattr(client, name, None)
+            if original is None:
+                continue
+            setattr(client, name, self._wrap(name, original))
+            attached += 1
+        logger.info(f"Recording {attached} BinanceDataClient methods")
+        return client
+
+    def _wrap(self, name: str, original: Callable) -> Callable:
+        signature = inspect.signature(original)
+
+        def key_of(args, kwargs) -> tuple:
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                return tuple(bound.arguments.values())
+            except TypeError:
+                return tuple(args) + tuple(sorted(kwargs.items()))
+
+        if inspect.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def async_wrapper(*args, **kwargs):
+                started = time.time()
+                try:
+                    result = await original(*args, **kwargs)
+                except Exception as e:
+                    self.record_call(name, key_of(args, kwargs), started, error=e)
+                    raise
+                self.record_call(name, key_of(args, kwargs), started, result=result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            started = time.time()
+            try:
+                result = original(*args, **kwargs)
+            except Exception as e:
+                self.record_call(name, key_of(args, kwargs), started, error=e)
+                raise
+            self.record_call(name, key_of(args, kwargs), started, result=result)
+            return result
+        return wrapper
+
+    def record_call(self, method: str, key: tuple, started: float, result: Any = None, error: Exception = None):
+        """Record one call (result or raised error)."""
+        duration = time.time() - started
+        with self._lock:
+            if error is not None:
+                payload = ('error', type(error).__name__, str(error))
+            elif method in KLINE_METHODS:
+                payload = self._encoder.encode((method,) + key[:2], result)
+                if payload[0] == 'delta':
+                    self.stats['kline_deltas'] += 1
+                elif payload[0] == 'full':
+                    self.stats['kline_full'] += 1
+            else:
+                payload = ('raw', result)
+            self._append((KIND_CALL, started, duration, method, key, payload))
+
+    def mark(self, label: str, **info):
+        """Record a marker (e.g. the start of a trading cycle)."""
+        with self._lock:
+            self._append((KIND_MARK, time.time(), 0.0, label, tuple(sorted(info.items())), None))
+
+    def _append(self, record: tuple):
+        self._buffer.append(record)
+        self.stats['records'] += 1
+        if len(self._buffer) >= self.flush_records:
+            self._flush_locked()
+
+    def flush(self):
+        """Write buffered records as one compressed block."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        try:
+            block = zlib.compress(pickle.dumps(self._buffer, protocol=pickle.HIGHEST_PROTOCOL), 6)
+            self._file.write(_BLOCK_HEADER.pack(len(block), zlib.crc32(block)))
+            self._file.write(block)
+            self._file.flush()
+            self.stats['blocks'] += 1
+            self.stats['bytes_written'] += _BLOCK_HEADER.size + len(block)
+        except Exception as e:
+            logger.error(f"Failed to write recording block ({len(self._buffer)} records): {e}")
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        logger.info(f"Recording closed: {self.stats['records']} records, {self.stats['bytes_written']:,} bytes")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get recorder statistics."""
+        return {
+            **self.stats,
+            'buffered': len(self._buffer),
+            'bytes_per_record': self.stats['bytes_written'] / max(self.stats['records'] - len(self._buffer), 1)
+        }
+
+
+def read_recording(path: str) -> Iterator[tuple]:
+    """
+    Iterate records of a recording file in write order.
+
+    Yields:
+        (kind, wall_time, duration, method_or_label, key_or_info, payload)
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a market recording")
+        for _, block in _scan_blocks(f, path):
+            yield from pickle.loads(zlib.decompress(block))
+
+
+def _scan_blocks(f, path: str) -> Iterator[Tuple[int, bytes]]:
+    """Valid blocks from the current position as (end offset, compressed block); stops at a torn tail."""
+    while True:
+        header = f.read(_BLOCK_HEADER.size)
+        if not header:
+            return
+        if len(header) < _BLOCK_HEADER.size:
+            logger.warning(f"Truncated block header at end of {path}, ignoring tail")
+            return
+        length, crc = _BLOCK_HEADER.unpack(header)
+        block = f.read(length)
+        if len(block) < length or zlib.crc32(block) != crc:
+            logger.warning(f"Truncated or corrupt block at end of {path}, ignoring tail")
+            return
+        yield f.tell(), block
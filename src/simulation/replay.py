@@ -0,0 +1,321 @@
+"""
+Market Replay - Feed a recording back through the bot at 1x or N-times speed.
+
+Responsibilities:
+- ReplayBinanceClient: BinanceDataClient stand-in that answers every call
+  with what was recorded at (or before) the replay clock
+- ReplayDriver: run TradingBotV3.run_cycle end to end over the recorded
+  cycles, with TTLs, rate limits and cycle spacing scaled by the speed
+
+Reproduces slow cycles with the exact symbol set, data shapes and cache
+behaviour of the recorded session.
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.simulation.recorder import (
+    KIND_MARK,
+    KLINE_METHODS,
+    KlineDeltaDecoder,
+    read_recording
+)
+
+logger = logging.getLogger(__name__)
+
+# 按調用順序回放（每次調用消耗一條記錄）的方法
+SEQUENTIAL_METHODS = (
+    'place_order', 'set_stop_loss_order', 'set_take_profit_order',
+    'create_order_async', 'place_batch_orders_async', 'cancel_orders_async'
+)
+CYCLE_MARK = 'cycle'
+
+
+class ReplayError(Exception):
+    """Recorded call raised an exception; replayed with the original message."""
+
+
+class ReplayBinanceClient:
+    """
+    BinanceDataClient stand-in serving recorded responses.
+
+    Each (method, arguments) returns its latest recorded response at or
+    before the replay clock (the earliest one if the clock is before it).
+    Order methods return their recorded responses in call order.
+    """
+
+    def __init__(self, path: str, reproduce_latency: bool = False, speed: float = 1.0):
+        """
+        Initialize replay client.
+
+        Args:
+            path: Recording file (see MarketRecorder)
+            reproduce_latency: Sleep for the recorded call duration (/ speed)
+            speed: Replay speed (only scales reproduced latency here)
+        """
+        self.path = path
+        self.reproduce_latency = reproduce_latency
+        self.speed = speed
+        self.async_client = self     # DataService 只檢查是否已初始化
+        self.bsm = None
+        self.clock = 0.0             # 錄製時間軸上的當前時刻（epoch 秒）
+
+        self.marks: List[Tuple[float, str, dict]] = []
+        self._times: Dict[tuple, List[float]] = defaultdict(list)
+        self._calls: Dict[tuple, List[tuple]] = defaultdict(list)
+        self._sequential: Dict[str, deque] = defaultdict(deque)
+        self._load()
+
+        # Statistics
+        self.stats = {
+            'calls': 0,
+            'served': 0,
+            'missing': 0,
+            'errors_replayed': 0
+        }
+
+    def _load(self):
+        """Index the recording; klines are decoded in write order (deltas need their predecessor)."""
+        decoder = KlineDeltaDecoder()
+        count = 0
+        for kind, wall_time, duration, name, key, payload in read_recording(self.path):
+            count += 1
+            if kind == KIND_MARK:
+                self.marks.append((wall_time, name, dict(key)))
+                continue
+
+            if payload[0] == 'error':
+                value = payload
+            elif name in KLINE_METHODS:
+                value = ('ok', decoder.decode((name,) + key[:2], payload))
+            else:
+                value = ('ok', payload[1])
+
+            if name in SEQUENTIAL_METHODS:
+                self._sequential[name].append((duration, value))
+            else:
+                self._times[(name, key)].append(wall_time)
+                self._calls[(name, key)].append((duration, value))
+
+        if not self.clock:
+            first = [times[0] for times in self._times.values()] + [m[0] for m in self.marks]
+            self.clock = min(first) if first else 0.0
+        logger.info(
+            f"Replay loaded {count} records ({len(self._calls)} distinct calls, "
+            f"{len(self.cycle_marks())} cycles) from {self.path}"
+        )
+
+    def cycle_marks(self) -> List[float]:
+        """Recorded cycle start times."""
+        return [t for t, label, _ in self.marks if label == CYCLE_MARK]
+
+    def _lookup(self, name: str, key: tuple):
+        self.stats['calls'] += 1
+        if name in SEQUENTIAL_METHODS:
+            queue = self._sequential.get(name)
+            entry = queue.popleft() if queue else None
+        else:
+            times = self._times.get((name, key))
+            if not times:
+                entry = None
+            else:
+                i = bisect.bisect_right(times, self.clock) - 1
+                entry = self._calls[(name, key)][max(i, 0)]
+
+        if entry is None:
+            self.stats['missing'] += 1
+            return 0.0, ('ok', None)
+        self.stats['served'] += 1
+        return entry
+
+    def _result(self, value):
+        if value[0] == 'error':
+            self.stats['errors_replayed'] += 1
+            raise ReplayError(f"{value[1]}: {value[2]}")
+        return value[1]
+
+    def _call(self, name: str, key: tuple):
+        duration, value = self._lookup(name, key)
+        if self.reproduce_latency and duration > 0:
+            time.sleep(duration / self.speed)
+        return self._result(value)
+
+    async def _call_async(self, name: str, key: tuple):
+        duration, value = self._lookup(name, key)
+        if self.reproduce_latency and duration > 0:
+            await asyncio.sleep(duration / self.speed)
+        return self._result(value)
+
+    # ------------------------------------------------------------------
+    # BinanceDataClient interface
+    # ------------------------------------------------------------------
+
+    async def initialize_async(self):
+        pass
+
+    async def close_async(self):
+        pass
+
+    async def get_klines_async(self, symbol, interval='1h', limit=500):
+        return await self._call_async('get_klines_async', (symbol, interval, limit))
+
+    async def get_ticker(self, symbol):
+        return await self._call_async('get_ticker', (symbol,))
+
+    async def get_usdt_perpetual_symbols(self):
+        return self.get_all_usdt_perpetual_pairs()
+
+    def get_klines(self, symbol, interval='1h', limit=500):
+        return self._call('get_klines', (symbol, interval, limit))
+
+    def get_ticker_price(self, symbol):
+        return self._call('get_ticker_price', (symbol,))
+
+    def get_futures_balance(self):
+        return self._call('get_futures_balance', ())
+
+    def get_current_positions(self):
+        return self._call('get_current_positions', ()) or []
+
+    def get_open_stop_orders(self, symbol=None):
+        return self._call('get_open_stop_orders', (symbol,)) or []
+
+    def get_all_usdt_perpetual_pairs(self):
+        return self._call('get_all_usdt_perpetual_pairs', ()) or []
+
+    def get_symbol_info(self, symbol):
+        return self._call('get_symbol_info', (symbol,))
+
+    def place_order(self, symbol, side, order_type, quantity, price=None):
+        return self._call('place_order', (symbol, side, order_type, quantity, price))
+
+    def create_order(self, symbol, side, type, quantity, price=None):
+        return self.place_order(symbol, side, type, quantity, price)
+
+    def set_stop_loss_order(self, symbol, side, quantity, stop_price, position_side):
+        return self._call('set_stop_loss_order', (symbol, side, quantity, stop_price, position_side))
+
+    def set_take_profit_order(self, symbol, side, quantity, tp_price, position_side):
+        return self._call('set_take_profit_order', (symbol, side, quantity, tp_price, position_side))
+
+    async def create_order_async(self, params):
+        return await self._call_async('create_order_async', (params,))
+
+    async def place_batch_orders_async(self, orders):
+        return await self._call_async('place_batch_orders_async', (orders,)) or [None] * len(orders)
+
+    async def cancel_orders_async(self, symbol, order_ids):
+        return await self._call_async('cancel_orders_async', (symbol, order_ids)) or [None] * len(order_ids)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get replay client statistics."""
+        return {**self.stats, 'clock': self.clock}
+
+
+class ReplayDriver:
+    """Runs the trading bot's cycles over a recording."""
+
+    def __init__(
+        self,
+        path: str,
+        speed: float = 1.0,
+        reproduce_latency: bool = False,
+        max_cycles: Optional[int] = None,
+        cycle_interval: float = 60.0
+    ):
+        """
+        Initialize replay driver.
+
+        Args:
+            path: Recording file
+            speed: 1.0 = recorded pace; N = N-times faster; 0 = back to back
+            reproduce_latency: Replay recorded API latencies
+            max_cycles: Stop after this many cycles
+            cycle_interval: Cycle spacing when the recording has no cycle marks
+        """
+        self.speed = speed
+        self.max_cycles = max_cycles
+        self.cycle_interval = cycle_interval
+        self.client = ReplayBinanceClient(path, reproduce_latency=reproduce_latency, speed=speed or 1.0)
+        self.bot = None
+        self.cycle_times: List[float] = []
+
+    def _scale_services(self, bot):
+        """Compress TTLs, rate limits and recovery timeouts by the replay speed."""
+        if not self.speed or self.speed == 1.0:
+            return
+        data_service = bot.data_service
+        data_service.cache.time_scale = self.speed
+        data_service.circuit_breaker.recovery_timeout /= self.speed
+        for limiter in data_service.rate_limiter.limiters.values():
+            limiter.rate *= self.speed
+
+    def _cycle_windows(self) -> List[Tuple[float, float]]:
+        """(start, end) of each recorded cycle on the recording clock."""
+        starts = self.client.cycle_marks()
+        if not starts:
+            times = [t for series in self.client._times.values() for t in series]
+            if not times:
+                return []
+            first, last = min(times), max(times)
+            count = int((last - first) // self.cycle_interval) + 1
+            starts = [first + i * self.cycle_interval for i in range(count)]
+        ends = starts[1:] + [float('inf')]
+        return list(zip(starts, ends))
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Initialize the bot on the replay client and run every recorded cycle.
+
+        Returns:
+            Cycle timing summary
+        """
+        # 延遲導入：src.main 在導入時配置日誌文件並加載 Discord 等依賴
+        from src.main import TradingBotV3
+
+        windows = self._cycle_windows()
+        if self.max_cycles:
+            windows = windows[:self.max_cycles]
+        if not windows:
+            logger.warning("Recording contains no cycles to replay")
+            return self.summary()
+
+        self.client.clock = windows[0][0]
+        self.bot = TradingBotV3(binance_client=self.client)
+        self._scale_services(self.bot)
+        await self.bot.initialize()
+
+        for i, (start, end) in enumerate(windows):
+            # 時鐘置於該週期結束前：週期內錄製的所有響應均可見
+            self.client.clock = end - 1e-6 if end != float('inf') else float('inf')
+            started = time.perf_counter()
+            await self.bot.run_cycle()
+            elapsed = time.perf_counter() - started
+            self.cycle_times.append(elapsed)
+
+            if self.speed and i + 1 < len(windows):
+                wait = (windows[i + 1][0] - start) / self.speed - elapsed
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+        summary = self.summary()
+        logger.info(
+            f"Replay complete: {summary['cycles']} cycles, mean {summary['mean_cycle']:.2f}s, "
+            f"max {summary['max_cycle']:.2f}s (cycle #{summary['slowest_cycle']})"
+        )
+        return summary
+
+    def summary(self) -> Dict[str, Any]:
+        times = self.cycle_times
+        return {
+            'cycles': len(times),
+            'mean_cycle': sum(times) / len(times) if times else 0.0,
+            'max_cycle': max(times) if times else 0.0,
+            'slowest_cycle': times.index(max(times)) + 1 if times else None,
+            'cycle_times': list(times),
+            'client': self.client.get_stats()
+        }
@@ -0,0 +1,286 @@
+"""
+Batch Scoring - Vectorized ICT/SMC confidence, direction and trade levels.
+
+Responsibilities:
+- Score every symbol's latest candle in one NumPy pass
+- Reproduce ICTSMCStrategy.calculate_confidence / _build_signal exactly
+
+Exactness notes: the scalar code works on numpy float32 scalars taken from
+df.iloc[-1]. float32 (op) float32 stays float32, while float32 (op) Python
+float is promoted to float64; every step below follows the same promotion
+so results are bit-identical, not merely close. Comparisons against Python
+constants are done in float64 (array-scalar comparisons would otherwise
+round the constant to float32).
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from src.config import Config
+
+# 市場結構編碼
+STRUCTURE_NONE = -1
+STRUCTURE_NEUTRAL = 0
+STRUCTURE_BULLISH = 1
+STRUCTURE_BEARISH = 2
+
+STRUCTURE_CODES = {
+    None: STRUCTURE_NONE,
+    'neutral_structure': STRUCTURE_NEUTRAL,
+    'bullish_structure': STRUCTURE_BULLISH,
+    'bearish_structure': STRUCTURE_BEARISH
+}
+
+# 15m 趨勢編碼
+TREND_NEUTRAL = 0
+TREND_BULL = 1
+TREND_BEAR = 2
+
+TREND_CODES = {
+    'neutral': TREND_NEUTRAL,
+    'bull': TREND_BULL,
+    'bear': TREND_BEAR
+}
+
+# 方向編碼
+DIRECTION_NONE = 0
+DIRECTION_BUY = 1
+DIRECTION_SELL = -1
+
+_DENOMINATOR_FLOOR = 1e-6
+
+
+@dataclass
+class BatchScores:
+    """Per-symbol arrays produced by score_batch (index-aligned with the inputs)."""
+    direction: np.ndarray        # 1 = BUY, -1 = SELL, 0 = no signal
+    confidence: np.ndarray       # confidence of the chosen direction (0 when none)
+    buy_confidence: np.ndarray
+    sell_confidence: np.ndarray
+    rr_ratio: np.ndarray         # dynamic risk/reward ratio
+    stop_loss: np.ndarray
+    take_profit: np.ndarray
+    expected_roi: np.ndarray
+    at_zone: np.ndarray          # at support (BUY) / resistance (SELL)
+
+    @property
+    def signal_mask(self) -> np.ndarray:
+        return self.direction != DIRECTION_NONE
+
+
+def _strength_ratio(numerator: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """|numerator| / max(|reference|, 1e-6) with the scalar code's dtype promotion."""
+    denominator = np.abs(reference)
+    use_floor = denominator.astype(np.float64) < _DENOMINATOR_FLOOR
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        native = (numerator / denominator).astype(np.float64)
+    floored = numerator.astype(np.float64) / _DENOMINATOR_FLOOR
+
+    return np.where(use_floor, floored, native)
+
+
+def confidence_batch(
+    structure: np.ndarray,
+    macd: np.ndarray,
+    macd_signal: np.ndarray,
+    ema_9: np.ndarray,
+    ema_21: np.ndarray,
+    price: np.ndarray,
+    side: int,
+    at_zone: np.ndarray
+) -> np.ndarray:
+    """Vectorized ICTSMCStrategy.calculate_confidence for one side."""
+    buy = side == DIRECTION_BUY
+    confirmed = STRUCTURE_BULLISH if buy else STRUCTURE_BEARISH
+
+    # 1. 市場結構 (40 / 20)
+    confidence = np.where(structure == confirmed, 40.0,
+                          np.where(structure == STRUCTURE_NEUTRAL, 20.0, 0.0))
+
+    # 2. MACD 確認 (20)
+    macd_aligned = macd > macd_signal if buy else macd < macd_signal
+    macd_diff = (macd - macd_signal) if buy else (macd_signal - macd)
+    macd_strength = _strength_ratio(np.abs(macd_diff), macd_signal) * 100
+    macd_strength = np.where(macd_strength > 1.0, 1.0, macd_strength)
+    confidence = confidence + np.where(macd_aligned, 20.0 * macd_strength, 0.0)
+
+    # 3. EMA 確認 (20，至少 10)
+    ema_aligned = ema_9 > ema_21 if buy else ema_9 < ema_21
+    ema_gap = (ema_9 - ema_21) if buy else (ema_21 - ema_9)
+    ema_strength = _strength_ratio(ema_gap, ema_21) * 100
+    ema_strength = np.where(ema_strength > 1.0, 1.0, ema_strength)
+    ema_strength = np.where(0.5 > ema_strength, 0.5, ema_strength)
+    confidence = confidence + np.where(ema_aligned, 20.0 * ema_strength, 0.0)
+
+    # 4. 價格位置 (10 / 5)
+    if buy:
+        position = np.where(price > ema_9, 10.0, np.where(price > ema_21, 5.0, 0.0))
+    else:
+        position = np.where(price < ema_9, 10.0, np.where(price < ema_21, 5.0, 0.0))
+    confidence = confidence + position
+
+    # 5. 流動性區域 (10)
+    confidence = confidence + np.where(at_zone, 10.0, 0.0)
+
+    return np.where(confidence > 100.0, 100.0, confidence)
+
+
+def rr_ratio_batch(confidence: np.ndarray, tiers: Optional[tuple] = None) -> np.ndarray:
+    """
+    Vectorized ICTSMCStrategy.get_dynamic_risk_reward_ratio.
+
+    tiers: optional (min, medium, max) ratios; scalars or arrays that
+    broadcast against confidence (default: Config values)
+    """
+    if tiers is None:
+        tiers = (Config.MIN_RISK_REWARD_RATIO, Config.MEDIUM_RISK_REWARD_RATIO, Config.MAX_RISK_REWARD_RATIO)
+    min_rr, medium_rr, max_rr = tiers
+    return np.where(
+        confidence >= 90.0, max_rr,
+        np.where(confidence >= 80.0, medium_rr, min_rr)
+    )
+
+
+def trade_levels_batch(
+    price: np.ndarray,
+    atr: np.ndarray,
+    rr_ratio: np.ndarray,
+    side: int,
+    stop_atr_multiplier=None
+):
+    """
+    Stop-loss / take-profit / expected ROI arrays plus a validity mask.
+
+    stop_atr_multiplier: ATR distance of the stop beyond breakeven (default
+    Config.BREAKEVEN_STOP_ATR_MULTIPLIER, as in _build_signal); may be an
+    array broadcasting against price.
+    """
+    price64 = price.astype(np.float64)
+    atr64 = atr.astype(np.float64)
+    buy = side == DIRECTION_BUY
+    multiplier = Config.BREAKEVEN_STOP_ATR_MULTIPLIER if stop_atr_multiplier is None else stop_atr_multiplier
+
+    if Config.USE_BREAKEVEN_STOPS:
+        total_fee_percent = Config.TAKER_FEE_RATE * 2
+        if buy:
+            breakeven = price64 * (1 + total_fee_percent)
+            stop_loss = breakeven - (atr64 * multiplier)
+            stop_loss = np.where(stop_loss >= price64, price64 - (atr64 * 2.0), stop_loss)
+            valid = ~(stop_loss >= price64)
+            take_profit = price64 + np.abs(price64 - stop_loss) * rr_ratio
+        else:
+            breakeven = price64 * (1 - total_fee_percent)
+            stop_loss = breakeven + (atr64 * multiplier)
+            stop_loss = np.where(stop_loss <= price64, price64 + (atr64 * 2.0), stop_loss)
+            valid = ~(stop_loss <= price64)
+            take_profit = price64 - np.abs(stop_loss - price64) * rr_ratio
+    else:
+        # 非損益平衡模式：固定 2 ATR 止損 / 3 ATR 止盈（不使用風險回報比）
+        valid = np.ones(len(price), dtype=bool)
+        if buy:
+            stop_loss = price64 - (atr64 * 2.0)
+            take_profit = price64 + (atr64 * 3.0)
+        else:
+            stop_loss = price64 + (atr64 * 2.0)
+            take_profit = price64 - (atr64 * 3.0)
+
+    valid = valid & ~((stop_loss <= 0) | (take_profit <= 0))
+
+    if buy:
+        risk = np.abs(price64 - stop_loss)
+        reward = np.abs(take_profit - price64)
+    else:
+        risk = np.abs(stop_loss - price64)
+        reward = np.abs(price64 - take_profit)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected_roi = np.where(risk > 0, reward / risk, 1.5)
+
+    return stop_loss, take_profit, expected_roi, valid
+
+
+def score_batch(
+    price: np.ndarray,
+    macd: np.ndarray,
+    macd_signal: np.ndarray,
+    ema_9: np.ndarray,
+    ema_21: np.ndarray,
+    atr: np.ndarray,
+    structure: np.ndarray,
+    trend: np.ndarray,
+    at_support: Optional[np.ndarray] = None,
+    at_resistance: Optional[np.ndarray] = None,
+    min_confidence: Optional[float] = None,
+    stop_atr_multiplier: Optional[float] = None
+) -> BatchScores:
+    """
+    Score all symbols in one pass (same decisions as ICTSMCStrategy._build_signal).
+
+    Args:
+        price, macd, macd_signal, ema_9, ema_21, atr: Latest indicator values
+            (keep the frames' dtype, normally float32, for exact results)
+        structure: STRUCTURE_* codes
+        trend: TREND_* codes
+        at_support / at_resistance: Liquidity-zone proximity flags
+        min_confidence: Signal threshold (default Config.MIN_CONFIDENCE_THRESHOLD)
+        stop_atr_multiplier: Breakeven stop distance in ATR (default Config.BREAKEVEN_STOP_ATR_MULTIPLIER)
+
+    Returns:
+        BatchScores
+    """
+    n = len(price)
+    if min_confidence is None:
+        min_confidence = Config.MIN_CONFIDENCE_THRESHOLD
+    structure = np.asarray(structure)
+    trend = np.asarray(trend)
+    at_support = np.zeros(n, dtype=bool) if at_support is None else np.asarray(at_support, dtype=bool)
+    at_resistance = np.zeros(n, dtype=bool) if at_resistance is None else np.asarray(at_resistance, dtype=bool)
+
+    # 與 _build_signal 相同的數據有效性檢查
+    values = np.column_stack([price, macd, macd_signal, ema_9, ema_21, atr]).astype(np.float64)
+    valid = ~np.isnan(values).any(axis=1) & (atr > 0) & (price > 0)
+
+    buy_confidence = confidence_batch(structure, macd, macd_signal, ema_9, ema_21, price, DIRECTION_BUY, at_support)
+    sell_confidence = confidence_batch(structure, macd, macd_signal, ema_9, ema_21, price, DIRECTION_SELL, at_resistance)
+    buy_rr = rr_ratio_batch(buy_confidence)
+    sell_rr = rr_ratio_batch(sell_confidence)
+
+    buy_sl, buy_tp, buy_roi, buy_levels_ok = trade_levels_batch(price, atr, buy_rr, DIRECTION_BUY, stop_atr_multiplier)
+    sell_sl, sell_tp, sell_roi, sell_levels_ok = trade_levels_batch(price, atr, sell_rr, DIRECTION_SELL, stop_atr_multiplier)
+
+    # 做多優先；做多觸發但價位無效時整個信號作廢（與標量版本一致）
+    buy_taken = (
+        valid
+        & ((structure == STRUCTURE_BULLISH) | (structure == STRUCTURE_NEUTRAL))
+        & (trend != TREND_BEAR)
+        & (buy_confidence >= min_confidence)
+    )
+    sell_taken = (
+        valid
+        & ~buy_taken
+        & ((structure == STRUCTURE_BEARISH) | (structure == STRUCTURE_NEUTRAL))
+        & (trend != TREND_BULL)
+        & (sell_confidence >= min_confidence)
+    )
+    is_buy = buy_taken & buy_levels_ok
+    is_sell = sell_taken & sell_levels_ok
+
+    direction = np.where(is_buy, DIRECTION_BUY, np.where(is_sell, DIRECTION_SELL, DIRECTION_NONE)).astype(np.int8)
+
+    def pick(buy_values, sell_values, default=0.0):
+        return np.where(is_buy, buy_values, np.where(is_sell, sell_values, default))
+
+    return BatchScores(
+        direction=direction,
+        confidence=pick(buy_confidence, sell_confidence),
+        buy_confidence=buy_confidence,
+        sell_confidence=sell_confidence,
+        rr_ratio=pick(buy_rr, sell_rr),
+        stop_loss=pick(buy_sl, sell_sl),
+        take_profit=pick(buy_tp, sell_tp),
+        expected_roi=pick(buy_roi, sell_roi),
+        at_zone=np.where(is_buy, at_support, np.where(is_sell, at_resistance, False))
+    )
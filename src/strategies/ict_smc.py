@@ -1,17 +1,53 @@
 import numpy as np
 import pandas as pd
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from src.config import Config
+from src.strategies.batch_scoring import (
+    DIRECTION_BUY, STRUCTURE_CODES, TREND_CODES, score_batch
+)
 from src.utils.helpers import setup_logger, get_market_structure_change
 from src.utils.indicators import TechnicalIndicators
 
 logger = setup_logger(__name__)
 
+# 信號評分所需的最新指標（順序與 score_batch 參數一致）
+_SCORE_COLUMNS = ['close', 'macd', 'macd_signal', 'ema_9', 'ema_21', 'atr']
+
+
+@dataclass
+class StrategyResult:
+    """
+    單次策略評估結果（不可變快照）
+
+    evaluate() 的所有輸出都放在這裡，而不是寫回策略實例，
+    因此同一個策略實例可以同時被多個協程 / 線程 / 進程使用。
+    """
+    symbol: Optional[str]
+    signal: Optional[Dict[str, Any]]
+    structure: Optional[str] = None
+    trend_15m: str = 'neutral'
+    order_blocks: List[Dict[str, Any]] = field(default_factory=list)
+    liquidity_zones: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def has_signal(self) -> bool:
+        return self.signal is not None and self.signal.get('type') != 'HOLD'
+
+
 class ICTSMCStrategy:
+    """
+    ICT/SMC 策略
+
+    實例只保存配置（名稱、信心度門檻），不保存任何逐交易對狀態。
+    evaluate() 是 (K線+指標, 趨勢上下文) 的純函數，可安全地並行執行和按交易對緩存。
+    """
+
     def __init__(self):
         self.name = "ICT/SMC Strategy"
-        self.order_blocks = []
-        self.liquidity_zones = []
-        self.min_confidence_threshold = 70.0  # 最低信心度門檻
+        self.min_confidence_threshold = Config.MIN_CONFIDENCE_THRESHOLD  # 最低信心度門檻
+        self.breakeven_stop_atr_multiplier = Config.BREAKEVEN_STOP_ATR_MULTIPLIER  # 止損距離損益平衡價格的 ATR 倍數
     
     def is_valid_order_block(self, df, idx, direction='bullish'):
         """
@@ -94,8 +130,7 @@ class ICTSMCStrategy:
                 }
                 order_blocks.append(order_block)
         
-        self.order_blocks = order_blocks[-5:]
-        return self.order_blocks
+        return order_blocks[-5:]
     
     def identify_liquidity_zones(self, df, lookback=50):
         liquidity_zones = []
@@ -123,8 +158,7 @@ class ICTSMCStrategy:
                     'timestamp': df.iloc[i]['timestamp']
                 })
         
-        self.liquidity_zones = liquidity_zones[-5:]
-        return self.liquidity_zones
+        return liquidity_zones[-5:]
     
     def is_msb_confirmed(self, df, structure_type='bullish'):
         """
@@ -224,7 +258,6 @@ class ICTSMCStrategy:
         """
         # 獲取 15m K 線數據（DataService 會自動處理緩存）
         try:
-            from config import Config
             klines_15m = await data_service.fetch_klines(symbol, Config.TREND_TIMEFRAME, limit=250)
             
             if klines_15m is None or len(klines_15m) < 200:
@@ -395,8 +428,6 @@ class ICTSMCStrategy:
             - 低信心度 (70-80%)：使用 1:1 風險回報比（保守策略）
             - 低於 70%：不應該生成信號（由 min_confidence_threshold 過濾）
         """
-        from config import Config
-        
         if confidence >= 90.0:
             # 高信心度：使用最大風險回報比 1:2
             ratio = Config.MAX_RISK_REWARD_RATIO
@@ -412,7 +443,25 @@ class ICTSMCStrategy:
         
         return ratio
     
-    async def generate_signal(self, df, symbol=None, data_service=None):
+    async def resolve_trend(self, symbol, data_service):
+        """
+        獲取 15m 趨勢上下文（策略中唯一需要 I/O 的步驟）
+        
+        與 evaluate() 分離：先在事件循環上取得趨勢，再把純計算交給 evaluate()，
+        後者可以在線程或進程池中執行。
+        """
+        if not (symbol and data_service):
+            return 'neutral'
+        
+        try:
+            trend_15m = await self.get_15m_trend(symbol, data_service)
+            logger.info(f"📊 {symbol} - 15m趨勢: {trend_15m}")
+            return trend_15m
+        except Exception as e:
+            logger.warning(f"⚠️  獲取 15m 趨勢失敗 {symbol}: {e}")
+            return 'neutral'
+    
+    async def generate_signal(self, df, symbol=None, data_service=None, structure_state=None):
         """
         生成交易信號（v3.1 優化 - 使用 DataService 緩存）
         
@@ -420,6 +469,7 @@ class ICTSMCStrategy:
             df: 1m K 線數據（用於執行交易）
             symbol: 交易對符號（用於 15m 趨勢過濾）
             data_service: DataService 實例（用於獲取緩存的 15m 數據）
+            structure_state: StructureTracker 維護的結構狀態（可選，省去全窗口重掃）
         
         多時間框架策略：
             - 15m K線：定義趨勢方向（EMA200）
@@ -431,20 +481,53 @@ class ICTSMCStrategy:
             return None
         
         # === v3.1 優化：15m 趨勢過濾（使用 DataService 緩存）===
-        trend_15m = 'neutral'
-        if symbol and data_service:
-            try:
-                trend_15m = await self.get_15m_trend(symbol, data_service)
-                logger.info(f"📊 {symbol} - 15m趨勢: {trend_15m}")
-            except Exception as e:
-                logger.warning(f"⚠️  獲取 15m 趨勢失敗 {symbol}: {e}")
-                trend_15m = 'neutral'
+        trend_15m = await self.resolve_trend(symbol, data_service)
+        
+        return self.evaluate(
+            df, trend_15m=trend_15m, symbol=symbol, structure_state=structure_state
+        ).signal
+    
+    def evaluate(self, df, trend_15m='neutral', symbol=None, structure_state=None) -> StrategyResult:
+        """
+        純函數式策略評估：(K線+指標, 趨勢上下文) → StrategyResult
+        
+        不讀寫任何實例狀態（只讀取配置），不做任何 I/O，
+        因此可以在多個線程 / 進程中並行執行，也可以按交易對緩存結果。
+        
+        參數：
+            df: 已計算指標的 K 線數據
+            trend_15m: 15m 趨勢（'bull' / 'bear' / 'neutral'）
+            symbol: 交易對（僅用於標記結果）
+            structure_state: StructureTracker 的 StructureState；提供時直接使用其
+                訂單塊和流動性區域，不再對整個窗口重新掃描
+        """
+        if len(df) < 50:
+            logger.warning("Insufficient data for ICT/SMC analysis")
+            return StrategyResult(symbol=symbol, signal=None, trend_15m=trend_15m)
         
         # 識別市場特徵（已整合 OB 三重驗證 和 MSB 幅度過濾）
-        self.identify_order_blocks(df)
-        self.identify_liquidity_zones(df)
+        if structure_state is not None:
+            # 增量追蹤：只處理新收盤的 K 棒，結果與全窗口掃描一致
+            order_blocks = structure_state.order_blocks
+            liquidity_zones = structure_state.liquidity_zones
+        else:
+            order_blocks = self.identify_order_blocks(df)
+            liquidity_zones = self.identify_liquidity_zones(df)
         structure = self.check_market_structure(df)
         
+        signal = self._build_signal(df, structure, liquidity_zones, trend_15m)
+        
+        return StrategyResult(
+            symbol=symbol,
+            signal=signal,
+            structure=structure,
+            trend_15m=trend_15m,
+            order_blocks=order_blocks,
+            liquidity_zones=liquidity_zones
+        )
+    
+    def _build_signal(self, df, structure, liquidity_zones, trend_15m):
+        """根據市場結構、流動性區域和最新指標構建信號（無副作用）"""
         # 獲取當前指標並驗證數據完整性
         try:
             current_price = df.iloc[-1]['close']
@@ -477,12 +560,7 @@ class ICTSMCStrategy:
         # === 做多信號分析 ===
         if structure in ['bullish_structure', 'neutral_structure']:
             # 檢查是否在支撐區域附近
-            at_support = False
-            for zone in self.liquidity_zones:
-                if zone['type'] == 'support':
-                    if abs(current_price - zone['price']) < current_price * 0.015:  # 1.5% 誤差範圍
-                        at_support = True
-                        break
+            at_support = self.is_near_zone(current_price, liquidity_zones, 'support')
             
             # 計算做多信心度
             confidence = self.calculate_confidence(
@@ -508,8 +586,6 @@ class ICTSMCStrategy:
                 
                 # 計算止損和止盈（基於損益平衡價格和動態風險收益比）
                 try:
-                    from config import Config
-                    
                     if Config.USE_BREAKEVEN_STOPS:
                         # 🎯 高頻交易止損策略：基於損益平衡價格
                         leverage = Config.DEFAULT_LEVERAGE
@@ -519,8 +595,8 @@ class ICTSMCStrategy:
                         # 做多：損益平衡價格 = 進場價 * (1 + 總手續費%)
                         breakeven = current_price * (1 + total_fee_percent)
                         
-                        # 止損：設在損益平衡價格下方 1.5 ATR
-                        stop_loss = breakeven - (atr * 1.5)
+                        # 止損：設在損益平衡價格下方 N ATR（默認 1.5）
+                        stop_loss = breakeven - (atr * self.breakeven_stop_atr_multiplier)
                         
                         # 驗證止損必須低於入場價（做多）
                         if stop_loss >= current_price:
@@ -599,12 +675,7 @@ class ICTSMCStrategy:
         # === 做空信號分析 ===
         if structure in ['bearish_structure', 'neutral_structure'] and not signal:
             # 檢查是否在阻力區域附近
-            at_resistance = False
-            for zone in self.liquidity_zones:
-                if zone['type'] == 'resistance':
-                    if abs(current_price - zone['price']) < current_price * 0.015:  # 1.5% 誤差範圍
-                        at_resistance = True
-                        break
+            at_resistance = self.is_near_zone(current_price, liquidity_zones, 'resistance')
             
             # 計算做空信心度
             confidence = self.calculate_confidence(
@@ -630,8 +701,6 @@ class ICTSMCStrategy:
                 
                 # 計算止損和止盈（基於損益平衡價格和動態風險收益比）
                 try:
-                    from config import Config
-                    
                     if Config.USE_BREAKEVEN_STOPS:
                         # 🎯 高頻交易止損策略：基於損益平衡價格
                         leverage = Config.DEFAULT_LEVERAGE
@@ -641,8 +710,8 @@ class ICTSMCStrategy:
                         # 做空：損益平衡價格 = 進場價 * (1 - 總手續費%)
                         breakeven = current_price * (1 - total_fee_percent)
                         
-                        # 止損：設在損益平衡價格上方 1.5 ATR
-                        stop_loss = breakeven + (atr * 1.5)
+                        # 止損：設在損益平衡價格上方 N ATR（默認 1.5）
+                        stop_loss = breakeven + (atr * self.breakeven_stop_atr_multiplier)
                         
                         # 驗證止損必須高於入場價（做空）
                         if stop_loss <= current_price:
@@ -726,6 +795,123 @@ class ICTSMCStrategy:
         
         return signal
     
+    @staticmethod
+    def is_near_zone(price, liquidity_zones, zone_type):
+        """價格是否在指定類型（support / resistance）的流動性區域附近（1.5% 誤差範圍）"""
+        for zone in liquidity_zones:
+            if zone['type'] == zone_type and abs(price - zone['price']) < price * 0.015:
+                return True
+        return False
+    
+    def evaluate_batch(self, frames, trends=None, structure_states=None) -> Dict[str, StrategyResult]:
+        """
+        批量評估：逐交易對識別結構，再用一次 NumPy 運算完成所有信心度 / 方向 / 止損止盈
+        
+        結果與對每個交易對調用 evaluate() 完全一致（見 batch_scoring 的精度說明）。
+        
+        參數：
+            frames: {symbol: 已計算指標的 K 線數據}
+            trends: {symbol: 15m 趨勢}（缺省為 neutral）
+            structure_states: {symbol: StructureState}（缺省為全窗口掃描）
+        """
+        trends = trends or {}
+        structure_states = structure_states or {}
+        results = {}
+        groups = {}  # {指標 dtype 組合: [(symbol, values, structure, at_support, at_resistance)]}
+        
+        for symbol, df in frames.items():
+            trend_15m = trends.get(symbol, 'neutral')
+            
+            if len(df) < 50:
+                logger.warning("Insufficient data for ICT/SMC analysis")
+                results[symbol] = StrategyResult(symbol=symbol, signal=None, trend_15m=trend_15m)
+                continue
+            
+            state = structure_states.get(symbol)
+            if state is not None:
+                order_blocks = state.order_blocks
+                liquidity_zones = state.liquidity_zones
+            else:
+                order_blocks = self.identify_order_blocks(df)
+                liquidity_zones = self.identify_liquidity_zones(df)
+            structure = self.check_market_structure(df)
+            
+            results[symbol] = StrategyResult(
+                symbol=symbol,
+                signal=None,
+                structure=structure,
+                trend_15m=trend_15m,
+                order_blocks=order_blocks,
+                liquidity_zones=liquidity_zones
+            )
+            
+            try:
+                values = tuple(df[col].values[-1] for col in _SCORE_COLUMNS)
+            except (KeyError, IndexError) as e:
+                logger.error(f"Missing required indicators: {e}")
+                continue
+            
+            current_price = values[0]
+            key = tuple(np.asarray(v).dtype.str for v in values)
+            groups.setdefault(key, []).append((
+                symbol,
+                values,
+                structure,
+                self.is_near_zone(current_price, liquidity_zones, 'support'),
+                self.is_near_zone(current_price, liquidity_zones, 'resistance')
+            ))
+        
+        # 每組 dtype 一致，保證與標量計算逐位相同
+        for rows in groups.values():
+            columns = [np.array([row[1][k] for row in rows]) for k in range(len(_SCORE_COLUMNS))]
+            price, macd, macd_signal, ema_9, ema_21, atr = columns
+            
+            scores = score_batch(
+                price, macd, macd_signal, ema_9, ema_21, atr,
+                structure=np.array([STRUCTURE_CODES.get(row[2], STRUCTURE_CODES[None]) for row in rows]),
+                trend=np.array([TREND_CODES.get(results[row[0]].trend_15m, TREND_CODES['neutral']) for row in rows]),
+                at_support=np.array([row[3] for row in rows], dtype=bool),
+                at_resistance=np.array([row[4] for row in rows], dtype=bool),
+                min_confidence=self.min_confidence_threshold,
+                stop_atr_multiplier=self.breakeven_stop_atr_multiplier
+            )
+            
+            for i in np.flatnonzero(scores.signal_mask):
+                symbol, _, structure, _, _ = rows[i]
+                result = results[symbol]
+                signal_type = 'BUY' if scores.direction[i] == DIRECTION_BUY else 'SELL'
+                at_zone = bool(scores.at_zone[i])
+                confidence = scores.confidence[i]
+                
+                result.signal = {
+                    'type': signal_type,
+                    'price': price[i],
+                    'stop_loss': scores.stop_loss[i],
+                    'take_profit': scores.take_profit[i],
+                    'confidence': confidence,
+                    'expected_roi': scores.expected_roi[i],
+                    'reason': self._build_reason(signal_type, structure, at_zone, confidence, result.trend_15m),
+                    'metadata': {
+                        'structure': structure,
+                        'at_liquidity_zone': at_zone,
+                        'macd': macd[i],
+                        'macd_signal': macd_signal[i],
+                        'ema_9': ema_9[i],
+                        'ema_21': ema_21[i],
+                        'atr': atr[i],
+                        'current_price': price[i],
+                        'trend_15m': result.trend_15m,
+                        'dynamic_rr_ratio': float(scores.rr_ratio[i])
+                    }
+                }
+                
+                logger.info(
+                    f"ICT/SMC Signal: {signal_type} at {price[i]:.4f} "
+                    f"(信心度: {confidence:.1f}%) - {result.signal['reason']}"
+                )
+        
+        return results
+    
     def _build_reason(self, signal_type, structure, at_zone, confidence, trend_15m='neutral'):
         """構建信號原因描述（整合 v2.0 + v3.0 多時間框架）"""
         reasons = []
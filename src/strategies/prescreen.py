@@ -0,0 +1,302 @@
+"""
+Signal Prescreen - Vectorized rejection stage before full ICT/SMC analysis.
+
+Responsibilities:
+- Stack the latest candles of every symbol into column arrays
+- Compute an upper bound of ICTSMCStrategy.calculate_confidence per direction
+- Reject symbols that cannot reach the confidence threshold
+- Track pass rate and false negatives found by audit sampling
+
+The bound is sound: every component is taken at its maximum unless the
+indicator alignment makes it exactly zero, and the liquidity-zone bonus is
+always assumed. Rejected symbols therefore can never produce a signal, so
+the stage changes throughput, not results (the optional volume / ATR band
+filters are policy filters and are disabled by default).
+"""
+
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_REQUIRED_COLUMNS = ['high', 'low', 'close', 'volume', 'macd', 'macd_signal', 'ema_9', 'ema_21', 'atr']
+
+# calculate_confidence 各項最大配重
+_STRUCTURE_CONFIRMED = 40.0
+_STRUCTURE_NEUTRAL = 20.0
+_MACD_MAX = 20.0
+_EMA_MAX = 20.0
+_PRICE_ABOVE_FAST = 10.0
+_PRICE_ABOVE_SLOW = 5.0
+_LIQUIDITY_MAX = 10.0
+
+
+@dataclass
+class PrescreenResult:
+    """Outcome of one prescreen pass."""
+    passed: List[str] = field(default_factory=list)
+    rejected: Dict[str, str] = field(default_factory=dict)  # {symbol: reason}
+    buy_bound: Dict[str, float] = field(default_factory=dict)
+    sell_bound: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def pass_rate(self) -> float:
+        total = len(self.passed) + len(self.rejected)
+        return len(self.passed) / total if total else 0.0
+
+
+class SignalPrescreen:
+    """Cheap vectorized filter that discards symbols unable to reach the threshold."""
+
+    def __init__(
+        self,
+        min_confidence: float = 70.0,
+        min_rows: int = 50,
+        min_volume: float = 0.0,
+        min_atr_percent: float = 0.0,
+        max_atr_percent: float = 0.0,
+        audit_rate: float = 0.0
+    ):
+        """
+        Initialize prescreen.
+
+        Args:
+            min_confidence: Strategy confidence threshold
+            min_rows: Minimum candles required by the strategy
+            min_volume: Minimum last-candle volume (0 = disabled)
+            min_atr_percent: Minimum ATR / price in % (0 = disabled)
+            max_atr_percent: Maximum ATR / price in % (0 = disabled)
+            audit_rate: Fraction of rejected symbols re-run through the full pipeline
+        """
+        self.min_confidence = min_confidence
+        self.min_rows = min_rows
+        self.min_volume = min_volume
+        self.min_atr_percent = min_atr_percent
+        self.max_atr_percent = max_atr_percent
+        self.audit_rate = audit_rate
+
+        # Statistics
+        self.stats = {
+            'screened': 0,
+            'passed': 0,
+            'rejected': 0,
+            'rejected_by_reason': {},
+            'audited': 0,
+            'false_negatives': 0
+        }
+
+    def screen(
+        self,
+        frames: Dict[str, pd.DataFrame],
+        trends: Optional[Dict[str, str]] = None
+    ) -> PrescreenResult:
+        """
+        Screen all symbols in one vectorized pass.
+
+        Args:
+            frames: Dict of {symbol: DataFrame with indicators}
+            trends: Optional {symbol: trend_15m}; enables the trend-agreement filter
+
+        Returns:
+            PrescreenResult
+        """
+        result = PrescreenResult()
+        symbols = []
+        tails = []
+
+        for symbol, df in frames.items():
+            if df is None or len(df) < self.min_rows:
+                result.rejected[symbol] = 'insufficient_data'
+                continue
+            if any(col not in df.columns for col in _REQUIRED_COLUMNS):
+                result.rejected[symbol] = 'missing_indicators'
+                continue
+            symbols.append(symbol)
+            tails.append(df[_REQUIRED_COLUMNS].values[-3:])
+
+        if symbols:
+            # (n_symbols, 3 rows, n_columns)
+            matrix = np.stack(tails).astype(np.float64)
+            col = {name: i for i, name in enumerate(_REQUIRED_COLUMNS)}
+            last = matrix[:, -1, :]
+
+            price = last[:, col['close']]
+            macd = last[:, col['macd']]
+            macd_signal = last[:, col['macd_signal']]
+            ema_9 = last[:, col['ema_9']]
+            ema_21 = last[:, col['ema_21']]
+            atr = last[:, col['atr']]
+            volume = last[:, col['volume']]
+            highs = matrix[:, :, col['high']]
+            lows = matrix[:, :, col['low']]
+
+            buy_bound, sell_bound = self._confidence_bounds(
+                price, macd, macd_signal, ema_9, ema_21, highs, lows
+            )
+
+            if trends:
+                trend = np.array([trends.get(s, 'neutral') for s in symbols])
+                buy_bound = np.where(trend == 'bear', 0.0, buy_bound)
+                sell_bound = np.where(trend == 'bull', 0.0, sell_bound)
+
+            invalid, atr_out, low_volume = self._rejection_masks(
+                price, macd, macd_signal, ema_9, ema_21, atr, volume
+            )
+            below = np.maximum(buy_bound, sell_bound) < self.min_confidence
+
+            for i, symbol in enumerate(symbols):
+                result.buy_bound[symbol] = float(buy_bound[i])
+                result.sell_bound[symbol] = float(sell_bound[i])
+                if invalid[i]:
+                    result.rejected[symbol] = 'invalid_indicators'
+                elif below[i]:
+                    result.rejected[symbol] = 'confidence_bound'
+                elif atr_out[i]:
+                    result.rejected[symbol] = 'atr_band'
+                elif low_volume[i]:
+                    result.rejected[symbol] = 'low_volume'
+                else:
+                    result.passed.append(symbol)
+
+        self._record(result)
+        return result
+
+    def screen_history(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Candidate mask over every row of a full-history indicator frame.
+
+        Row i is True when a window ending at i could pass screen(); used by
+        the backtester to skip candles where no signal is possible. The trend
+        filter is not applied (it only lowers the bound), so the mask stays sound.
+
+        Args:
+            df: DataFrame with indicators, oldest first
+
+        Returns:
+            Boolean array of len(df)
+        """
+        mask = np.zeros(len(df), dtype=bool)
+        if len(df) < 3 or any(col not in df.columns for col in _REQUIRED_COLUMNS):
+            return mask
+
+        values = df[_REQUIRED_COLUMNS].to_numpy(dtype=np.float64)
+        col = {name: i for i, name in enumerate(_REQUIRED_COLUMNS)}
+        last = values[2:]
+
+        # 每行與前兩行組成 3 根 K 棒窗口（與 screen() 的 values[-3:] 相同）
+        highs = np.lib.stride_tricks.sliding_window_view(values[:, col['high']], 3)
+        lows = np.lib.stride_tricks.sliding_window_view(values[:, col['low']], 3)
+
+        price = last[:, col['close']]
+        macd = last[:, col['macd']]
+        macd_signal = last[:, col['macd_signal']]
+        ema_9 = last[:, col['ema_9']]
+        ema_21 = last[:, col['ema_21']]
+        atr = last[:, col['atr']]
+
+        buy_bound, sell_bound = self._confidence_bounds(
+            price, macd, macd_signal, ema_9, ema_21, highs, lows
+        )
+        invalid, atr_out, low_volume = self._rejection_masks(
+            price, macd, macd_signal, ema_9, ema_21, atr, last[:, col['volume']]
+        )
+
+        mask[2:] = (
+            (np.maximum(buy_bound, sell_bound) >= self.min_confidence)
+            & ~invalid & ~atr_out & ~low_volume
+        )
+        return mask
+
+    def _rejection_masks(self, price, macd, macd_signal, ema_9, ema_21, atr, volume):
+        """Invalid-indicator, ATR-band and low-volume masks."""
+        with np.errstate(invalid='ignore'):
+            invalid = np.isnan(np.column_stack([price, macd, macd_signal, ema_9, ema_21, atr])).any(axis=1)
+            invalid |= (atr <= 0) | (price <= 0)
+
+            atr_pct = np.divide(atr, price, out=np.zeros_like(atr), where=price > 0) * 100
+            atr_out = np.zeros(len(price), dtype=bool)
+            if self.min_atr_percent > 0:
+                atr_out |= atr_pct < self.min_atr_percent
+            if self.max_atr_percent > 0:
+                atr_out |= atr_pct > self.max_atr_percent
+
+            low_volume = volume < self.min_volume if self.min_volume > 0 else np.zeros(len(price), dtype=bool)
+        return invalid, atr_out, low_volume
+
+    def _confidence_bounds(self, price, macd, macd_signal, ema_9, ema_21, highs, lows):
+        """Upper bound of calculate_confidence for BUY and SELL (same comparisons as the scalar code)."""
+        rising = (np.diff(highs, axis=1) >= 0).all(axis=1) & (np.diff(lows, axis=1) >= 0).all(axis=1)
+        falling = (np.diff(highs, axis=1) <= 0).all(axis=1) & (np.diff(lows, axis=1) <= 0).all(axis=1)
+
+        buy = (
+            np.where(rising, _STRUCTURE_CONFIRMED, _STRUCTURE_NEUTRAL)
+            + np.where(macd > macd_signal, _MACD_MAX, 0.0)
+            + np.where(ema_9 > ema_21, _EMA_MAX, 0.0)
+            + np.where(price > ema_9, _PRICE_ABOVE_FAST, np.where(price > ema_21, _PRICE_ABOVE_SLOW, 0.0))
+            + _LIQUIDITY_MAX
+        )
+        sell = (
+            np.where(falling, _STRUCTURE_CONFIRMED, _STRUCTURE_NEUTRAL)
+            + np.where(macd < macd_signal, _MACD_MAX, 0.0)
+            + np.where(ema_9 < ema_21, _EMA_MAX, 0.0)
+            + np.where(price < ema_9, _PRICE_ABOVE_FAST, np.where(price < ema_21, _PRICE_ABOVE_SLOW, 0.0))
+            + _LIQUIDITY_MAX
+        )
+        return buy, sell
+
+    def _record(self, result: PrescreenResult):
+        """Update statistics with one pass."""
+        self.stats['screened'] += len(result.passed) + len(result.rejected)
+        self.stats['passed'] += len(result.passed)
+        self.stats['rejected'] += len(result.rejected)
+        for reason in result.rejected.values():
+            by_reason = self.stats['rejected_by_reason']
+            by_reason[reason] = by_reason.get(reason, 0) + 1
+
+    def audit_sample(self, result: PrescreenResult) -> List[str]:
+        """
+        Pick rejected symbols to re-run through the full pipeline.
+
+        Only confidence-bound rejections are audited: the other reasons are
+        either policy filters or conditions the strategy itself rejects.
+        """
+        if self.audit_rate <= 0:
+            return []
+
+        candidates = [s for s, reason in result.rejected.items() if reason == 'confidence_bound']
+        if not candidates:
+            return []
+
+        k = max(1, int(round(len(candidates) * self.audit_rate)))
+        return random.sample(candidates, min(k, len(candidates)))
+
+    def record_audit(self, audited: int, false_negatives: List[str]):
+        """Record audit outcome (false negatives indicate an unsound bound)."""
+        self.stats['audited'] += audited
+        self.stats['false_negatives'] += len(false_negatives)
+        if false_negatives:
+            logger.error(f"Prescreen false negatives detected: {false_negatives}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prescreen statistics."""
+        return {
+            **self.stats,
+            'pass_rate': self.stats['passed'] / max(self.stats['screened'], 1),
+            'false_negative_rate': self.stats['false_negatives'] / max(self.stats['audited'], 1)
+        }
+
+    def reset_stats(self):
+        """Reset statistics counters."""
+        self.stats = {
+            'screened': 0,
+            'passed': 0,
+            'rejected': 0,
+            'rejected_by_reason': {},
+            'audited': 0,
+            'false_negatives': 0
+        }
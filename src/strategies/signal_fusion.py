@@ -0,0 +1,218 @@
+"""
+Signal Fusion - Combine signals from several strategies into one decision.
+
+Combiners:
+- weighted: direction with the largest weighted confidence; confidence is
+  normalised over all strategies that evaluated the symbol
+- voting: direction backed by at least min_votes strategies
+- veto: primary strategy decides, any opposing strategy vetoes
+
+With a single registered strategy every combiner returns that strategy's
+signal unchanged.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SignalCombiner:
+    """Base combiner: pass-through of the primary strategy's signal."""
+
+    name = 'primary'
+
+    def __init__(
+        self,
+        primary: str = 'ict_smc',
+        weights: Optional[Dict[str, float]] = None,
+        min_confidence: float = 70.0
+    ):
+        """
+        Initialize combiner.
+
+        Args:
+            primary: Strategy whose trade levels are used when it contributes
+            weights: Per-strategy weights (missing strategies weigh 1.0)
+            min_confidence: Minimum fused confidence for a signal
+        """
+        self.primary = primary
+        self.weights = weights or {}
+        self.min_confidence = min_confidence
+
+    def weight(self, strategy_name: str) -> float:
+        return self.weights.get(strategy_name, 1.0)
+
+    def combine(self, signals: Dict[str, Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Fuse one symbol's per-strategy signals.
+
+        Args:
+            signals: {strategy_name: signal dict or None} for every strategy that ran
+
+        Returns:
+            Fused signal dict (strategy signal format plus 'strategy' and
+            metadata['fusion']) or None
+        """
+        active = self._active(signals)
+        if len(signals) == 1:
+            return self._single(signals, active)
+
+        signal = active.get(self.primary)
+        if signal is None:
+            return None
+        return self._fused(signal, [self.primary], signal['confidence'], signals)
+
+    @staticmethod
+    def _active(signals: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """Strategies that produced an actionable BUY/SELL signal."""
+        return {
+            name: sig for name, sig in signals.items()
+            if sig is not None and sig.get('type') in ('BUY', 'SELL')
+        }
+
+    def _single(self, signals, active) -> Optional[Dict[str, Any]]:
+        """One strategy registered: its signal is the decision."""
+        if not active:
+            return None
+        name, signal = next(iter(active.items()))
+        return {**signal, 'strategy': name}
+
+    def _lead(self, contributors: List[str], active: Dict[str, Dict[str, Any]]) -> str:
+        """Strategy whose price / stop / target levels are used."""
+        if self.primary in contributors:
+            return self.primary
+        return max(contributors, key=lambda n: (self.weight(n), active[n]['confidence']))
+
+    def _fused(self, lead_signal, contributors, confidence, signals) -> Dict[str, Any]:
+        """Build the fused signal from the lead strategy's levels."""
+        metadata = dict(lead_signal.get('metadata', {}))
+        metadata['fusion'] = {
+            'combiner': self.name,
+            'contributors': {
+                name: signals[name]['confidence'] for name in contributors
+            },
+            'strategies_evaluated': len(signals)
+        }
+        return {
+            **lead_signal,
+            'confidence': confidence,
+            'strategy': '+'.join(contributors),
+            'metadata': metadata
+        }
+
+
+class WeightedConfidenceCombiner(SignalCombiner):
+    """Weighted confidence across strategies (abstaining strategies count as 0)."""
+
+    name = 'weighted'
+
+    def combine(self, signals):
+        active = self._active(signals)
+        if len(signals) == 1:
+            return self._single(signals, active)
+        if not active:
+            return None
+
+        total_weight = sum(self.weight(name) for name in signals)
+        if total_weight <= 0:
+            return None
+
+        scores = {}
+        for direction in ('BUY', 'SELL'):
+            supporters = [n for n, s in active.items() if s['type'] == direction]
+            scores[direction] = (
+                sum(self.weight(n) * active[n]['confidence'] for n in supporters) / total_weight,
+                supporters
+            )
+
+        direction = max(scores, key=lambda d: scores[d][0])
+        confidence, contributors = scores[direction]
+        if not contributors or confidence < self.min_confidence:
+            return None
+
+        lead = self._lead(contributors, active)
+        return self._fused(active[lead], contributors, confidence, signals)
+
+
+class VotingCombiner(SignalCombiner):
+    """Direction needs at least min_votes agreeing strategies (default: majority)."""
+
+    name = 'voting'
+
+    def __init__(self, min_votes: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.min_votes = min_votes
+
+    def combine(self, signals):
+        active = self._active(signals)
+        if len(signals) == 1:
+            return self._single(signals, active)
+
+        required = self.min_votes or (len(signals) // 2 + 1)
+        for direction in ('BUY', 'SELL'):
+            contributors = [n for n, s in active.items() if s['type'] == direction]
+            if len(contributors) >= required:
+                confidence = sum(active[n]['confidence'] for n in contributors) / len(contributors)
+                if confidence < self.min_confidence:
+                    return None
+                lead = self._lead(contributors, active)
+                return self._fused(active[lead], contributors, confidence, signals)
+        return None
+
+
+class VetoCombiner(SignalCombiner):
+    """Primary strategy decides; an opposing signal from any other strategy vetoes it."""
+
+    name = 'veto'
+
+    def combine(self, signals):
+        active = self._active(signals)
+        if len(signals) == 1:
+            return self._single(signals, active)
+
+        signal = active.get(self.primary)
+        if signal is None:
+            return None
+
+        opposing = [n for n, s in active.items() if n != self.primary and s['type'] != signal['type']]
+        if opposing:
+            logger.debug(f"Signal vetoed by {opposing}")
+            return None
+
+        contributors = [n for n, s in active.items() if s['type'] == signal['type']]
+        contributors.sort(key=lambda n: n != self.primary)
+        return self._fused(signal, contributors, signal['confidence'], signals)
+
+
+_COMBINERS = {
+    'primary': SignalCombiner,
+    'weighted': WeightedConfidenceCombiner,
+    'voting': VotingCombiner,
+    'veto': VetoCombiner
+}
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse 'ict_smc:1.0,other:0.5' into a weight dict (invalid entries are skipped)."""
+    weights = {}
+    for item in (spec or '').split(','):
+        if ':' not in item:
+            continue
+        name, value = item.split(':', 1)
+        try:
+            weights[name.strip()] = float(value)
+        except ValueError:
+            logger.warning(f"Invalid strategy weight: {item}")
+    return weights
+
+
+def create_combiner(name: str, **kwargs) -> SignalCombiner:
+    """Create a combiner by name (unknown names fall back to 'weighted')."""
+    combiner_cls = _COMBINERS.get((name or '').lower())
+    if combiner_cls is None:
+        logger.warning(f"Unknown signal combiner '{name}', using weighted")
+        combiner_cls = WeightedConfidenceCombiner
+    if combiner_cls is not VotingCombiner:
+        kwargs.pop('min_votes', None)
+    return combiner_cls(**kwargs)
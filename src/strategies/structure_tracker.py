@@ -0,0 +1,283 @@
+"""
+Structure Tracker - Incremental ICT/SMC market structure per symbol.
+
+Responsibilities:
+- Keep active order blocks, liquidity zones and swing points across cycles
+- Process only candles that closed since the previous update
+- Validate order-block candidates once their 5-bar window completes
+- Mark zones that price has since mitigated / swept
+
+Produces the same order blocks and liquidity zones as the full-window scan
+in ICTSMCStrategy (identify_order_blocks / identify_liquidity_zones).
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StructureState:
+    """Read-only view of a symbol's structure (consumed by ICTSMCStrategy.evaluate)."""
+    symbol: str
+    order_blocks: List[Dict[str, Any]] = field(default_factory=list)
+    liquidity_zones: List[Dict[str, Any]] = field(default_factory=list)
+    swing_highs: List[Dict[str, Any]] = field(default_factory=list)
+    swing_lows: List[Dict[str, Any]] = field(default_factory=list)
+    last_closed: Optional[pd.Timestamp] = None
+
+    @property
+    def active_order_blocks(self) -> List[Dict[str, Any]]:
+        """Order blocks price has not returned to yet."""
+        return [ob for ob in self.order_blocks if not ob.get('mitigated')]
+
+
+@dataclass
+class _SymbolStructure:
+    """Mutable per-symbol tracking state."""
+    order_blocks: List[Dict[str, Any]] = field(default_factory=list)
+    liquidity_zones: List[Dict[str, Any]] = field(default_factory=list)
+    swing_highs: List[Dict[str, Any]] = field(default_factory=list)
+    swing_lows: List[Dict[str, Any]] = field(default_factory=list)
+    last_closed_ns: Optional[int] = None
+
+
+class StructureTracker:
+    """
+    Per-symbol incremental structure tracker.
+
+    The last row of each frame is the still-forming candle: its liquidity
+    zones are recomputed on every update but never committed, so intra-candle
+    price changes cannot leave stale zones behind.
+    """
+
+    def __init__(
+        self,
+        ob_lookback: int = 20,
+        lz_lookback: int = 50,
+        max_items: int = 5,
+        max_swings: int = 10
+    ):
+        """
+        Initialize structure tracker.
+
+        Args:
+            ob_lookback: Order-block lookback (same as identify_order_blocks)
+            lz_lookback: Liquidity-zone lookback (same as identify_liquidity_zones)
+            max_items: Order blocks / liquidity zones exposed per symbol
+            max_swings: Swing points kept per side
+        """
+        self.ob_lookback = ob_lookback
+        self.lz_lookback = lz_lookback
+        self.max_items = max_items
+        self.max_swings = max_swings
+        self._symbols: Dict[str, _SymbolStructure] = {}
+
+        # Statistics
+        self.stats = {
+            'updates': 0,
+            'full_rebuilds': 0,
+            'candles_processed': 0,
+            'order_blocks_validated': 0,
+            'zones_mitigated': 0
+        }
+
+    def update(self, symbol: str, df: pd.DataFrame) -> StructureState:
+        """
+        Bring a symbol's structure up to date with a frame and return its state.
+
+        Args:
+            symbol: Trading symbol
+            df: K-line DataFrame (timestamp, open, high, low, close), oldest first
+
+        Returns:
+            StructureState
+        """
+        self.stats['updates'] += 1
+
+        timestamps = df['timestamp']
+        if not pd.api.types.is_datetime64_any_dtype(timestamps):
+            timestamps = pd.to_datetime(timestamps)
+        ts = timestamps.values.astype('datetime64[ns]').astype(np.int64)
+        opens = df['open'].values
+        highs = df['high'].values
+        lows = df['low'].values
+        closes = df['close'].values
+        last_closed = len(df) - 2  # 最後一根為未收盤 K 棒
+
+        state = self._symbols.get(symbol)
+        start = self._resume_position(state, ts)
+
+        if start is None:
+            # 首次追蹤或數據不連續：從頭重建
+            state = _SymbolStructure()
+            self._symbols[symbol] = state
+            self.stats['full_rebuilds'] += 1
+            start = 0
+
+        for j in range(start, last_closed + 1):
+            self._process_closed_candle(state, j, ts, opens, highs, lows, closes)
+
+        if last_closed >= 0:
+            state.last_closed_ns = int(ts[last_closed])
+
+        self._prune(state, ts)
+        return self._snapshot(symbol, state, ts, highs, lows)
+
+    def get_state(self, symbol: str) -> Optional[_SymbolStructure]:
+        """Raw tracking state for a symbol (None if not tracked)."""
+        return self._symbols.get(symbol)
+
+    def discard(self, symbol: str):
+        """Stop tracking a symbol."""
+        self._symbols.pop(symbol, None)
+
+    def _resume_position(self, state: Optional[_SymbolStructure], ts: np.ndarray) -> Optional[int]:
+        """Index of the first unprocessed closed candle (None = rebuild)."""
+        if state is None or state.last_closed_ns is None:
+            return None
+
+        pos = int(np.searchsorted(ts, state.last_closed_ns))
+        if pos >= len(ts) or ts[pos] != state.last_closed_ns:
+            return None
+
+        # 需要足夠歷史來重新驗證新的候選 OB
+        if pos < 6:
+            return None
+
+        return pos + 1
+
+    def _process_closed_candle(self, state, j, ts, opens, highs, lows, closes):
+        """Apply one newly closed candle at index j."""
+        self.stats['candles_processed'] += 1
+
+        # 1. 標記被回補的訂單塊 / 被掃過的流動性區域
+        for ob in state.order_blocks:
+            if ob['mitigated']:
+                continue
+            if (ob['type'] == 'bullish' and lows[j] <= ob['high']) or \
+               (ob['type'] == 'bearish' and highs[j] >= ob['low']):
+                ob['mitigated'] = True
+                ob['mitigated_at'] = pd.Timestamp(ts[j])
+                self.stats['zones_mitigated'] += 1
+
+        for zone in state.liquidity_zones:
+            if zone['swept']:
+                continue
+            if (zone['type'] == 'resistance' and highs[j] > zone['price']) or \
+               (zone['type'] == 'support' and lows[j] < zone['price']):
+                zone['swept'] = True
+                self.stats['zones_mitigated'] += 1
+
+        # 2. 候選 OB（idx = j-5）的 5 根驗證窗口剛剛完成
+        idx = j - 5
+        if idx >= 0:
+            direction = None
+            if self._is_valid_order_block(idx, opens, lows, highs, closes, 'bullish'):
+                direction = 'bullish'
+            elif self._is_valid_order_block(idx, opens, lows, highs, closes, 'bearish'):
+                direction = 'bearish'
+
+            if direction:
+                state.order_blocks.append({
+                    'type': direction,
+                    'high': highs[idx],
+                    'low': lows[idx],
+                    'timestamp': pd.Timestamp(ts[idx]),
+                    'validated': True,
+                    'mitigated': False
+                })
+                self.stats['order_blocks_validated'] += 1
+
+        # 3. 流動性區域（已收盤 K 棒）
+        state.liquidity_zones.extend(
+            self._liquidity_zones_at(j, ts, highs, lows, swept=False)
+        )
+
+        # 4. 擺動點：j-1 在 j 收盤後確認
+        k = j - 1
+        if k >= 1:
+            if highs[k] > highs[k - 1] and highs[k] > highs[j]:
+                state.swing_highs.append({'price': highs[k], 'timestamp': pd.Timestamp(ts[k])})
+            if lows[k] < lows[k - 1] and lows[k] < lows[j]:
+                state.swing_lows.append({'price': lows[k], 'timestamp': pd.Timestamp(ts[k])})
+
+    @staticmethod
+    def _is_valid_order_block(idx, opens, lows, highs, closes, direction) -> bool:
+        """Array version of ICTSMCStrategy.is_valid_order_block (triple validation)."""
+        if direction == 'bullish':
+            if closes[idx] >= opens[idx]:
+                return False
+            ob_body = opens[idx] - closes[idx]
+            next_body = closes[idx + 1] - opens[idx + 1]
+            if ob_body <= 0 or next_body < 1.2 * ob_body:
+                return False
+            return not np.any(lows[idx + 1:idx + 6] <= lows[idx])
+        else:
+            if closes[idx] <= opens[idx]:
+                return False
+            ob_body = closes[idx] - opens[idx]
+            next_body = opens[idx + 1] - closes[idx + 1]
+            if ob_body <= 0 or next_body < 1.2 * ob_body:
+                return False
+            return not np.any(highs[idx + 1:idx + 6] >= highs[idx])
+
+    def _liquidity_zones_at(self, i, ts, highs, lows, swept=False) -> List[Dict[str, Any]]:
+        """Liquidity zones created by candle i (same rule as identify_liquidity_zones)."""
+        if i < self.lz_lookback:
+            return []
+
+        zones = []
+        if highs[i] >= np.max(highs[i - self.lz_lookback:i]):
+            zones.append({'type': 'resistance', 'price': highs[i],
+                          'timestamp': pd.Timestamp(ts[i]), 'swept': swept})
+        if lows[i] <= np.min(lows[i - self.lz_lookback:i]):
+            zones.append({'type': 'support', 'price': lows[i],
+                          'timestamp': pd.Timestamp(ts[i]), 'swept': swept})
+        return zones
+
+    def _prune(self, state: _SymbolStructure, ts: np.ndarray):
+        """Drop items that fell out of the analysis window."""
+        if len(ts) > self.ob_lookback:
+            ob_cutoff = pd.Timestamp(ts[self.ob_lookback])
+            state.order_blocks = [ob for ob in state.order_blocks if ob['timestamp'] >= ob_cutoff]
+            state.order_blocks = state.order_blocks[-self.max_items:]
+
+        if len(ts) > self.lz_lookback:
+            lz_cutoff = pd.Timestamp(ts[self.lz_lookback])
+            state.liquidity_zones = [z for z in state.liquidity_zones if z['timestamp'] >= lz_cutoff]
+            state.liquidity_zones = state.liquidity_zones[-self.max_items:]
+
+        window_start = pd.Timestamp(ts[0]) if len(ts) else None
+        if window_start is not None:
+            state.swing_highs = [s for s in state.swing_highs if s['timestamp'] >= window_start][-self.max_swings:]
+            state.swing_lows = [s for s in state.swing_lows if s['timestamp'] >= window_start][-self.max_swings:]
+
+    def _snapshot(self, symbol, state, ts, highs, lows) -> StructureState:
+        """Combine committed state with the forming candle into a StructureState."""
+        provisional = self._liquidity_zones_at(len(ts) - 1, ts, highs, lows) if len(ts) else []
+        zones = (state.liquidity_zones + provisional)[-self.max_items:]
+
+        return StructureState(
+            symbol=symbol,
+            order_blocks=[dict(ob) for ob in state.order_blocks[-self.max_items:]],
+            liquidity_zones=[dict(z) for z in zones],
+            swing_highs=list(state.swing_highs),
+            swing_lows=list(state.swing_lows),
+            last_closed=pd.Timestamp(state.last_closed_ns) if state.last_closed_ns is not None else None
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get tracker statistics."""
+        return {
+            **self.stats,
+            'tracked_symbols': len(self._symbols),
+            'avg_candles_per_update': (
+                self.stats['candles_processed'] / max(self.stats['updates'], 1)
+            )
+        }
@@ -0,0 +1,82 @@
+"""Tests for the user-data stream AccountModel."""
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from src.services.user_data_stream import AccountModel  # noqa: E402
+
+
+def order_event(order_id, status, execution_type='NEW', order_type='STOP_MARKET', symbol='BTCUSDT'):
+    return {
+        'e': 'ORDER_TRADE_UPDATE', 'E': 1700000000000 + order_id,
+        'o': {
+            'i': order_id, 's': symbol, 'S': 'SELL', 'o': order_type, 'ps': 'LONG',
+            'q': '0.01', 'p': '0', 'sp': '95', 'ap': '0', 'z': '0',
+            'X': status, 'x': execution_type
+        }
+    }
+
+
+def seeded_model():
+    model = AccountModel()
+    model.seed(
+        balance=1000.0,
+        positions=[
+            {'symbol': 'BTCUSDT', 'positionSide': 'LONG', 'positionAmt': '0.01', 'entryPrice': '100',
+             'unRealizedProfit': '0', 'leverage': '10'},
+            {'symbol': 'ETHUSDT', 'positionSide': 'SHORT', 'positionAmt': '0', 'entryPrice': '0'}
+        ],
+        open_orders=[{'orderId': 7, 'symbol': 'BTCUSDT', 'type': 'STOP_MARKET'}]
+    )
+    return model
+
+
+def test_seed_keeps_open_positions_only():
+    model = seeded_model()
+    assert model.get_futures_balance() == 1000.0
+    assert [pos['symbol'] for pos in model.get_current_positions()] == ['BTCUSDT']
+    assert model.get_position('BTCUSDT', 'LONG')['leverage'] == 10
+    assert len(model.get_open_stop_orders('BTCUSDT')) == 1
+
+
+def test_account_update_sets_absolute_balance_and_positions():
+    model = seeded_model()
+    model.apply({
+        'e': 'ACCOUNT_UPDATE', 'E': 1700000000500,
+        'a': {
+            'B': [{'a': 'USDT', 'wb': '990.5'}],
+            'P': [
+                {'s': 'BTCUSDT', 'ps': 'LONG', 'pa': '0', 'ep': '0'},
+                {'s': 'ETHUSDT', 'ps': 'SHORT', 'pa': '-0.5', 'ep': '2000', 'up': '-1.5'}
+            ]
+        }
+    })
+    assert model.get_futures_balance() == 990.5
+    assert model.get_position('BTCUSDT', 'LONG') is None
+    assert model.get_position('ETHUSDT', 'SHORT')['positionAmt'] == -0.5
+    assert model.event_time == 1700000000500
+    assert model.stats['account_updates'] == 1
+
+
+def test_order_updates_track_open_orders_and_notify_listeners():
+    model = seeded_model()
+    seen = []
+    model.order_listeners.append(lambda order: seen.append((order['orderId'], order['status'])))
+    model.order_listeners.append(lambda order: 1 / 0)   # 監聽器異常不影響其他監聽器與狀態
+
+    model.apply(order_event(8, 'NEW'))
+    assert {order['orderId'] for order in model.get_open_orders()} == {7, 8}
+    model.apply(order_event(8, 'FILLED', execution_type='TRADE'))
+    model.apply(order_event(7, 'CANCELED', execution_type='CANCELED'))
+
+    assert model.get_open_orders() == []
+    assert seen == [(8, 'NEW'), (8, 'FILLED'), (7, 'CANCELED')]
+    assert model.stats['fills'] == 1
+    assert model.stats['order_updates'] == 3
+
+
+def test_leverage_config_update():
+    model = seeded_model()
+    model.apply({'e': 'ACCOUNT_CONFIG_UPDATE', 'E': 1, 'ac': {'s': 'BTCUSDT', 'l': 20}})
+    assert model.get_current_positions()[0]['leverage'] == 20
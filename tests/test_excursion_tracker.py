@@ -0,0 +1,78 @@
+"""Tests for the incremental MFE / MAE tracker."""
+
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+from src.services.excursion_tracker import ExcursionTracker
+
+OPENED = datetime(2024, 1, 1, 0, 0, tzinfo=timezone.utc)
+
+
+def frame(start, rows):
+    """15m kline frame from (high, low, close) rows."""
+    timestamps = pd.date_range(start, periods=len(rows), freq='15min')
+    return pd.DataFrame({
+        'timestamp': timestamps,
+        'high': [row[0] for row in rows],
+        'low': [row[1] for row in rows],
+        'close': [row[2] for row in rows]
+    })
+
+
+def test_long_and_short_excursions_from_prices():
+    long = ExcursionTracker.open('BUY', OPENED, entry_price=100.0)
+    short = ExcursionTracker.open('SHORT', OPENED, entry_price=100.0)
+    for price in (104.0, 97.0, 101.0, float('nan'), 0.0):
+        long.update_price(price)
+        short.update_price(price)
+    assert long.mfe_mae(100.0) == pytest.approx((4.0, -3.0))
+    assert short.mfe_mae(100.0) == pytest.approx((3.0, -4.0))
+    assert long.observations == 4
+    assert long.path_length == pytest.approx(4 + 7 + 4)
+
+
+def test_excursions_clamp_at_zero_and_follow_corrected_entry():
+    tracker = ExcursionTracker.open('BUY', OPENED, entry_price=100.0)
+    tracker.update_price(102.0)
+    assert tracker.mfe_mae(100.0) == pytest.approx((2.0, 0.0))
+    # 成交價修正後按新入場價計算，無需重新追蹤
+    assert tracker.mfe_mae(105.0) == pytest.approx((0.0, -100 * 5 / 105))
+    assert ExcursionTracker('BUY', since=0).mfe_mae(100.0) == (0.0, 0.0)
+
+
+def test_update_frame_reads_only_candles_since_entry_and_new_ones():
+    tracker = ExcursionTracker.open('BUY', OPENED)
+    klines = frame('2023-12-31 23:30', [(150, 50, 100), (90, 80, 85), (105, 95, 100), (110, 99, 108)])
+    tracker.update_frame(klines.iloc[:3])
+    # 開倉前的 K 線（23:30、23:45）不計入
+    assert tracker.candles == 1
+    assert (tracker.high, tracker.low) == (105, 95)
+
+    # 最後一根 K 線增長後重讀，不重複計數
+    grown = klines.iloc[:3].copy()
+    grown.loc[2, 'high'] = 107
+    tracker.update_frame(grown)
+    assert tracker.candles == 1
+    assert tracker.high == 107
+
+    tracker.update_frame(klines)
+    assert tracker.candles == 2
+    assert (tracker.high, tracker.low) == (110, 95)
+    assert tracker.last_price == 108
+
+
+def test_round_trip_and_summary():
+    tracker = ExcursionTracker.open_utc('SELL', '2024-01-01T00:00:00', entry_price=100.0)
+    assert tracker.since == OPENED.timestamp()
+    tracker.update_price(90.0)
+    restored = ExcursionTracker.from_dict(tracker.to_dict())
+    assert restored == tracker
+    assert ExcursionTracker.from_dict(None) is None
+
+    summary = restored.summary(100.0)
+    assert summary['max_favorable_excursion'] == pytest.approx(10.0)
+    assert summary['max_adverse_excursion'] == 0.0
+    assert summary['path_length_pct'] == pytest.approx(10.0)
+    assert summary['observations'] == 2
@@ -0,0 +1,127 @@
+"""Tests for ExecutionService slot reservation and order-update handling."""
+
+import asyncio
+from types import SimpleNamespace
+
+from src.services.execution_service import ExecutionService
+from src.services.signal_trace import SignalTrace
+from src.simulation.paper_exchange import PaperExchange
+
+
+class FakeRisk:
+    """Fixed sizing, enough of RiskManager for ExecutionService."""
+
+    account_balance = 1000
+
+    def __init__(self):
+        self.open_positions = {}
+
+    def calculate_dynamic_leverage(self, **kwargs):
+        return 5
+
+    def calculate_position_size(self, **kwargs):
+        return {'quantity': 1.0, 'margin': 20, 'leverage': 5, 'margin_percent': 2, 'position_value': 100}
+
+    def add_position(self, symbol, *args):
+        self.open_positions[symbol] = args
+
+    def close_position(self, symbol):
+        self.open_positions.pop(symbol, None)
+
+
+def make_signal(symbol, price=100.0):
+    return SimpleNamespace(
+        symbol=symbol, action='BUY', price=price, stop_loss=price * 0.95, take_profit=price * 1.1,
+        confidence=70.0, strategy='test', expected_roi=1.0, reason='', metadata={}, trace=SignalTrace()
+    )
+
+
+def test_reserve_slot_never_exceeds_max_positions():
+    async def run():
+        service = ExecutionService(None, FakeRisk())
+        service.max_positions = 3
+        symbols = [f"S{i}USDT" for i in range(10)]
+        results = await asyncio.gather(*(service._reserve_slot(symbol) for symbol in symbols))
+        return service, results
+
+    service, results = asyncio.run(run())
+    assert sum(results) == 3
+    assert len(service.reserved_slots) == 3
+
+
+def test_reserve_slot_rejects_symbol_in_flight_or_open():
+    async def run():
+        service = ExecutionService(None, FakeRisk())
+        service.max_positions = 5
+        first = await service._reserve_slot('BTCUSDT')
+        duplicate = await service._reserve_slot('BTCUSDT')
+        service.reserved_slots.discard('BTCUSDT')
+        service.positions['BTCUSDT'] = object()
+        open_duplicate = await service._reserve_slot('BTCUSDT')
+        return first, duplicate, open_duplicate
+
+    assert asyncio.run(run()) == (True, False, False)
+
+
+def test_concurrent_entries_respect_the_cap():
+    async def run():
+        exchange = PaperExchange(None, balance=1000, latency_ms=20)
+        symbols = ['AUSDT', 'BUSDT', 'CUSDT', 'DUSDT']
+        for symbol in symbols:
+            exchange.last_price[symbol] = 100.0
+        service = ExecutionService(exchange, FakeRisk(), paper_trading=True)
+        service.max_positions = 3
+        signals = [make_signal(symbol) for symbol in symbols + ['AUSDT']]
+        results = await asyncio.gather(*(service.execute_signal(signal) for signal in signals))
+        await service.flush_background()
+        return service, results
+
+    service, results = asyncio.run(run())
+    assert results == [True, True, True, False, False]
+    assert set(service.positions) == {'AUSDT', 'BUSDT', 'CUSDT'}
+    assert not service.reserved_slots
+    assert service.stats['trades_rejected'] == 2
+
+
+class PushingClient:
+    """Native client whose entry fill is pushed on the user stream before the batch response returns."""
+
+    def __init__(self):
+        self.service = None
+        self.canceled = []
+
+    async def place_batch_orders_async(self, orders):
+        self.service.on_order_update({'orderId': 1, 'symbol': 'BTCUSDT', 'status': 'FILLED', 'avgPrice': '101.5'})
+        return [{'orderId': 1, 'status': 'NEW', 'avgPrice': '0'}, {'orderId': 2}, {'orderId': 3}]
+
+    async def create_order_async(self, order):
+        return {'orderId': 9}
+
+    async def cancel_orders_async(self, symbol, order_ids):
+        self.canceled.extend(order_ids)
+        return [{'orderId': order_id} for order_id in order_ids]
+
+
+def test_entry_fill_before_batch_response_is_applied_and_sibling_canceled():
+    async def run():
+        client = PushingClient()
+        service = ExecutionService(client, FakeRisk(), enable_trading=True)
+        client.service = service
+        signal = make_signal('BTCUSDT')
+        prepared = await service.gateway.prepare('BTCUSDT', 'BUY', 1.0, 95.0, 110.0, 100.0)
+        prepared.sizing = {'quantity': 1.0, 'margin': 10.0, 'leverage': 10}
+        signal.prepared = prepared
+        executed = await service.execute_signal(signal)
+        position = service.positions['BTCUSDT']
+
+        # 止損成交：交易所側的止盈單隨之撤銷
+        service.on_order_update({'orderId': 2, 'symbol': 'BTCUSDT', 'status': 'FILLED', 'avgPrice': '95'})
+        await asyncio.sleep(0.05)
+        return service, client, executed, position
+
+    service, client, executed, position = asyncio.run(run())
+    assert executed
+    assert position.entry_price == 101.5
+    assert 'filled' in position.trace.marks
+    assert client.canceled == [3]
+    assert not service._early_fills
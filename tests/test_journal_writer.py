@@ -0,0 +1,106 @@
+"""Tests for the background JournalWriter."""
+
+import threading
+
+from src.managers.journal_writer import JournalWriter
+from src.managers.trade_journal import TradeJournal
+
+
+class FakeJournal:
+    """Records operations; append() can be held until released."""
+
+    def __init__(self):
+        self.directory = 'fake'
+        self.ops = []
+        self.syncs = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.entered = threading.Event()
+
+    def append(self, value):
+        self.entered.set()
+        self.release.wait(5)
+        self.ops.append(('append', value))
+
+    def put(self, key, value):
+        self.ops.append(('put', key, value))
+
+    def delete(self, key):
+        self.ops.append(('delete', key))
+
+    def sync(self):
+        self.syncs += 1
+
+    def maybe_compact(self):
+        return False
+
+
+def test_overflow_keeps_submission_order():
+    journal = FakeJournal()
+    writer = JournalWriter(max_queue=2, batch_max=1, sync_interval=0)
+    try:
+        journal.release.clear()
+        writer.submit(journal, 'append', value=0)
+        assert journal.entered.wait(5)   # 寫入線程卡在第一條記錄上
+        for i in range(1, 10):
+            writer.submit(journal, 'append', value=i)
+        assert writer.stats['overflowed'] == 7
+        assert writer.stats['max_depth'] == 9
+        journal.release.set()
+        assert writer.flush(5)
+    finally:
+        writer.close()
+    assert journal.ops == [('append', i) for i in range(10)]
+    assert writer.stats['submitted'] == 10
+    assert writer.stats['written'] == 10
+    assert writer.depth == 0
+
+
+def test_flush_is_a_barrier_with_group_commit():
+    journal = FakeJournal()
+    writer = JournalWriter(batch_max=100, sync_interval=0.05)
+    try:
+        writer.submit(journal, 'put', 'a', 1)
+        writer.submit(journal, 'put', 'b', 2)
+        writer.submit(journal, 'delete', 'a')
+        assert writer.flush(5)
+        assert journal.ops == [('put', 'a', 1), ('put', 'b', 2), ('delete', 'a')]
+        # 一個批次內多條記錄只 fsync 一次
+        assert journal.syncs == writer.stats['syncs'] <= writer.stats['batches']
+        stats = writer.get_stats()
+        assert stats['depth'] == 0
+        assert stats['durability_lag_ms'] == 0
+        assert stats['lag_mean_ms'] is not None
+    finally:
+        writer.close()
+    assert writer.flush()   # 已關閉：立即返回
+
+
+def test_errors_are_counted_and_writer_keeps_running():
+    class Broken(FakeJournal):
+        def put(self, key, value):
+            raise OSError('disk full')
+
+    broken, journal = Broken(), FakeJournal()
+    writer = JournalWriter(sync_interval=0)
+    try:
+        writer.submit(broken, 'put', 'a', 1)
+        writer.submit(journal, 'put', 'b', 2)
+        assert writer.flush(5)
+    finally:
+        writer.close()
+    assert writer.stats['errors'] == 1
+    assert journal.ops == [('put', 'b', 2)]
+
+
+def test_writes_reach_a_real_journal(tmp_path):
+    journal = TradeJournal(str(tmp_path))
+    writer = JournalWriter(sync_interval=0.01)
+    try:
+        for i in range(50):
+            writer.submit(journal, 'put', f"t{i % 5}", {'i': i})
+        assert writer.flush(5)
+    finally:
+        writer.close()
+        journal.close()
+    assert TradeJournal(str(tmp_path)).items() == {f"t{k}": {'i': 45 + k} for k in range(5)}
@@ -0,0 +1,151 @@
+"""Tests for the columnar KlineArchive and the resumable KlineDownloader."""
+
+import asyncio
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest import archive as archive_module
+from src.backtest.archive import KlineArchive, KlineDownloader
+
+HOUR_MS = 3_600_000
+
+
+def klines(start, periods, freq='1h', offset=0.0):
+    timestamps = pd.date_range(start, periods=periods, freq=freq)
+    close = np.arange(periods, dtype=float) + 100 + offset
+    return pd.DataFrame({
+        'timestamp': timestamps, 'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+        'volume': np.full(periods, 10.0)
+    })
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_write_merge_and_load_across_months(tmp_path, compress):
+    archive = KlineArchive(str(tmp_path), compress=compress)
+    assert archive.write_klines('BTCUSDT', '1h', klines('2024-01-31 20:00', 10)) == 2
+    # 重疊部分以新數據為準，其餘保留
+    archive.write_klines('BTCUSDT', '1h', klines('2024-02-01 02:00', 4, offset=1000))
+
+    assert archive.months('BTCUSDT', '1h') == ['2024-01', '2024-02']
+    df = archive.load('BTCUSDT', '1h')
+    assert len(df) == 10
+    assert df['timestamp'].is_monotonic_increasing
+    assert list(df['close'].iloc[6:]) == [1100.0, 1101.0, 1102.0, 1103.0]
+    assert list(df['close'].iloc[:6]) == [100.0, 101.0, 102.0, 103.0, 104.0, 105.0]
+
+    window = archive.load('BTCUSDT', '1h', start='2024-01-31 22:00', end='2024-02-01 01:00')
+    assert list(window['timestamp'].dt.hour) == [22, 23, 0, 1]
+    assert archive.load_klines(interval='1h').keys() == {'BTCUSDT'}
+
+
+def test_switching_format_replaces_the_partition(tmp_path):
+    KlineArchive(str(tmp_path), compress=False).write_klines('BTCUSDT', '1h', klines('2024-01-01', 3))
+    archive = KlineArchive(str(tmp_path), compress=True)
+    archive.write_klines('BTCUSDT', '1h', klines('2024-01-01 03:00', 3))
+    directory = archive._symbol_dir('BTCUSDT', '1h')
+    assert sorted(os.listdir(directory)) == ['2024-01.npz']
+    assert len(archive.load('BTCUSDT', '1h')) == 6
+
+
+def test_interrupted_partition_swaps_are_recovered(tmp_path):
+    archive = KlineArchive(str(tmp_path), compress=False)
+    archive.write_klines('BTCUSDT', '1h', klines('2024-01-01', 3))
+    archive.write_klines('BTCUSDT', '1h', klines('2024-02-01', 3))
+    directory = archive._symbol_dir('BTCUSDT', '1h')
+
+    # 崩潰於「舊分區移開、新分區就位」之間：恢復舊分區
+    os.replace(os.path.join(directory, '2024-01'), os.path.join(directory, '2024-01.old'))
+    # 崩潰於「新分區就位、刪除舊分區」之間：刪除多餘的舊分區
+    os.makedirs(os.path.join(directory, '2024-02.old'))
+    # 未完成的寫入
+    os.makedirs(os.path.join(directory, '2024-03.tmp'))
+
+    assert archive.months('BTCUSDT', '1h') == ['2024-01', '2024-02']
+    assert sorted(os.listdir(directory)) == ['2024-01', '2024-02']
+    assert len(archive.load('BTCUSDT', '1h')) == 6
+
+
+class FakeHistoryClient:
+    """Hourly klines from listing to the fake clock; fail_on lists request numbers that return None."""
+
+    def __init__(self, listing, now, fail_on=()):
+        self.listing_ms = pd.Timestamp(listing).value // 1_000_000
+        self.now = now
+        self.fail_on = set(fail_on)
+        self.requests = 0
+
+    def history(self, end_ms):
+        opened = np.arange(self.listing_ms, end_ms + 1, HOUR_MS)
+        return pd.DataFrame({
+            'timestamp': pd.to_datetime(opened, unit='ms'),
+            'open': opened / HOUR_MS % 1000, 'high': opened / HOUR_MS % 1000 + 1,
+            'low': opened / HOUR_MS % 1000 - 1, 'close': opened / HOUR_MS % 1000,
+            'volume': np.ones(len(opened))
+        })
+
+    async def get_klines_history_async(self, symbol, interval, end_time, limit):
+        self.requests += 1
+        if self.requests in self.fail_on:
+            return None
+        # 交易所最多返回到當前（可能未收盤）的 K 線
+        end_time = min(end_time, int(self.now[0] * 1000))
+        return self.history(end_time).iloc[-limit:].reset_index(drop=True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [pd.Timestamp('2024-03-10 00:30').value / 1e9]
+    monkeypatch.setattr(archive_module, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def archived_gaps(archive, symbol):
+    ts = archive.load_columns(symbol, '1h')['timestamp']
+    return np.unique(np.diff(ts)).tolist(), ts
+
+
+def test_downloader_resumes_without_gaps_and_tops_up(tmp_path, clock):
+    archive = KlineArchive(str(tmp_path), compress=False)
+    client = FakeHistoryClient('2024-01-20', clock, fail_on={3})
+    downloader = KlineDownloader(
+        client, archive, intervals=['1h'], start='2024-01-01', weight_per_minute=100000,
+        concurrency=1, page_limit=200, max_retries=0
+    )
+
+    # 第一次運行中途失敗：已寫入部分必須是連續的，清單記錄其下界
+    stats = asyncio.run(downloader.run(['BTCUSDT']))
+    assert stats['streams_failed'] == 1
+    steps, ts = archived_gaps(archive, 'BTCUSDT')
+    assert steps == [HOUR_MS]
+    manifest = archive.read_manifest('BTCUSDT', '1h')
+    assert manifest['first_ms'] == ts[0]
+    assert not manifest['listing_reached']
+
+    # 第二次運行從中斷處繼續，直到上市日
+    requests_before = client.requests
+    asyncio.run(downloader.run(['BTCUSDT']))
+    assert downloader.stats['streams_completed'] == 1
+    expected = client.history(int(clock[0] * 1000) // HOUR_MS * HOUR_MS - 1)
+    steps, ts = archived_gaps(archive, 'BTCUSDT')
+    assert steps == [HOUR_MS]
+    assert ts[0] == client.listing_ms
+    assert ts[-1] == expected['timestamp'].iloc[-1].value // 1_000_000
+    assert len(ts) == len(expected)
+    assert client.requests - requests_before < len(expected) // 200 + 1
+    assert archive.read_manifest('BTCUSDT', '1h')['listing_reached']
+
+    # 之後的運行補上新收盤的 K 線
+    clock[0] += 5 * 3600
+    asyncio.run(downloader.run(['BTCUSDT']))
+    steps, ts = archived_gaps(archive, 'BTCUSDT')
+    assert steps == [HOUR_MS]
+    assert len(ts) == len(expected) + 5
+    pd.testing.assert_frame_equal(
+        archive.load('BTCUSDT', '1h'),
+        client.history(int(clock[0] * 1000) // HOUR_MS * HOUR_MS - 1),
+        check_dtype=False
+    )
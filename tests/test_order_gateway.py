@@ -0,0 +1,134 @@
+"""Tests for OrderGateway batch submission, retries and protection replacement."""
+
+import asyncio
+
+from src.services.order_gateway import ENTRY, STOP_LOSS, TAKE_PROFIT, OrderGateway, PreparedOrder
+
+
+class FakeNativeClient:
+    """Async batch client that logs every call; reject(type, n) rejects the next n orders of a type."""
+
+    def __init__(self):
+        self.calls = []
+        self.rejections = {}
+        self.next_id = 1
+
+    def reject(self, order_type: str, times: int = 1):
+        self.rejections[order_type] = times
+
+    def _accept(self, order):
+        if self.rejections.get(order['type']):
+            self.rejections[order['type']] -= 1
+            return None
+        response = {'orderId': self.next_id, 'type': order['type'],
+                    'status': 'FILLED' if order['type'] == 'MARKET' else 'NEW'}
+        self.next_id += 1
+        return response
+
+    async def place_batch_orders_async(self, orders):
+        self.calls.append(('batch', [order['type'] for order in orders]))
+        return [self._accept(order) for order in orders]
+
+    async def create_order_async(self, order):
+        self.calls.append(('create', [order['type']]))
+        return self._accept(order)
+
+    async def cancel_orders_async(self, symbol, order_ids):
+        self.calls.append(('cancel', list(order_ids)))
+        return [{'orderId': order_id, 'status': 'CANCELED'} for order_id in order_ids]
+
+
+def prepared(stop_loss=95.0, take_profit=110.0, limit_price=None):
+    entry = OrderGateway.entry_params('BTCUSDT', 'BUY', 0.01, limit_price)
+    return PreparedOrder(
+        symbol='BTCUSDT', action='BUY', quantity=0.01, entry=entry,
+        protection=OrderGateway.protection_params('BTCUSDT', 'BUY', 0.01, stop_loss, take_profit),
+        notional=1.0, margin=1.0
+    )
+
+
+def test_market_entry_and_protection_in_one_batch():
+    client = FakeNativeClient()
+    gateway = OrderGateway(client)
+    result = asyncio.run(gateway.submit(prepared()))
+    assert client.calls == [('batch', ['MARKET', 'STOP_MARKET', 'TAKE_PROFIT_MARKET'])]
+    assert result[ENTRY]['status'] == 'FILLED'
+    assert result[STOP_LOSS]['type'] == 'STOP_MARKET'
+    assert result[TAKE_PROFIT]['type'] == 'TAKE_PROFIT_MARKET'
+    assert gateway.stats['batches'] == 1
+    assert gateway.stats['unprotected_positions'] == 0
+
+
+def test_single_protection_leg_is_keyed_by_type():
+    client = FakeNativeClient()
+    gateway = OrderGateway(client)
+    result = asyncio.run(gateway.submit(prepared(stop_loss=None)))
+    assert client.calls == [('batch', ['MARKET', 'TAKE_PROFIT_MARKET'])]
+    assert result[STOP_LOSS] is None
+    assert result[TAKE_PROFIT]['type'] == 'TAKE_PROFIT_MARKET'
+    # 未要求的止損不算作無保護
+    assert gateway.stats['unprotected_positions'] == 0
+    assert gateway.stats['protection_retries'] == 0
+
+
+def test_rejected_protection_leg_is_retried_alone():
+    client = FakeNativeClient()
+    client.reject('STOP_MARKET')
+    gateway = OrderGateway(client)
+    result = asyncio.run(gateway.submit(prepared()))
+    assert client.calls == [
+        ('batch', ['MARKET', 'STOP_MARKET', 'TAKE_PROFIT_MARKET']),
+        ('create', ['STOP_MARKET'])
+    ]
+    assert result[STOP_LOSS]['type'] == 'STOP_MARKET'
+    assert gateway.stats['protection_retries'] == 1
+    assert gateway.stats['unprotected_positions'] == 0
+
+
+def test_failed_entry_cancels_accepted_protection():
+    client = FakeNativeClient()
+    client.reject('MARKET')
+    gateway = OrderGateway(client)
+    result = asyncio.run(gateway.submit(prepared()))
+    assert result[ENTRY] is None
+    assert client.calls[-1] == ('cancel', [1, 2])
+
+
+def test_limit_entry_places_protection_after_acceptance():
+    client = FakeNativeClient()
+    client.reject('TAKE_PROFIT_MARKET', times=2)
+    gateway = OrderGateway(client)
+    result = asyncio.run(gateway.submit(prepared(limit_price=99.0)))
+    assert client.calls == [
+        ('create', ['LIMIT']),
+        ('batch', ['STOP_MARKET', 'TAKE_PROFIT_MARKET']),
+        ('create', ['TAKE_PROFIT_MARKET'])
+    ]
+    assert result[STOP_LOSS] is not None
+    assert result[TAKE_PROFIT] is None
+    assert gateway.stats['unprotected_positions'] == 1
+
+
+def test_replace_protection_places_before_cancelling():
+    client = FakeNativeClient()
+    gateway = OrderGateway(client)
+    replaced = asyncio.run(gateway.replace_protection(
+        'BTCUSDT', 'BUY', 0.01, stop_loss=100.0, stop_loss_order_id=42, take_profit_order_id=43
+    ))
+    assert client.calls == [('create', ['STOP_MARKET']), ('cancel', [42])]
+    assert replaced[STOP_LOSS]['type'] == 'STOP_MARKET'
+    assert replaced[TAKE_PROFIT] is None
+    assert gateway.stats['protections_replaced'] == 1
+
+
+def test_replace_protection_keeps_old_order_when_new_one_fails():
+    client = FakeNativeClient()
+    client.reject('STOP_MARKET')
+    gateway = OrderGateway(client)
+    replaced = asyncio.run(gateway.replace_protection(
+        'BTCUSDT', 'BUY', 0.01, stop_loss=100.0, take_profit=120.0,
+        stop_loss_order_id=42, take_profit_order_id=43
+    ))
+    assert client.calls == [('batch', ['STOP_MARKET', 'TAKE_PROFIT_MARKET']), ('cancel', [43])]
+    assert replaced[STOP_LOSS] is None
+    assert replaced[TAKE_PROFIT]['type'] == 'TAKE_PROFIT_MARKET'
@@ -0,0 +1,131 @@
+"""Tests for the market recorder, its kline delta encoding and replay."""
+
+import asyncio
+import itertools
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.simulation import recorder as recorder_module
+from src.simulation.recorder import (
+    MAGIC,
+    KlineDeltaDecoder,
+    KlineDeltaEncoder,
+    MarketRecorder,
+    read_recording
+)
+from src.simulation.replay import ReplayBinanceClient, ReplayError
+
+
+def klines(start, rows, last_close=None):
+    timestamps = pd.date_range('2024-01-01', periods=start + rows, freq='15min')[start:]
+    close = np.arange(start, start + rows, dtype=float) + 100
+    if last_close is not None:
+        close[-1] = last_close
+    return pd.DataFrame({'timestamp': timestamps, 'open': close, 'close': close})
+
+
+class FakeClient:
+    """Sliding kline window whose forming candle changes between calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_klines(self, symbol, interval='1h', limit=500):
+        self.calls += 1
+        return klines(self.calls, limit, last_close=1000.0 + self.calls)
+
+    async def get_ticker(self, symbol):
+        return {'symbol': symbol, 'lastPrice': str(100 + self.calls)}
+
+    def place_order(self, symbol, side, order_type, quantity, price=None):
+        raise RuntimeError('insufficient margin')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Deterministic recorder wall clock: 1, 2, 3, ..."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(recorder_module, 'time', SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def test_delta_encoding_round_trip():
+    encoder, decoder = KlineDeltaEncoder(), KlineDeltaDecoder()
+    stream = ('get_klines', 'BTCUSDT', '15m')
+    frames = [klines(0, 50), klines(1, 50, last_close=7.0), klines(1, 50, last_close=8.0), klines(60, 10), klines(0, 10)]
+    kinds = []
+    for frame in frames:
+        payload = encoder.encode(stream, frame)
+        kinds.append(payload[0])
+        pd.testing.assert_frame_equal(decoder.decode(stream, payload), frame)
+    # 不重疊的後續窗口也是增量（全部為新行）；早於上一窗口開始則重新完整存儲
+    assert kinds == ['full', 'delta', 'delta', 'delta', 'full']
+    assert encoder.encode(stream, None) == ('raw', None)
+
+
+def test_record_and_replay_round_trip(tmp_path, clock):
+    path = str(tmp_path / 'session.rec')
+    client = FakeClient()
+    recorder = MarketRecorder(path, flush_records=2)
+    recorder.attach(client)
+    expected = []
+    for _ in range(3):
+        recorder.mark('cycle')
+        expected.append(client.get_klines('BTCUSDT', '15m', limit=20))
+    ticker = asyncio.run(client.get_ticker('BTCUSDT'))
+    with pytest.raises(RuntimeError):
+        client.place_order('BTCUSDT', 'BUY', 'MARKET', 0.01)
+    recorder.close()
+    assert recorder.stats['kline_full'] == 1
+    assert recorder.stats['kline_deltas'] == 2
+
+    records = list(read_recording(path))
+    assert [record[3] for record in records[:2]] == ['cycle', 'get_klines']
+
+    replay = ReplayBinanceClient(path)
+    assert len(replay.cycle_marks()) == 3
+    # 每個週期按錄製時鐘取回當時的響應
+    for mark_time, frame in zip(replay.cycle_marks(), expected):
+        replay.clock = mark_time + 1   # 標記之後的那次調用
+        pd.testing.assert_frame_equal(replay.get_klines('BTCUSDT', '15m', 20), frame)
+    assert asyncio.run(replay.get_ticker('BTCUSDT')) == ticker
+    with pytest.raises(ReplayError, match='insufficient margin'):
+        replay.place_order('BTCUSDT', 'BUY', 'MARKET', 0.01, None)
+    assert replay.get_klines('ETHUSDT', '15m', 20) is None
+    assert replay.stats['missing'] == 1
+
+
+def test_torn_tail_is_truncated_before_appending(tmp_path):
+    path = str(tmp_path / 'session.rec')
+    recorder = MarketRecorder(path, flush_records=1)
+    recorder.mark('a')
+    recorder.close()
+    intact = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        f.write(b'\x10\x00\x00\x00garbage')
+
+    reopened = MarketRecorder(path, flush_records=1)
+    assert reopened.stats['truncated_bytes'] == 8 + 3
+    assert os.path.getsize(path) == intact
+    reopened.mark('b')
+    reopened.close()
+    assert [record[3] for record in read_recording(path)] == ['a', 'b']
+
+
+def test_torn_magic_restarts_and_foreign_file_is_refused(tmp_path):
+    torn = str(tmp_path / 'torn.rec')
+    with open(torn, 'wb') as f:
+        f.write(MAGIC[:3])
+    recorder = MarketRecorder(torn)
+    recorder.mark('a')
+    recorder.close()
+    assert [record[3] for record in read_recording(torn)] == ['a']
+
+    foreign = str(tmp_path / 'foreign.rec')
+    with open(foreign, 'wb') as f:
+        f.write(b'not a recording at all')
+    with pytest.raises(ValueError):
+        MarketRecorder(foreign)
@@ -0,0 +1,76 @@
+"""Tests for the SignalQueue top-K windows."""
+
+import asyncio
+from types import SimpleNamespace
+
+from src.services.signal_queue import SignalQueue, signal_priority
+
+
+def make_signal(symbol, confidence, expected_roi=1.0):
+    return SimpleNamespace(symbol=symbol, confidence=confidence, expected_roi=expected_roi)
+
+
+def symbols(signals):
+    return [signal.symbol for signal in signals]
+
+
+def test_priority_modes():
+    signal = make_signal('A', 80.0, expected_roi=2.5)
+    assert signal_priority(signal) == 80.0
+    assert signal_priority(signal, 'roi') == 2.5
+    assert signal_priority(signal, 'combined') == 200.0
+
+
+def test_window_returns_top_k_and_superseded_in_priority_order():
+    queue = SignalQueue(window_seconds=0)
+    for symbol, confidence in (('A', 60), ('B', 90), ('C', 75), ('D', 90)):
+        queue.publish(make_signal(symbol, confidence))
+    selected, superseded = asyncio.run(queue.next_window(2))
+    # 同優先級按到達順序
+    assert symbols(selected) == ['B', 'D']
+    assert symbols(superseded) == ['C', 'A']
+    assert queue.depth == 0
+    assert queue.stats['consumed'] == 2
+    assert queue.stats['superseded'] == 2
+    assert queue.stats['max_depth'] == 4
+
+
+def test_window_collects_signals_published_while_it_is_open():
+    async def run():
+        queue = SignalQueue(window_seconds=0.05)
+        consumer = asyncio.ensure_future(queue.next_window(1))
+        await asyncio.sleep(0.01)
+        assert not consumer.done()   # 隊列為空時等待第一個信號
+        queue.publish(make_signal('A', 60))
+        await asyncio.sleep(0.01)
+        queue.publish(make_signal('B', 95))
+        return await consumer
+
+    selected, superseded = asyncio.run(run())
+    assert symbols(selected) == ['B']
+    assert symbols(superseded) == ['A']
+
+
+def test_stale_signals_are_dropped():
+    async def run():
+        queue = SignalQueue(window_seconds=0, max_age_seconds=0.02)
+        queue.publish(make_signal('OLD', 99))
+        await asyncio.sleep(0.05)
+        queue.publish(make_signal('NEW', 50))
+        return queue, await queue.next_window(5)
+
+    queue, (selected, superseded) = asyncio.run(run())
+    assert symbols(selected) == ['NEW']
+    assert superseded == []
+    assert queue.stats['dropped_stale'] == 1
+    assert queue.get_stats()['wait_ms']['count'] == 1
+
+
+def test_clear_and_reset_stats():
+    queue = SignalQueue(window_seconds=0)
+    queue.publish(make_signal('A', 60))
+    queue.publish(make_signal('B', 70))
+    assert queue.clear() == 2
+    assert queue.depth == 0
+    queue.reset_stats()
+    assert queue.stats['published'] == 0
@@ -0,0 +1,117 @@
+"""Tests for the TradeJournal write-ahead log."""
+
+import os
+
+from src.managers.trade_journal import TradeJournal, decode_record, encode_record
+
+
+def test_record_round_trip_and_checksum():
+    line = encode_record({'k': 'a', 'v': 1})
+    assert decode_record(line) == {'k': 'a', 'v': 1}
+    assert decode_record(line[:-1]) is None                 # 殘缺（無換行）
+    assert decode_record(line.replace(b'1}', b'2}')) is None  # 校驗和不符
+    assert decode_record(b'{"v": 3}\n') == {'v': 3}          # 未帶校驗和的舊記錄
+
+
+def test_put_get_delete_and_reopen(tmp_path):
+    journal = TradeJournal(str(tmp_path))
+    journal.put('a', {'pnl': 1})
+    journal.put('b', {'pnl': 2})
+    journal.put('a', {'pnl': 3})
+    journal.delete('b')
+    journal.append('log line')
+    assert journal.get('a') == {'pnl': 3}
+    assert 'b' not in journal
+    assert journal.values() == [{'pnl': 3}, 'log line']
+    journal.close()
+
+    reopened = TradeJournal(str(tmp_path))
+    assert reopened.items() == {'a': {'pnl': 3}}
+    assert len(reopened) == 2
+    assert reopened.dead_bytes == journal.dead_bytes
+    reopened.close()
+
+
+def test_torn_tail_is_truncated_on_open(tmp_path):
+    journal = TradeJournal(str(tmp_path))
+    journal.put('a', 1)
+    journal.put('b', 2)
+    journal.close()
+    segment = os.path.join(str(tmp_path), f"{journal.segments[-1]:08d}.jsonl")
+    intact = os.path.getsize(segment)
+    with open(segment, 'ab') as f:
+        f.write(encode_record({'k': 'c', 'v': 3})[:-5])
+
+    reopened = TradeJournal(str(tmp_path))
+    assert reopened.stats['torn_records'] == 1
+    assert os.path.getsize(segment) == intact
+    assert reopened.items() == {'a': 1, 'b': 2}
+
+    # 截斷後的追加從乾淨的行首開始
+    reopened.put('c', 3)
+    reopened.close()
+    assert TradeJournal(str(tmp_path)).items() == {'a': 1, 'b': 2, 'c': 3}
+
+
+def test_corrupt_record_is_skipped_not_the_file(tmp_path):
+    journal = TradeJournal(str(tmp_path))
+    journal.put('a', 1)
+    journal.put('b', 2)
+    journal.put('c', 3)
+    journal.close()
+    segment = os.path.join(str(tmp_path), f"{journal.segments[-1]:08d}.jsonl")
+    with open(segment, 'rb') as f:
+        lines = f.readlines()
+    lines[1] = lines[1].replace(b'"v":2', b'"v":9')
+    with open(segment, 'wb') as f:
+        f.writelines(lines)
+
+    reopened = TradeJournal(str(tmp_path))
+    assert reopened.stats['corrupt_records'] == 1
+    assert reopened.stats['torn_records'] == 0
+    assert reopened.items() == {'a': 1, 'c': 3}
+
+
+def test_rotation_and_snapshot(tmp_path):
+    journal = TradeJournal(str(tmp_path), segment_max_bytes=200, compact_min_bytes=100)
+    for i in range(20):
+        journal.put('position', {'i': i})
+    journal.append('kept')
+    assert len(journal.segments) > 1
+    assert journal.should_compact()
+    assert journal.maybe_compact()
+    assert journal.segments == []
+    assert journal.dead_bytes == 0
+    assert not journal.maybe_compact()
+
+    journal.put('other', 1)
+    journal.close()
+    names = sorted(os.listdir(str(tmp_path)))
+    assert 'snapshot.jsonl' in names
+    assert not any(name.endswith('.tmp') for name in names)
+
+    reopened = TradeJournal(str(tmp_path))
+    assert reopened.items() == {'position': {'i': 19}, 'other': 1}
+    assert 'kept' in reopened.values()
+
+
+def test_leftover_segments_covered_by_snapshot_are_removed(tmp_path):
+    journal = TradeJournal(str(tmp_path), segment_max_bytes=100)
+    for i in range(5):
+        journal.put('k', i)
+    covered = [os.path.join(str(tmp_path), f"{s:08d}.jsonl") for s in journal.segments]
+    saved = {}
+    for path in covered:
+        with open(path, 'rb') as f:
+            saved[path] = f.read()
+    journal.snapshot()
+    journal.close()
+    # 模擬快照改名後、刪除舊分段前崩潰
+    for path, data in saved.items():
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    reopened = TradeJournal(str(tmp_path))
+    assert reopened.items() == {'k': 4}
+    assert reopened.segments == []
+    assert not any(os.path.exists(path) for path in covered)